@@ -13,6 +13,7 @@ from langgraph.graph import END, StateGraph
 from langgraph.prebuilt import create_react_agent, ToolNode
 from langgraph.checkpoint.memory import MemorySaver
 
+from app.llm.usage import get_usage_callback
 from app.observability.logging import get_logger
 
 logger = get_logger(__name__)
@@ -141,6 +142,10 @@ class AgentManager:
         message: str,
         session_id: str,
         user_id: str | None = None,
+        tenant_id: int | None = None,
+        api_key_id: str | None = None,
+        metadata: dict[str, Any] | None = None,
+        callbacks: list[Any] | None = None,
     ) -> AsyncIterator[str]:
         """流式对话
 
@@ -148,13 +153,19 @@ class AgentManager:
             message: 用户消息
             session_id: 会话 ID
             user_id: 用户 ID
+            tenant_id: 租户 ID（用于用量归属）
+            api_key_id: API Key ID（用于用量归属）
+            metadata: 附加到运行配置的元数据
+            callbacks: 附加的回调（如按模型调用预留预算的 ``BudgetCallback``），先于用量采集回调执行
 
         Yields:
             响应文本片段
         """
         from langchain_core.messages import HumanMessage
 
-        config = {"configurable": {"thread_id": session_id}}
+        config = self._build_config(
+            session_id, user_id, tenant_id, api_key_id, metadata, callbacks
+        )
 
         # 流式获取响应
         async for chunk in self._agent.astream(
@@ -170,6 +181,10 @@ class AgentManager:
         message: str,
         session_id: str,
         user_id: str | None = None,
+        tenant_id: int | None = None,
+        api_key_id: str | None = None,
+        metadata: dict[str, Any] | None = None,
+        callbacks: list[Any] | None = None,
     ) -> str:
         """同步对话
 
@@ -177,13 +192,19 @@ class AgentManager:
             message: 用户消息
             session_id: 会话 ID
             user_id: 用户 ID
+            tenant_id: 租户 ID（用于用量归属）
+            api_key_id: API Key ID（用于用量归属）
+            metadata: 附加到运行配置的元数据
+            callbacks: 附加的回调（如按模型调用预留预算的 ``BudgetCallback``），先于用量采集回调执行
 
         Returns:
             完整响应文本
         """
         from langchain_core.messages import HumanMessage
 
-        config = {"configurable": {"thread_id": session_id}}
+        config = self._build_config(
+            session_id, user_id, tenant_id, api_key_id, metadata, callbacks
+        )
 
         result = await self._agent.ainvoke(
             {"messages": [HumanMessage(content=message)]},
@@ -196,6 +217,31 @@ class AgentManager:
                 return str(msg.content)
         return ""
 
+    @staticmethod
+    def _build_config(
+        session_id: str,
+        user_id: str | None,
+        tenant_id: int | None,
+        api_key_id: str | None = None,
+        metadata: dict[str, Any] | None = None,
+        callbacks: list[Any] | None = None,
+    ) -> dict[str, Any]:
+        """构建运行配置
+
+        挂载用量采集回调，图中所有模型调用都会被记录到 CostTracker。
+        """
+        return {
+            "configurable": {"thread_id": session_id},
+            "callbacks": [*(callbacks or []), get_usage_callback()],
+            "metadata": {
+                "session_id": session_id,
+                "user_id": user_id,
+                "tenant_id": tenant_id,
+                "api_key_id": api_key_id,
+                **(metadata or {}),
+            },
+        }
+
 
 __all__ = [
     "AgentState",
@@ -0,0 +1,325 @@
+"""Agent 提示词模板
+
+把 Agent 提示词模板与其占位符编译一次，之后每次渲染只做变量校验、类型转换
+和执行编译好的 jinja2 渲染函数:
+
+- 模板在沙箱环境中编译（模板由租户编写），相同模板源码跨 Agent 共用编译结果
+- 占位符的 ``validation_rule`` 正则预编译并缓存，``variable_type`` 决定类型转换
+- 编译结果按 (租户, agent_id, 占位符版本) 缓存；只使用该租户的占位符，占位符版本取
+  热点行缓存中占位符作用域的版本号，占位符增删改后自动重新编译
+
+使用示例:
+```python
+engine = get_prompt_engine()
+compiled = engine.compile("agent-1", 1, 0, "你是 {{ company_name }} 的助手", placeholders)
+prompt = compiled.render({"company_name": "Kiki"})
+```
+"""
+
+import json
+import re
+from collections import OrderedDict
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+from jinja2 import Template
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+
+from app.infra.row_cache import get_row_cache
+from app.models.placeholder import Placeholder
+from app.observability.logging import get_logger
+from app.repositories.placeholder import CACHE_SCOPE, PlaceholderRepository
+
+logger = get_logger(__name__)
+
+_environment = ImmutableSandboxedEnvironment(autoescape=False, keep_trailing_newline=True)
+
+_TRUE = frozenset({"true", "1", "yes", "y", "on"})
+_FALSE = frozenset({"false", "0", "no", "n", "off", ""})
+
+
+class PlaceholderValidationError(ValueError):
+    """占位符取值缺失、类型不符或未通过校验规则"""
+
+    def __init__(self, name: str, message: str) -> None:
+        super().__init__(f"{name}: {message}")
+        self.name = name
+
+
+# ============== 类型转换 ==============
+
+
+def _to_string(value: Any) -> str:
+    return value if isinstance(value, str) else str(value)
+
+
+def _to_number(value: Any) -> int | float:
+    if isinstance(value, bool):
+        raise ValueError("expected a number")
+    if isinstance(value, int | float):
+        return value
+    text = str(value).strip()
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def _to_boolean(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError("expected a boolean")
+
+
+def _to_json(value: Any) -> Any:
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _to_array(value: Any) -> list[Any]:
+    if isinstance(value, str):
+        text = value.strip()
+        if text.startswith("["):
+            value = json.loads(text)
+        else:
+            # 逗号分隔
+            return [item.strip() for item in text.split(",") if item.strip()]
+    if isinstance(value, list | tuple):
+        return list(value)
+    raise ValueError("expected an array")
+
+
+_COERCERS: dict[str, Callable[[Any], Any]] = {
+    "string": _to_string,
+    "number": _to_number,
+    "boolean": _to_boolean,
+    "json": _to_json,
+    "array": _to_array,
+}
+
+
+@lru_cache(maxsize=4096)
+def compile_rule(rule: str) -> re.Pattern[str] | None:
+    """预编译校验规则（相同规则跨 Agent 共用）
+
+    Returns:
+        正则，规则为 JSON Schema（不校验）时为 None
+
+    Raises:
+        re.error: 正则无效
+    """
+    if rule.lstrip().startswith("{"):
+        return None
+    return re.compile(rule)
+
+
+@lru_cache(maxsize=1024)
+def compile_source(source: str) -> Template:
+    """在沙箱环境中编译模板源码（相同源码跨 Agent 共用）"""
+    return _environment.from_string(source)
+
+
+# ============== 编译结果 ==============
+
+
+@dataclass(frozen=True, slots=True)
+class PlaceholderSpec:
+    """编译后的占位符"""
+
+    name: str
+    coerce: Callable[[Any], Any]
+    pattern: re.Pattern[str] | None
+    default: Any
+    required: bool
+
+    @classmethod
+    def from_placeholder(cls, placeholder: Placeholder) -> "PlaceholderSpec":
+        coerce = _COERCERS.get(placeholder.variable_type, _to_string)
+        pattern = None
+        if placeholder.validation_rule:
+            try:
+                pattern = compile_rule(placeholder.validation_rule)
+            except re.error as e:
+                logger.warning(
+                    "placeholder_rule_invalid", name=placeholder.name, error=str(e)
+                )
+        default = None
+        if placeholder.default_value is not None:
+            try:
+                default = coerce(placeholder.default_value)
+            except ValueError:
+                default = placeholder.default_value
+        return cls(placeholder.name, coerce, pattern, default, placeholder.is_required)
+
+    def resolve(self, values: Mapping[str, Any]) -> Any:
+        """校验并转换取值，未提供时使用默认值
+
+        Raises:
+            PlaceholderValidationError: 必填缺失、未通过校验规则或类型不符
+        """
+        if self.name not in values or values[self.name] is None:
+            if self.required and self.default is None:
+                raise PlaceholderValidationError(self.name, "value is required")
+            return self.default
+
+        value = values[self.name]
+        if self.pattern is not None and self.pattern.search(_to_string(value)) is None:
+            raise PlaceholderValidationError(self.name, "value does not match validation rule")
+        try:
+            return self.coerce(value)
+        except ValueError as e:
+            raise PlaceholderValidationError(self.name, str(e)) from e
+
+
+class CompiledTemplate:
+    """编译后的提示词模板"""
+
+    __slots__ = ("source", "_render", "_specs")
+
+    def __init__(self, source: str, placeholders: Sequence[Placeholder]) -> None:
+        self.source = source
+        self._render = compile_source(source).render
+        # 同名时 Agent 专属占位符覆盖全局占位符
+        specs: dict[str, PlaceholderSpec] = {}
+        for placeholder in sorted(placeholders, key=lambda p: p.agent_id is not None):
+            if placeholder.is_enabled:
+                specs[placeholder.name] = PlaceholderSpec.from_placeholder(placeholder)
+        self._specs = tuple(specs.values())
+
+    @property
+    def names(self) -> list[str]:
+        return [spec.name for spec in self._specs]
+
+    def render(self, values: Mapping[str, Any] | None = None) -> str:
+        """渲染模板
+
+        Args:
+            values: 占位符取值，未声明为占位符的键原样传给模板
+
+        Returns:
+            渲染结果
+
+        Raises:
+            PlaceholderValidationError: 占位符取值无效
+        """
+        values = values or {}
+        context = dict(values)
+        for spec in self._specs:
+            context[spec.name] = spec.resolve(values)
+        return self._render(context)
+
+
+class PromptTemplateEngine:
+    """提示词模板引擎，按 (租户, agent_id, 占位符版本) 缓存编译结果"""
+
+    def __init__(self, cache_size: int = 1024) -> None:
+        """初始化模板引擎
+
+        Args:
+            cache_size: 最多缓存的编译结果数
+        """
+        self.cache_size = cache_size
+        self._compiled: OrderedDict[tuple[int, str, Any], CompiledTemplate] = OrderedDict()
+        self.compilations = 0
+
+    def compile(
+        self,
+        agent_id: str,
+        tenant_id: int,
+        version: Any,
+        source: str,
+        placeholders: Sequence[Placeholder],
+    ) -> CompiledTemplate:
+        """获取编译结果，同一 (tenant_id, agent_id, version) 且模板源码未变时直接复用
+
+        Args:
+            agent_id: Agent ID
+            tenant_id: 租户 ID
+            version: 占位符版本
+            source: 模板源码
+            placeholders: Agent 可用的占位符
+
+        Returns:
+            编译后的模板
+
+        Raises:
+            jinja2.TemplateSyntaxError: 模板语法错误
+        """
+        key = (tenant_id, agent_id, version)
+        compiled = self._compiled.get(key)
+        if compiled is not None and compiled.source == source:
+            self._compiled.move_to_end(key)
+            return compiled
+
+        compiled = CompiledTemplate(source, placeholders)
+        self.compilations += 1
+        self._compiled[key] = compiled
+        self._compiled.move_to_end(key)
+        while len(self._compiled) > self.cache_size:
+            self._compiled.popitem(last=False)
+        return compiled
+
+    async def render_for_agent(
+        self,
+        repository: PlaceholderRepository,
+        agent_id: str,
+        tenant_id: int,
+        source: str,
+        values: Mapping[str, Any] | None = None,
+    ) -> str:
+        """加载 Agent 的占位符（读穿缓存）并渲染提示词
+
+        编译结果命中时不查询占位符；占位符加载失败时直接抛出，不缓存编译结果。
+
+        Args:
+            repository: 占位符仓储
+            agent_id: Agent ID
+            tenant_id: 租户 ID，只使用该租户的占位符
+            source: 模板源码
+            values: 占位符取值
+
+        Returns:
+            渲染结果
+
+        Raises:
+            PlaceholderValidationError: 占位符取值无效
+            SQLAlchemyError: 占位符加载失败
+        """
+        version = get_row_cache().version(CACHE_SCOPE)
+        compiled = self._compiled.get((tenant_id, agent_id, version))
+        if compiled is None or compiled.source != source:
+            placeholders = await repository.list_by_agent(agent_id, tenant_id, is_enabled=True)
+            compiled = self.compile(agent_id, tenant_id, version, source, placeholders)
+        return compiled.render(values)
+
+    def clear(self) -> None:
+        self._compiled.clear()
+
+
+# 全局模板引擎
+_engine: PromptTemplateEngine | None = None
+
+
+def get_prompt_engine() -> PromptTemplateEngine:
+    """获取全局提示词模板引擎"""
+    global _engine
+    if _engine is None:
+        _engine = PromptTemplateEngine()
+    return _engine
+
+
+__all__ = [
+    "CompiledTemplate",
+    "PlaceholderSpec",
+    "PlaceholderValidationError",
+    "PromptTemplateEngine",
+    "compile_rule",
+    "compile_source",
+    "get_prompt_engine",
+]
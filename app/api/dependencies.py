@@ -47,8 +47,24 @@ async def get_tenant_id(request: Request) -> int | None:
     return getattr(request.state, "tenant_id", None)
 
 
+async def get_api_key_id(request: Request) -> str | None:
+    """获取 API Key ID（依赖注入）
+
+    从中间件设置的请求状态中获取调用方 API Key 的 ID。
+
+    Args:
+        request: FastAPI 请求对象
+
+    Returns:
+        API Key ID 或 None
+    """
+    api_key_id = getattr(request.state, "api_key_id", None)
+    return str(api_key_id) if api_key_id is not None else None
+
+
 # 重新导出其他有用的依赖
 __all__ = [
     "get_db",
     "get_tenant_id",
+    "get_api_key_id",
 ]
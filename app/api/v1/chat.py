@@ -1,14 +1,27 @@
 """聊天 API"""
 
 from typing import Annotated
+from uuid import uuid4
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from app.agent.agent import AgentManager
 from app.agent.tools import list_tools
+from app.api.dependencies import get_api_key_id, get_tenant_id
 from app.config.settings import get_settings
+from app.infra.message_writer import get_message_writer
+from app.llm.budget import (
+    BudgetCallback,
+    BudgetExceededError,
+    BudgetReservation,
+    get_budget_manager,
+)
+from app.llm.tokens import count_prompt_tokens
+from app.observability.logging import get_logger
+
+logger = get_logger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["chat"])
 
@@ -28,39 +41,80 @@ class ChatResponse(BaseModel):
 async def chat(
     request: ChatRequest,
     llm_service: "LLMService" = Depends(lambda: get_llm_service()),
+    tenant_id: int | None = Depends(get_tenant_id),
+    api_key_id: str | None = Depends(get_api_key_id),
 ) -> ChatResponse:
     """发送消息并获取响应（同步）"""
     from app.llm import get_llm_service
 
-    llm_service = get_llm_service()
-    model = llm_service.get_model()
-    tools = list_tools()
-    agent = AgentManager(model=model, tools=tools)
-
-    response = await agent.chat_sync(
-        message=request.message,
-        session_id=request.session_id,
-    )
+    admitted = _admit(request.message, tenant_id, api_key_id)
+    budget = BudgetCallback(get_budget_manager(), tenant_id=tenant_id, api_key_id=api_key_id)
+    try:
+        llm_service = get_llm_service()
+        model = llm_service.get_model(model_name=admitted.model, max_tokens=admitted.max_tokens)
+        tools = list_tools()
+        agent = AgentManager(model=model, tools=tools)
 
+        response = await agent.chat_sync(
+            message=request.message,
+            session_id=request.session_id,
+            tenant_id=tenant_id,
+            api_key_id=api_key_id,
+            callbacks=[budget],
+        )
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=402, detail=str(e)) from e
+    finally:
+        # 实际花费入账后再释放剩余预留
+        budget.close()
+
+    await _persist_turn(request.session_id, request.message, response)
     return ChatResponse(response=response, session_id=request.session_id)
 
 
 @router.post("/stream")
-async def stream_chat(request: ChatRequest):
+async def stream_chat(
+    request: ChatRequest,
+    tenant_id: int | None = Depends(get_tenant_id),
+    api_key_id: str | None = Depends(get_api_key_id),
+):
     """发送消息并获取响应（流式）"""
     from app.llm import get_llm_service
 
+    # 开始推流前做准入检查，预算不足时直接返回 402；准入不占用额度，
+    # 生成器未启动（客户端提前断开）时没有需要释放的预留
+    admitted = _admit(request.message, tenant_id, api_key_id)
+
     llm_service = get_llm_service()
-    model = llm_service.get_model()
+    model = llm_service.get_model(model_name=admitted.model, max_tokens=admitted.max_tokens)
     tools = list_tools()
     agent = AgentManager(model=model, tools=tools)
 
     async def generate():
-        async for chunk in agent.chat(
-            message=request.message,
-            session_id=request.session_id,
-        ):
-            yield chunk
+        chunks: list[str] = []
+        completed = False
+        # 每次模型调用开始前各自预留
+        budget = BudgetCallback(get_budget_manager(), tenant_id=tenant_id, api_key_id=api_key_id)
+        try:
+            async for chunk in agent.chat(
+                message=request.message,
+                session_id=request.session_id,
+                tenant_id=tenant_id,
+                api_key_id=api_key_id,
+                callbacks=[budget],
+            ):
+                chunks.append(chunk)
+                yield chunk
+            completed = True
+        except BudgetExceededError as e:
+            # 已开始推流，无法再返回 402，结束本次响应
+            logger.warning("chat_stream_budget_exceeded", session_id=request.session_id, error=str(e))
+        finally:
+            budget.close()
+            # 客户端中途断开时保存已生成的部分
+            await _persist_turn(
+                request.session_id, request.message, "".join(chunks), completed=completed
+            )
 
     return StreamingResponse(
         generate(),
@@ -80,6 +134,41 @@ async def get_chat_history(session_id: str) -> dict:
     return {"messages": messages, "session_id": session_id}
 
 
+async def _persist_turn(
+    session_id: str,
+    message: str,
+    response: str,
+    *,
+    completed: bool = True,
+) -> None:
+    """把一轮问答交给消息写入器异步落库"""
+    if not get_settings().message_writer_enabled:
+        return
+    writer = get_message_writer()
+    request_id = str(uuid4())
+    await writer.enqueue(session_id, "user", message, request_id=request_id)
+    await writer.enqueue(
+        session_id, "assistant", response, request_id=request_id, is_completed=completed
+    )
+
+
+def _admit(
+    message: str,
+    tenant_id: int | None,
+    api_key_id: str | None,
+) -> BudgetReservation:
+    """请求准入检查，接近额度时自动降级模型（实际额度由每次模型调用预留）"""
+    try:
+        return get_budget_manager().admit(
+            get_settings().llm_model,
+            prompt_tokens=count_prompt_tokens(message),
+            tenant_id=tenant_id,
+            api_key_id=api_key_id,
+        )
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=402, detail=str(e)) from e
+
+
 # 延迟导入避免循环依赖
 def get_llm_service():
     from app.llm import get_llm_service as _get
@@ -1,18 +1,13 @@
 """消息管理 API"""
 
-from typing import Annotated
-from uuid import uuid4
-
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 
-from app.config.settings import get_settings
+from app.infra.chat_store import ChatStore, MessageRecord, get_chat_store
+from app.repositories import InvalidCursorError
 
 router = APIRouter(prefix="/messages", tags=["messages"])
 
-# 内存存储（简化）
-_messages: list[dict] = []
-
 
 class MessageCreateRequest(BaseModel):
     session_id: str
@@ -27,37 +22,56 @@ class MessageResponse(BaseModel):
     content: str
     created_at: str
 
+    @classmethod
+    def from_record(cls, record: MessageRecord) -> "MessageResponse":
+        return cls(
+            id=record.id,
+            session_id=record.session_id,
+            role=record.role,
+            content=record.content,
+            created_at=record.created_at.isoformat(),
+        )
+
 
 @router.get("/session/{session_id}")
-async def list_messages(session_id: str, limit: int = 100) -> list[MessageResponse]:
-    """获取会话的消息历史"""
-    msgs = [m for m in _messages if m["session_id"] == session_id][-limit:]
-    return [MessageResponse(**m) for m in msgs]
+async def list_messages(
+    session_id: str,
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: str | None = None,
+    store: ChatStore = Depends(get_chat_store),
+) -> list[MessageResponse]:
+    """获取会话的消息历史
+
+    返回最近的 ``limit`` 条消息；更早的消息用响应头 ``X-Next-Cursor`` 作为 ``cursor`` 继续获取。
+    """
+    try:
+        page = await store.list_messages(session_id, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return [MessageResponse.from_record(record) for record in page.items]
 
 
 @router.post("", response_model=MessageResponse)
-async def create_message(request: MessageCreateRequest) -> MessageResponse:
+async def create_message(
+    request: MessageCreateRequest,
+    store: ChatStore = Depends(get_chat_store),
+) -> MessageResponse:
     """创建消息"""
-    from datetime import datetime
-
-    msg = {
-        "id": str(uuid4()),
-        "session_id": request.session_id,
-        "role": request.role,
-        "content": request.content,
-        "created_at": datetime.now().isoformat(),
-    }
-    _messages.append(msg)
-    return MessageResponse(**msg)
+    record = await store.add_message(request.session_id, request.role, request.content)
+    return MessageResponse.from_record(record)
 
 
 @router.delete("/{message_id}")
-async def delete_message(message_id: str) -> dict:
+async def delete_message(
+    message_id: str,
+    store: ChatStore = Depends(get_chat_store),
+) -> dict:
     """删除消息"""
-    global _messages
-    if not any(m["id"] == message_id for m in _messages):
+    if not await store.delete_message(message_id):
         raise HTTPException(status_code=404, detail="消息不存在")
-    _messages = [m for m in _messages if m["id"] != message_id]
     return {"message": "删除成功"}
 
 
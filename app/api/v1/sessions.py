@@ -1,19 +1,14 @@
 """会话管理 API"""
 
-from typing import Annotated
-from uuid import uuid4
-
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from pydantic import BaseModel
 
-from app.config.settings import get_settings
-from app.models import Session
+from app.api.dependencies import get_tenant_id
+from app.infra.chat_store import ChatStore, SessionRecord, get_chat_store
+from app.repositories import InvalidCursorError
 
 router = APIRouter(prefix="/sessions", tags=["sessions"])
 
-# 内存存储（简化）
-_sessions: dict[str, dict] = {}
-
 
 class SessionCreateRequest(BaseModel):
     title: str | None = None
@@ -24,45 +19,62 @@ class SessionResponse(BaseModel):
     title: str | None
     created_at: str
 
+    @classmethod
+    def from_record(cls, record: SessionRecord) -> "SessionResponse":
+        return cls(id=record.id, title=record.title, created_at=record.created_at.isoformat())
+
 
 @router.get("")
-async def list_sessions() -> list[SessionResponse]:
-    """列出所有会话"""
-    return [
-        SessionResponse(id=sid, **data)
-        for sid, data in _sessions.items()
-    ]
+async def list_sessions(
+    response: Response,
+    limit: int = Query(100, ge=1, le=500),
+    cursor: str | None = None,
+    store: ChatStore = Depends(get_chat_store),
+) -> list[SessionResponse]:
+    """列出会话（按创建时间倒序）
+
+    下一页用响应头 ``X-Next-Cursor`` 作为 ``cursor`` 继续获取。
+    """
+    try:
+        page = await store.list_sessions(limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    if page.next_cursor:
+        response.headers["X-Next-Cursor"] = page.next_cursor
+    return [SessionResponse.from_record(record) for record in page.items]
 
 
 @router.post("", response_model=SessionResponse)
-async def create_session(request: SessionCreateRequest) -> SessionResponse:
+async def create_session(
+    request: SessionCreateRequest,
+    tenant_id: int | None = Depends(get_tenant_id),
+    store: ChatStore = Depends(get_chat_store),
+) -> SessionResponse:
     """创建新会话"""
-    from datetime import datetime
-
-    sid = str(uuid4())
-    session = {
-        "title": request.title or "新对话",
-        "created_at": datetime.now().isoformat(),
-    }
-    _sessions[sid] = session
-
-    return SessionResponse(id=sid, **session)
+    record = await store.create_session(request.title or "新对话", tenant_id=tenant_id)
+    return SessionResponse.from_record(record)
 
 
 @router.get("/{session_id}")
-async def get_session(session_id: str) -> SessionResponse:
+async def get_session(
+    session_id: str,
+    store: ChatStore = Depends(get_chat_store),
+) -> SessionResponse:
     """获取会话详情"""
-    if session_id not in _sessions:
+    record = await store.get_session(session_id)
+    if record is None:
         raise HTTPException(status_code=404, detail="会话不存在")
-    return SessionResponse(id=session_id, **_sessions[session_id])
+    return SessionResponse.from_record(record)
 
 
 @router.delete("/{session_id}")
-async def delete_session(session_id: str) -> dict:
+async def delete_session(
+    session_id: str,
+    store: ChatStore = Depends(get_chat_store),
+) -> dict:
     """删除会话"""
-    if session_id not in _sessions:
+    if not await store.delete_session(session_id):
         raise HTTPException(status_code=404, detail="会话不存在")
-    del _sessions[session_id]
     return {"message": "删除成功"}
 
 
@@ -4,53 +4,23 @@
 """
 
 from collections.abc import AsyncIterator
-from functools import lru_cache
-from typing import Annotated
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-
-from app.config.settings import Settings, get_settings
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 # ============== 数据库 ==============
 
-@lru_cache
-def _get_engine():
-    """获取数据库引擎（缓存）"""
-    settings = get_settings()
-    return create_async_engine(
-        settings.database_url,
-        echo=settings.debug,
-        pool_size=settings.database_pool_size,
-    )
-
-
-_async_session_factory = None
-
 
-def _get_session_factory() -> async_sessionmaker[AsyncSession]:
-    """获取会话工厂"""
-    global _async_session_factory
-    if _async_session_factory is None:
-        engine = _get_engine()
-        _async_session_factory = async_sessionmaker(
-            engine,
-            class_=AsyncSession,
-            expire_on_commit=False,
-        )
-    return _async_session_factory
+async def get_session() -> AsyncIterator[AsyncSession]:
+    """数据库会话依赖注入
 
+    使用 ``app.infra.database`` 的共享引擎与连接池；不自动提交，
+    需要写入的调用方自行 ``commit``，异常时回滚。
+    """
+    from app.infra.database import get_session as _get_session
 
-async def get_session() -> AsyncIterator[AsyncSession]:
-    """数据库会话依赖注入"""
-    factory = _get_session_factory()
-    async with factory() as session:
-        try:
-            yield session
-            await session.commit()
-        except Exception:
-            await session.rollback()
-            raise
+    async for session in _get_session():
+        yield session
 
 
 # ============== LLM Service ==============
@@ -0,0 +1,383 @@
+"""会话与消息存储
+
+会话 / 消息管理 API 的存储后端，由 ``chat_store_backend`` 配置选择:
+
+- ``memory``：进程内存储，会话按 ID、消息按 ID 和 session_id 建索引，
+  按会话取最近 N 条消息为 O(N)，删除消息为 O(1)；多 worker 之间不共享
+- ``database``：通过 ``SessionRepository`` / ``MessageRepository`` 读写
+  ``sessions`` / ``messages`` 表，多 worker 看到同一份数据
+
+列表按 (created_at, id) 从新到旧分页，``next_cursor`` 为不透明游标，
+翻页耗时与页数无关。
+
+使用示例:
+```python
+store = get_chat_store()
+session = await store.create_session("新对话")
+await store.add_message(session.id, "user", "你好")
+page = await store.list_messages(session.id, limit=20)
+older = await store.list_messages(session.id, limit=20, cursor=page.next_cursor)
+```
+"""
+
+from bisect import bisect_left
+from collections.abc import Callable, Iterator
+from contextlib import AbstractAsyncContextManager
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from typing import Protocol
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import get_settings
+from app.models import Session
+from app.observability.logging import get_logger
+from app.repositories import MessageRepository, PaginationParams, SessionRepository
+from app.repositories.base import decode_cursor, encode_cursor
+
+logger = get_logger(__name__)
+
+SessionFactory = Callable[[], AbstractAsyncContextManager[AsyncSession]]
+
+# 未指定租户时会话归属的租户
+_DEFAULT_TENANT_ID = 0
+
+# 游标排序键，两种后端的游标格式一致
+_CURSOR_KEYS = ("created_at", "id")
+_TICK = timedelta(microseconds=1)
+
+
+def _default_session_factory() -> AbstractAsyncContextManager[AsyncSession]:
+    from app.infra.database import session_scope
+
+    return session_scope()
+
+
+@dataclass(slots=True)
+class SessionRecord:
+    """会话"""
+
+    id: str
+    title: str | None
+    created_at: datetime
+
+
+@dataclass(slots=True)
+class MessageRecord:
+    """消息"""
+
+    id: str
+    session_id: str
+    role: str
+    content: str
+    created_at: datetime
+
+
+@dataclass
+class RecordPage[R]:
+    """一页记录"""
+
+    items: list[R]
+    # 更早一页的游标，没有更多时为空
+    next_cursor: str | None = None
+
+
+def _cursor(record: SessionRecord | MessageRecord) -> str:
+    return encode_cursor([record.created_at, record.id], _CURSOR_KEYS)
+
+
+class ChatStore(Protocol):
+    """会话与消息存储"""
+
+    async def create_session(
+        self, title: str | None, *, tenant_id: int | None = None, user_id: str | None = None
+    ) -> SessionRecord: ...
+
+    async def get_session(self, session_id: str) -> SessionRecord | None: ...
+
+    async def list_sessions(
+        self, *, user_id: str | None = None, limit: int = 100, cursor: str | None = None
+    ) -> RecordPage[SessionRecord]:
+        """按创建时间倒序分页列出会话
+
+        Raises:
+            InvalidCursorError: 游标无效
+        """
+        ...
+
+    async def delete_session(self, session_id: str) -> bool:
+        """删除会话及其消息"""
+        ...
+
+    async def add_message(self, session_id: str, role: str, content: str) -> MessageRecord: ...
+
+    async def list_messages(
+        self, session_id: str, limit: int = 100, cursor: str | None = None
+    ) -> RecordPage[MessageRecord]:
+        """会话最近的 ``limit`` 条消息（页内按时间正序），游标指向更早的消息
+
+        Raises:
+            InvalidCursorError: 游标无效
+        """
+        ...
+
+    async def delete_message(self, message_id: str) -> bool: ...
+
+
+class _RecordLog[R]:
+    """按 (created_at, id) 升序追加的记录
+
+    删除只留空位（O(1)），空位过半时压缩；游标用二分查找定位。
+    """
+
+    def __init__(self) -> None:
+        self._keys: list[tuple[datetime, str]] = []
+        self._records: list[R | None] = []
+        self._positions: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def __iter__(self) -> Iterator[R]:
+        return (record for record in self._records if record is not None)
+
+    def get(self, id: str) -> R | None:
+        position = self._positions.get(id)
+        return None if position is None else self._records[position]
+
+    def append(self, record: R) -> None:
+        self._positions[record.id] = len(self._records)
+        self._keys.append((record.created_at, record.id))
+        self._records.append(record)
+
+    def remove(self, id: str) -> R | None:
+        position = self._positions.pop(id, None)
+        if position is None:
+            return None
+        record, self._records[position] = self._records[position], None
+        if len(self._positions) * 2 < len(self._records):
+            self._compact()
+        return record
+
+    def page(
+        self, limit: int, cursor: str | None, match: Callable[[R], bool] | None = None
+    ) -> RecordPage[R]:
+        """从新到旧取一页
+
+        Raises:
+            ValueError: ``limit`` 不是正数
+        """
+        if limit <= 0:
+            raise ValueError("limit must be positive")
+        end = len(self._records)
+        if cursor:
+            created_at, id = decode_cursor(cursor, _CURSOR_KEYS)
+            end = bisect_left(self._keys, (created_at, id))
+        items: list[R] = []
+        for position in range(end - 1, -1, -1):
+            record = self._records[position]
+            if record is None or (match is not None and not match(record)):
+                continue
+            if len(items) == limit:
+                return RecordPage(items, _cursor(items[-1]))
+            items.append(record)
+        return RecordPage(items)
+
+    def _compact(self) -> None:
+        self._records = [record for record in self._records if record is not None]
+        self._keys = [(record.created_at, record.id) for record in self._records]
+        self._positions = {record.id: i for i, record in enumerate(self._records)}
+
+
+class InMemoryChatStore:
+    """进程内存储"""
+
+    def __init__(self) -> None:
+        self._sessions: _RecordLog[SessionRecord] = _RecordLog()
+        self._session_users: dict[str, str | None] = {}
+        self._messages: dict[str, MessageRecord] = {}
+        self._by_session: dict[str, _RecordLog[MessageRecord]] = {}
+        self._last_created_at = datetime.min.replace(tzinfo=UTC)
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    async def create_session(
+        self, title: str | None, *, tenant_id: int | None = None, user_id: str | None = None
+    ) -> SessionRecord:
+        record = SessionRecord(str(uuid4()), title, self._now())
+        self._sessions.append(record)
+        self._session_users[record.id] = user_id
+        return record
+
+    async def get_session(self, session_id: str) -> SessionRecord | None:
+        return self._sessions.get(session_id)
+
+    async def list_sessions(
+        self, *, user_id: str | None = None, limit: int = 100, cursor: str | None = None
+    ) -> RecordPage[SessionRecord]:
+        if user_id is None:
+            return self._sessions.page(limit, cursor)
+
+        def match(record: SessionRecord) -> bool:
+            return self._session_users[record.id] == user_id
+
+        return self._sessions.page(limit, cursor, match)
+
+    async def delete_session(self, session_id: str) -> bool:
+        if self._sessions.remove(session_id) is None:
+            return False
+        del self._session_users[session_id]
+        for record in self._by_session.pop(session_id, ()):
+            del self._messages[record.id]
+        return True
+
+    async def add_message(self, session_id: str, role: str, content: str) -> MessageRecord:
+        record = MessageRecord(str(uuid4()), session_id, role, content, self._now())
+        self._messages[record.id] = record
+        log = self._by_session.get(session_id)
+        if log is None:
+            log = self._by_session[session_id] = _RecordLog()
+        log.append(record)
+        return record
+
+    async def list_messages(
+        self, session_id: str, limit: int = 100, cursor: str | None = None
+    ) -> RecordPage[MessageRecord]:
+        log = self._by_session.get(session_id)
+        if log is None:
+            if cursor:
+                decode_cursor(cursor, _CURSOR_KEYS)
+            return RecordPage([])
+        page = log.page(limit, cursor)
+        page.items.reverse()
+        return page
+
+    async def delete_message(self, message_id: str) -> bool:
+        record = self._messages.pop(message_id, None)
+        if record is None:
+            return False
+        log = self._by_session[record.session_id]
+        log.remove(message_id)
+        if not log:
+            del self._by_session[record.session_id]
+        return True
+
+    def _now(self) -> datetime:
+        # 严格递增，保证 (created_at, id) 顺序与插入顺序一致
+        self._last_created_at = max(datetime.now(UTC), self._last_created_at + _TICK)
+        return self._last_created_at
+
+
+class DatabaseChatStore:
+    """数据库存储"""
+
+    def __init__(self, session_factory: SessionFactory | None = None) -> None:
+        """初始化数据库存储
+
+        Args:
+            session_factory: 数据库会话工厂，默认 ``session_scope``
+        """
+        self._session_factory = session_factory or _default_session_factory
+
+    async def create_session(
+        self, title: str | None, *, tenant_id: int | None = None, user_id: str | None = None
+    ) -> SessionRecord:
+        session_model = Session(
+            id=str(uuid4()),
+            title=title,
+            tenant_id=_DEFAULT_TENANT_ID if tenant_id is None else tenant_id,
+            user_id=user_id,
+        )
+        async with self._session_factory() as session:
+            await SessionRepository(session).create(session_model)
+            await session.commit()
+        return self._to_session(session_model)
+
+    async def get_session(self, session_id: str) -> SessionRecord | None:
+        async with self._session_factory() as session:
+            session_model = await SessionRepository(session).get(session_id)
+        return self._to_session(session_model) if session_model is not None else None
+
+    async def list_sessions(
+        self, *, user_id: str | None = None, limit: int = 100, cursor: str | None = None
+    ) -> RecordPage[SessionRecord]:
+        params = PaginationParams(size=limit, cursor=cursor, count="none")
+        async with self._session_factory() as session:
+            page = await SessionRepository(session).page_by_user(user_id, params)
+        return RecordPage([self._to_session(item) for item in page.items], page.next_cursor)
+
+    async def delete_session(self, session_id: str) -> bool:
+        async with self._session_factory() as session:
+            # 先删消息（外键指向 sessions）
+            await MessageRepository(session).delete_by_session(session_id)
+            deleted = await SessionRepository(session).delete(session_id)
+            await session.commit()
+        return deleted
+
+    async def add_message(self, session_id: str, role: str, content: str) -> MessageRecord:
+        now = datetime.now(UTC)
+        message_id = str(uuid4())
+        row = {
+            "id": message_id,
+            "request_id": message_id,
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "is_completed": True,
+            "created_at": now,
+            "updated_at": now,
+        }
+        # 一条 INSERT，不做 flush + refresh 回读
+        async with self._session_factory() as session:
+            await MessageRepository(session).bulk_insert([row])
+            await session.commit()
+        return MessageRecord(message_id, session_id, role, content, now)
+
+    async def list_messages(
+        self, session_id: str, limit: int = 100, cursor: str | None = None
+    ) -> RecordPage[MessageRecord]:
+        params = PaginationParams(size=limit, cursor=cursor, count="none")
+        async with self._session_factory() as session:
+            page = await MessageRepository(session).page_by_session(session_id, params)
+        items = [
+            MessageRecord(m.id, m.session_id, m.role, m.content, m.created_at)
+            for m in reversed(page.items)
+        ]
+        return RecordPage(items, page.next_cursor)
+
+    async def delete_message(self, message_id: str) -> bool:
+        async with self._session_factory() as session:
+            deleted = await MessageRepository(session).delete(message_id)
+            await session.commit()
+        return deleted
+
+    @staticmethod
+    def _to_session(session_model: Session) -> SessionRecord:
+        return SessionRecord(session_model.id, session_model.title, session_model.created_at)
+
+
+# 全局存储
+_chat_store: ChatStore | None = None
+
+
+def get_chat_store() -> ChatStore:
+    """获取全局会话与消息存储"""
+    global _chat_store
+    if _chat_store is None:
+        backend = get_settings().chat_store_backend
+        _chat_store = DatabaseChatStore() if backend == "database" else InMemoryChatStore()
+        logger.info("chat_store_initialized", backend=backend)
+    return _chat_store
+
+
+__all__ = [
+    "ChatStore",
+    "DatabaseChatStore",
+    "InMemoryChatStore",
+    "MessageRecord",
+    "RecordPage",
+    "SessionRecord",
+    "get_chat_store",
+]
@@ -1,35 +1,156 @@
 """数据库服务模块
 
-提供数据库连接池、会话管理和事务处理。
+提供数据库引擎注册表、连接池、会话管理和事务处理。
+
+进程内所有异步数据库访问共用 ``get_async_engine()`` 按名称注册的引擎
+（``primary`` 为主库），连接池参数统一来自 ``database_*`` 配置；
+``get_pool_stats()`` 返回连接池指标（占用连接数、取连接等待时间、溢出连接使用情况）。
+
+配置 ``database_replica_url`` 后，会话按语句路由：只读查询走只读副本（``replica``），
+INSERT / UPDATE / DELETE、ORM flush 与 ``SELECT ... FOR UPDATE`` 走主库。
+发生写入后，同一请求（同一 asyncio 任务上下文）内后续的读也走主库，
+保证读到自己刚写入的数据，不受副本复制延迟影响。
 """
 
-from collections.abc import AsyncGenerator, Callable
-from contextlib import asynccontextmanager
+import time
+from collections.abc import AsyncGenerator, Callable, Iterator
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
 from typing import Any
 
+from sqlalchemy import Select, TextClause, UpdateBase
+from sqlalchemy.engine import URL, Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import SQLModel, create_engine
 
 from app.config.settings import get_settings
+from app.infra.migrations import apply_migrations
 from app.observability.logging import get_logger
 
 logger = get_logger(__name__)
 
 settings = get_settings()
 
+# 引擎名称：主库与只读副本
+PRIMARY = "primary"
+REPLICA = "replica"
+
 # 同步引擎（用于迁移）
 _sync_engine = None
 
-# 异步引擎
-_async_engine: AsyncEngine | None = None
+# 异步引擎注册表，按名称
+_engines: dict[str, AsyncEngine] = {}
 
 # 会话工厂
-_session_factory = None
+_session_factory: async_sessionmaker[AsyncSession] | None = None
+
+# 当前请求已写入主库，后续读取也走主库
+_read_primary: ContextVar[bool] = ContextVar("read_primary", default=False)
+
+
+# ============== 连接池 ==============
+
+
+@dataclass
+class PoolMetrics:
+    """连接池累计指标"""
+
+    checkouts: int = 0
+    timeouts: int = 0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    peak_checked_out: int = 0
+    peak_overflow: int = 0
+
+    def observe(self, wait: float, checked_out: int, overflow: int) -> None:
+        self.checkouts += 1
+        self.wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        self.peak_checked_out = max(self.peak_checked_out, checked_out)
+        self.peak_overflow = max(self.peak_overflow, overflow)
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """记录取连接等待时间、超时次数与峰值占用的异步连接池"""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self) -> Any:
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            logger.warning(
+                "db_pool_timeout", size=self.size(), checked_out=self.checkedout()
+            )
+            raise
+        finally:
+            self.metrics.observe(
+                time.perf_counter() - started, self.checkedout(), max(self.overflow(), 0)
+            )
+
+    def recreate(self) -> "InstrumentedAsyncQueuePool":
+        # dispose() 会重建连接池，累计指标沿用
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def engine_options(url: str | URL, *, sync: bool = False) -> dict[str, Any]:
+    """按 ``database_*`` 配置生成引擎参数
+
+    只有队列连接池（PostgreSQL、SQLite 文件库）才设置池大小等参数，
+    SQLite 内存库使用 StaticPool。
+
+    Args:
+        url: 数据库连接字符串
+        sync: 是否为同步引擎（同步引擎不记录连接池指标）
+
+    Returns:
+        ``create_engine`` / ``create_async_engine`` 的关键字参数
+    """
+    url = make_url(url)
+    options: dict[str, Any] = {
+        "echo": settings.database_echo,
+        "pool_pre_ping": settings.database_pool_pre_ping,
+    }
+    if issubclass(url.get_dialect().get_pool_class(url), QueuePool):
+        options.update(
+            pool_size=settings.database_pool_size,
+            max_overflow=settings.database_max_overflow,
+            pool_timeout=settings.database_pool_timeout,
+            pool_recycle=settings.database_pool_recycle,
+        )
+        if not sync:
+            options["poolclass"] = InstrumentedAsyncQueuePool
+
+    # 建立连接的超时，各驱动参数名不同
+    driver = url.get_driver_name()
+    if driver in ("asyncpg", "aiosqlite", "pysqlite"):
+        options["connect_args"] = {"timeout": settings.database_connect_timeout}
+    elif driver.startswith("psycopg"):
+        options["connect_args"] = {"connect_timeout": max(1, int(settings.database_connect_timeout))}
+    return options
+
+
+def _engine_url(name: str) -> str:
+    if name == PRIMARY:
+        return settings.database_url
+    if name == REPLICA and settings.database_replica_url:
+        return settings.database_replica_url
+    raise KeyError(f"Unknown database engine: {name}")
 
 
 def get_sync_engine():
@@ -44,51 +165,158 @@ def get_sync_engine():
         db_url = settings.database_url
         if db_url.startswith("postgresql+asyncpg://"):
             db_url = db_url.replace("postgresql+asyncpg://", "postgresql://")
+        elif db_url.startswith("sqlite+aiosqlite://"):
+            db_url = db_url.replace("sqlite+aiosqlite://", "sqlite://")
 
-        # SQLite 不支持 pool_size 和 max_overflow
-        if db_url.startswith("sqlite"):
-            engine_args = {"echo": settings.database_echo}
-        else:
-            engine_args = {
-                "echo": settings.database_echo,
-                "pool_size": 20,
-                "max_overflow": 10,
-            }
-
-        _sync_engine = create_engine(db_url, **engine_args)
+        _sync_engine = create_engine(db_url, **engine_options(db_url, sync=True))
         logger.info("sync_db_engine_created")
     return _sync_engine
 
 
-def get_async_engine() -> AsyncEngine:
+def get_async_engine(name: str = PRIMARY) -> AsyncEngine:
     """获取异步数据库引擎
 
+    Args:
+        name: 引擎名称
+
     Returns:
         异步引擎实例
+
+    Raises:
+        KeyError: 未知的引擎名称
     """
-    global _async_engine
-    if _async_engine is None:
-        _async_engine = create_async_engine(
-            settings.database_url,
-            echo=settings.database_echo,
+    if name == REPLICA and not settings.database_replica_url:
+        # 未配置副本时读写都走主库
+        name = PRIMARY
+    engine = _engines.get(name)
+    if engine is None:
+        url = _engine_url(name)
+        engine = _engines[name] = create_async_engine(url, **engine_options(url))
+        logger.info(
+            "async_db_engine_created",
+            name=name,
+            pool=type(engine.pool).__name__,
             pool_size=settings.database_pool_size,
-            pool_pre_ping=True,  # 连接前检查有效性
+            max_overflow=settings.database_max_overflow,
         )
-        logger.info("async_db_engine_created", pool_size=settings.database_pool_size)
-    return _async_engine
+    return engine
+
+
+def get_pool_stats(name: str = PRIMARY) -> dict[str, Any]:
+    """获取连接池指标
+
+    Args:
+        name: 引擎名称
+
+    Returns:
+        当前池大小、占用 / 空闲连接数、溢出连接数，以及累计取连接次数、
+        超时次数、平均 / 最大等待时间（毫秒）和峰值占用
+    """
+    return _pool_stats(name, get_async_engine(name).pool)
+
+
+def _pool_stats(name: str, pool: Any) -> dict[str, Any]:
+    if not isinstance(pool, QueuePool):
+        return {"name": name, "pool": type(pool).__name__}
+
+    stats: dict[str, Any] = {
+        "name": name,
+        "pool": type(pool).__name__,
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+    metrics = getattr(pool, "metrics", None)
+    if metrics is not None:
+        stats.update(
+            checkouts=metrics.checkouts,
+            timeouts=metrics.timeouts,
+            avg_wait_ms=metrics.wait_seconds / metrics.checkouts * 1000 if metrics.checkouts else 0.0,
+            max_wait_ms=metrics.max_wait_seconds * 1000,
+            peak_checked_out=metrics.peak_checked_out,
+            peak_overflow=metrics.peak_overflow,
+        )
+    return stats
+
+
+# ============== 会话 ==============
+
 
+# 可以走副本的文本 SQL 前缀（WITH 可能带写入，按写处理）
+_READ_PREFIXES = ("SELECT", "EXPLAIN", "SHOW")
 
-def _get_session_factory():
+
+def _is_write(clause: Any) -> bool:
+    if isinstance(clause, UpdateBase):
+        return True
+    if isinstance(clause, Select):
+        return clause._for_update_arg is not None
+    if isinstance(clause, TextClause):
+        return not clause.text.lstrip().upper().startswith(_READ_PREFIXES)
+    return False
+
+
+class RoutingSession(Session):
+    """按语句在主库与只读副本之间路由的会话"""
+
+    def __init__(self, *, primary: Engine, replica: Engine, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self._primary = primary
+        self._replica = replica
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs: Any) -> Engine:
+        if self._replica is self._primary:
+            return self._primary
+        if self._flushing or _is_write(clause):
+            # 读自己的写：本会话与当前请求后续的读都走主库
+            self.info["wrote"] = True
+            _read_primary.set(True)
+            return self._primary
+        if self.info.get("wrote") or _read_primary.get():
+            return self._primary
+        return self._replica
+
+
+def create_session_factory(
+    primary: AsyncEngine, replica: AsyncEngine | None = None
+) -> async_sessionmaker[AsyncSession]:
+    """创建读写分离的会话工厂
+
+    Args:
+        primary: 主库引擎
+        replica: 只读副本引擎，为空时读写都走主库
+
+    Returns:
+        会话工厂
+    """
+    return async_sessionmaker(
+        class_=AsyncSession,
+        sync_session_class=RoutingSession,
+        primary=primary.sync_engine,
+        replica=(replica or primary).sync_engine,
+        expire_on_commit=False,
+        autocommit=False,
+        autoflush=False,
+    )
+
+
+@contextmanager
+def read_from_primary() -> Iterator[None]:
+    """在该作用域内所有读取走主库（需要强一致读时使用）"""
+    token = _read_primary.set(True)
+    try:
+        yield
+    finally:
+        _read_primary.reset(token)
+
+
+def _get_session_factory() -> async_sessionmaker[AsyncSession]:
     """获取会话工厂"""
     global _session_factory
     if _session_factory is None:
-        engine = get_async_engine()
-        _session_factory = async_sessionmaker(
-            bind=engine,
-            class_=AsyncSession,
-            expire_on_commit=False,
-            autocommit=False,
-            autoflush=False,
+        _session_factory = create_session_factory(
+            get_async_engine(PRIMARY), get_async_engine(REPLICA)
         )
     return _session_factory
 
@@ -96,6 +324,8 @@ def _get_session_factory():
 async def get_session() -> AsyncGenerator[AsyncSession]:
     """获取异步数据库会话（依赖注入）
 
+    不自动提交，需要写入的调用方自行 ``commit``，异常时回滚。
+
     Yields:
         异步会话实例
     """
@@ -127,11 +357,11 @@ async def session_scope() -> AsyncGenerator[AsyncSession]:
 
 
 def init_db():
-    """初始化数据库（创建表）"""
-
+    """初始化数据库（创建表并执行索引迁移）"""
     engine = get_sync_engine()
     SQLModel.metadata.create_all(engine)
     logger.info("database_tables_created")
+    apply_migrations(engine)
 
 
 # ============== 事务辅助方法 ==============
@@ -192,16 +422,16 @@ async def health_check() -> bool:
 
 async def close_db():
     """关闭数据库连接"""
-    global _async_engine, _sync_engine, _session_factory
+    global _sync_engine, _session_factory
 
-    if _async_engine:
-        await _async_engine.dispose()
-        _async_engine = None
-        logger.info("async_db_closed")
+    _session_factory = None
+    while _engines:
+        name, engine = _engines.popitem()
+        stats = _pool_stats(name, engine.pool)
+        await engine.dispose()
+        logger.info("async_db_closed", **stats)
 
     if _sync_engine:
         _sync_engine.dispose()
         _sync_engine = None
         logger.info("sync_db_closed")
-
-    _session_factory = None
@@ -0,0 +1,304 @@
+"""进程内关键词索引（BM25）
+
+与向量索引配合做混合检索，参数与会话的 ``keyword_threshold`` 对应。
+
+- 分词：中日韩文字按单字 + 相邻二元组切分，其余按字母数字串小写切分，无需词典
+- 倒排表：每个词两条 ``array`` 紧凑数组（文档行号 uint32、词频 uint16），
+  查询时在锁内复制查询词的倒排表为 numpy 数组后向量化打分
+- 文档长度 / 租户 / 存活标记为预留容量的 numpy 数组，查询在锁内只取引用和文档数：
+  追加只写快照范围之外的行，扩容和删除都换成新数组（写时复制），不影响进行中的查询
+- 分数归一化到 [0, 1]：以平均长度文档中每个查询词各出现一次的得分为 1，超出截断
+
+使用示例:
+```python
+index = KeywordIndex()
+index.add(chunk_ids, contents, tenant_id=1)
+hits = index.search("如何配置知识库", k=10, tenant_id=1, threshold=session.keyword_threshold)
+```
+"""
+
+import re
+import threading
+from array import array
+from collections import Counter
+from collections.abc import Sequence
+
+import numpy as np
+
+from app.infra.vector_index import VectorHit
+
+# 中日韩统一表意文字、假名、韩文音节
+_CJK = r"぀-ヿ㐀-䶿一-鿿가-힯豈-﫿"
+_TOKEN_PATTERN = re.compile(rf"[{_CJK}]+|[0-9A-Za-zÀ-ɏ]+(?:[._-][0-9A-Za-z]+)*")
+_CJK_RUN = re.compile(rf"[{_CJK}]")
+
+_NO_TENANT = -1
+_MAX_TF = 0xFFFF
+_MIN_CAPACITY = 1024
+
+
+def tokenize(text: str) -> list[str]:
+    """CJK 感知分词
+
+    中文连续片段输出单字和相邻二元组（"知识库" -> 知 识 库 知识 识库），
+    英文和数字按词小写输出。
+    """
+    tokens: list[str] = []
+    for match in _TOKEN_PATTERN.finditer(text):
+        piece = match.group()
+        if _CJK_RUN.match(piece):
+            tokens.extend(piece)
+            tokens.extend(piece[i : i + 2] for i in range(len(piece) - 1))
+        else:
+            tokens.append(piece.lower())
+    return tokens
+
+
+class _Postings:
+    """单个词的倒排表"""
+
+    __slots__ = ("rows", "freqs")
+
+    def __init__(self) -> None:
+        self.rows = array("I")
+        self.freqs = array("H")
+
+
+class KeywordIndex:
+    """BM25 关键词索引
+
+    线程安全：写操作加锁，查询在锁内取得所需倒排表的副本和文档数组的引用后计算。
+    """
+
+    def __init__(self, *, k1: float = 1.2, b: float = 0.75) -> None:
+        """初始化关键词索引
+
+        Args:
+            k1: 词频饱和参数
+            b: 文档长度归一化参数
+        """
+        self.k1 = k1
+        self.b = b
+
+        self._postings: dict[str, _Postings] = {}
+        # 前 len(self._ids) 行有效，其后为预留容量
+        self._lengths = np.zeros(0, dtype=np.uint32)
+        self._tenants = np.zeros(0, dtype=np.int64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._total_length = 0
+        self._deleted = 0
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._rows
+
+    def memory_usage(self) -> dict[str, int]:
+        """倒排表与文档元数据占用（字节），不含词典键和 ID 字符串"""
+        with self._lock:
+            usage = {
+                "postings": sum(
+                    p.rows.itemsize * len(p.rows) + p.freqs.itemsize * len(p.freqs)
+                    for p in self._postings.values()
+                ),
+                "documents": self._lengths.nbytes + self._tenants.nbytes + self._alive.nbytes,
+            }
+        usage["total"] = sum(usage.values())
+        return usage
+
+    def add(
+        self,
+        ids: Sequence[str],
+        texts: Sequence[str],
+        *,
+        tenant_id: int | Sequence[int | None] | None = None,
+    ) -> None:
+        """添加文档，已存在的 ID 会被覆盖
+
+        Args:
+            ids: 文档 ID（如 chunk id）
+            texts: 文档内容
+            tenant_id: 租户 ID，可为每篇文档单独指定
+        """
+        if len(ids) != len(texts):
+            raise ValueError(f"ID 数量 {len(ids)} 与文本数量 {len(texts)} 不一致")
+        if tenant_id is None or isinstance(tenant_id, int):
+            tenants = [tenant_id] * len(ids)
+        else:
+            tenants = list(tenant_id)
+        # 分词在锁外完成
+        counted = [Counter(tokenize(text)) for text in texts]
+
+        with self._lock:
+            self._delete_rows([self._rows.pop(id) for id in ids if id in self._rows])
+            self._reserve(len(self._ids) + len(ids))
+            for id, counts, tenant in zip(ids, counted, tenants, strict=True):
+                row = len(self._ids)
+                length = sum(counts.values())
+                for term, freq in counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = _Postings()
+                    postings.rows.append(row)
+                    postings.freqs.append(min(freq, _MAX_TF))
+                self._lengths[row] = length
+                self._tenants[row] = _NO_TENANT if tenant is None else tenant
+                self._alive[row] = True
+                self._ids.append(id)
+                self._rows[id] = row
+                self._total_length += length
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """删除文档
+
+        Returns:
+            实际删除的数量
+        """
+        with self._lock:
+            rows = [self._rows.pop(id) for id in ids if id in self._rows]
+            self._delete_rows(rows)
+            if self._deleted > 0.3 * max(len(self._ids), 1):
+                self.compact()
+            return len(rows)
+
+    def compact(self) -> None:
+        """清除已删除文档，重建倒排表"""
+        with self._lock:
+            alive = self._alive[: len(self._ids)]
+            remap = np.full(len(alive), -1, dtype=np.int64)
+            remap[alive] = np.arange(int(alive.sum()))
+
+            postings: dict[str, _Postings] = {}
+            for term, old in self._postings.items():
+                rows = np.frombuffer(old.rows, dtype=np.uint32)
+                keep = alive[rows]
+                if not keep.any():
+                    continue
+                new = postings[term] = _Postings()
+                new.rows = array("I", remap[rows[keep]].astype(np.uint32).tobytes())
+                new.freqs = array("H", np.frombuffer(old.freqs, dtype=np.uint16)[keep].tobytes())
+
+            keep_rows = np.flatnonzero(alive)
+            # 全部换成新对象，进行中的查询继续使用旧的
+            self._postings = postings
+            self._ids = [self._ids[row] for row in keep_rows]
+            self._rows = {id: row for row, id in enumerate(self._ids)}
+            self._lengths = self._lengths[keep_rows]
+            self._tenants = self._tenants[keep_rows]
+            self._alive = np.ones(len(keep_rows), dtype=bool)
+            self._deleted = 0
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        *,
+        tenant_id: int | None = None,
+        threshold: float | None = None,
+    ) -> list[VectorHit]:
+        """BM25 检索
+
+        Args:
+            query: 查询文本
+            k: 返回数量
+            tenant_id: 只在该租户的文档中检索
+            threshold: 最低归一化分数（0-1）
+
+        Returns:
+            按分数降序的检索结果
+        """
+        terms = Counter(tokenize(query))
+        with self._lock:
+            count = len(self._ids)
+            if not terms or count == 0:
+                return []
+            # 复制而非零拷贝视图：array 有导出的缓冲区时 append 会抛 BufferError，
+            # 视图留到锁外会让并发的 add 半途失败
+            postings = [
+                (weight, np.array(p.rows, dtype=np.uint32), np.array(p.freqs, dtype=np.uint16))
+                for term, weight in terms.items()
+                if (p := self._postings.get(term)) is not None
+            ]
+            # 只取引用：之后的写入不会改动前 count 行
+            lengths = self._lengths[:count]
+            tenants = self._tenants[:count]
+            alive = self._alive[:count]
+            ids = self._ids
+            live = count - self._deleted
+            avg_length = self._total_length / max(live, 1)
+
+        if not postings:
+            return []
+
+        scores = np.zeros(count, dtype=np.float32)
+        best_possible = 0.0
+        norm = self.k1 * (1 - self.b + self.b * lengths / max(avg_length, 1e-9))
+        for weight, rows, freqs in postings:
+            df = int(alive[rows].sum())
+            if df == 0:
+                continue
+            idf = float(np.log(1 + (live - df + 0.5) / (df + 0.5)))
+            tf = freqs.astype(np.float32)
+            scores += np.bincount(
+                rows,
+                weights=weight * idf * tf * (self.k1 + 1) / (tf + norm[rows]),
+                minlength=count,
+            ).astype(np.float32)
+            # tf=1 且文档为平均长度时单词得分恰为 idf
+            best_possible += weight * idf
+        if best_possible == 0:
+            return []
+
+        mask = alive & (scores > 0)
+        if tenant_id is not None:
+            mask &= tenants == tenant_id
+        candidates = np.flatnonzero(mask)
+        normalized = np.minimum(scores[candidates] / best_possible, 1.0)
+        if len(candidates) > k:
+            top = np.argpartition(normalized, -k)[-k:]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(normalized[top])[::-1]]
+
+        hits = []
+        for i in top:
+            score = float(normalized[i])
+            if threshold is not None and score < threshold:
+                break
+            row = candidates[i]
+            tenant = int(tenants[row])
+            hits.append(VectorHit(ids[row], score, None if tenant == _NO_TENANT else tenant))
+        return hits
+
+    def _delete_rows(self, rows: Sequence[int]) -> None:
+        if not rows:
+            return
+        # 写时复制：进行中的查询持有旧的存活标记
+        alive = self._alive.copy()
+        alive[rows] = False
+        self._alive = alive
+        self._total_length -= int(self._lengths[rows].sum())
+        self._deleted += len(rows)
+
+    def _reserve(self, size: int) -> None:
+        """确保文档数组容量不小于 ``size``，扩容时换成新数组"""
+        capacity = len(self._lengths)
+        if size <= capacity:
+            return
+        capacity = max(size, capacity + capacity // 2, _MIN_CAPACITY)
+        count = len(self._ids)
+        for name in ("_lengths", "_tenants", "_alive"):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:count] = old[:count]
+            setattr(self, name, new)
+
+
+__all__ = [
+    "KeywordIndex",
+    "tokenize",
+]
@@ -0,0 +1,535 @@
+"""长期记忆存储（LangGraph Store）
+
+基于 ``memories`` 表实现 LangGraph ``BaseStore``，命名空间 ``("users", "u1")``
+以 ``users.u1`` 存入 ``namespace`` 列（LangGraph 不允许标签中出现 ``.``）:
+
+- 批量读写：同一轮事件循环内并发的 ``aget`` / ``aput`` 合并为一次 ``abatch``
+  （``AsyncBatchedBaseStore``），批内所有读取为一条 ``(namespace, key) IN`` 查询，
+  所有写入为一条多行 upsert 与一条 DELETE；``amget`` / ``amput`` 直接按批调用
+- 前缀搜索：``namespace = :p OR namespace LIKE ':p.%'``，按更新时间从新到旧；
+  ``filter`` 在进程内匹配，读到 offset + limit 条命中即停止
+- 读缓存：进程内 TTL + LRU，按 (namespace, key) 缓存读取结果（包括不存在），
+  本进程写入后立即失效；其他 worker 的写入最多在 ``cache_ttl`` 秒后可见
+- 过期清理：写入时按 ``ttl``（分钟）设置 ``expires_at``，读取时跳过已过期的行；
+  后台任务定期按批删除过期行，每批一个短事务，不长时间持有锁
+
+读取不会延长过期时间（``refresh_ttl`` 被忽略）；不支持语义搜索（``query`` 被忽略）。
+
+使用示例:
+```python
+store = get_memory_store()
+await store.start()
+await store.aput(("users", "u1"), "preferences", {"language": "zh"}, ttl=60 * 24)
+items = await store.amget([(("users", "u1"), "preferences"), (("users", "u2"), "preferences")])
+hits = await store.asearch(("users",), filter={"language": "zh"})
+await store.stop()
+```
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from contextlib import AbstractAsyncContextManager
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+from langgraph.store.base import (
+    GetOp,
+    Item,
+    ListNamespacesOp,
+    MatchCondition,
+    Op,
+    PutOp,
+    Result,
+    SearchItem,
+    SearchOp,
+    TTLConfig,
+    validate_op_namespace,
+)
+from langgraph.store.base.batch import AsyncBatchedBaseStore
+from sqlalchemy import delete, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import get_settings
+from app.models.memory import Memory
+from app.observability.logging import get_logger
+
+logger = get_logger(__name__)
+
+SessionFactory = Callable[[], AbstractAsyncContextManager[AsyncSession]]
+
+_Key = tuple[str, str]
+# 缓存的条目快照：(值的 JSON, 命名空间, 创建时间, 更新时间)，每次读取反序列化出新的 Item
+_Snapshot = tuple[str, tuple[str, ...], datetime, datetime]
+
+# 每条 IN / 多行 INSERT 的最大键数，控制绑定参数个数
+_CHUNK = 500
+
+_OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": lambda value, target: value == target,
+    "$ne": lambda value, target: value != target,
+    "$gt": lambda value, target: float(value) > float(target),
+    "$gte": lambda value, target: float(value) >= float(target),
+    "$lt": lambda value, target: float(value) < float(target),
+    "$lte": lambda value, target: float(value) <= float(target),
+}
+
+
+def _default_session_factory() -> AbstractAsyncContextManager[AsyncSession]:
+    from app.infra.database import session_scope
+
+    return session_scope()
+
+
+def _insert_for(dialect_name: str) -> Any:
+    """按方言选择支持 ON CONFLICT 的 insert"""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"不支持的数据库方言: {dialect_name}")
+    return insert
+
+
+def _encode(namespace: tuple[str, ...]) -> str:
+    return ".".join(namespace)
+
+
+def _decode(namespace: str) -> tuple[str, ...]:
+    return tuple(namespace.split("."))
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _under_prefix(prefix: Sequence[str]) -> Any:
+    """命名空间等于前缀或在前缀之下"""
+    encoded = _encode(tuple(prefix))
+    return or_(
+        Memory.namespace == encoded,
+        Memory.namespace.like(_escape_like(encoded) + ".%", escape="\\"),
+    )
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite 读回的时间不带时区，按 UTC 处理
+    return value if value.tzinfo is not None else value.replace(tzinfo=UTC)
+
+
+def _not_expired(now: datetime) -> Any:
+    return or_(Memory.expires_at.is_(None), Memory.expires_at > now)
+
+
+def _matches(value: Any, condition: Any) -> bool:
+    """按 LangGraph 的过滤语义匹配（嵌套对象逐键比较，支持 $eq/$ne/$gt/$gte/$lt/$lte）"""
+    if isinstance(condition, dict):
+        if any(key.startswith("$") for key in condition):
+            try:
+                return all(_OPERATORS[op](value, target) for op, target in condition.items())
+            except (KeyError, TypeError, ValueError):
+                return False
+        return isinstance(value, dict) and all(
+            _matches(value.get(key), target) for key, target in condition.items()
+        )
+    if isinstance(condition, list | tuple):
+        return (
+            isinstance(value, list | tuple)
+            and len(value) == len(condition)
+            and all(_matches(v, c) for v, c in zip(value, condition, strict=True))
+        )
+    return value == condition
+
+
+def _namespace_matches(namespace: tuple[str, ...], condition: MatchCondition) -> bool:
+    path = condition.path
+    if len(namespace) < len(path):
+        return False
+    labels = namespace if condition.match_type == "prefix" else namespace[len(namespace) - len(path) :]
+    return all(p == "*" or p == label for label, p in zip(labels, path, strict=False))
+
+
+def _to_item(row: Memory) -> Item:
+    return Item(
+        value=row.value or {},
+        key=row.key,
+        namespace=_decode(row.namespace),
+        created_at=row.created_at,
+        updated_at=row.updated_at,
+    )
+
+
+def _from_snapshot(key: str, snapshot: _Snapshot) -> Item:
+    value, namespace, created_at, updated_at = snapshot
+    return Item(
+        value=json.loads(value),
+        key=key,
+        namespace=namespace,
+        created_at=created_at,
+        updated_at=updated_at,
+    )
+
+
+class DatabaseStore(AsyncBatchedBaseStore):
+    """基于 ``memories`` 表的 LangGraph Store（需在事件循环中创建）"""
+
+    supports_ttl = True
+
+    def __init__(
+        self,
+        *,
+        session_factory: SessionFactory | None = None,
+        ttl: TTLConfig | None = None,
+        cache_size: int = 10000,
+        cache_ttl: float = 30.0,
+        sweep_batch_size: int = 500,
+    ) -> None:
+        """初始化存储
+
+        Args:
+            session_factory: 数据库会话工厂，默认 ``session_scope``
+            ttl: 过期配置，``default_ttl`` 为未指定 ttl 的写入的过期分钟数，
+                ``sweep_interval_minutes`` 为后台清理周期
+            cache_size: 读缓存条目数，0 关闭缓存
+            cache_ttl: 读缓存存活秒数
+            sweep_batch_size: 清理时每批删除的行数
+        """
+        super().__init__()
+        self._session_factory = session_factory or _default_session_factory
+        self.ttl_config = ttl
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self.sweep_batch_size = sweep_batch_size
+
+        # (namespace, key) -> (条目快照或 None, 缓存到期的 monotonic 时间)
+        self._cache: OrderedDict[_Key, tuple[_Snapshot | None, float]] = OrderedDict()
+        # 写入计数，读取期间有写入时不写缓存，避免旧值覆盖
+        self._writes = 0
+        self._sweeper: asyncio.Task[None] | None = None
+        self.hits = 0
+        self.misses = 0
+
+    # ============== 批量接口 ==============
+
+    async def amget(self, keys: Iterable[tuple[tuple[str, ...], str]]) -> list[Item | None]:
+        """批量读取
+
+        Args:
+            keys: (命名空间, 键) 列表
+
+        Returns:
+            与 ``keys`` 一一对应的条目，不存在或已过期时为 None
+        """
+        return await self.abatch([GetOp(namespace, key) for namespace, key in keys])
+
+    async def amput(
+        self,
+        items: Iterable[tuple[tuple[str, ...], str, Mapping[str, Any] | None]],
+        *,
+        ttl: float | None = None,
+    ) -> None:
+        """批量写入，值为 None 时删除
+
+        Args:
+            items: (命名空间, 键, 值) 列表
+            ttl: 过期分钟数，为空时使用 ``default_ttl``
+        """
+        default = self.ttl_config.get("default_ttl") if self.ttl_config else None
+        ops = [
+            PutOp(namespace, key, value, ttl=default if ttl is None else ttl)
+            for namespace, key, value in items
+        ]
+        await self.abatch(ops)
+
+    async def abatch(self, ops: Iterable[Op]) -> list[Result]:
+        """执行一批操作：先执行全部读取，再一次性写入（批内读不到同批写入）"""
+        ops = list(ops)
+        results: list[Result] = [None] * len(ops)
+        gets: list[tuple[int, GetOp]] = []
+        reads: list[tuple[int, SearchOp | ListNamespacesOp]] = []
+        puts: dict[_Key, PutOp] = {}
+        for index, op in enumerate(ops):
+            if isinstance(op, GetOp):
+                gets.append((index, op))
+            elif isinstance(op, SearchOp | ListNamespacesOp):
+                reads.append((index, op))
+            elif isinstance(op, PutOp):
+                validate_op_namespace(op)
+                # 同一键多次写入以最后一次为准
+                puts[(_encode(op.namespace), op.key)] = op
+            else:
+                raise ValueError(f"Unknown operation type: {type(op)}")
+
+        now = datetime.now(UTC)
+        missing = self._get_cached(gets, results)
+        if not (missing or reads or puts):
+            return results
+
+        writes = self._writes
+        async with self._session_factory() as session:
+            if missing:
+                loaded = await self._load(session, list(missing), now)
+                for key, indexes in missing.items():
+                    item, expires_at = loaded.get(key, (None, None))
+                    for index in indexes:
+                        results[index] = item
+                    if writes == self._writes:
+                        self._cache_put(key, item, expires_at, now)
+            for index, op in reads:
+                if isinstance(op, SearchOp):
+                    results[index] = await self._search(session, op, now)
+                else:
+                    results[index] = await self._list_namespaces(session, op, now)
+            if puts:
+                await self._write(session, puts, now)
+                await session.commit()
+
+        if puts:
+            self._writes += 1
+            for key in puts:
+                self._cache.pop(key, None)
+        return results
+
+    # ============== 读取 ==============
+
+    def _get_cached(
+        self, gets: list[tuple[int, GetOp]], results: list[Result]
+    ) -> dict[_Key, list[int]]:
+        """从缓存填充结果，返回未命中的键及其在结果中的位置"""
+        missing: dict[_Key, list[int]] = {}
+        now = time.monotonic()
+        for index, op in gets:
+            key = (_encode(op.namespace), op.key)
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] > now:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                results[index] = None if entry[0] is None else _from_snapshot(key[1], entry[0])
+            else:
+                self.misses += 1
+                missing.setdefault(key, []).append(index)
+        return missing
+
+    def _cache_put(
+        self, key: _Key, item: Item | None, expires_at: datetime | None, now: datetime
+    ) -> None:
+        if self.cache_size <= 0:
+            return
+        # 不缓存到条目过期之后
+        lifetime = self.cache_ttl
+        if expires_at is not None:
+            lifetime = min(lifetime, (_aware(expires_at) - now).total_seconds())
+        snapshot = None
+        if item is not None:
+            snapshot = (json.dumps(item.value), item.namespace, item.created_at, item.updated_at)
+        self._cache[key] = (snapshot, time.monotonic() + lifetime)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _load(
+        self, session: AsyncSession, keys: list[_Key], now: datetime
+    ) -> dict[_Key, tuple[Item, datetime | None]]:
+        loaded: dict[_Key, tuple[Item, datetime | None]] = {}
+        for start in range(0, len(keys), _CHUNK):
+            result = await session.execute(
+                select(Memory).where(
+                    tuple_(Memory.namespace, Memory.key).in_(keys[start : start + _CHUNK]),
+                    _not_expired(now),
+                )
+            )
+            for row in result.scalars():
+                loaded[(row.namespace, row.key)] = (_to_item(row), row.expires_at)
+        return loaded
+
+    async def _search(self, session: AsyncSession, op: SearchOp, now: datetime) -> list[SearchItem]:
+        statement = select(Memory).where(_not_expired(now))
+        if op.namespace_prefix:
+            statement = statement.where(_under_prefix(op.namespace_prefix))
+        statement = statement.order_by(
+            Memory.updated_at.desc(), Memory.namespace, Memory.key
+        )
+
+        if not op.filter:
+            result = await session.execute(statement.offset(op.offset).limit(op.limit))
+            rows = list(result.scalars())
+        else:
+            # 逐批读取并匹配，凑够 offset + limit 条即停止
+            rows = []
+            wanted = op.offset + op.limit
+            result = await session.stream_scalars(statement.execution_options(yield_per=_CHUNK))
+            async for row in result:
+                if _matches(row.value or {}, op.filter):
+                    rows.append(row)
+                    if len(rows) >= wanted:
+                        break
+            await result.close()
+            rows = rows[op.offset :]
+
+        return [
+            SearchItem(
+                namespace=_decode(row.namespace),
+                key=row.key,
+                value=row.value or {},
+                created_at=row.created_at,
+                updated_at=row.updated_at,
+            )
+            for row in rows
+        ]
+
+    async def _list_namespaces(
+        self, session: AsyncSession, op: ListNamespacesOp, now: datetime
+    ) -> list[tuple[str, ...]]:
+        statement = select(Memory.namespace).distinct().where(_not_expired(now))
+        conditions = op.match_conditions or ()
+        for condition in conditions:
+            # 前缀中第一个通配符之前的部分可以交给数据库过滤
+            if condition.match_type == "prefix":
+                fixed = []
+                for label in condition.path:
+                    if label == "*":
+                        break
+                    fixed.append(label)
+                if fixed:
+                    statement = statement.where(_under_prefix(fixed))
+        result = await session.execute(statement)
+
+        namespaces: set[tuple[str, ...]] = set()
+        for (encoded,) in result:
+            namespace = _decode(encoded)
+            if all(_namespace_matches(namespace, condition) for condition in conditions):
+                if op.max_depth is not None:
+                    namespace = namespace[: op.max_depth]
+                namespaces.add(namespace)
+        return sorted(namespaces)[op.offset : op.offset + op.limit]
+
+    # ============== 写入 ==============
+
+    async def _write(self, session: AsyncSession, puts: dict[_Key, PutOp], now: datetime) -> None:
+        deletes = [key for key, op in puts.items() if op.value is None]
+        rows = [
+            {
+                "namespace": namespace,
+                "key": key,
+                "value": dict(op.value),
+                "created_at": now,
+                "updated_at": now,
+                "expires_at": None if op.ttl is None else now + timedelta(minutes=op.ttl),
+            }
+            for (namespace, key), op in puts.items()
+            if op.value is not None
+        ]
+
+        for start in range(0, len(deletes), _CHUNK):
+            await session.execute(
+                delete(Memory).where(
+                    tuple_(Memory.namespace, Memory.key).in_(deletes[start : start + _CHUNK])
+                )
+            )
+
+        insert = _insert_for(session.bind.dialect.name)
+        for start in range(0, len(rows), _CHUNK):
+            statement = insert(Memory).values(rows[start : start + _CHUNK])
+            statement = statement.on_conflict_do_update(
+                index_elements=[Memory.namespace, Memory.key],
+                set_={
+                    "value": statement.excluded.value,
+                    "updated_at": statement.excluded.updated_at,
+                    "expires_at": statement.excluded.expires_at,
+                },
+            )
+            await session.execute(statement)
+
+    # ============== 过期清理 ==============
+
+    async def sweep_expired(self) -> int:
+        """按批删除已过期的行
+
+        Returns:
+            删除的行数
+        """
+        now = datetime.now(UTC)
+        deleted = 0
+        while True:
+            async with self._session_factory() as session:
+                result = await session.execute(
+                    select(Memory.namespace, Memory.key)
+                    .where(Memory.expires_at <= now)
+                    .limit(self.sweep_batch_size)
+                )
+                keys = [tuple(row) for row in result]
+                if not keys:
+                    break
+                # 再次检查过期时间，跳过期间被重新写入的行
+                await session.execute(
+                    delete(Memory).where(
+                        tuple_(Memory.namespace, Memory.key).in_(keys),
+                        Memory.expires_at <= now,
+                    )
+                )
+                await session.commit()
+
+            for key in keys:
+                self._cache.pop(key, None)
+            deleted += len(keys)
+            if len(keys) < self.sweep_batch_size:
+                break
+            # 批与批之间让出事件循环
+            await asyncio.sleep(0)
+
+        if deleted:
+            logger.info("memory_store_swept", deleted=deleted)
+        return deleted
+
+    async def start(self) -> None:
+        """启动后台过期清理（``sweep_interval_minutes`` 为空时不启动）"""
+        interval = (self.ttl_config or {}).get("sweep_interval_minutes")
+        if not interval or self._sweeper is not None:
+            return
+        self._sweeper = asyncio.create_task(self._sweep_loop(interval * 60), name="memory-store-sweeper")
+        logger.info("memory_store_sweeper_started", interval_minutes=interval)
+
+    async def stop(self) -> None:
+        task, self._sweeper = self._sweeper, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _sweep_loop(self, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep_expired()
+            except Exception as e:
+                logger.error("memory_store_sweep_failed", error=str(e))
+
+
+# 全局存储
+_memory_store: DatabaseStore | None = None
+
+
+def get_memory_store() -> DatabaseStore:
+    """获取全局长期记忆存储（需在事件循环中调用）"""
+    global _memory_store
+    if _memory_store is None:
+        settings = get_settings()
+        _memory_store = DatabaseStore(
+            ttl=TTLConfig(
+                default_ttl=settings.memory_store_default_ttl,
+                sweep_interval_minutes=settings.memory_store_sweep_interval,
+                refresh_on_read=False,
+            ),
+            cache_size=settings.memory_store_cache_size,
+            cache_ttl=settings.memory_store_cache_ttl,
+            sweep_batch_size=settings.memory_store_sweep_batch_size,
+        )
+    return _memory_store
+
+
+__all__ = ["DatabaseStore", "get_memory_store"]
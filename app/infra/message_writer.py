@@ -0,0 +1,290 @@
+"""消息异步写入（write-behind）
+
+每轮对话逐条 ``session.add`` + ``flush`` + ``refresh`` 需要两三次数据库往返。
+消息先进入 asyncio 队列，由后台任务攒批后用一条多行 INSERT 写入 ``messages`` 表。
+
+- 每 ``interval`` 秒或攒够 ``batch_size`` 行写一批；``enqueue`` 不阻塞，队列满时丢弃并计数
+- 单个消费者按入队顺序写入，``created_at`` 在入队时分配且严格递增，
+  同一会话的消息顺序与入队顺序一致
+- 写入失败的批次保留在队首，下个周期重试；连续失败 ``max_retries`` 次后二分拆批写入，
+  单行仍失败（如会话不存在）时记录日志并丢弃，不阻塞后续消息
+- ``stop`` 时写出全部剩余消息
+
+使用示例:
+```python
+writer = get_message_writer()
+writer.start()
+await writer.enqueue(session_id, "user", message, request_id=request_id)
+...
+await writer.stop()
+```
+"""
+
+import asyncio
+from collections.abc import Callable
+from contextlib import AbstractAsyncContextManager
+from datetime import UTC, datetime, timedelta
+from typing import Any
+from uuid import uuid4
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import get_settings
+from app.observability.logging import get_logger
+from app.repositories import MessageRepository
+
+logger = get_logger(__name__)
+
+SessionFactory = Callable[[], AbstractAsyncContextManager[AsyncSession]]
+
+_TICK = timedelta(microseconds=1)
+
+
+def _default_session_factory() -> AbstractAsyncContextManager[AsyncSession]:
+    from app.infra.database import session_scope
+
+    return session_scope()
+
+
+class MessageWriter:
+    """消息写入器"""
+
+    def __init__(
+        self,
+        *,
+        interval: float = 0.05,
+        batch_size: int = 200,
+        max_queue: int = 10000,
+        max_retries: int = 3,
+        session_factory: SessionFactory | None = None,
+    ) -> None:
+        """初始化消息写入器
+
+        Args:
+            interval: 写入周期（秒）
+            batch_size: 每条 INSERT 的最大行数，攒够时提前写入
+            max_queue: 队列容量，满时 ``enqueue`` 丢弃消息
+            max_retries: 同一批连续失败多少次后拆批写入并丢弃写不进去的行
+            session_factory: 数据库会话工厂，默认 ``session_scope``
+        """
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self._session_factory = session_factory or _default_session_factory
+
+        self._queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue(maxsize=max_queue)
+        # 已出队、尚未写入成功的行（队首）
+        self._batch: list[dict[str, Any]] = []
+        # 队首批次连续失败次数
+        self._failures = 0
+        self._full = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._task: asyncio.Task[None] | None = None
+        self._last_created_at = datetime.min.replace(tzinfo=UTC)
+        self.written = 0
+        self.dropped = 0
+        self.dead_lettered = 0
+
+    @property
+    def pending(self) -> int:
+        """待写消息数"""
+        return len(self._batch) + self._queue.qsize()
+
+    def start(self) -> None:
+        """启动后台写入任务（需在事件循环中调用）"""
+        if self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="message-writer")
+        logger.info("message_writer_started", interval=self.interval, batch_size=self.batch_size)
+
+    async def stop(self) -> None:
+        """停止后台任务并写出剩余消息"""
+        task, self._task = self._task, None
+        if task is not None:
+            # 持有写锁时取消，避免中断进行中的写入
+            async with self._write_lock:
+                task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        if self.pending:
+            logger.error("message_writer_stopped_with_pending", pending=self.pending)
+        else:
+            logger.info(
+                "message_writer_stopped",
+                written=self.written,
+                dropped=self.dropped,
+                dead_lettered=self.dead_lettered,
+            )
+
+    async def enqueue(
+        self,
+        session_id: str,
+        role: str,
+        content: str,
+        *,
+        request_id: str | None = None,
+        id: str | None = None,
+        **fields: Any,
+    ) -> str:
+        """消息入队（不阻塞，队列满时丢弃）
+
+        Args:
+            session_id: 会话 ID
+            role: 角色 (user/assistant/system)
+            content: 消息内容
+            request_id: 请求 ID，同一轮的问答共用，默认与消息 ID 相同
+            id: 消息 ID，默认生成 UUID
+            **fields: ``Message`` 的其他字段（如 ``knowledge_references``、``is_completed``）
+
+        Returns:
+            消息 ID
+        """
+        message_id = id or str(uuid4())
+        # 入队即分配时间，严格递增，按 created_at 排序即为入队顺序
+        created_at = max(datetime.now(UTC), self._last_created_at + _TICK)
+        self._last_created_at = created_at
+        row = {
+            "id": message_id,
+            "request_id": request_id or message_id,
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "is_completed": True,
+            "created_at": created_at,
+            "updated_at": created_at,
+            **fields,
+        }
+        try:
+            self._queue.put_nowait(row)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(
+                "message_dropped", session_id=session_id, role=role, dropped=self.dropped
+            )
+            return message_id
+        if self._queue.qsize() >= self.batch_size:
+            self._full.set()
+        return message_id
+
+    async def flush(self) -> int:
+        """立即写出全部待写消息
+
+        Returns:
+            写入的行数，写入失败时剩余消息保留在队列中
+        """
+        written = 0
+        while self.pending:
+            count = await self._write_batch()
+            if count is None:
+                break
+            written += count
+        return written
+
+    async def _run(self) -> None:
+        while True:
+            if not self._batch:
+                self._batch.append(await self._queue.get())
+            if self.pending < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.interval)
+                except TimeoutError:
+                    pass
+            self._full.clear()
+            if await self._write_batch() is None:
+                await asyncio.sleep(self.interval)
+
+    async def _write_batch(self) -> int | None:
+        """写入一批
+
+        Returns:
+            写入的行数；失败且未达重试上限时返回 None，该批保留在队首
+        """
+        async with self._write_lock:
+            batch, self._batch = self._batch[: self.batch_size], self._batch[self.batch_size :]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            if not batch:
+                return 0
+            try:
+                await self._insert(batch)
+            except Exception as e:
+                self._failures += 1
+                if self._failures < self.max_retries:
+                    # 写入期间后台任务可能已取出更新的消息，失败的批次放回其前面
+                    self._batch = batch + self._batch
+                    logger.error(
+                        "message_write_failed",
+                        error=str(e),
+                        attempt=self._failures,
+                        retained=self.pending,
+                    )
+                    return None
+                logger.error("message_write_isolating", error=str(e), rows=len(batch))
+                written = await self._write_isolated(batch, e)
+            else:
+                written = len(batch)
+            self._failures = 0
+            self.written += written
+            return written
+
+    async def _insert(self, rows: list[dict[str, Any]]) -> None:
+        async with self._session_factory() as session:
+            await MessageRepository(session).bulk_insert(rows)
+            await session.commit()
+
+    async def _write_isolated(self, rows: list[dict[str, Any]], error: Exception) -> int:
+        """二分拆开整批写入失败的行，单行失败时记录日志并丢弃
+
+        Returns:
+            写入的行数
+        """
+        if len(rows) == 1:
+            row = rows[0]
+            self.dead_lettered += 1
+            logger.error(
+                "message_dead_lettered",
+                message_id=row["id"],
+                session_id=row["session_id"],
+                role=row["role"],
+                error=str(error),
+                dead_lettered=self.dead_lettered,
+            )
+            return 0
+
+        middle = len(rows) // 2
+        written = 0
+        for part in (rows[:middle], rows[middle:]):
+            try:
+                await self._insert(part)
+            except Exception as e:
+                written += await self._write_isolated(part, e)
+            else:
+                written += len(part)
+        return written
+
+
+# 全局写入器
+_message_writer: MessageWriter | None = None
+
+
+def get_message_writer() -> MessageWriter:
+    """获取全局消息写入器"""
+    global _message_writer
+    if _message_writer is None:
+        settings = get_settings()
+        _message_writer = MessageWriter(
+            interval=settings.message_flush_interval,
+            batch_size=settings.message_flush_batch_size,
+            max_queue=settings.message_queue_size,
+            max_retries=settings.message_write_max_retries,
+        )
+    return _message_writer
+
+
+__all__ = [
+    "MessageWriter",
+    "get_message_writer",
+]
@@ -0,0 +1,263 @@
+"""索引迁移
+
+表结构由 ``scripts/public.sql`` / ``SQLModel.metadata.create_all`` 创建，这里只管理
+其后追加的索引。迁移按 ``MIGRATIONS`` 顺序执行，已执行的记录在 ``index_migrations`` 表中
+（``schema_migrations`` 已被 ``public.sql`` 按 golang-migrate 的格式占用），
+重复执行是安全的:
+
+- 语句全部为 ``CREATE INDEX IF NOT EXISTS``，中途失败后重跑会跳过已建好的索引
+- PostgreSQL 上以 ``CONCURRENTLY`` 在自动提交连接上建索引，不阻塞线上写入；
+  并发建索引失败会留下 INVALID 索引，``IF NOT EXISTS`` 会跳过它，故建索引前检查
+  ``pg_index.indisvalid``，无效索引先删除再重建
+- 表尚未创建（如 ``public.sql`` 中没有的表）时跳过其索引，该迁移不记为已执行，下次重跑
+- 部分索引（``WHERE deleted_at IS NULL``）只收录未删除的行，与仓储查询的软删除过滤一致，
+  PostgreSQL 与 SQLite 都支持
+
+部署时由 ``scripts/docker-entrypoint.sh`` / ``scripts/rebuild_db.sh`` 执行
+``python -m app.infra.migrations``。
+
+使用示例:
+```python
+from app.infra.database import get_sync_engine
+from app.infra.migrations import apply_migrations
+
+applied = apply_migrations(get_sync_engine())
+```
+"""
+
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.observability.logging import get_logger
+
+logger = get_logger(__name__)
+
+_NOT_DELETED = "deleted_at IS NULL"
+
+
+@dataclass(frozen=True)
+class IndexSpec:
+    """索引定义
+
+    Attributes:
+        name: 索引名
+        table: 表名
+        columns: 列，可带排序方向（如 ``"created_at DESC"``）
+        where: 部分索引条件，为空时为普通索引
+    """
+
+    name: str
+    table: str
+    columns: tuple[str, ...]
+    where: str | None = None
+
+    def create_sql(self, dialect: str) -> str:
+        """生成建索引语句"""
+        concurrently = "CONCURRENTLY " if dialect == "postgresql" else ""
+        sql = (
+            f"CREATE INDEX {concurrently}IF NOT EXISTS {self.name} "
+            f"ON {self.table} ({', '.join(self.columns)})"
+        )
+        if self.where:
+            sql += f" WHERE {self.where}"
+        return sql
+
+    def drop_sql(self, dialect: str) -> str:
+        """生成删索引语句"""
+        concurrently = "CONCURRENTLY " if dialect == "postgresql" else ""
+        return f"DROP INDEX {concurrently}IF EXISTS {self.name}"
+
+
+@dataclass(frozen=True)
+class Migration:
+    """一次迁移"""
+
+    id: str
+    description: str
+    indexes: tuple[IndexSpec, ...] = field(default_factory=tuple)
+
+
+# 按查询形状建立的索引，列顺序为：等值过滤列在前，排序列在后
+SOFT_DELETE_INDEXES = Migration(
+    id="0001_soft_delete_hot_query_indexes",
+    description="软删除热点查询的组合索引与部分索引",
+    indexes=(
+        # PlaceholderRepository.list_by_tenant: tenant_id = ? ORDER BY display_order, created_at DESC, id DESC
+        # list_by_agent 同样按 tenant_id 过滤、按 display_order 排序，复用该索引
+        IndexSpec(
+            "ix_placeholders_tenant_order",
+            "placeholders",
+            ("tenant_id", "display_order", "created_at DESC", "id DESC"),
+            _NOT_DELETED,
+        ),
+        # PlaceholderRepository.get_by_name
+        IndexSpec(
+            "ix_placeholders_tenant_name",
+            "placeholders",
+            ("tenant_id", "name"),
+            _NOT_DELETED,
+        ),
+        # TagRepository.list_by_kb: knowledge_base_id = ? AND tenant_id = ? ORDER BY sort_order, created_at, id
+        IndexSpec(
+            "ix_knowledge_tags_kb_order",
+            "knowledge_tags",
+            ("knowledge_base_id", "tenant_id", "sort_order", "created_at", "id"),
+            _NOT_DELETED,
+        ),
+        # TagRepository.get_counts / get_knowledge_count / get_chunk_count
+        IndexSpec(
+            "ix_knowledges_tag_tenant",
+            "knowledges",
+            ("tag_id", "tenant_id"),
+            _NOT_DELETED,
+        ),
+        IndexSpec(
+            "ix_chunks_tag_tenant",
+            "chunks",
+            ("tag_id", "tenant_id"),
+            _NOT_DELETED,
+        ),
+        # MessageRepository: session_id = ? ORDER BY created_at [, id]
+        # list_by_session 不过滤 deleted_at，故不做部分索引
+        IndexSpec(
+            "ix_messages_session_created",
+            "messages",
+            ("session_id", "created_at", "id"),
+        ),
+    ),
+)
+
+# 长期记忆过期清理：expires_at <= now 按批删除，只有设置了过期时间的行需要收录
+MEMORY_EXPIRY_INDEX = Migration(
+    id="0002_memory_expiry_index",
+    description="长期记忆过期时间索引",
+    indexes=(
+        IndexSpec(
+            "ix_memories_expires_at",
+            "memories",
+            ("expires_at",),
+            "expires_at IS NOT NULL",
+        ),
+    ),
+)
+
+MIGRATIONS: tuple[Migration, ...] = (SOFT_DELETE_INDEXES, MEMORY_EXPIRY_INDEX)
+
+
+def _ensure_table(connection: Connection) -> None:
+    connection.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS index_migrations ("
+            "id VARCHAR(128) PRIMARY KEY, "
+            "description VARCHAR(255), "
+            "applied_at TIMESTAMP NOT NULL)"
+        )
+    )
+
+
+def applied_migrations(connection: Connection) -> set[str]:
+    """已执行的迁移 ID"""
+    _ensure_table(connection)
+    result = connection.execute(text("SELECT id FROM index_migrations"))
+    return {row[0] for row in result}
+
+
+def apply_migrations(
+    bind: Engine | Connection,
+    migrations: tuple[Migration, ...] = MIGRATIONS,
+) -> list[str]:
+    """按顺序执行未执行过的迁移
+
+    Args:
+        bind: 同步引擎；也可传入连接（如 ``AsyncConnection.run_sync`` 中），
+            PostgreSQL 上须为自动提交连接
+        migrations: 迁移列表
+
+    Returns:
+        本次执行的迁移 ID
+    """
+    if isinstance(bind, Connection):
+        return _apply(bind, migrations)
+    # CREATE INDEX CONCURRENTLY 不能在事务中执行
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        return _apply(connection, migrations)
+
+
+def _apply(connection: Connection, migrations: tuple[Migration, ...]) -> list[str]:
+    dialect = connection.dialect.name
+    done = applied_migrations(connection)
+    applied: list[str] = []
+    for migration in migrations:
+        if migration.id in done:
+            continue
+
+        started = datetime.now(UTC)
+        missing: list[str] = []
+        for index in migration.indexes:
+            if not inspect(connection).has_table(index.table):
+                missing.append(index.table)
+                continue
+            if _is_invalid(connection, index.name):
+                # 之前的 CREATE INDEX CONCURRENTLY 中途失败
+                logger.warning("invalid_index_dropped", index=index.name)
+                connection.execute(text(index.drop_sql(dialect)))
+            connection.execute(text(index.create_sql(dialect)))
+        if missing:
+            logger.warning(
+                "migration_deferred", migration_id=migration.id, missing_tables=sorted(set(missing))
+            )
+            continue
+        connection.execute(
+            text(
+                "INSERT INTO index_migrations (id, description, applied_at) "
+                "VALUES (:id, :description, :applied_at)"
+            ),
+            {"id": migration.id, "description": migration.description, "applied_at": started},
+        )
+        applied.append(migration.id)
+        logger.info(
+            "migration_applied",
+            migration_id=migration.id,
+            indexes=len(migration.indexes),
+            duration_ms=round((datetime.now(UTC) - started).total_seconds() * 1000, 2),
+        )
+    return applied
+
+
+def _is_invalid(connection: Connection, name: str) -> bool:
+    """索引存在但不可用（PostgreSQL ``indisvalid = false``）"""
+    if connection.dialect.name != "postgresql":
+        return False
+    result = connection.execute(
+        text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"),
+        {"name": name},
+    )
+    return bool(result.scalar())
+
+
+def main() -> None:
+    """命令行入口：对 ``database_url`` 指向的数据库执行未执行的迁移"""
+    from app.infra.database import get_sync_engine
+
+    engine = get_sync_engine()
+    try:
+        applied = apply_migrations(engine)
+    finally:
+        engine.dispose()
+    logger.info("migrations_finished", applied=applied)
+
+
+__all__ = [
+    "MIGRATIONS",
+    "IndexSpec",
+    "Migration",
+    "applied_migrations",
+    "apply_migrations",
+]
+
+
+if __name__ == "__main__":
+    main()
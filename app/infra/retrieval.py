@@ -0,0 +1,232 @@
+"""知识检索
+
+把会话上的检索配置（top-k、阈值、两阶段维度等）应用到本地索引。
+混合检索并发执行关键词（BM25）与向量检索，再用 RRF 或加权分数融合。
+
+使用示例:
+```python
+settings = RetrievalSettings.from_session(session)
+hits = vector_search(index, query_vector, settings, tenant_id=session.tenant_id)
+
+hits = await hybrid_search(
+    vector_index, keyword_index, query, query_vector, settings, tenant_id=session.tenant_id
+)
+```
+"""
+
+import asyncio
+from collections.abc import Awaitable, Sequence
+from dataclasses import dataclass
+from typing import Any, Literal
+
+import numpy as np
+
+from app.infra.keyword_index import KeywordIndex
+from app.infra.vector_index import VectorHit, VectorIndex
+
+FusionMethod = Literal["rrf", "weighted"]
+
+
+@dataclass(frozen=True)
+class RetrievalSettings:
+    """检索配置
+
+    字段与 ``sessions`` 表的检索配置列一一对应。
+    """
+
+    enable_rewrite: bool = True
+    max_rounds: int = 5
+    embedding_top_k: int = 10
+    vector_threshold: float = 0.5
+    keyword_threshold: float = 0.5
+    rerank_model_id: str | None = None
+    rerank_top_k: int = 10
+    rerank_threshold: float = 0.65
+    # Matryoshka 两阶段：粗排前缀维度 / 重排维度，为空时使用完整维度
+    search_dimensions: int | None = None
+    rerank_dimensions: int | None = None
+
+    @classmethod
+    def from_session(cls, session: Any) -> "RetrievalSettings":
+        """从会话读取检索配置
+
+        Args:
+            session: ``Session`` 实例（或具有同名属性的对象）
+
+        Returns:
+            检索配置
+        """
+        return cls(
+            enable_rewrite=session.enable_rewrite,
+            max_rounds=session.max_rounds,
+            embedding_top_k=session.embedding_top_k,
+            vector_threshold=session.vector_threshold,
+            keyword_threshold=session.keyword_threshold,
+            rerank_model_id=session.rerank_model_id,
+            rerank_top_k=session.rerank_top_k,
+            rerank_threshold=session.rerank_threshold,
+            search_dimensions=session.embedding_search_dimensions,
+            rerank_dimensions=session.embedding_rerank_dimensions,
+        )
+
+
+def vector_search(
+    index: VectorIndex,
+    query_vector: Sequence[float] | np.ndarray,
+    settings: RetrievalSettings,
+    *,
+    tenant_id: int | None = None,
+) -> list[VectorHit]:
+    """按检索配置执行向量检索
+
+    Args:
+        index: 向量索引
+        query_vector: 查询向量（完整维度）
+        settings: 检索配置
+        tenant_id: 租户 ID
+
+    Returns:
+        相似度不低于 ``vector_threshold`` 的前 ``embedding_top_k`` 条结果
+    """
+    return index.search(
+        query_vector,
+        settings.embedding_top_k,
+        tenant_id=tenant_id,
+        threshold=settings.vector_threshold,
+        search_dimensions=settings.search_dimensions,
+        rerank_dimensions=settings.rerank_dimensions,
+    )
+
+
+def keyword_search(
+    index: KeywordIndex,
+    query: str,
+    settings: RetrievalSettings,
+    *,
+    tenant_id: int | None = None,
+) -> list[VectorHit]:
+    """按检索配置执行 BM25 关键词检索
+
+    Returns:
+        归一化分数不低于 ``keyword_threshold`` 的前 ``embedding_top_k`` 条结果
+    """
+    return index.search(
+        query,
+        settings.embedding_top_k,
+        tenant_id=tenant_id,
+        threshold=settings.keyword_threshold,
+    )
+
+
+@dataclass
+class HybridHit:
+    """混合检索结果
+
+    ``vector_score`` / ``keyword_score`` 为空表示该路未召回。
+    """
+
+    id: str
+    score: float
+    tenant_id: int | None = None
+    vector_score: float | None = None
+    keyword_score: float | None = None
+
+
+def fuse(
+    vector_hits: Sequence[VectorHit],
+    keyword_hits: Sequence[VectorHit],
+    *,
+    method: FusionMethod = "rrf",
+    top_k: int = 10,
+    rrf_k: int = 60,
+    vector_weight: float = 0.7,
+) -> list[HybridHit]:
+    """融合两路检索结果
+
+    Args:
+        vector_hits: 向量检索结果（按分数降序）
+        keyword_hits: 关键词检索结果（按分数降序）
+        method: ``rrf`` 按名次融合 sum(1 / (rrf_k + rank))；
+            ``weighted`` 按分数加权 vector_weight * 向量分 + (1 - vector_weight) * 关键词分
+        top_k: 返回数量
+        rrf_k: RRF 平滑常数
+        vector_weight: 加权融合时向量分数的权重
+
+    Returns:
+        按融合分数降序的结果
+    """
+    merged: dict[str, HybridHit] = {}
+    for hits, weight, field in (
+        (vector_hits, vector_weight, "vector_score"),
+        (keyword_hits, 1 - vector_weight, "keyword_score"),
+    ):
+        for rank, hit in enumerate(hits, start=1):
+            item = merged.get(hit.id)
+            if item is None:
+                item = merged[hit.id] = HybridHit(hit.id, 0.0, hit.tenant_id)
+            setattr(item, field, hit.score)
+            item.score += 1 / (rrf_k + rank) if method == "rrf" else weight * hit.score
+    return sorted(merged.values(), key=lambda item: item.score, reverse=True)[:top_k]
+
+
+async def hybrid_search(
+    vector_index: VectorIndex,
+    keyword_index: KeywordIndex,
+    query: str,
+    query_vector: Sequence[float] | np.ndarray | Awaitable[Sequence[float]],
+    settings: RetrievalSettings,
+    *,
+    tenant_id: int | None = None,
+    method: FusionMethod = "rrf",
+    rrf_k: int = 60,
+    vector_weight: float = 0.7,
+) -> list[HybridHit]:
+    """混合检索
+
+    两路检索在线程池中并发执行（numpy 计算会释放 GIL）。``query_vector``
+    可以传入尚未完成的 Embedding 协程，关键词检索不必等待它。
+
+    Args:
+        vector_index: 向量索引
+        keyword_index: 关键词索引
+        query: 查询文本
+        query_vector: 查询向量，或返回查询向量的 awaitable（如 ``embeddings.aembed_query(query)``）
+        settings: 检索配置，两路分别应用 ``vector_threshold`` / ``keyword_threshold``
+        tenant_id: 租户 ID
+        method: 融合方式，见 ``fuse``
+        rrf_k: RRF 平滑常数
+        vector_weight: 加权融合时向量分数的权重
+
+    Returns:
+        前 ``embedding_top_k`` 条融合结果
+    """
+
+    async def run_vector() -> list[VectorHit]:
+        vector = await query_vector if isinstance(query_vector, Awaitable) else query_vector
+        return await asyncio.to_thread(
+            vector_search, vector_index, vector, settings, tenant_id=tenant_id
+        )
+
+    vector_hits, keyword_hits = await asyncio.gather(
+        run_vector(),
+        asyncio.to_thread(keyword_search, keyword_index, query, settings, tenant_id=tenant_id),
+    )
+    return fuse(
+        vector_hits,
+        keyword_hits,
+        method=method,
+        top_k=settings.embedding_top_k,
+        rrf_k=rrf_k,
+        vector_weight=vector_weight,
+    )
+
+
+__all__ = [
+    "FusionMethod",
+    "HybridHit",
+    "RetrievalSettings",
+    "fuse",
+    "hybrid_search",
+    "keyword_search",
+    "vector_search",
+]
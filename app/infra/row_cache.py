@@ -0,0 +1,227 @@
+"""热点行缓存
+
+租户配置、自定义 Agent、占位符几乎每个请求都要读、却很少修改，
+仓储通过 ``RowCache.get_or_load`` 读穿缓存：
+
+- 进程内 TTL + LRU：超过 ``ttl`` 秒或被挤出后重新从数据库加载
+- 版本戳失效：每个作用域（如 ``tenant:1``）有一个版本号，写入提交后
+  ``invalidate`` 把版本加一，之前写入的缓存项全部作废。加载前先取版本号，
+  加载期间发生的失效不会被旧数据覆盖
+- 可选广播：配置 ``row_cache_redis_url`` 后失效通过 Redis pub/sub 发给所有 worker
+
+缓存值以 pickle 序列化保存，命中时反序列化出新副本（比 ``copy.deepcopy`` 快一个数量级），
+调用方修改返回值不影响缓存；ORM 实例反序列化后为游离（detached）状态。
+
+使用示例:
+```python
+cache = get_row_cache()
+config = await cache.get_or_load(f"tenant:{tenant_id}", "config", load_config)
+# 更新并提交后
+await cache.invalidate(f"tenant:{tenant_id}")
+```
+"""
+
+import asyncio
+import json
+import pickle
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any, TypeVar
+from uuid import uuid4
+
+from app.config.settings import get_settings
+from app.observability.logging import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+_CHANNEL = "kiki:row-cache:invalidate"
+
+
+@dataclass(slots=True)
+class _Entry:
+    data: bytes
+    version: int
+    expires_at: float
+
+
+class RedisInvalidationBroadcaster:
+    """通过 Redis pub/sub 在 worker 之间广播失效"""
+
+    def __init__(self, url: str, channel: str = _CHANNEL) -> None:
+        self._url = url
+        self._channel = channel
+        # 区分自己发出的消息
+        self._origin = uuid4().hex
+        self._redis: Any = None
+        self._listener: asyncio.Task[None] | None = None
+
+    async def start(self, cache: "RowCache") -> None:
+        """连接 Redis 并订阅失效频道"""
+        import redis.asyncio as redis
+
+        self._redis = redis.from_url(self._url)
+        pubsub = self._redis.pubsub()
+        await pubsub.subscribe(self._channel)
+        self._listener = asyncio.create_task(self._listen(pubsub, cache))
+        logger.info("row_cache_broadcast_started", channel=self._channel)
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+
+    async def publish(self, scope: str) -> None:
+        if self._redis is None:
+            return
+        message = json.dumps({"origin": self._origin, "scope": scope})
+        try:
+            await self._redis.publish(self._channel, message)
+        except Exception as e:
+            # 广播失败时其他 worker 靠 TTL 过期
+            logger.warning("row_cache_broadcast_failed", scope=scope, error=str(e))
+
+    async def _listen(self, pubsub: Any, cache: "RowCache") -> None:
+        try:
+            async for message in pubsub.listen():
+                if message.get("type") != "message":
+                    continue
+                try:
+                    payload = json.loads(message["data"])
+                except (TypeError, ValueError):
+                    continue
+                if payload.get("origin") != self._origin:
+                    cache.invalidate_local(payload["scope"])
+        finally:
+            await pubsub.aclose()
+
+
+class RowCache:
+    """进程内 TTL + LRU 读穿缓存，按作用域版本戳失效"""
+
+    def __init__(
+        self,
+        max_size: int = 10000,
+        ttl: float = 60.0,
+        broadcaster: RedisInvalidationBroadcaster | None = None,
+    ) -> None:
+        """初始化缓存
+
+        Args:
+            max_size: 最多缓存的条目数
+            ttl: 条目存活秒数
+            broadcaster: 跨 worker 失效广播，为空时只在本进程失效
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._broadcaster = broadcaster
+        self._entries: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+        self._versions: dict[str, int] = {}
+        # clear() 递增的全局代数，计入每个作用域的版本号
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def start(self) -> None:
+        if self._broadcaster is not None:
+            await self._broadcaster.start(self)
+
+    async def stop(self) -> None:
+        if self._broadcaster is not None:
+            await self._broadcaster.stop()
+
+    async def get_or_load(
+        self, scope: str, key: str, loader: Callable[[], Awaitable[T]]
+    ) -> T:
+        """读穿：命中返回缓存值的副本，未命中调用 ``loader`` 加载后写入
+
+        Args:
+            scope: 失效作用域
+            key: 作用域内的键
+            loader: 从数据库加载的协程函数，返回值须可 pickle
+
+        Returns:
+            命中时为缓存副本，未命中时为 ``loader`` 的返回值
+        """
+        version = self.version(scope)
+        entry = self._entries.get((scope, key))
+        if entry is not None and entry.version == version and entry.expires_at > time.monotonic():
+            self._entries.move_to_end((scope, key))
+            self.hits += 1
+            # 数据只来自本进程 pickle.dumps 的结果，不会反序列化外部输入
+            return pickle.loads(entry.data)  # noqa: S301
+
+        self.misses += 1
+        value = await loader()
+        # 加载期间作用域被失效时不写入，避免旧数据覆盖
+        if self.max_size > 0 and self.version(scope) == version:
+            self._entries[(scope, key)] = _Entry(
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL), version, time.monotonic() + self.ttl
+            )
+            self._entries.move_to_end((scope, key))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    async def invalidate(self, scope: str) -> None:
+        """作废作用域内的全部缓存（写入提交后调用），并广播给其他 worker"""
+        self.invalidate_local(scope)
+        if self._broadcaster is not None:
+            await self._broadcaster.publish(scope)
+
+    def version(self, scope: str) -> int:
+        """作用域当前版本号，可作为派生缓存（如编译后的模板）的版本戳"""
+        return self._generation + self._versions.get(scope, 0)
+
+    def invalidate_local(self, scope: str) -> None:
+        """只作废本进程的缓存"""
+        self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def clear(self) -> None:
+        """清空缓存；版本号只增不减，进行中的加载不会以旧版本写回"""
+        self._entries.clear()
+        self._generation += 1
+
+
+# 全局缓存
+_row_cache: RowCache | None = None
+
+
+def get_row_cache() -> RowCache:
+    """获取全局热点行缓存"""
+    global _row_cache
+    if _row_cache is None:
+        settings = get_settings()
+        broadcaster = (
+            RedisInvalidationBroadcaster(settings.row_cache_redis_url)
+            if settings.row_cache_redis_url
+            else None
+        )
+        _row_cache = RowCache(
+            max_size=settings.row_cache_size,
+            ttl=settings.row_cache_ttl,
+            broadcaster=broadcaster,
+        )
+        logger.info(
+            "row_cache_initialized",
+            max_size=settings.row_cache_size,
+            ttl=settings.row_cache_ttl,
+            broadcast=broadcaster is not None,
+        )
+    return _row_cache
+
+
+__all__ = ["RedisInvalidationBroadcaster", "RowCache", "get_row_cache"]
@@ -0,0 +1,742 @@
+"""进程内向量索引
+
+为知识库检索提供本地向量搜索，参数与会话的 ``embedding_top_k`` / ``vector_threshold`` 对应。
+
+- 精确模式：分块矩阵乘 + ``argpartition`` 取 top-k，适合小语料
+- IVF 模式：球面 k-means 粗量化，只扫描最近的 ``nprobe`` 个簇，适合大语料
+- 量化：int8（按向量缩放，内存 1/4）或二值（符号位 + 汉明距离，内存 1/32）
+  粗排，再用全精度向量对前 ``k * rerank_factor`` 个候选重排
+- Matryoshka 两阶段：粗排只用向量前 ``search_dimensions`` 维（可再叠加量化），
+  重排使用完整维度（或 ``rerank_dimensions`` 维）
+- 支持增删（删除为墓碑标记，比例过高时自动压缩）和按租户过滤
+- ``save`` / ``load`` 使用 ``.npy`` 文件，加载时内存映射，不必整体读入内存
+
+使用示例:
+```python
+index = VectorIndex(1024, quantization="int8", vectors_path="/data/kb-1.f32")
+index.add(chunk_ids, vectors, tenant_id=1)
+hits = index.search(query_vector, k=session.embedding_top_k,
+                    tenant_id=1, threshold=session.vector_threshold)
+```
+"""
+
+import json
+import os
+import threading
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+
+from app.observability.logging import get_logger
+
+logger = get_logger(__name__)
+
+# 无租户的向量
+_NO_TENANT = -1
+
+Quantization = Literal["none", "int8", "binary"]
+
+# int8 粗排时每次转换的行数
+_INT8_CAST_ROWS = 512
+
+
+@dataclass
+class VectorHit:
+    """检索结果"""
+
+    id: str
+    score: float
+    tenant_id: int | None = None
+
+
+@dataclass
+class _Snapshot:
+    """查询快照：锁内取引用，锁外计算"""
+
+    vectors: np.ndarray
+    stage_dimensions: int
+    codes: np.ndarray | None
+    scales: np.ndarray | None
+    mask: np.ndarray
+    ids: list[str]
+    tenants: np.ndarray
+    centroids: np.ndarray | None
+    postings: list[np.ndarray] | None
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """返回一维分数中最大的 k 个下标（降序）"""
+    if k <= 0 or scores.size == 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(scores.size)
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """按向量缩放的 int8 量化
+
+    Returns:
+        (int8 编码, 每个向量的缩放系数)，原向量约等于 ``codes * scales[:, None]``
+    """
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def quantize_binary(vectors: np.ndarray) -> np.ndarray:
+    """符号位二值量化，每 8 维打包成 1 字节"""
+    return np.packbits(vectors > 0, axis=1)
+
+
+class VectorIndex:
+    """向量索引
+
+    线程安全：写操作加锁，查询在锁内取快照后无锁计算。
+    """
+
+    def __init__(
+        self,
+        dimensions: int,
+        *,
+        metric: Literal["cosine", "dot"] = "cosine",
+        quantization: Quantization = "none",
+        search_dimensions: int | None = None,
+        rerank_factor: int = 4,
+        vectors_path: str | Path | None = None,
+        nprobe: int = 8,
+        block_size: int = 16384,
+        compact_ratio: float = 0.3,
+    ) -> None:
+        """初始化向量索引
+
+        Args:
+            dimensions: 向量维度
+            metric: 相似度，cosine 会在写入和查询时归一化
+            quantization: 粗排使用的量化方式
+            search_dimensions: 粗排使用的前缀维度（Matryoshka），为空时使用完整维度
+            rerank_factor: 两阶段检索时送入重排的候选倍数
+            vectors_path: 全精度向量的磁盘文件，设置后全精度向量不常驻内存（配合量化使用）
+            nprobe: IVF 模式默认探测的簇数
+            block_size: 精确搜索每块的行数，限制分数矩阵的内存
+            compact_ratio: 删除比例超过该值时压缩存储
+        """
+        self.dimensions = dimensions
+        self.metric = metric
+        self.quantization = quantization
+        self.search_dimensions = search_dimensions or dimensions
+        if not 0 < self.search_dimensions <= dimensions:
+            raise ValueError(f"粗排维度 {self.search_dimensions} 超出向量维度 {dimensions}")
+        self.rerank_factor = rerank_factor
+        self.vectors_path = Path(vectors_path) if vectors_path else None
+        self.nprobe = nprobe
+        self.block_size = block_size
+        self.compact_ratio = compact_ratio
+
+        self._vectors = np.empty((0, dimensions), dtype=np.float32)
+        self._spilled = False
+        # 粗排编码：前缀向量（float32）、int8 或二值，由 search_dimensions 维的前缀生成
+        self._codes: np.ndarray | None = None
+        self._scales: np.ndarray | None = None
+        stage = self.search_dimensions
+        if quantization == "int8":
+            self._codes = np.empty((0, stage), dtype=np.int8)
+            self._scales = np.empty(0, dtype=np.float32)
+        elif quantization == "binary":
+            self._codes = np.empty((0, (stage + 7) // 8), dtype=np.uint8)
+        elif stage < dimensions:
+            self._codes = np.empty((0, stage), dtype=np.float32)
+        self._tenants = np.empty(0, dtype=np.int64)
+        self._alive = np.empty(0, dtype=bool)
+        self._ids: list[str] = []
+        self._rows: dict[str, int] = {}
+        self._size = 0
+        self._deleted = 0
+
+        self._centroids: np.ndarray | None = None
+        self._assign = np.empty(0, dtype=np.int32)
+        self._postings: list[np.ndarray] | None = None
+
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._rows
+
+    @property
+    def is_trained(self) -> bool:
+        """是否已训练 IVF 粗量化器"""
+        return self._centroids is not None
+
+    def memory_usage(self) -> dict[str, int]:
+        """常驻内存占用（字节），内存映射的全精度向量不计入"""
+        size = self._size
+        usage = {
+            "vectors": 0 if isinstance(self._vectors, np.memmap) else self._vectors[:size].nbytes,
+            "codes": 0 if self._codes is None else self._codes[:size].nbytes,
+            "scales": 0 if self._scales is None else self._scales[:size].nbytes,
+        }
+        usage["total"] = sum(usage.values())
+        return usage
+
+    # ============== 写入 ==============
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: Sequence[Sequence[float]] | np.ndarray,
+        *,
+        tenant_id: int | Sequence[int | None] | None = None,
+    ) -> None:
+        """添加向量，已存在的 ID 会被覆盖
+
+        Args:
+            ids: 向量 ID（如 chunk id）
+            vectors: 向量，形状 (n, dimensions)
+            tenant_id: 租户 ID，可为每条向量单独指定
+        """
+        matrix = self._prepare(vectors)
+        if len(ids) != matrix.shape[0]:
+            raise ValueError(f"ID 数量 {len(ids)} 与向量数量 {matrix.shape[0]} 不一致")
+        if tenant_id is None or isinstance(tenant_id, int):
+            tenants = np.full(len(ids), _NO_TENANT if tenant_id is None else tenant_id)
+        else:
+            tenants = np.array([_NO_TENANT if t is None else t for t in tenant_id])
+
+        with self._lock:
+            self._delete_rows([self._rows[id] for id in ids if id in self._rows])
+            start = self._size
+            end = start + len(ids)
+            self._reserve(end)
+            self._vectors[start:end] = matrix
+            if self._codes is not None:
+                stage = self._truncate(matrix, self.search_dimensions)
+                if self.quantization == "int8":
+                    self._codes[start:end], self._scales[start:end] = quantize_int8(stage)
+                elif self.quantization == "binary":
+                    self._codes[start:end] = quantize_binary(stage)
+                else:
+                    self._codes[start:end] = stage
+            self._tenants[start:end] = tenants
+            self._alive[start:end] = True
+            self._ids.extend(ids)
+            for offset, id in enumerate(ids):
+                self._rows[id] = start + offset
+            if self._centroids is not None:
+                self._assign[start:end] = self._nearest_centroids(matrix)
+                self._postings = None
+            self._size = end
+
+    def delete(self, ids: Sequence[str]) -> int:
+        """删除向量
+
+        Returns:
+            实际删除的数量
+        """
+        with self._lock:
+            rows = [self._rows.pop(id) for id in ids if id in self._rows]
+            self._delete_rows(rows, unindex=False)
+            if self._deleted > self.compact_ratio * max(self._size, 1):
+                self.compact()
+            return len(rows)
+
+    def delete_tenant(self, tenant_id: int) -> int:
+        """删除租户的全部向量"""
+        with self._lock:
+            rows = np.flatnonzero(self._mask(tenant_id))
+            return self.delete([self._ids[row] for row in rows])
+
+    def compact(self) -> None:
+        """清除墓碑行
+
+        保留的行复制到新分配的数组（设置 ``vectors_path`` 时为新文件，替换原文件）后在锁内
+        替换引用；进行中的查询仍持有旧数组和旧 ``_ids``，行号与 ID 保持一致。
+        """
+        with self._lock:
+            if self._deleted == 0:
+                return
+            keep = np.flatnonzero(self._alive[: self._size])
+            capacity = max(len(self._alive), 1)
+            if self.vectors_path is not None:
+                self._vectors = self._compact_file(keep, capacity)
+                self._spilled = True
+            else:
+                self._vectors = self._take(self._vectors, keep, capacity, 0.0)
+            if self._codes is not None:
+                self._codes = self._take(self._codes, keep, capacity, 0)
+            if self._scales is not None:
+                self._scales = self._take(self._scales, keep, capacity, 1.0)
+            self._tenants = self._take(self._tenants, keep, capacity, _NO_TENANT)
+            self._alive = self._take(self._alive, keep, capacity, False)
+            if self._centroids is not None:
+                self._assign = self._take(self._assign, keep, capacity, 0)
+            self._ids = [self._ids[row] for row in keep]
+            self._rows = {id: row for row, id in enumerate(self._ids)}
+            self._postings = None
+            self._size = len(keep)
+            self._deleted = 0
+
+    # ============== IVF ==============
+
+    def train(
+        self,
+        nlist: int | None = None,
+        *,
+        iterations: int = 10,
+        sample_size: int | None = None,
+        seed: int = 0,
+    ) -> None:
+        """训练 IVF 粗量化器（球面 k-means），之后的查询默认走 IVF
+
+        Args:
+            nlist: 簇数，默认 ``4 * sqrt(n)``
+            iterations: k-means 迭代次数
+            sample_size: 训练采样数，默认 ``32 * nlist``
+            seed: 随机种子
+        """
+        with self._lock:
+            alive = np.flatnonzero(self._alive[: self._size])
+            if nlist is None:
+                nlist = max(1, int(4 * np.sqrt(len(alive))))
+            if len(alive) < nlist:
+                raise ValueError(f"向量数 {len(alive)} 少于簇数 {nlist}")
+
+            rng = np.random.default_rng(seed)
+            sample_size = min(len(alive), sample_size or 32 * nlist)
+            rows = np.sort(rng.choice(alive, sample_size, replace=False))
+            sample = _normalize(np.asarray(self._vectors[rows], dtype=np.float32))
+            centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+            for _ in range(iterations):
+                assign = self._argmax_blocks(sample, centroids)
+                order = np.argsort(assign, kind="stable")
+                counts = np.bincount(assign, minlength=nlist)
+                starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+                sums = np.zeros_like(centroids)
+                present = counts > 0
+                sums[present] = np.add.reduceat(sample[order], starts[present], axis=0)
+                empty = ~present
+                if empty.any():
+                    sums[empty] = sample[rng.choice(sample_size, int(empty.sum()), replace=False)]
+                centroids = _normalize(sums)
+
+            self._centroids = centroids.astype(np.float32)
+            self._assign = np.zeros(len(self._alive), dtype=np.int32)
+            for start in range(0, self._size, self.block_size):
+                block = self._vectors[start : start + self.block_size]
+                self._assign[start : start + len(block)] = self._nearest_centroids(block)
+            self._postings = None
+            logger.info("vector_index_trained", nlist=nlist, size=len(alive))
+
+    # ============== 查询 ==============
+
+    def search(
+        self,
+        query: Sequence[float] | np.ndarray,
+        k: int = 10,
+        *,
+        tenant_id: int | None = None,
+        threshold: float | None = None,
+        nprobe: int | None = None,
+        search_dimensions: int | None = None,
+        rerank_dimensions: int | None = None,
+        exact: bool = False,
+    ) -> list[VectorHit]:
+        """检索最相似的 k 条向量
+
+        Args:
+            query: 查询向量
+            k: 返回数量
+            tenant_id: 只在该租户的向量中检索
+            threshold: 最低相似度
+            nprobe: IVF 探测簇数，默认使用索引配置
+            search_dimensions: 粗排维度，默认使用索引配置；与索引配置不同时按前缀现算
+            rerank_dimensions: 重排维度，默认使用完整维度
+            exact: 强制全精度精确搜索（不走 IVF 和两阶段检索）
+
+        Returns:
+            按相似度降序的检索结果
+        """
+        return self.search_batch(
+            [query],
+            k,
+            tenant_id=tenant_id,
+            threshold=threshold,
+            nprobe=nprobe,
+            search_dimensions=search_dimensions,
+            rerank_dimensions=rerank_dimensions,
+            exact=exact,
+        )[0]
+
+    def search_batch(
+        self,
+        queries: Sequence[Sequence[float]] | np.ndarray,
+        k: int = 10,
+        *,
+        tenant_id: int | None = None,
+        threshold: float | None = None,
+        nprobe: int | None = None,
+        search_dimensions: int | None = None,
+        rerank_dimensions: int | None = None,
+        exact: bool = False,
+    ) -> list[list[VectorHit]]:
+        """批量检索，参数同 ``search``"""
+        matrix = self._prepare(queries)
+        stage = min(search_dimensions or self.search_dimensions, self.dimensions)
+        rerank = min(rerank_dimensions or self.dimensions, self.dimensions)
+        if exact:
+            stage = rerank
+        # 预先生成的编码只对应索引配置的粗排维度
+        use_codes = not exact and stage == self.search_dimensions
+
+        # 在锁内取快照，矩阵运算在锁外进行（numpy 运算期间释放 GIL，查询可并行）
+        with self._lock:
+            size = self._size
+            centroids = None if exact else self._centroids
+            snapshot = _Snapshot(
+                vectors=self._vectors[:size],
+                stage_dimensions=stage,
+                codes=self._codes[:size] if use_codes and self._codes is not None else None,
+                scales=self._scales[:size] if use_codes and self._scales is not None else None,
+                mask=self._mask(tenant_id),
+                ids=self._ids,
+                tenants=self._tenants[:size],
+                centroids=centroids,
+                postings=None if centroids is None else self._get_postings(),
+            )
+
+        # 粗排分数与最终分数不一致时（量化或维度不同）需要重排
+        two_stage = self.quantization != "none" and snapshot.codes is not None or stage != rerank
+        shortlist = k * self.rerank_factor if two_stage else k
+        stage_queries = self._truncate(matrix, stage)
+        if snapshot.centroids is None:
+            candidates = self._candidates_flat(snapshot, stage_queries, shortlist)
+        else:
+            candidates = self._candidates_ivf(
+                snapshot, matrix, stage_queries, shortlist, nprobe or self.nprobe
+            )
+
+        rerank_queries = self._truncate(matrix, rerank)
+        results = []
+        for query, (rows, scores) in zip(rerank_queries, candidates, strict=True):
+            if two_stage:
+                rows, scores = self._rerank(snapshot.vectors, query, rows, k)
+            hits = []
+            for row, score in zip(rows, scores, strict=True):
+                if threshold is not None and score < threshold:
+                    break
+                tenant = int(snapshot.tenants[row])
+                hits.append(
+                    VectorHit(
+                        snapshot.ids[row], float(score), None if tenant == _NO_TENANT else tenant
+                    )
+                )
+            results.append(hits)
+        return results
+
+    def get_vectors(self, ids: Sequence[str]) -> np.ndarray:
+        """读取全精度向量（cosine 下为归一化后的向量）"""
+        with self._lock:
+            return np.asarray(self._vectors[[self._rows[id] for id in ids]], dtype=np.float32)
+
+    # ============== 持久化 ==============
+
+    def save(self, path: str | Path) -> None:
+        """保存到目录（先压缩墓碑行）"""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            self.compact()
+            size = self._size
+            np.save(path / "vectors.npy", self._vectors[:size])
+            np.save(path / "tenants.npy", self._tenants[:size])
+            if self._codes is not None:
+                np.save(path / "codes.npy", self._codes[:size])
+            if self._scales is not None:
+                np.save(path / "scales.npy", self._scales[:size])
+            if self._centroids is not None:
+                np.save(path / "centroids.npy", self._centroids)
+                np.save(path / "assign.npy", self._assign[:size])
+            (path / "ids.json").write_text(json.dumps(self._ids, ensure_ascii=False))
+            (path / "meta.json").write_text(
+                json.dumps(
+                    {
+                        "dimensions": self.dimensions,
+                        "metric": self.metric,
+                        "quantization": self.quantization,
+                        "search_dimensions": self.search_dimensions,
+                        "rerank_factor": self.rerank_factor,
+                        "nprobe": self.nprobe,
+                    }
+                )
+            )
+
+    @classmethod
+    def load(
+        cls, path: str | Path, *, mmap: bool = True, vectors_path: str | Path | None = None
+    ) -> "VectorIndex":
+        """从目录加载
+
+        量化索引只把编码读入内存，全精度向量保持内存映射，重排时按需分页读取。
+
+        Args:
+            path: ``save`` 写入的目录
+            mmap: 是否内存映射全精度向量（只读，首次写入时复制到内存或 ``vectors_path``）
+            vectors_path: 之后写入时全精度向量的磁盘文件
+
+        Returns:
+            向量索引
+        """
+        path = Path(path)
+        meta = json.loads((path / "meta.json").read_text())
+        index = cls(
+            meta["dimensions"],
+            metric=meta["metric"],
+            quantization=meta.get("quantization", "none"),
+            search_dimensions=meta.get("search_dimensions"),
+            rerank_factor=meta.get("rerank_factor", 4),
+            vectors_path=vectors_path,
+            nprobe=meta["nprobe"],
+        )
+        index._vectors = np.load(path / "vectors.npy", mmap_mode="r" if mmap else None)
+        index._tenants = np.load(path / "tenants.npy")
+        if (path / "codes.npy").exists():
+            index._codes = np.load(path / "codes.npy")
+        if (path / "scales.npy").exists():
+            index._scales = np.load(path / "scales.npy")
+        index._ids = json.loads((path / "ids.json").read_text())
+        index._rows = {id: row for row, id in enumerate(index._ids)}
+        index._size = len(index._ids)
+        index._alive = np.ones(index._size, dtype=bool)
+        if (path / "centroids.npy").exists():
+            index._centroids = np.load(path / "centroids.npy")
+            index._assign = np.load(path / "assign.npy")
+        return index
+
+    # ============== 内部方法 ==============
+
+    def _prepare(self, vectors: Sequence[Sequence[float]] | np.ndarray) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        if matrix.shape[1] != self.dimensions:
+            raise ValueError(f"向量维度 {matrix.shape[1]} 与索引维度 {self.dimensions} 不一致")
+        return _normalize(matrix) if self.metric == "cosine" else matrix
+
+    def _truncate(self, vectors: np.ndarray, dimensions: int) -> np.ndarray:
+        """取前缀维度（cosine 下重新归一化）"""
+        if dimensions >= vectors.shape[1]:
+            return vectors
+        prefix = np.asarray(vectors[:, :dimensions], dtype=np.float32)
+        return _normalize(prefix) if self.metric == "cosine" else prefix
+
+    def _reserve(self, rows: int) -> None:
+        """保证容量和可写（加载的只读映射在首次写入时复制）"""
+        capacity = len(self._alive)
+        if rows <= capacity and self._vectors.flags.writeable:
+            return
+        capacity = max(rows, capacity * 2, 1024)
+
+        def grow(array: np.ndarray, fill: object) -> np.ndarray:
+            grown = np.full((capacity, *array.shape[1:]), fill, dtype=array.dtype)
+            grown[: self._size] = array[: self._size]
+            return grown
+
+        if self.vectors_path is not None:
+            self._vectors = self._grow_file(capacity)
+            self._spilled = True
+        else:
+            self._vectors = grow(self._vectors, 0.0)
+        if self._codes is not None:
+            self._codes = grow(self._codes, 0)
+        if self._scales is not None:
+            self._scales = grow(self._scales, 1.0)
+        self._tenants = grow(self._tenants, _NO_TENANT)
+        self._alive = grow(self._alive, False)
+        if self._centroids is not None:
+            self._assign = grow(self._assign, 0)
+
+    def _grow_file(self, capacity: int) -> np.memmap:
+        """扩展全精度向量文件并重新映射"""
+        path = self.vectors_path
+        shape = (capacity, self.dimensions)
+        if self._spilled:
+            self._vectors.flush()
+            with open(path, "r+b") as f:
+                f.truncate(capacity * self.dimensions * 4)
+            return np.memmap(path, dtype=np.float32, mode="r+", shape=shape)
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        vectors = np.memmap(path, dtype=np.float32, mode="w+", shape=shape)
+        for start in range(0, self._size, self.block_size):
+            end = min(start + self.block_size, self._size)
+            vectors[start:end] = self._vectors[start:end]
+        return vectors
+
+    def _take(self, array: np.ndarray, rows: np.ndarray, capacity: int, fill: object) -> np.ndarray:
+        """把 ``rows`` 按块复制到新数组的开头"""
+        taken = np.full((capacity, *array.shape[1:]), fill, dtype=array.dtype)
+        for start in range(0, len(rows), self.block_size):
+            chunk = rows[start : start + self.block_size]
+            taken[start : start + len(chunk)] = array[chunk]
+        return taken
+
+    def _compact_file(self, rows: np.ndarray, capacity: int) -> np.memmap:
+        """把保留的全精度向量写入新文件并替换原文件（旧映射仍指向原文件内容）"""
+        path = self.vectors_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staging = path.with_name(f"{path.name}.compact")
+        shape = (capacity, self.dimensions)
+        vectors = np.memmap(staging, dtype=np.float32, mode="w+", shape=shape)
+        for start in range(0, len(rows), self.block_size):
+            chunk = rows[start : start + self.block_size]
+            vectors[start : start + len(chunk)] = self._vectors[chunk]
+        vectors.flush()
+        del vectors
+        os.replace(staging, path)
+        return np.memmap(path, dtype=np.float32, mode="r+", shape=shape)
+
+    def _delete_rows(self, rows: Sequence[int], *, unindex: bool = True) -> None:
+        if not rows:
+            return
+        if unindex:
+            for row in rows:
+                self._rows.pop(self._ids[row], None)
+        self._alive[list(rows)] = False
+        self._deleted += len(rows)
+
+    def _mask(self, tenant_id: int | None) -> np.ndarray:
+        mask = self._alive[: self._size]
+        if tenant_id is not None:
+            return mask & (self._tenants[: self._size] == tenant_id)
+        return mask.copy()
+
+    def _approx_scores(
+        self, snapshot: _Snapshot, queries: np.ndarray, rows: np.ndarray | slice
+    ) -> np.ndarray:
+        """粗排分数，形状 (查询数, 行数)，``queries`` 已截取为粗排维度"""
+        if snapshot.codes is None:
+            vectors = snapshot.vectors[rows]
+            if snapshot.stage_dimensions < self.dimensions:
+                vectors = self._truncate(vectors, snapshot.stage_dimensions)
+            return queries @ vectors.T
+        codes = snapshot.codes[rows]
+        if codes.dtype == np.float32:
+            return queries @ codes.T
+        if self.quantization == "int8":
+            # 分小块转换为 float32，转换结果留在 CPU 缓存内再做矩阵乘
+            scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+            for start in range(0, len(codes), _INT8_CAST_ROWS):
+                block = codes[start : start + _INT8_CAST_ROWS].astype(np.float32)
+                scores[:, start : start + len(block)] = queries @ block.T
+            return scores * snapshot.scales[rows]
+        # 二值：分数为负汉明距离
+        query_bits = quantize_binary(queries)
+        scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for i, bits in enumerate(query_bits):
+            scores[i] = -np.bitwise_count(codes ^ bits).sum(axis=1, dtype=np.int32)
+        return scores
+
+    def _candidates_flat(
+        self, snapshot: _Snapshot, queries: np.ndarray, k: int
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        best = [
+            (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)) for _ in range(len(queries))
+        ]
+        mask = snapshot.mask
+        for start in range(0, len(mask), self.block_size):
+            block_mask = mask[start : start + self.block_size]
+            if not block_mask.any():
+                continue
+            end = start + len(block_mask)
+            if block_mask.all():
+                block_rows = np.arange(start, end)
+                scores = self._approx_scores(snapshot, queries, slice(start, end))
+            else:
+                # 有墓碑或租户过滤时只计算保留的行
+                block_rows = np.flatnonzero(block_mask) + start
+                scores = self._approx_scores(snapshot, queries, block_rows)
+            for i, row_scores in enumerate(scores):
+                top = _top_k(row_scores, k)
+                rows = np.concatenate([best[i][0], block_rows[top]])
+                merged = np.concatenate([best[i][1], row_scores[top]])
+                order = _top_k(merged, k)
+                best[i] = (rows[order], merged[order])
+        return best
+
+    def _candidates_ivf(
+        self,
+        snapshot: _Snapshot,
+        queries: np.ndarray,
+        stage_queries: np.ndarray,
+        k: int,
+        nprobe: int,
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        centroids = snapshot.centroids
+        nprobe = min(nprobe, len(centroids))
+        probes = np.argpartition(queries @ centroids.T, -nprobe, axis=1)[:, -nprobe:]
+
+        results = []
+        for query, query_probes in zip(stage_queries, probes, strict=True):
+            rows = np.concatenate([snapshot.postings[p] for p in query_probes])
+            rows = np.sort(rows[snapshot.mask[rows]])
+            scores = self._approx_scores(snapshot, query[None, :], rows)[0]
+            top = _top_k(scores, k)
+            results.append((rows[top], scores[top]))
+        return results
+
+    def _rerank(
+        self, vectors: np.ndarray, query: np.ndarray, rows: np.ndarray, k: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """用全精度向量重排候选（按行号顺序读取，对内存映射友好）"""
+        rows = np.sort(rows)
+        candidates = self._truncate(np.asarray(vectors[rows], dtype=np.float32), len(query))
+        scores = candidates @ query
+        top = _top_k(scores, k)
+        return rows[top], scores[top]
+
+    def _get_postings(self) -> list[np.ndarray]:
+        """按簇分组的行号（懒构建，写入后失效）"""
+        postings = self._postings
+        if postings is None:
+            assign = self._assign[: self._size]
+            order = np.argsort(assign, kind="stable")
+            bounds = np.searchsorted(assign[order], np.arange(len(self._centroids) + 1))
+            postings = [order[bounds[i] : bounds[i + 1]] for i in range(len(self._centroids))]
+            self._postings = postings
+        return postings
+
+    def _nearest_centroids(self, vectors: np.ndarray) -> np.ndarray:
+        return self._argmax_blocks(
+            _normalize(np.asarray(vectors, dtype=np.float32)), self._centroids
+        )
+
+    def _argmax_blocks(self, vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        result = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), self.block_size):
+            block = vectors[start : start + self.block_size]
+            result[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return result
+
+
+__all__ = [
+    "Quantization",
+    "VectorHit",
+    "VectorIndex",
+    "quantize_binary",
+    "quantize_int8",
+]
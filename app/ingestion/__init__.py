@@ -0,0 +1,37 @@
+"""文档入库
+
+解析 → 切分 → 去重 → 批量 Embedding → 批量写入的流式管道。
+
+解析子进程只导入 ``app.ingestion.parsers``，管道相关对象延迟导入，
+避免子进程加载数据库和 LLM 依赖。
+"""
+
+from app.ingestion.dedupe import MinHasher, NearDuplicateIndex
+from app.ingestion.parsers import ChunkingConfig, ParseUnit, detect_file_type
+
+__all__ = [
+    "ChunkingConfig",
+    "IngestionPipeline",
+    "IngestionProgress",
+    "MinHasher",
+    "NearDuplicateIndex",
+    "ParseUnit",
+    "detect_file_type",
+    "get_ingestion_pipeline",
+]
+
+
+def __getattr__(name: str):
+    """延迟导入管道对象
+
+    Args:
+        name: 要导入的名称
+
+    Returns:
+        导入的对象
+    """
+    if name in ("IngestionPipeline", "IngestionProgress", "get_ingestion_pipeline"):
+        from app.ingestion import pipeline
+
+        return getattr(pipeline, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,173 @@
+"""近似重复检测（MinHash + LSH）
+
+同一政策的不同版本等重叠文档切分后大部分分块只有细微差别，内容哈希无法识别。
+按字符 shingle 计算 MinHash 签名，LSH 分桶找候选，再用签名估计的 Jaccard
+相似度确认，相似度不低于阈值的分块链接到已有的规范分块，不再 Embedding。
+
+- 字符 shingle 不依赖分词，中英文通用；比较前去除空白并转小写
+- shingle 哈希与置换都用 numpy 向量化，``MinHasher`` 可直接在解析子进程中使用
+
+使用示例:
+```python
+hasher = MinHasher()
+index = NearDuplicateIndex(threshold=0.85, num_perm=hasher.num_perm)
+signature = hasher.signature(text)
+match = index.query(signature)  # (规范分块 ID, 相似度) 或 None
+if match is None:
+    index.add(chunk_id, signature)
+```
+"""
+
+import re
+import threading
+from collections.abc import Sequence
+from dataclasses import dataclass
+from functools import cached_property
+
+import numpy as np
+
+_WHITESPACE = re.compile(r"\s+")
+_ROLLING_BASE = np.uint64(1000003)
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+@dataclass(frozen=True)
+class MinHasher:
+    """MinHash 签名计算（可跨进程传递）"""
+
+    num_perm: int = 128
+    shingle_size: int = 5
+    seed: int = 1
+
+    @cached_property
+    def _coefficients(self) -> tuple[np.ndarray, np.ndarray]:
+        rng = np.random.default_rng(self.seed)
+        # multiply-shift 哈希族：a 为奇数，(a * h + b) mod 2^64 取高 32 位，避免取模运算
+        a = rng.integers(0, 2**63, self.num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        b = rng.integers(0, 2**63, self.num_perm, dtype=np.uint64)
+        return a[:, None], b[:, None]
+
+    def shingle_hashes(self, text: str) -> np.ndarray:
+        """字符 shingle 的 32 位哈希（去重后）"""
+        normalized = _WHITESPACE.sub("", text).lower()
+        codes = np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        k = min(self.shingle_size, len(codes))
+        if k == 0:
+            return np.zeros(1, dtype=np.uint64)
+        # 多项式滚动哈希（uint64 自然溢出），一次处理全部 k-gram
+        hashes = np.zeros(len(codes) - k + 1, dtype=np.uint64)
+        for offset in range(k):
+            hashes = hashes * _ROLLING_BASE + codes[offset : offset + len(hashes)]
+        return np.unique((hashes * _MIX) >> np.uint64(32))
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash 签名，形状 (num_perm,)，uint32"""
+        a, b = self._coefficients
+        # 原地运算，避免 (num_perm, n) 大小的中间数组
+        values = np.multiply(a, self.shingle_hashes(text)[None, :])
+        values += b
+        values >>= np.uint64(32)
+        return values.min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """批量计算签名，形状 (n, num_perm)"""
+        result = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for row, text in enumerate(texts):
+            result[row] = self.signature(text)
+        return result
+
+
+def choose_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """选择 LSH 分段数与每段行数
+
+    让 S 曲线拐点 (1/b)^(1/r) 略低于相似度阈值，候选多召回一些，再由签名相似度确认。
+
+    Returns:
+        (bands, rows)
+    """
+    target = max(threshold - 0.1, 0.05)
+    options = [(bands, num_perm // bands) for bands in range(1, num_perm + 1) if num_perm % bands == 0]
+    return min(options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - target))
+
+
+class NearDuplicateIndex:
+    """近似重复索引
+
+    一个实例对应一个去重范围（知识库或租户），线程安全。
+    """
+
+    def __init__(self, threshold: float = 0.85, num_perm: int = 128) -> None:
+        """初始化近似重复索引
+
+        Args:
+            threshold: 判定为重复的最低 Jaccard 相似度
+            num_perm: 签名长度，需与 ``MinHasher.num_perm`` 一致
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        self._buckets: list[dict[bytes, list[str]]] = [{} for _ in range(self.bands)]
+        self._signatures: dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._signatures
+
+    def add(self, id: str, signature: np.ndarray) -> None:
+        """加入规范分块"""
+        with self._lock:
+            if id in self._signatures:
+                return
+            self._signatures[id] = signature
+            for band, key in enumerate(self._band_keys(signature)):
+                self._buckets[band].setdefault(key, []).append(id)
+
+    def discard(self, id: str) -> None:
+        """移除分块（如入库失败或被判定为已有分块的重复）"""
+        with self._lock:
+            signature = self._signatures.pop(id, None)
+            if signature is None:
+                return
+            for band, key in enumerate(self._band_keys(signature)):
+                bucket = self._buckets[band].get(key)
+                if bucket is not None:
+                    bucket.remove(id)
+                    if not bucket:
+                        del self._buckets[band][key]
+
+    def query(self, signature: np.ndarray) -> tuple[str, float] | None:
+        """查找最相似的规范分块
+
+        Returns:
+            (分块 ID, 估计 Jaccard 相似度)，没有达到阈值的候选时返回 None
+        """
+        with self._lock:
+            candidates: set[str] = set()
+            for band, key in enumerate(self._band_keys(signature)):
+                candidates.update(self._buckets[band].get(key, ()))
+            if not candidates:
+                return None
+            ids = list(candidates)
+            matrix = np.stack([self._signatures[id] for id in ids])
+
+        similarities = (matrix == signature).mean(axis=1)
+        best = int(similarities.argmax())
+        if similarities[best] < self.threshold:
+            return None
+        return ids[best], float(similarities[best])
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [
+            signature[band * self.rows : (band + 1) * self.rows].tobytes()
+            for band in range(self.bands)
+        ]
+
+
+__all__ = [
+    "MinHasher",
+    "NearDuplicateIndex",
+    "choose_bands",
+]
@@ -0,0 +1,448 @@
+"""文档解析与切分
+
+解析在进程池的子进程中执行，本模块只依赖标准库和各格式的解析库（按需导入），
+避免子进程加载整个应用。
+
+一个文档被拆成若干 ``ParseUnit``（PDF 按页段、PPTX 按幻灯片段、XLSX 按工作表、
+TXT / MD / CSV 按字节区间），每个单元在子进程内逐页 / 逐行读取并立即切分，
+只把分块文本传回主进程：
+
+- PDF：PyMuPDF 按页加载（不可用时退回 pypdf）
+- XLSX：openpyxl 只读模式逐行流式读取
+- PPTX：逐页幻灯片
+- DOCX：流式解析 ``word/document.xml``，逐段落 / 表格读取后即释放，不构建完整文档树
+- HTML：分块喂给 ``HTMLParser``，按行组输出
+- TXT / MD / CSV：区间边界对齐到行首，单元内按行流式读取
+"""
+
+import functools
+import itertools
+import os
+import re
+import zipfile
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+
+import numpy as np
+
+from app.ingestion.dedupe import MinHasher
+
+# 各格式单次输出的片段大小
+_ROWS_PER_SECTION = 200
+_PARAGRAPHS_PER_SECTION = 50
+_TEXT_SECTION_CHARS = 64 * 1024
+# 文本类文件每个解析单元的字节数
+_TEXT_UNIT_BYTES = 1024 * 1024
+_READ_BYTES = 64 * 1024
+
+_WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_SLIDE_PART = re.compile(r"ppt/slides/slide\d+\.xml")
+
+PDF_TYPES = {"pdf"}
+SHEET_TYPES = {"xlsx", "xlsm"}
+SLIDE_TYPES = {"pptx"}
+TEXT_TYPES = {"txt", "md", "markdown", "csv"}
+SUPPORTED_TYPES = PDF_TYPES | SHEET_TYPES | SLIDE_TYPES | TEXT_TYPES | {"docx", "html", "htm"}
+
+
+@dataclass(frozen=True)
+class ChunkingConfig:
+    """切分配置
+
+    与 ``knowledge_bases.chunking_config`` 的默认值一致，长度按字符计。
+    """
+
+    chunk_size: int = 512
+    chunk_overlap: int = 50
+    split_markers: tuple[str, ...] = ("\n\n", "\n", "。")
+    keep_separator: bool = True
+
+    @classmethod
+    def from_dict(cls, data: dict | None) -> "ChunkingConfig":
+        """从知识库的 ``chunking_config`` 构建"""
+        if not data:
+            return cls()
+        default = cls()
+        return cls(
+            chunk_size=data.get("chunk_size", default.chunk_size),
+            chunk_overlap=data.get("chunk_overlap", default.chunk_overlap),
+            split_markers=tuple(data.get("split_markers", default.split_markers)),
+            keep_separator=data.get("keep_separator", default.keep_separator),
+        )
+
+
+@dataclass(frozen=True)
+class ParseUnit:
+    """解析单元（可跨进程传递）
+
+    ``start`` / ``stop`` 为页码区间（PDF）、幻灯片区间（PPTX）或字节区间（文本类），
+    ``stop`` 为空时读到末尾；``sheet`` 为工作表名。
+    """
+
+    path: str
+    file_type: str
+    start: int = 0
+    stop: int | None = None
+    sheet: str | None = None
+
+
+@dataclass
+class ParsedSection:
+    """解析并切分后的片段
+
+    ``chunks`` 中的偏移相对于片段开头，``length`` 用于主进程累加文档全局偏移。
+    ``signatures`` 为各分块的 MinHash 签名（未启用近似去重时为空）。
+    """
+
+    label: str
+    length: int
+    chunks: list[tuple[int, str]] = field(default_factory=list)
+    signatures: np.ndarray | None = None
+
+
+def detect_file_type(path: str | Path, file_type: str | None = None) -> str:
+    """规范化文件类型（缺省时取扩展名）"""
+    file_type = (file_type or Path(path).suffix).lower().lstrip(".")
+    if file_type not in SUPPORTED_TYPES:
+        raise ValueError(f"不支持的文件类型: {file_type}")
+    return file_type
+
+
+def plan_units(path: str | Path, file_type: str, pages_per_unit: int = 8) -> list[ParseUnit]:
+    """把文档拆成可并行解析的单元
+
+    只读取页数 / 工作表名 / 文件大小等元数据，不加载正文。
+
+    Args:
+        path: 文件路径
+        file_type: 文件类型（见 ``detect_file_type``）
+        pages_per_unit: PDF 每个单元的页数，PPTX 每个单元的幻灯片数
+
+    Returns:
+        按文档顺序排列的解析单元
+    """
+    path = str(path)
+    if file_type in PDF_TYPES:
+        pages = _pdf_page_count(path)
+        return [
+            ParseUnit(path, file_type, start, min(start + pages_per_unit, pages))
+            for start in range(0, pages, pages_per_unit)
+        ]
+    if file_type in SHEET_TYPES:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True)
+        try:
+            return [ParseUnit(path, file_type, sheet=name) for name in workbook.sheetnames]
+        finally:
+            workbook.close()
+    if file_type in SLIDE_TYPES:
+        with zipfile.ZipFile(path) as archive:
+            slides = sum(bool(_SLIDE_PART.fullmatch(name)) for name in archive.namelist())
+        starts = range(0, max(slides, 1), pages_per_unit)
+        # 最后一个单元读到末尾，不依赖幻灯片文件计数与演示文稿顺序表完全一致
+        return [
+            ParseUnit(
+                path, file_type, start, start + pages_per_unit if start != starts[-1] else None
+            )
+            for start in starts
+        ]
+    if file_type in TEXT_TYPES:
+        bounds = _text_bounds(path, _TEXT_UNIT_BYTES)
+        return [
+            ParseUnit(path, file_type, start, stop) for start, stop in itertools.pairwise(bounds)
+        ]
+    return [ParseUnit(path, file_type)]
+
+
+def parse_unit(
+    unit: ParseUnit, chunking: ChunkingConfig, hasher: MinHasher | None = None
+) -> list[ParsedSection]:
+    """解析并切分一个单元（在子进程中执行）
+
+    Args:
+        unit: 解析单元
+        chunking: 切分配置
+        hasher: 提供时同时计算各分块的 MinHash 签名
+
+    Returns:
+        按顺序排列的片段，空白片段保留长度以维持全局偏移
+    """
+    splitter = _get_splitter(chunking)
+    sections = []
+    for label, text in iter_sections(unit):
+        chunks = [
+            (doc.metadata["start_index"], doc.page_content)
+            for doc in splitter.create_documents([text])
+            if doc.page_content.strip()
+        ]
+        signatures = hasher.signatures([chunk for _, chunk in chunks]) if hasher else None
+        sections.append(ParsedSection(label, len(text), chunks, signatures))
+    return sections
+
+
+def iter_sections(unit: ParseUnit) -> Iterator[tuple[str, str]]:
+    """逐段读取单元的文本
+
+    Yields:
+        (位置标签, 文本)
+    """
+    handlers = {
+        "pdf": _iter_pdf,
+        "xlsx": _iter_sheet,
+        "xlsm": _iter_sheet,
+        "docx": _iter_docx,
+        "pptx": _iter_pptx,
+        "html": _iter_html,
+        "htm": _iter_html,
+    }
+    yield from handlers.get(unit.file_type, _iter_text)(unit)
+
+
+# ============== 各格式读取 ==============
+
+
+def _text_bounds(path: str, unit_bytes: int) -> list[int]:
+    """按约 ``unit_bytes`` 切分文件的字节边界，边界对齐到行首（不会切开多字节字符）"""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, "rb") as file:
+        while bounds[-1] + unit_bytes < size:
+            file.seek(bounds[-1] + unit_bytes)
+            position = _next_line_start(file)
+            if position >= size:
+                break
+            bounds.append(position)
+    bounds.append(size)
+    return bounds
+
+
+def _next_line_start(file) -> int:
+    """从当前位置向后找到下一行的行首"""
+    while block := file.read(_READ_BYTES):
+        newline = block.find(b"\n")
+        if newline >= 0:
+            return file.tell() - len(block) + newline + 1
+    return file.tell()
+
+
+def _pdf_page_count(path: str) -> int:
+    try:
+        import pymupdf
+    except ImportError:
+        from pypdf import PdfReader
+
+        return len(PdfReader(path).pages)
+    with pymupdf.open(path) as document:
+        return document.page_count
+
+
+def _iter_pdf(unit: ParseUnit) -> Iterator[tuple[str, str]]:
+    try:
+        import pymupdf
+    except ImportError:
+        from pypdf import PdfReader
+
+        reader = PdfReader(unit.path)
+        for number in range(unit.start, unit.stop or len(reader.pages)):
+            yield f"page {number + 1}", reader.pages[number].extract_text() or ""
+        return
+
+    with pymupdf.open(unit.path) as document:
+        for number in range(unit.start, unit.stop or document.page_count):
+            yield f"page {number + 1}", document.load_page(number).get_text()
+
+
+def _iter_sheet(unit: ParseUnit) -> Iterator[tuple[str, str]]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(unit.path, read_only=True, data_only=True)
+    try:
+        sheet = workbook[unit.sheet] if unit.sheet else workbook.active
+        lines: list[str] = []
+        first_row = 1
+        for number, row in enumerate(sheet.iter_rows(values_only=True), start=1):
+            cells = ["" if value is None else str(value) for value in row]
+            if any(cells):
+                lines.append("\t".join(cells).rstrip("\t"))
+            if len(lines) >= _ROWS_PER_SECTION:
+                yield f"{sheet.title}!{first_row}:{number}", "\n".join(lines)
+                lines, first_row = [], number + 1
+        if lines:
+            yield f"{sheet.title}!{first_row}:", "\n".join(lines)
+    finally:
+        workbook.close()
+
+
+def _iter_docx(unit: ParseUnit) -> Iterator[tuple[str, str]]:
+    from lxml import etree
+
+    def text_of(element) -> str:
+        return "".join(node.text or "" for node in element.iter(f"{_WORD_NAMESPACE}t"))
+
+    paragraphs: list[str] = []
+    start = 0
+    number = -1
+    depth = 0
+    with zipfile.ZipFile(unit.path) as archive, archive.open("word/document.xml") as file:
+        # 按正文顺序遍历段落和表格：document > body > 块，块读完即清空
+        for event, element in etree.iterparse(
+            file, events=("start", "end"), resolve_entities=False
+        ):
+            if event == "start":
+                depth += 1
+                continue
+            depth -= 1
+            if depth != 2:
+                continue
+            number += 1
+            if element.tag == f"{_WORD_NAMESPACE}p":
+                text = text_of(element)
+            elif element.tag == f"{_WORD_NAMESPACE}tbl":
+                text = "\n".join(
+                    "\t".join(text_of(cell) for cell in row.iterchildren(f"{_WORD_NAMESPACE}tc"))
+                    for row in element.iterchildren(f"{_WORD_NAMESPACE}tr")
+                )
+            else:
+                text = ""
+            element.clear()
+            if text.strip():
+                paragraphs.append(text)
+            if len(paragraphs) >= _PARAGRAPHS_PER_SECTION:
+                yield f"blocks {start + 1}-{number + 1}", "\n".join(paragraphs)
+                paragraphs, start = [], number + 1
+    if paragraphs:
+        yield f"blocks {start + 1}-", "\n".join(paragraphs)
+
+
+def _iter_pptx(unit: ParseUnit) -> Iterator[tuple[str, str]]:
+    from pptx import Presentation
+
+    presentation = Presentation(unit.path)
+    slides = itertools.islice(presentation.slides, unit.start, unit.stop)
+    for number, slide in enumerate(slides, start=unit.start + 1):
+        texts = [
+            paragraph.text
+            for shape in slide.shapes
+            if shape.has_text_frame
+            for paragraph in shape.text_frame.paragraphs
+            if paragraph.text.strip()
+        ]
+        yield f"slide {number}", "\n".join(texts)
+
+
+class _HTMLText(HTMLParser):
+    """增量提取 HTML 可见文本（去掉脚本与样式），按非空行累积"""
+
+    _SKIPPED = frozenset({"script", "style", "noscript"})
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.lines: list[str] = []
+        self._skipping = 0
+        # 同一文本节点可能跨多次 feed 分段送达，遇到标签时再拆行
+        self._pending: list[str] = []
+
+    def handle_starttag(self, tag: str, attrs: list) -> None:
+        self._flush_text()
+        if tag in self._SKIPPED:
+            self._skipping += 1
+
+    def handle_endtag(self, tag: str) -> None:
+        self._flush_text()
+        if tag in self._SKIPPED and self._skipping:
+            self._skipping -= 1
+
+    def handle_data(self, data: str) -> None:
+        if not self._skipping:
+            self._pending.append(data)
+
+    def close(self) -> None:
+        super().close()
+        self._flush_text()
+
+    def _flush_text(self) -> None:
+        text, self._pending = "".join(self._pending), []
+        self.lines.extend(line.strip() for line in text.splitlines() if line.strip())
+
+
+def _iter_html(unit: ParseUnit) -> Iterator[tuple[str, str]]:
+    parser = _HTMLText()
+    start = 0
+
+    def drain(final: bool) -> Iterator[tuple[str, str]]:
+        nonlocal start
+        while len(parser.lines) >= _PARAGRAPHS_PER_SECTION or (final and parser.lines):
+            lines = parser.lines[:_PARAGRAPHS_PER_SECTION]
+            del parser.lines[:_PARAGRAPHS_PER_SECTION]
+            yield f"lines {start + 1}-", "\n".join(lines)
+            start += len(lines)
+
+    with open(unit.path, encoding="utf-8", errors="replace") as file:
+        while block := file.read(_READ_BYTES):
+            parser.feed(block)
+            yield from drain(final=False)
+    parser.close()
+    yield from drain(final=True)
+
+
+def _iter_text(unit: ParseUnit) -> Iterator[tuple[str, str]]:
+    with open(unit.path, "rb") as file:
+        file.seek(unit.start)
+        remaining = None if unit.stop is None else unit.stop - unit.start
+        buffer: list[str] = []
+        size = 0
+        for line in file:
+            if remaining is not None:
+                if remaining <= 0:
+                    break
+                remaining -= len(line)
+            # 区间边界对齐到行首，按行解码不会切开多字节字符
+            text = line.decode("utf-8", errors="replace")
+            buffer.append(text)
+            size += len(text)
+            if size >= _TEXT_SECTION_CHARS:
+                yield "text", "".join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield "text", "".join(buffer)
+
+
+def warm_up() -> None:
+    """子进程初始化：提前导入切分器和解析库，避免首个单元承担导入耗时"""
+    import langchain_text_splitters  # noqa: F401
+    import openpyxl  # noqa: F401
+
+    try:
+        import pymupdf  # noqa: F401
+    except ImportError:
+        import pypdf  # noqa: F401
+
+
+@functools.lru_cache(maxsize=8)
+def _get_splitter(chunking: ChunkingConfig):
+    """每个子进程按配置缓存切分器"""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunking.chunk_size,
+        chunk_overlap=chunking.chunk_overlap,
+        separators=[*chunking.split_markers, ""],
+        keep_separator=chunking.keep_separator,
+        add_start_index=True,
+    )
+
+
+__all__ = [
+    "ChunkingConfig",
+    "ParseUnit",
+    "ParsedSection",
+    "SUPPORTED_TYPES",
+    "detect_file_type",
+    "iter_sections",
+    "parse_unit",
+    "plan_units",
+    "warm_up",
+]
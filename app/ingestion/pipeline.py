@@ -0,0 +1,639 @@
+"""流式文档入库管道
+
+解析 → 切分 → 去重 → 批量 Embedding → 批量写入，全程以生成器逐段推进，
+内存占用只与在途的解析单元数和一个写入批次有关，与文档大小无关。
+
+- 解析与切分在进程池中执行（CPU 密集），主进程按文档顺序消费结果，
+  同时最多 ``max_inflight_units`` 个单元在途
+- 去重：内容哈希识别完全重复，MinHash + LSH（见 ``dedupe``）识别近似重复，
+  范围为知识库或租户；重复分块照常写入但链接到规范分块，不再 Embedding；
+  规范分块随所在知识删除时，提升一个重复分块为新的规范分块
+- 每写入一批产出一次 ``IngestionProgress``（含去重率），可直接推送给前端
+
+使用示例:
+```python
+pipeline = get_ingestion_pipeline()
+async for progress in pipeline.ingest(knowledge):
+    print(progress.knowledge_id, progress.status, progress.chunks_stored)
+```
+"""
+
+import asyncio
+import hashlib
+import multiprocessing
+import os
+import re
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Callable, Sequence
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import AbstractAsyncContextManager
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import Any, Literal
+from uuid import uuid4
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import get_settings
+from app.infra.keyword_index import KeywordIndex
+from app.infra.vector_index import VectorIndex
+from app.ingestion.dedupe import MinHasher, NearDuplicateIndex
+from app.ingestion.parsers import (
+    ChunkingConfig,
+    ParsedSection,
+    ParseUnit,
+    detect_file_type,
+    parse_unit,
+    plan_units,
+    warm_up,
+)
+from app.models.knowledge import (
+    CHUNK_TYPE_DUPLICATE,
+    CHUNK_TYPE_TEXT,
+    PARSE_STATUS_COMPLETED,
+    PARSE_STATUS_FAILED,
+    PARSE_STATUS_PROCESSING,
+    Knowledge,
+)
+from app.observability.logging import get_logger
+from app.repositories.knowledge import ChunkRepository, KnowledgeRepository
+
+logger = get_logger(__name__)
+
+SessionFactory = Callable[[], AbstractAsyncContextManager[AsyncSession]]
+
+DedupeScope = Literal["knowledge_base", "tenant"]
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _default_session_factory() -> AbstractAsyncContextManager[AsyncSession]:
+    from app.infra.database import session_scope
+
+    return session_scope()
+
+
+def content_hash(text: str) -> str:
+    """分块内容哈希（忽略空白差异），对应 ``chunks.content_hash``"""
+    return hashlib.sha256(_WHITESPACE.sub(" ", text).strip().encode()).hexdigest()
+
+
+@dataclass
+class IngestionProgress:
+    """单个文档的入库进度"""
+
+    knowledge_id: str
+    status: str
+    units_total: int = 0
+    units_done: int = 0
+    chunks_parsed: int = 0
+    chunks_duplicate: int = 0
+    chunks_near_duplicate: int = 0
+    chunks_stored: int = 0
+    chunks_embedded: int = 0
+    error: str | None = None
+
+    @property
+    def dedupe_ratio(self) -> float:
+        """重复（完全 + 近似）分块占解析分块的比例"""
+        if not self.chunks_parsed:
+            return 0.0
+        return (self.chunks_duplicate + self.chunks_near_duplicate) / self.chunks_parsed
+
+    @property
+    def fraction(self) -> float:
+        """解析进度（0-1）"""
+        if self.status == PARSE_STATUS_COMPLETED:
+            return 1.0
+        return self.units_done / self.units_total if self.units_total else 0.0
+
+
+@dataclass
+class _Candidate:
+    """待写入的分块"""
+
+    content: str
+    start_at: int
+    content_hash: str
+    location: str
+    id: str = field(default_factory=lambda: str(uuid4()))
+    # 重复分块指向的规范分块
+    duplicate_of: str | None = None
+    similarity: float | None = None
+
+
+class IngestionPipeline:
+    """流式文档入库管道"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings | None = None,
+        *,
+        chunking: ChunkingConfig | None = None,
+        session_factory: SessionFactory | None = None,
+        executor: Executor | None = None,
+        pages_per_unit: int = 8,
+        embed_batch_size: int = 64,
+        max_inflight_units: int | None = None,
+        vector_index: VectorIndex | None = None,
+        keyword_index: KeywordIndex | None = None,
+        near_duplicate_threshold: float | None = 0.85,
+        dedupe_scope: DedupeScope = "knowledge_base",
+        hasher: MinHasher | None = None,
+        max_dedupe_scopes: int = 64,
+    ) -> None:
+        """初始化入库管道
+
+        Args:
+            embeddings: Embedding 模型，默认使用带缓存的批量管道
+            chunking: 切分配置
+            session_factory: 数据库会话工厂，默认 ``session_scope``
+            executor: 解析用的执行器，默认使用全局进程池
+            pages_per_unit: PDF 每个解析单元的页数
+            embed_batch_size: 每批 Embedding 与写入的分块数
+            max_inflight_units: 同时在途的解析单元数，默认进程数的两倍
+            vector_index: 写入后同步加入的向量索引
+            keyword_index: 写入后同步加入的关键词索引
+            near_duplicate_threshold: 近似重复的 Jaccard 阈值，为空时只做完全去重
+            dedupe_scope: 去重范围（知识库或整个租户）
+            hasher: MinHash 签名计算器
+            max_dedupe_scopes: 内存中保留的去重范围数（LRU）
+        """
+        self._embeddings = embeddings
+        self.chunking = chunking or ChunkingConfig()
+        self._session_factory = session_factory or _default_session_factory
+        self._executor = executor
+        self.pages_per_unit = pages_per_unit
+        self.embed_batch_size = embed_batch_size
+        self.max_inflight_units = max_inflight_units
+        self.vector_index = vector_index
+        self.keyword_index = keyword_index
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.dedupe_scope = dedupe_scope
+        self.hasher = hasher or MinHasher()
+        self.max_dedupe_scopes = max_dedupe_scopes
+        self._dedupe_indexes: OrderedDict[tuple[int, str | None], NearDuplicateIndex] = OrderedDict()
+        self._dedupe_locks: dict[tuple[int, str | None], asyncio.Lock] = {}
+
+    @property
+    def embeddings(self) -> Embeddings:
+        if self._embeddings is None:
+            from app.llm.embedding_cache import get_cached_embeddings
+
+            self._embeddings = get_cached_embeddings()
+        return self._embeddings
+
+    @property
+    def executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = get_parse_executor()
+        return self._executor
+
+    async def ingest(
+        self,
+        knowledge: Knowledge,
+        *,
+        path: str | None = None,
+        chunking: ChunkingConfig | None = None,
+    ) -> AsyncIterator[IngestionProgress]:
+        """入库单个文档
+
+        开始前删除该知识已有的分块及其索引条目（重新入库或上次中途失败留下的），
+        失败时同样清除本次已写入的批次，把知识标记为 ``failed`` 并产出失败进度，
+        不向外抛出异常。
+
+        Args:
+            knowledge: 知识记录（需已存在于数据库）
+            path: 文件路径，默认 ``knowledge.file_path``
+            chunking: 切分配置，默认使用管道配置
+
+        Yields:
+            每个解析单元完成、每批写入后的进度
+        """
+        progress = IngestionProgress(knowledge.id, PARSE_STATUS_PROCESSING)
+        writer: _ChunkWriter | None = None
+        try:
+            await self._update_status(knowledge.id, PARSE_STATUS_PROCESSING)
+            path = path or knowledge.file_path
+            if not path:
+                raise ValueError("知识缺少文件路径")
+            file_type = detect_file_type(path, knowledge.file_type)
+            await self._purge(knowledge)
+            units = await asyncio.to_thread(plan_units, path, file_type, self.pages_per_unit)
+            progress.units_total = len(units)
+            yield progress
+
+            near_duplicates = await self._near_duplicate_index(knowledge)
+            hasher = self.hasher if near_duplicates is not None else None
+            writer = _ChunkWriter(self, knowledge, progress, near_duplicates)
+            seen: dict[str, str] = {}
+            offset = 0
+            async for sections in self._parse(units, chunking or self.chunking, hasher):
+                for section in sections:
+                    for number, (start, text) in enumerate(section.chunks):
+                        progress.chunks_parsed += 1
+                        candidate = _Candidate(text, offset + start, content_hash(text), section.label)
+                        signature = None if section.signatures is None else section.signatures[number]
+                        if candidate.content_hash in seen:
+                            candidate.duplicate_of = seen[candidate.content_hash]
+                            candidate.similarity = 1.0
+                            progress.chunks_duplicate += 1
+                        elif signature is not None and (match := near_duplicates.query(signature)):
+                            candidate.duplicate_of, candidate.similarity = match
+                            progress.chunks_near_duplicate += 1
+                        else:
+                            seen[candidate.content_hash] = candidate.id
+                            writer.track(candidate.id, signature)
+                        writer.add(candidate)
+                    # 片段之间按一个换行符计入全文偏移
+                    offset += section.length + 1
+                    while writer.ready:
+                        await writer.flush()
+                        yield progress
+                progress.units_done += 1
+                yield progress
+
+            await writer.flush(final=True)
+            await self._update_status(knowledge.id, PARSE_STATUS_COMPLETED, processed=True)
+            progress.status = PARSE_STATUS_COMPLETED
+            logger.info(
+                "knowledge_ingested",
+                knowledge_id=knowledge.id,
+                units=progress.units_total,
+                chunks_parsed=progress.chunks_parsed,
+                chunks_duplicate=progress.chunks_duplicate,
+                chunks_near_duplicate=progress.chunks_near_duplicate,
+                chunks_stored=progress.chunks_stored,
+                chunks_embedded=progress.chunks_embedded,
+                dedupe_ratio=round(progress.dedupe_ratio, 4),
+            )
+        except Exception as e:
+            logger.exception("knowledge_ingest_failed", knowledge_id=knowledge.id)
+            if writer is not None:
+                writer.rollback()
+                try:
+                    await self._purge(knowledge)
+                except Exception as cleanup_error:
+                    # 下次入库开始前会再次清除
+                    logger.error(
+                        "knowledge_ingest_cleanup_failed",
+                        knowledge_id=knowledge.id,
+                        error=str(cleanup_error),
+                    )
+            progress.status = PARSE_STATUS_FAILED
+            progress.error = str(e)
+            try:
+                await self._update_status(knowledge.id, PARSE_STATUS_FAILED, error_message=str(e))
+            except Exception as status_error:
+                # 数据库不可用时知识停留在 processing，由调用方依据失败进度重试
+                logger.error(
+                    "knowledge_status_update_failed",
+                    knowledge_id=knowledge.id,
+                    error=str(status_error),
+                )
+        yield progress
+
+    async def ingest_many(
+        self,
+        knowledges: Sequence[Knowledge],
+        *,
+        concurrency: int = 2,
+    ) -> AsyncIterator[IngestionProgress]:
+        """并发入库多个文档，合并各文档的进度流
+
+        Args:
+            knowledges: 知识记录
+            concurrency: 同时处理的文档数
+
+        Yields:
+            各文档的进度（按发生顺序交错）；结束时记录整个任务的去重率
+        """
+        queue: asyncio.Queue[IngestionProgress | None] = asyncio.Queue()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(knowledge: Knowledge) -> None:
+            try:
+                async with semaphore:
+                    async for progress in self.ingest(knowledge):
+                        await queue.put(progress)
+            finally:
+                await queue.put(None)
+
+        tasks = [asyncio.create_task(run(knowledge)) for knowledge in knowledges]
+        latest: dict[str, IngestionProgress] = {}
+        try:
+            remaining = len(tasks)
+            while remaining:
+                progress = await queue.get()
+                if progress is None:
+                    remaining -= 1
+                else:
+                    latest[progress.knowledge_id] = progress
+                    yield progress
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        parsed = sum(p.chunks_parsed for p in latest.values())
+        duplicates = sum(p.chunks_duplicate + p.chunks_near_duplicate for p in latest.values())
+        logger.info(
+            "ingestion_job_completed",
+            documents=len(latest),
+            failed=sum(p.status == PARSE_STATUS_FAILED for p in latest.values()),
+            chunks_parsed=parsed,
+            chunks_duplicate=duplicates,
+            chunks_embedded=sum(p.chunks_embedded for p in latest.values()),
+            dedupe_ratio=round(duplicates / parsed, 4) if parsed else 0.0,
+        )
+
+    async def _parse(
+        self, units: Sequence[ParseUnit], chunking: ChunkingConfig, hasher: MinHasher | None
+    ) -> AsyncIterator[list[ParsedSection]]:
+        """在进程池中解析，保持文档顺序并限制在途单元数"""
+        loop = asyncio.get_running_loop()
+        limit = self.max_inflight_units or 2 * _executor_workers(self.executor)
+        pending: deque[asyncio.Future[list[ParsedSection]]] = deque()
+        units_iter = iter(units)
+        try:
+            while True:
+                while len(pending) < limit and (unit := next(units_iter, None)) is not None:
+                    pending.append(
+                        loop.run_in_executor(self.executor, parse_unit, unit, chunking, hasher)
+                    )
+                if not pending:
+                    return
+                yield await pending.popleft()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def _near_duplicate_index(self, knowledge: Knowledge) -> NearDuplicateIndex | None:
+        """获取去重范围的近似重复索引，首次使用时从已入库的规范分块构建"""
+        if self.near_duplicate_threshold is None:
+            return None
+        kb_id = knowledge.knowledge_base_id if self.dedupe_scope == "knowledge_base" else None
+        key = (knowledge.tenant_id, kb_id)
+        lock = self._dedupe_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            index = self._dedupe_indexes.get(key)
+            if index is not None:
+                self._dedupe_indexes.move_to_end(key)
+                return index
+
+            index = NearDuplicateIndex(self.near_duplicate_threshold, self.hasher.num_perm)
+            loop = asyncio.get_running_loop()
+            async with self._session_factory() as session:
+                async for batch in ChunkRepository(session).iter_canonical(kb_id, knowledge.tenant_id):
+                    signatures = await loop.run_in_executor(
+                        self.executor, self.hasher.signatures, [content for _, content in batch]
+                    )
+                    for (chunk_id, _), signature in zip(batch, signatures, strict=True):
+                        index.add(chunk_id, signature)
+            logger.info(
+                "near_duplicate_index_built",
+                tenant_id=knowledge.tenant_id,
+                knowledge_base_id=kb_id,
+                chunks=len(index),
+            )
+
+            self._dedupe_indexes[key] = index
+            while len(self._dedupe_indexes) > self.max_dedupe_scopes:
+                evicted, _ = self._dedupe_indexes.popitem(last=False)
+                self._dedupe_locks.pop(evicted, None)
+            return index
+
+    async def _purge(self, knowledge: Knowledge) -> int:
+        """删除知识已写入的分块，并从检索索引和近似重复索引中移除
+
+        其他知识中指向被删除规范分块的重复分块，每组提升一个为规范分块
+        （Embedding 并加入索引），其余改为指向它。
+
+        Returns:
+            删除的分块数
+        """
+        async with self._session_factory() as session:
+            chunks = ChunkRepository(session)
+            ids = await chunks.delete_by_knowledge(knowledge.id)
+            promoted = await chunks.promote_duplicates(knowledge.tenant_id, ids) if ids else []
+            promoted_ids = [chunk.id for chunk in promoted]
+            contents = [chunk.content for chunk in promoted]
+            # Embedding 失败时整体回滚，规范分块不会在没有替代者的情况下被删除
+            vectors = await self.embeddings.aembed_documents(contents) if promoted else []
+            await session.commit()
+        if not ids:
+            return 0
+
+        if self.vector_index is not None:
+            self.vector_index.delete(ids)
+            if promoted:
+                self.vector_index.add(promoted_ids, vectors, tenant_id=knowledge.tenant_id)
+        if self.keyword_index is not None:
+            self.keyword_index.delete(ids)
+            if promoted:
+                self.keyword_index.add(promoted_ids, contents, tenant_id=knowledge.tenant_id)
+        kb_id = knowledge.knowledge_base_id if self.dedupe_scope == "knowledge_base" else None
+        near_duplicates = self._dedupe_indexes.get((knowledge.tenant_id, kb_id))
+        if near_duplicates is not None:
+            for chunk_id in ids:
+                near_duplicates.discard(chunk_id)
+            if promoted:
+                signatures = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.hasher.signatures, contents
+                )
+                for chunk_id, signature in zip(promoted_ids, signatures, strict=True):
+                    near_duplicates.add(chunk_id, signature)
+        logger.info(
+            "knowledge_chunks_purged",
+            knowledge_id=knowledge.id,
+            chunks=len(ids),
+            promoted=len(promoted),
+        )
+        return len(ids)
+
+    async def _update_status(self, knowledge_id: str, status: str, **kwargs: Any) -> None:
+        async with self._session_factory() as session:
+            await KnowledgeRepository(session).update_status(knowledge_id, status, **kwargs)
+            await session.commit()
+
+
+class _ChunkWriter:
+    """按批 Embedding 并写入分块
+
+    重复分块照常写入以保持文档顺序，但不 Embedding、不加入检索索引。
+    每批保留最后一个分块到下一批，以便填写 ``next_chunk_id``。
+    """
+
+    def __init__(
+        self,
+        pipeline: IngestionPipeline,
+        knowledge: Knowledge,
+        progress: IngestionProgress,
+        near_duplicates: NearDuplicateIndex | None,
+    ) -> None:
+        self._pipeline = pipeline
+        self._knowledge = knowledge
+        self._progress = progress
+        self._near_duplicates = near_duplicates
+        self._candidates: list[_Candidate] = []
+        self._held: dict[str, Any] | None = None
+        self._index = 0
+        # 本次加入近似重复索引的分块，失败时移除
+        self._tracked: list[str] = []
+        # 写入前发现已存在于数据库的规范分块 -> 数据库中的分块
+        self._remap: dict[str, str] = {}
+
+    @property
+    def ready(self) -> bool:
+        return len(self._candidates) >= self._pipeline.embed_batch_size
+
+    def add(self, candidate: _Candidate) -> None:
+        self._candidates.append(candidate)
+
+    def track(self, chunk_id: str, signature: np.ndarray | None) -> None:
+        """把新的规范分块加入近似重复索引"""
+        if self._near_duplicates is not None and signature is not None:
+            self._near_duplicates.add(chunk_id, signature)
+            self._tracked.append(chunk_id)
+
+    def rollback(self) -> None:
+        """入库失败时移除本次加入索引的分块"""
+        if self._near_duplicates is not None:
+            for chunk_id in self._tracked:
+                self._near_duplicates.discard(chunk_id)
+        self._tracked.clear()
+
+    async def flush(self, *, final: bool = False) -> None:
+        pipeline = self._pipeline
+        knowledge = self._knowledge
+        batch = self._candidates[: pipeline.embed_batch_size]
+        del self._candidates[: len(batch)]
+
+        async with pipeline._session_factory() as session:
+            chunks = ChunkRepository(session)
+            # 近似重复索引只覆盖内存中的范围，写入前再按内容哈希核对数据库
+            existing = await chunks.existing_hashes(
+                knowledge.knowledge_base_id if pipeline.dedupe_scope == "knowledge_base" else None,
+                knowledge.tenant_id,
+                (c.content_hash for c in batch if c.duplicate_of is None),
+            )
+            for candidate in batch:
+                if candidate.duplicate_of is None and candidate.content_hash in existing:
+                    self._remap[candidate.id] = existing[candidate.content_hash]
+                    if self._near_duplicates is not None:
+                        self._near_duplicates.discard(candidate.id)
+                    candidate.duplicate_of = existing[candidate.content_hash]
+                    candidate.similarity = 1.0
+                    self._progress.chunks_duplicate += 1
+
+            rows = [self._held] if self._held else []
+            rows.extend(self._row(candidate) for candidate in batch)
+            for previous, current in zip(rows, rows[1:], strict=False):
+                previous["next_chunk_id"] = current["id"]
+                current["pre_chunk_id"] = previous["id"]
+            self._held = None if final or not rows else rows.pop()
+            if not rows:
+                return
+
+            canonical = [row for row in rows if row["chunk_type"] != CHUNK_TYPE_DUPLICATE]
+            contents = [row["content"] for row in canonical]
+            vectors = await pipeline.embeddings.aembed_documents(contents) if canonical else []
+            await chunks.bulk_insert(rows)
+            await session.commit()
+
+        ids = [row["id"] for row in canonical]
+        if ids and pipeline.vector_index is not None:
+            pipeline.vector_index.add(ids, vectors, tenant_id=knowledge.tenant_id)
+        if ids and pipeline.keyword_index is not None:
+            pipeline.keyword_index.add(ids, contents, tenant_id=knowledge.tenant_id)
+        self._progress.chunks_stored += len(rows)
+        self._progress.chunks_embedded += len(canonical)
+
+    def _row(self, candidate: _Candidate) -> dict[str, Any]:
+        knowledge = self._knowledge
+        now = datetime.now(UTC)
+        meta: dict[str, Any] = {"location": candidate.location}
+        if candidate.duplicate_of is not None:
+            meta["duplicate_of"] = self._remap.get(candidate.duplicate_of, candidate.duplicate_of)
+            meta["similarity"] = round(candidate.similarity or 1.0, 4)
+        row = {
+            "id": candidate.id,
+            "tenant_id": knowledge.tenant_id,
+            "knowledge_base_id": knowledge.knowledge_base_id,
+            "knowledge_id": knowledge.id,
+            "content": candidate.content,
+            "chunk_index": self._index,
+            "start_at": candidate.start_at,
+            "end_at": candidate.start_at + len(candidate.content),
+            "pre_chunk_id": None,
+            "next_chunk_id": None,
+            "chunk_type": CHUNK_TYPE_TEXT if candidate.duplicate_of is None else CHUNK_TYPE_DUPLICATE,
+            "tag_id": knowledge.tag_id,
+            "content_hash": candidate.content_hash,
+            "meta": meta,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self._index += 1
+        return row
+
+
+# ============== 进程池 ==============
+
+_parse_executor: ProcessPoolExecutor | None = None
+
+
+def _executor_workers(executor: Executor) -> int:
+    return getattr(executor, "_max_workers", None) or os.cpu_count() or 1
+
+
+def get_parse_executor() -> ProcessPoolExecutor:
+    """获取全局解析进程池
+
+    使用 spawn 启动子进程，避免 fork 带着事件循环和连接池的状态。
+    """
+    global _parse_executor
+    if _parse_executor is None:
+        settings = get_settings()
+        _parse_executor = ProcessPoolExecutor(
+            max_workers=settings.ingestion_parse_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=warm_up,
+        )
+    return _parse_executor
+
+
+def shutdown_parse_executor() -> None:
+    """关闭全局解析进程池"""
+    global _parse_executor
+    if _parse_executor is not None:
+        _parse_executor.shutdown(wait=False, cancel_futures=True)
+        _parse_executor = None
+
+
+_pipeline: IngestionPipeline | None = None
+
+
+def get_ingestion_pipeline() -> IngestionPipeline:
+    """获取全局入库管道"""
+    global _pipeline
+    if _pipeline is None:
+        settings = get_settings()
+        _pipeline = IngestionPipeline(
+            pages_per_unit=settings.ingestion_pages_per_unit,
+            embed_batch_size=settings.ingestion_embed_batch_size,
+            near_duplicate_threshold=settings.ingestion_near_duplicate_threshold,
+            dedupe_scope=settings.ingestion_dedupe_scope,
+        )
+    return _pipeline
+
+
+__all__ = [
+    "IngestionPipeline",
+    "IngestionProgress",
+    "content_hash",
+    "get_ingestion_pipeline",
+    "get_parse_executor",
+    "shutdown_parse_executor",
+]
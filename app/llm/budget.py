@@ -0,0 +1,602 @@
+"""预算预检与执行
+
+每次模型调用之前按 ``prompt tokens + max_tokens`` 估算成本并预留预算，模型输出以
+``max_tokens`` 封顶。提示词 token 数为字符数估算，不是精确上界：实际花费按用量如实
+入账，超出预留的部分计入已花费，使之后的预留更早被拒绝。
+
+- 租户与 API Key 两级预算，检查与预留在同一把锁内完成
+- ``BudgetCallback`` 在每次模型调用开始时按完整提示词（对话历史、系统提示词、工具定义）
+  预留，ReAct Agent 一个请求内的多次模型调用各自预留，预算不足时中止调用
+- 实际花费由用量回调（见 ``app/llm/usage.py``）入账：事件对应某个预留（预留 ID 或模型调用的
+  run_id）时，入账与扣减预留在同一把锁内完成；剩余预留排在用量记录器队列中本请求的
+  事件之后释放，事件被丢弃时也会释放
+- 预算使用率超过阈值时自动降级到更便宜的已注册模型
+
+使用示例:
+```python
+budget = get_budget_manager()
+admitted = budget.admit("qwen-max", prompt_tokens=800, tenant_id=1)
+llm = get_llm_service().get_model(model_name=admitted.model, max_tokens=admitted.max_tokens)
+callback = BudgetCallback(budget, tenant_id=1)
+try:
+    await agent.ainvoke(inputs, config={"callbacks": [callback, get_usage_callback()]})
+finally:
+    callback.close()
+```
+"""
+
+import json
+import threading
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
+from uuid import UUID, uuid4
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from app.config.settings import get_settings
+from app.llm.cost_tracker import PricingTable, get_pricing_table
+from app.llm.tokens import count_prompt_tokens
+from app.llm.usage import UsageEvent, UsageRecorder, get_usage_recorder
+from app.observability.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class BudgetExceededError(Exception):
+    """预算不足"""
+
+    def __init__(self, scope: str, limit: float, used: float, requested: float) -> None:
+        self.scope = scope
+        self.limit = limit
+        self.used = used
+        self.requested = requested
+        super().__init__(
+            f"预算不足: {scope} 已用 {used:.6f} / {limit:.6f} 美元，本次预估 {requested:.6f} 美元"
+        )
+
+
+@dataclass
+class BudgetReservation:
+    """预算预留"""
+
+    id: str
+    model: str
+    amount: float
+    tenant_id: int | None = None
+    api_key_id: str | None = None
+    requested_model: str | None = None
+    max_tokens: int | None = None
+    # 按模型调用预留时对应的 run_id，该调用的用量事件入账后即释放
+    run_id: str | None = None
+    # 已由用量事件结算（从预留转为花费）的金额
+    settled: float = 0.0
+    released: bool = False
+
+    @property
+    def downgraded(self) -> bool:
+        """是否发生了模型降级"""
+        return self.requested_model is not None and self.requested_model != self.model
+
+    @property
+    def held(self) -> float:
+        """尚未结算的预留金额"""
+        return max(self.amount - self.settled, 0.0)
+
+    @property
+    def metadata(self) -> dict[str, Any]:
+        """用于 RunnableConfig.metadata 的用量归属信息"""
+        return {
+            "tenant_id": self.tenant_id,
+            "api_key_id": self.api_key_id,
+            "budget_reservation_id": self.id,
+        }
+
+
+@dataclass
+class _ScopeBudget:
+    limit: float | None = None
+    spent: float = 0.0
+    reserved: float = 0.0
+
+    @property
+    def used(self) -> float:
+        return self.spent + self.reserved
+
+
+@dataclass
+class BudgetStatus:
+    """预算使用情况"""
+
+    limit: float | None
+    spent: float
+    reserved: float
+    remaining: float | None = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.remaining = None if self.limit is None else self.limit - self.spent - self.reserved
+
+
+class BudgetManager:
+    """预算管理器
+
+    维护租户与 API Key 的预算额度、已花费和在途预留。
+    """
+
+    def __init__(
+        self,
+        *,
+        pricing: PricingTable | None = None,
+        default_tenant_budget: float | None = None,
+        default_api_key_budget: float | None = None,
+        downgrade_threshold: float = 0.8,
+        candidate_models: Callable[[], list[str]] | None = None,
+        recorder: UsageRecorder | None = None,
+    ) -> None:
+        """初始化预算管理器
+
+        Args:
+            pricing: 定价表，默认使用全局定价表
+            default_tenant_budget: 未单独设置时的租户预算（美元）
+            default_api_key_budget: 未单独设置时的 API Key 预算（美元）
+            downgrade_threshold: 预留后使用率超过该比例时尝试降级
+            candidate_models: 返回可降级模型名称列表的函数，默认读取 LLMRegistry
+            recorder: 把实际花费回调给 ``on_usage`` 的用量记录器，为空时 ``finish`` 立即释放
+        """
+        self.pricing = pricing or get_pricing_table()
+        self.default_tenant_budget = default_tenant_budget
+        self.default_api_key_budget = default_api_key_budget
+        self.downgrade_threshold = downgrade_threshold
+        self._candidate_models = candidate_models or _registered_models
+        self._recorder = recorder
+        self._scopes: dict[str, _ScopeBudget] = {}
+        self._reservations: dict[str, BudgetReservation] = {}
+        self._runs: dict[str, BudgetReservation] = {}
+        self._lock = threading.Lock()
+
+    # ============== 额度配置 ==============
+
+    def set_tenant_budget(self, tenant_id: int, limit: float | None) -> None:
+        """设置租户预算（美元），None 表示不限制"""
+        with self._lock:
+            self._scope(f"tenant:{tenant_id}").limit = limit
+
+    def set_api_key_budget(self, api_key_id: str, limit: float | None) -> None:
+        """设置 API Key 预算（美元），None 表示不限制"""
+        with self._lock:
+            self._scope(f"api_key:{api_key_id}").limit = limit
+
+    def get_status(
+        self,
+        *,
+        tenant_id: int | None = None,
+        api_key_id: str | None = None,
+    ) -> BudgetStatus:
+        """获取租户或 API Key 的预算使用情况"""
+        key = f"tenant:{tenant_id}" if tenant_id is not None else f"api_key:{api_key_id}"
+        with self._lock:
+            scope = self._scope(key)
+            return BudgetStatus(limit=scope.limit, spent=scope.spent, reserved=scope.reserved)
+
+    # ============== 预估与预留 ==============
+
+    def estimate_cost(self, model: str, prompt_tokens: int, max_tokens: int) -> float:
+        """估算一次调用的最坏成本（输出打满 max_tokens）"""
+        return self.pricing.get(model).cost(prompt_tokens, max_tokens)
+
+    def reserve(
+        self,
+        model: str,
+        *,
+        prompt_tokens: int,
+        max_tokens: int | None = None,
+        tenant_id: int | None = None,
+        api_key_id: str | None = None,
+        allow_downgrade: bool = True,
+    ) -> BudgetReservation:
+        """预留预算
+
+        Args:
+            model: 请求的模型
+            prompt_tokens: 提示词 token 数
+            max_tokens: 最大输出 token 数，默认取配置 llm_max_tokens
+            tenant_id: 租户 ID
+            api_key_id: API Key ID
+            allow_downgrade: 是否允许降级到更便宜的模型
+
+        Returns:
+            预算预留（model 为实际应使用的模型，调用时须以 max_tokens 封顶输出）
+
+        Raises:
+            BudgetExceededError: 任何一级预算都无法容纳本次调用
+        """
+        if max_tokens is None:
+            max_tokens = get_settings().llm_max_tokens
+        amount = self.estimate_cost(model, prompt_tokens, max_tokens)
+
+        # 快路径：未接近额度时直接预留
+        reservation = self._try_reserve(model, amount, [], tenant_id, api_key_id)
+
+        if reservation is None:
+            # 接近额度：在锁外准备降级候选（避免持锁访问注册表），再重新检查并预留
+            candidates = []
+            if allow_downgrade:
+                candidates = self._cheaper_models(model, prompt_tokens, max_tokens)
+            reservation = self._try_reserve(
+                model, amount, candidates, tenant_id, api_key_id, final=True
+            )
+        reservation.max_tokens = max_tokens
+
+        if reservation.downgraded:
+            logger.info(
+                "budget_model_downgraded",
+                tenant_id=tenant_id,
+                requested_model=model,
+                model=reservation.model,
+            )
+        return reservation
+
+    def admit(
+        self,
+        model: str,
+        *,
+        prompt_tokens: int,
+        max_tokens: int | None = None,
+        tenant_id: int | None = None,
+        api_key_id: str | None = None,
+    ) -> BudgetReservation:
+        """请求准入检查：预留后立即释放，不占用额度
+
+        用于在开始处理请求前决定模型（含降级）并尽早拒绝；实际额度由每次模型调用
+        各自预留（见 ``BudgetCallback``）。
+
+        Returns:
+            已释放的预留，``model`` / ``max_tokens`` 为应使用的模型与输出上限
+
+        Raises:
+            BudgetExceededError: 预算不足
+        """
+        reservation = self.reserve(
+            model,
+            prompt_tokens=prompt_tokens,
+            max_tokens=max_tokens,
+            tenant_id=tenant_id,
+            api_key_id=api_key_id,
+        )
+        self.release(reservation)
+        return reservation
+
+    def bind_run(self, run_id: str, reservation: BudgetReservation) -> None:
+        """把预留关联到一次模型调用，该调用的用量事件入账时结算并释放"""
+        with self._lock:
+            if not reservation.released:
+                reservation.run_id = run_id
+                self._runs[run_id] = reservation
+
+    def release(self, reservation: BudgetReservation) -> None:
+        """立即释放尚未结算的预留（幂等）"""
+        with self._lock:
+            self._release(reservation)
+
+    def finish(self, reservation: BudgetReservation) -> None:
+        """请求结束：本请求已提交的用量事件入账后释放剩余预留
+
+        剩余预留排在用量记录器队列中本请求的事件之后释放，在此之前仍占用额度；
+        未挂载用量记录器或队列已满时立即释放。
+        """
+        recorder = self._recorder
+        if recorder is None or not recorder.defer(lambda: self.release(reservation)):
+            self.release(reservation)
+
+    def commit(
+        self,
+        cost: float,
+        *,
+        tenant_id: int | None = None,
+        api_key_id: str | None = None,
+    ) -> None:
+        """记入实际花费"""
+        with self._lock:
+            for _, scope in self._scopes_for(tenant_id, api_key_id):
+                scope.spent += cost
+
+    def settle(self, reservation: BudgetReservation, actual_cost: float) -> None:
+        """按实际花费结算并释放预留（不经过用量回调时使用）"""
+        with self._lock:
+            self._settle(reservation, actual_cost)
+            self._release(reservation)
+
+    def on_usage(self, event: UsageEvent, cost: float) -> None:
+        """用量回调：记入实际花费，事件对应某个预留时同时扣减该预留
+
+        按模型调用的预留（``bind_run``）在入账后立即释放剩余部分。
+        """
+        metadata = event.metadata or {}
+        with self._lock:
+            reservation = self._runs.get(event.run_id or "")
+            if reservation is not None:
+                self._settle(reservation, cost)
+                self._release(reservation)
+                return
+            reservation = self._reservations.get(metadata.get("budget_reservation_id") or "")
+            if reservation is not None:
+                self._settle(reservation, cost)
+                return
+            for _, scope in self._scopes_for(event.tenant_id, metadata.get("api_key_id")):
+                scope.spent += cost
+
+    @asynccontextmanager
+    async def guard(
+        self,
+        model: str,
+        *,
+        prompt_tokens: int,
+        max_tokens: int | None = None,
+        tenant_id: int | None = None,
+        api_key_id: str | None = None,
+        allow_downgrade: bool = True,
+    ) -> AsyncIterator[BudgetReservation]:
+        """预留预算并在退出时结束预留（见 ``finish``）
+
+        实际花费由用量回调异步入账，调用方需把 ``reservation.metadata``
+        放入 RunnableConfig.metadata，并以 ``reservation.max_tokens`` 封顶输出。
+        """
+        reservation = self.reserve(
+            model,
+            prompt_tokens=prompt_tokens,
+            max_tokens=max_tokens,
+            tenant_id=tenant_id,
+            api_key_id=api_key_id,
+            allow_downgrade=allow_downgrade,
+        )
+        try:
+            yield reservation
+        finally:
+            self.finish(reservation)
+
+    # ============== 内部方法 ==============
+
+    def _settle(self, reservation: BudgetReservation, cost: float) -> None:
+        """记入花费并扣减等额预留（须持有锁）"""
+        held = 0.0 if reservation.released else min(cost, reservation.held)
+        reservation.settled += held
+        for _, scope in self._scopes_for(reservation.tenant_id, reservation.api_key_id):
+            scope.spent += cost
+            scope.reserved = max(scope.reserved - held, 0.0)
+
+    def _release(self, reservation: BudgetReservation) -> None:
+        """释放剩余预留（须持有锁）"""
+        if reservation.released:
+            return
+        reservation.released = True
+        self._reservations.pop(reservation.id, None)
+        if reservation.run_id is not None:
+            self._runs.pop(reservation.run_id, None)
+        for _, scope in self._scopes_for(reservation.tenant_id, reservation.api_key_id):
+            scope.reserved = max(scope.reserved - reservation.held, 0.0)
+
+    def _try_reserve(
+        self,
+        model: str,
+        amount: float,
+        candidates: list[tuple[str, float]],
+        tenant_id: int | None,
+        api_key_id: str | None,
+        *,
+        final: bool = False,
+    ) -> BudgetReservation | None:
+        """在锁内检查额度并预留；非 final 且接近额度时返回 None"""
+        with self._lock:
+            scopes = self._scopes_for(tenant_id, api_key_id)
+            chosen = model
+
+            if not self._fits(scopes, amount, self.downgrade_threshold):
+                if not final:
+                    return None
+                fallback = next(
+                    ((name, cost) for name, cost in candidates if self._fits(scopes, cost)),
+                    None,
+                )
+                if fallback is not None:
+                    chosen, amount = fallback
+                else:
+                    self._ensure_fits(scopes, amount)
+
+            for _, scope in scopes:
+                scope.reserved += amount
+
+            reservation = BudgetReservation(
+                id=str(uuid4()),
+                model=chosen,
+                amount=amount,
+                tenant_id=tenant_id,
+                api_key_id=api_key_id,
+                requested_model=model,
+            )
+            self._reservations[reservation.id] = reservation
+            return reservation
+
+    def _scope(self, key: str) -> _ScopeBudget:
+        scope = self._scopes.get(key)
+        if scope is None:
+            if key.startswith("tenant:"):
+                limit = self.default_tenant_budget
+            else:
+                limit = self.default_api_key_budget
+            scope = self._scopes[key] = _ScopeBudget(limit=limit)
+        return scope
+
+    def _scopes_for(
+        self,
+        tenant_id: int | None,
+        api_key_id: str | None,
+    ) -> list[tuple[str, _ScopeBudget]]:
+        keys = []
+        if tenant_id is not None:
+            keys.append(f"tenant:{tenant_id}")
+        if api_key_id is not None:
+            keys.append(f"api_key:{api_key_id}")
+        return [(key, self._scope(key)) for key in keys]
+
+    @staticmethod
+    def _fits(scopes: list[tuple[str, _ScopeBudget]], amount: float, ratio: float = 1.0) -> bool:
+        return all(
+            scope.limit is None or scope.used + amount <= scope.limit * ratio for _, scope in scopes
+        )
+
+    @staticmethod
+    def _ensure_fits(scopes: list[tuple[str, _ScopeBudget]], amount: float) -> None:
+        for key, scope in scopes:
+            if scope.limit is not None and scope.used + amount > scope.limit:
+                raise BudgetExceededError(key, scope.limit, scope.used, amount)
+
+    def _cheaper_models(
+        self,
+        model: str,
+        prompt_tokens: int,
+        max_tokens: int,
+    ) -> list[tuple[str, float]]:
+        """按预估成本降序返回比 model 更便宜、且有显式定价的已注册模型"""
+        baseline = self.estimate_cost(model, prompt_tokens, max_tokens)
+        candidates = []
+        for name in self._candidate_models():
+            if name == model or not self.pricing.is_registered(name):
+                continue
+            cost = self.estimate_cost(name, prompt_tokens, max_tokens)
+            if cost < baseline:
+                candidates.append((name, cost))
+        candidates.sort(key=lambda item: item[1], reverse=True)
+        return candidates
+
+
+class BudgetCallback(BaseCallbackHandler):
+    """按模型调用预留预算的回调（每个请求一个实例）
+
+    模型调用开始时按完整提示词、工具定义和调用参数中的 ``max_tokens`` 预留，预算不足时
+    抛出 ``BudgetExceededError`` 中止调用；用量事件按 run_id 结算并释放预留，调用出错时
+    立即释放。请求结束后调用 ``close`` 释放用量事件未送达的剩余预留。
+    """
+
+    # 预算不足须中止模型调用，不能像普通回调那样只记录日志
+    raise_error = True
+    run_inline = True
+
+    def __init__(
+        self,
+        manager: BudgetManager,
+        *,
+        tenant_id: int | None = None,
+        api_key_id: str | None = None,
+    ) -> None:
+        """初始化回调
+
+        Args:
+            manager: 预算管理器
+            tenant_id: 租户 ID
+            api_key_id: API Key ID
+        """
+        self._manager = manager
+        self._tenant_id = tenant_id
+        self._api_key_id = api_key_id
+        self._reservations: dict[UUID, BudgetReservation] = {}
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[Any]],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._reserve(run_id, messages, metadata, kwargs.get("invocation_params"))
+
+    def on_llm_start(
+        self,
+        serialized: dict[str, Any],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._reserve(run_id, prompts, metadata, kwargs.get("invocation_params"))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        reservation = self._reservations.pop(run_id, None)
+        if reservation is not None:
+            self._manager.release(reservation)
+
+    def close(self) -> None:
+        """请求结束：释放剩余预留（排在已提交的用量事件之后）"""
+        for reservation in self._reservations.values():
+            self._manager.finish(reservation)
+        self._reservations.clear()
+
+    def _reserve(
+        self,
+        run_id: UUID,
+        prompt: Any,
+        metadata: dict[str, Any] | None,
+        invocation_params: dict[str, Any] | None,
+    ) -> None:
+        params = invocation_params or {}
+        model = (
+            (metadata or {}).get("ls_model_name")
+            or params.get("model")
+            or params.get("model_name")
+            or get_settings().llm_model
+        )
+        prompt_tokens = count_prompt_tokens(prompt)
+        if params.get("tools"):
+            prompt_tokens += count_prompt_tokens(json.dumps(params["tools"], ensure_ascii=False))
+        max_tokens = params.get("max_tokens") or params.get("max_completion_tokens")
+        # 模型已确定，调用中途不再降级
+        reservation = self._manager.reserve(
+            model,
+            prompt_tokens=prompt_tokens,
+            max_tokens=max_tokens,
+            tenant_id=self._tenant_id,
+            api_key_id=self._api_key_id,
+            allow_downgrade=False,
+        )
+        self._manager.bind_run(str(run_id), reservation)
+        self._reservations[run_id] = reservation
+
+
+def _registered_models() -> list[str]:
+    """LLMRegistry 中已注册的模型"""
+    from app.llm.registry import LLMRegistry
+
+    return LLMRegistry.list_models()
+
+
+# 全局预算管理器
+_budget_manager: BudgetManager | None = None
+
+
+def get_budget_manager() -> BudgetManager:
+    """获取全局预算管理器（首次创建时挂载到用量记录器）"""
+    global _budget_manager
+    if _budget_manager is None:
+        settings = get_settings()
+        recorder = get_usage_recorder()
+        _budget_manager = BudgetManager(
+            default_tenant_budget=settings.tenant_budget,
+            default_api_key_budget=settings.api_key_budget,
+            downgrade_threshold=settings.budget_downgrade_threshold,
+            recorder=recorder,
+        )
+        recorder.add_handler(_budget_manager.on_usage)
+    return _budget_manager
+
+
+__all__ = [
+    "BudgetCallback",
+    "BudgetExceededError",
+    "BudgetReservation",
+    "BudgetStatus",
+    "BudgetManager",
+    "get_budget_manager",
+]
@@ -1,53 +1,460 @@
-"""成本追踪模块（简化版）"""
+"""成本追踪模块
 
-from dataclasses import dataclass
-from typing import Optional
+提供按模型定价的成本计算，以及按模型、租户、时间桶维护的流式聚合。
+
+- 定价表支持精确匹配和前缀匹配（如 ``gpt-4o-2024-08-06`` 命中 ``gpt-4o``）
+- 聚合在写入时增量更新，``get_summary`` / ``check_budget`` 为 O(1)
+- 原始记录日志可选且有界（``record_log_size``）
+"""
+
+import time
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from threading import Lock, RLock
+
+# 定价单位：美元 / 百万 tokens
+_TOKENS_PER_UNIT = 1_000_000
+
+
+@dataclass(frozen=True)
+class ModelPricing:
+    """模型定价（美元 / 百万 tokens）
+
+    Attributes:
+        input_price: 输入 token 单价
+        output_price: 输出 token 单价
+        cached_input_price: 命中缓存的输入 token 单价，为空时按 input_price 计费
+    """
+
+    input_price: float
+    output_price: float
+    cached_input_price: float | None = None
+
+    def cost(self, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+        """计算一次调用的成本
+
+        Args:
+            input_tokens: 输入 token 数（包含缓存命中部分）
+            output_tokens: 输出 token 数
+            cached_tokens: 缓存命中的输入 token 数
+
+        Returns:
+            成本（美元）
+        """
+        cached = min(max(cached_tokens, 0), input_tokens)
+        cached_price = (
+            self.input_price if self.cached_input_price is None else self.cached_input_price
+        )
+        return (
+            (input_tokens - cached) * self.input_price
+            + cached * cached_price
+            + output_tokens * self.output_price
+        ) / _TOKENS_PER_UNIT
+
+
+# 未注册模型的兜底定价（与旧版硬编码单价一致）
+DEFAULT_PRICING = ModelPricing(input_price=10.0, output_price=30.0)
+
+# 内置定价（公开牌价，可通过 register_model_pricing 覆盖）
+DEFAULT_MODEL_PRICING: dict[str, ModelPricing] = {
+    # OpenAI
+    "gpt-4o": ModelPricing(2.50, 10.00, 1.25),
+    "gpt-4o-mini": ModelPricing(0.15, 0.60, 0.075),
+    "gpt-3.5-turbo": ModelPricing(0.50, 1.50),
+    # Anthropic
+    "claude-opus-4": ModelPricing(15.00, 75.00, 1.50),
+    "claude-sonnet-4": ModelPricing(3.00, 15.00, 0.30),
+    "claude-haiku-4": ModelPricing(0.80, 4.00, 0.08),
+    # DeepSeek
+    "deepseek-chat": ModelPricing(0.27, 1.10, 0.07),
+    "deepseek-reasoner": ModelPricing(0.55, 2.19, 0.14),
+    # DashScope (Qwen)
+    "qwen-max": ModelPricing(1.60, 6.40),
+    "qwen-plus": ModelPricing(0.40, 1.20),
+    "qwen-turbo": ModelPricing(0.05, 0.20),
+    "qwen-long": ModelPricing(0.07, 0.28),
+}
+
+
+class PricingTable:
+    """模型定价表
+
+    线程安全，解析结果按模型名缓存，注册新定价时失效。
+    """
+
+    def __init__(self, pricing: dict[str, ModelPricing] | None = None) -> None:
+        self._pricing: dict[str, ModelPricing] = dict(
+            DEFAULT_MODEL_PRICING if pricing is None else pricing
+        )
+        self._resolved: dict[str, ModelPricing] = {}
+        self._lock = RLock()
+
+    def register(
+        self,
+        model: str,
+        input_price: float,
+        output_price: float,
+        cached_input_price: float | None = None,
+    ) -> None:
+        """注册模型定价
+
+        Args:
+            model: 模型名称或名称前缀
+            input_price: 输入单价（美元 / 百万 tokens）
+            output_price: 输出单价（美元 / 百万 tokens）
+            cached_input_price: 缓存输入单价（美元 / 百万 tokens）
+        """
+        with self._lock:
+            self._pricing[model] = ModelPricing(input_price, output_price, cached_input_price)
+            self._resolved.clear()
+
+    def get(self, model: str) -> ModelPricing:
+        """获取模型定价
+
+        先精确匹配，再按最长前缀匹配，均未命中时返回 DEFAULT_PRICING。
+
+        Args:
+            model: 模型名称
+
+        Returns:
+            模型定价
+        """
+        pricing = self._resolved.get(model)
+        if pricing is not None:
+            return pricing
+
+        with self._lock:
+            pricing = self._pricing.get(model)
+            if pricing is None:
+                prefixes = [name for name in self._pricing if model.startswith(name)]
+                pricing = self._pricing[max(prefixes, key=len)] if prefixes else DEFAULT_PRICING
+            self._resolved[model] = pricing
+            return pricing
+
+    def is_registered(self, model: str) -> bool:
+        """模型是否有显式定价（含前缀匹配）"""
+        return self.get(model) is not DEFAULT_PRICING
+
+    def list_models(self) -> list[str]:
+        """列出已注册定价的模型名称"""
+        with self._lock:
+            return list(self._pricing)
 
 
 @dataclass
 class CostRecord:
     """成本记录"""
+
     model: str
     input_tokens: int
     output_tokens: int
     cost: float
+    cached_tokens: int = 0
+    tenant_id: int | None = None
+    latency_ms: float = 0.0
+    timestamp: float = field(default_factory=time.time)
 
 
 @dataclass
 class CostSummary:
     """成本汇总"""
+
     total_cost: float
     total_input_tokens: int
     total_output_tokens: int
     request_count: int
+    total_cached_tokens: int = 0
+    total_latency_ms: float = 0.0
+
+
+@dataclass
+class UsageAggregate:
+    """用量聚合（增量维护）"""
+
+    cost: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    request_count: int = 0
+    latency_ms: float = 0.0
+
+    def add(self, record: CostRecord) -> None:
+        """累加一条记录"""
+        self.cost += record.cost
+        self.input_tokens += record.input_tokens
+        self.output_tokens += record.output_tokens
+        self.cached_tokens += record.cached_tokens
+        self.request_count += 1
+        self.latency_ms += record.latency_ms
+
+    def to_summary(self) -> CostSummary:
+        """转换为汇总"""
+        return CostSummary(
+            total_cost=self.cost,
+            total_input_tokens=self.input_tokens,
+            total_output_tokens=self.output_tokens,
+            request_count=self.request_count,
+            total_cached_tokens=self.cached_tokens,
+            total_latency_ms=self.latency_ms,
+        )
 
 
 class CostTracker:
-    """成本追踪器（简化版）"""
+    """成本追踪器
+
+    写入时更新总量、按模型、按租户和按时间桶的聚合，查询不扫描记录。
+    """
 
-    def __init__(self, budget: Optional[float] = None) -> None:
+    def __init__(
+        self,
+        budget: float | None = None,
+        *,
+        pricing: PricingTable | None = None,
+        record_log_size: int = 0,
+        bucket_seconds: int = 60,
+        max_buckets: int = 1440,
+    ) -> None:
+        """初始化成本追踪器
+
+        Args:
+            budget: 总预算（美元）
+            pricing: 定价表，默认使用全局定价表
+            record_log_size: 原始记录日志容量，0 表示不保留原始记录
+            bucket_seconds: 时间桶宽度（秒）
+            max_buckets: 保留的时间桶数量上限
+        """
         self.budget = budget
-        self._records: list[CostRecord] = []
+        self.pricing = pricing or get_pricing_table()
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+
+        self._records: deque[CostRecord] | None = (
+            deque(maxlen=record_log_size) if record_log_size > 0 else None
+        )
+        self._total = UsageAggregate()
+        self._by_model: dict[str, UsageAggregate] = {}
+        self._by_tenant: dict[int | None, UsageAggregate] = {}
+        self._buckets: dict[int, UsageAggregate] = {}
+        self._listeners: list[Callable[[CostRecord], None]] = []
+        self._lock = Lock()
+
+    def track(
+        self,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        *,
+        cached_tokens: int = 0,
+        tenant_id: int | None = None,
+        latency_ms: float = 0.0,
+    ) -> float:
+        """追踪一次 LLM 调用成本
+
+        Args:
+            model: 模型名称
+            input_tokens: 输入 token 数（包含缓存命中部分）
+            output_tokens: 输出 token 数
+            cached_tokens: 缓存命中的输入 token 数
+            tenant_id: 租户 ID
+            latency_ms: 调用耗时（毫秒）
 
-    def track(self, model: str, input_tokens: int, output_tokens: int) -> float:
-        """追踪一次 LLM 调用成本"""
-        cost = (input_tokens * 0.00001 + output_tokens * 0.00003)
-        self._records.append(CostRecord(model, input_tokens, output_tokens, cost))
+        Returns:
+            本次调用成本（美元）
+        """
+        cost = self.pricing.get(model).cost(input_tokens, output_tokens, cached_tokens)
+        self.record(
+            model,
+            input_tokens,
+            output_tokens,
+            cost,
+            cached_tokens=cached_tokens,
+            tenant_id=tenant_id,
+            latency_ms=latency_ms,
+        )
         return cost
 
-    def get_summary(self) -> CostSummary:
-        """获取成本汇总"""
-        total = sum(r.cost for r in self._records)
-        return CostSummary(
-            total_cost=total,
-            total_input_tokens=sum(r.input_tokens for r in self._records),
-            total_output_tokens=sum(r.output_tokens for r in self._records),
-            request_count=len(self._records),
+    def record(
+        self,
+        model: str,
+        input_tokens: int,
+        output_tokens: int,
+        cost: float,
+        *,
+        cached_tokens: int = 0,
+        tenant_id: int | None = None,
+        latency_ms: float = 0.0,
+        timestamp: float | None = None,
+    ) -> CostRecord:
+        """记录一次已知成本的调用
+
+        Args:
+            model: 模型名称
+            input_tokens: 输入 token 数
+            output_tokens: 输出 token 数
+            cost: 成本（美元）
+            cached_tokens: 缓存命中的输入 token 数
+            tenant_id: 租户 ID
+            latency_ms: 调用耗时（毫秒）
+            timestamp: 调用时间戳，默认当前时间
+
+        Returns:
+            成本记录
+        """
+        record = CostRecord(
+            model=model,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            cost=cost,
+            cached_tokens=cached_tokens,
+            tenant_id=tenant_id,
+            latency_ms=latency_ms,
+            timestamp=time.time() if timestamp is None else timestamp,
         )
+        bucket = int(record.timestamp // self.bucket_seconds) * self.bucket_seconds
+
+        with self._lock:
+            self._total.add(record)
+            self._aggregate(self._by_model, model).add(record)
+            self._aggregate(self._by_tenant, tenant_id).add(record)
+
+            bucket_aggregate = self._buckets.get(bucket)
+            if bucket_aggregate is None:
+                bucket_aggregate = self._buckets[bucket] = UsageAggregate()
+                # 按时间淘汰最早的时间桶（迟到的记录可能创建比已有桶更早的桶）
+                while len(self._buckets) > self.max_buckets:
+                    del self._buckets[min(self._buckets)]
+            bucket_aggregate.add(record)
+
+            if self._records is not None:
+                self._records.append(record)
+            listeners = self._listeners
+
+        for listener in listeners:
+            listener(record)
+        return record
+
+    @staticmethod
+    def _aggregate[K](index: dict[K, UsageAggregate], key: K) -> UsageAggregate:
+        aggregate = index.get(key)
+        if aggregate is None:
+            aggregate = index[key] = UsageAggregate()
+        return aggregate
+
+    def add_listener(self, listener: Callable[[CostRecord], None]) -> None:
+        """注册记录监听器，每条记录写入聚合后回调 ``listener(record)``"""
+        with self._lock:
+            self._listeners = [*self._listeners, listener]
+
+    def remove_listener(self, listener: Callable[[CostRecord], None]) -> None:
+        """移除记录监听器"""
+        with self._lock:
+            self._listeners = [item for item in self._listeners if item is not listener]
+
+    def get_summary(
+        self,
+        *,
+        model: str | None = None,
+        tenant_id: int | None = None,
+    ) -> CostSummary:
+        """获取成本汇总
+
+        Args:
+            model: 按模型过滤
+            tenant_id: 按租户过滤（不能与 model 同时使用）
+
+        Returns:
+            成本汇总
+        """
+        if model is not None and tenant_id is not None:
+            raise ValueError("model 与 tenant_id 不能同时指定")
 
+        with self._lock:
+            if model is not None:
+                aggregate = self._by_model.get(model) or UsageAggregate()
+            elif tenant_id is not None:
+                aggregate = self._by_tenant.get(tenant_id) or UsageAggregate()
+            else:
+                aggregate = self._total
+            return aggregate.to_summary()
+
+    def get_model_summaries(self) -> dict[str, CostSummary]:
+        """获取按模型的成本汇总"""
+        with self._lock:
+            return {name: agg.to_summary() for name, agg in self._by_model.items()}
+
+    def get_tenant_summaries(self) -> dict[int | None, CostSummary]:
+        """获取按租户的成本汇总"""
+        with self._lock:
+            return {tid: agg.to_summary() for tid, agg in self._by_tenant.items()}
+
+    def get_time_series(self, since: float | None = None) -> list[tuple[int, CostSummary]]:
+        """获取按时间桶的成本汇总
+
+        Args:
+            since: 起始时间戳（包含），默认返回全部保留的时间桶
+
+        Returns:
+            (时间桶起始时间戳, 汇总) 列表，按时间升序
+        """
+        with self._lock:
+            series = [
+                (bucket, agg.to_summary())
+                for bucket, agg in self._buckets.items()
+                if since is None or bucket + self.bucket_seconds > since
+            ]
+        series.sort(key=lambda item: item[0])
+        return series
+
+    def get_records(self) -> list[CostRecord]:
+        """获取保留的原始记录（未开启记录日志时为空）"""
+        with self._lock:
+            return list(self._records) if self._records is not None else []
+
+    def check_budget(
+        self,
+        budget: float | None = None,
+        *,
+        tenant_id: int | None = None,
+    ) -> bool:
+        """检查是否仍在预算内
+
+        Args:
+            budget: 预算（美元），默认使用实例预算
+            tenant_id: 按租户检查
+
+        Returns:
+            是否未超出预算；未设置预算时返回 True
+        """
+        budget = self.budget if budget is None else budget
+        if budget is None:
+            return True
+        return self.get_summary(tenant_id=tenant_id).total_cost < budget
+
+    def reset(self) -> None:
+        """清空所有聚合和记录"""
+        with self._lock:
+            self._total = UsageAggregate()
+            self._by_model.clear()
+            self._by_tenant.clear()
+            self._buckets.clear()
+            if self._records is not None:
+                self._records.clear()
+
+
+# 全局定价表
+_pricing_table: PricingTable | None = None
 
 # 全局成本追踪器
-_cost_tracker: Optional[CostTracker] = None
+_cost_tracker: CostTracker | None = None
+
+
+def get_pricing_table() -> PricingTable:
+    """获取全局定价表"""
+    global _pricing_table
+    if _pricing_table is None:
+        _pricing_table = PricingTable()
+    return _pricing_table
 
 
 def get_cost_tracker() -> CostTracker:
@@ -64,9 +471,24 @@ def set_cost_tracker(tracker: CostTracker) -> None:
     _cost_tracker = tracker
 
 
-def track_llm_call(model: str, input_tokens: int, output_tokens: int) -> float:
+def track_llm_call(
+    model: str,
+    input_tokens: int,
+    output_tokens: int,
+    *,
+    cached_tokens: int = 0,
+    tenant_id: int | None = None,
+    latency_ms: float = 0.0,
+) -> float:
     """追踪 LLM 调用"""
-    return get_cost_tracker().track(model, input_tokens, output_tokens)
+    return get_cost_tracker().track(
+        model,
+        input_tokens,
+        output_tokens,
+        cached_tokens=cached_tokens,
+        tenant_id=tenant_id,
+        latency_ms=latency_ms,
+    )
 
 
 def record_llm_usage(
@@ -74,26 +496,41 @@ def record_llm_usage(
     input_tokens: int,
     output_tokens: int,
     cost: float,
+    *,
+    cached_tokens: int = 0,
+    tenant_id: int | None = None,
 ) -> None:
-    """记录 LLM 使用情况"""
-    pass  # 简化实现
+    """记录已知成本的 LLM 使用情况"""
+    get_cost_tracker().record(
+        model,
+        input_tokens,
+        output_tokens,
+        cost,
+        cached_tokens=cached_tokens,
+        tenant_id=tenant_id,
+    )
 
 
-def get_cost_summary() -> CostSummary:
+def get_cost_summary(tenant_id: int | None = None) -> CostSummary:
     """获取成本汇总"""
-    return get_cost_tracker().get_summary()
+    return get_cost_tracker().get_summary(tenant_id=tenant_id)
 
 
-def get_model_pricing(model: str) -> dict:
+def get_model_pricing(model: str) -> ModelPricing:
     """获取模型定价"""
-    return {"input_price": 0.00001, "output_price": 0.00003}
+    return get_pricing_table().get(model)
 
 
-def register_model_pricing(model: str, input_price: float, output_price: float) -> None:
-    """注册模型定价"""
-    pass
+def register_model_pricing(
+    model: str,
+    input_price: float,
+    output_price: float,
+    cached_input_price: float | None = None,
+) -> None:
+    """注册模型定价（美元 / 百万 tokens）"""
+    get_pricing_table().register(model, input_price, output_price, cached_input_price)
 
 
-def check_budget(budget: float) -> bool:
+def check_budget(budget: float, tenant_id: int | None = None) -> bool:
     """检查预算"""
-    return get_cost_summary().total_cost < budget
+    return get_cost_tracker().check_budget(budget, tenant_id=tenant_id)
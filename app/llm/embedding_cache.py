@@ -0,0 +1,403 @@
+"""内容寻址的 Embedding 缓存
+
+键为 ``sha256(provider, model, dimensions, text)``，同一文本在不同文档、租户、
+重复查询之间只向量化一次。
+
+- 内存：OrderedDict LRU
+- 磁盘：按维度和精度分文件的 ``np.memmap`` 向量数组 + 追加写的键索引文件，
+  进程重启后直接映射复用，无需加载全部向量
+
+使用示例:
+```python
+embeddings = get_cached_embeddings("dashscope")
+vectors = await embeddings.aembed_documents(chunks)  # 只有未命中的文本会发给提供商
+```
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Any, Literal
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.config.settings import get_settings
+from app.llm.embedding_pipeline import get_embedding_pipeline
+from app.observability.logging import get_logger
+
+logger = get_logger(__name__)
+
+_KEY_SIZE = hashlib.sha256().digest_size
+
+
+def embedding_cache_key(
+    provider: str, model: str, dimensions: int | None, text: str
+) -> bytes:
+    """计算缓存键"""
+    digest = hashlib.sha256()
+    for part in (provider, model, str(dimensions or ""), text):
+        raw = part.encode("utf-8")
+        digest.update(len(raw).to_bytes(8, "little"))
+        digest.update(raw)
+    return digest.digest()
+
+
+class EmbeddingStore:
+    """磁盘向量存储
+
+    ``vectors.bin`` 为 (capacity, dims) 的内存映射数组，容量不足时翻倍扩展；
+    ``keys.idx`` 依次追加 32 字节键，第 i 个键对应第 i 行向量；
+    ``meta.json`` 记录维度和精度。
+    先写向量再追加键，中途崩溃只会留下无键的行，不会读到半写的向量。
+
+    多个进程可共用同一目录：写入时持有 ``keys.idx`` 的排他文件锁，先读入其他进程
+    追加的键再分配行号；读取未命中时也会读入其他进程新追加的键。
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        dimensions: int | None = None,
+        dtype: Literal["float32", "float16"] = "float32",
+        initial_capacity: int = 1024,
+    ) -> None:
+        """打开（或创建）磁盘向量存储
+
+        Args:
+            path: 存储目录
+            dimensions: 向量维度，为空时从已有存储的 meta.json 读取
+            dtype: 存储精度
+            initial_capacity: 初始行数
+
+        Raises:
+            FileNotFoundError: 未指定维度且存储不存在
+            ValueError: 维度或精度与已有存储不一致
+        """
+        self.path = Path(path)
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text())
+            if dimensions not in (None, meta["dimensions"]) or meta["dtype"] != dtype:
+                raise ValueError(f"Embedding 存储参数不一致: {meta_path}")
+            dimensions = meta["dimensions"]
+        elif dimensions is None:
+            raise FileNotFoundError(meta_path)
+        else:
+            self.path.mkdir(parents=True, exist_ok=True)
+            meta_path.write_text(json.dumps({"dimensions": dimensions, "dtype": dtype}))
+
+        self.dimensions = dimensions
+        self.dtype = np.dtype(dtype)
+        self._vectors_path = self.path / "vectors.bin"
+        self._keys_path = self.path / "keys.idx"
+        self._lock = threading.Lock()
+
+        self._index: dict[bytes, int] = {}
+        if self._keys_path.exists():
+            raw = self._keys_path.read_bytes()
+            usable = len(raw) - len(raw) % _KEY_SIZE
+            for row, offset in enumerate(range(0, usable, _KEY_SIZE)):
+                self._index[raw[offset : offset + _KEY_SIZE]] = row
+            self._count = usable // _KEY_SIZE
+        else:
+            self._count = 0
+
+        row_bytes = dimensions * self.dtype.itemsize
+        existing_rows = (
+            self._vectors_path.stat().st_size // row_bytes if self._vectors_path.exists() else 0
+        )
+        self._capacity = max(initial_capacity, existing_rows, self._count)
+        self._vectors = self._map(self._capacity)
+        self._keys_file = open(self._keys_path, "ab")  # noqa: SIM115
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self._index
+
+    def get(self, key: bytes) -> np.ndarray | None:
+        """读取向量，未命中返回 None"""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Sequence[bytes]) -> dict[bytes, np.ndarray]:
+        """批量读取向量"""
+        if any(key not in self._index for key in keys):
+            with self._lock:
+                self._refresh()
+        found = [(key, self._index[key]) for key in keys if key in self._index]
+        if not found:
+            return {}
+        rows = self._vectors[[row for _, row in found]].astype(np.float32)
+        return {key: rows[i] for i, (key, _) in enumerate(found)}
+
+    def put_many(self, items: Sequence[tuple[bytes, Sequence[float]]]) -> None:
+        """批量写入向量，已存在的键跳过"""
+        with self._lock:
+            fcntl.flock(self._keys_file, fcntl.LOCK_EX)
+            try:
+                self._refresh()
+                new = [(key, vector) for key, vector in items if key not in self._index]
+                if not new:
+                    return
+                # 丢弃崩溃留下的半个键，保证追加的键与行号对齐
+                os.ftruncate(self._keys_file.fileno(), self._count * _KEY_SIZE)
+                self._ensure_capacity(self._count + len(new))
+                start = self._count
+                self._vectors[start : start + len(new)] = np.asarray(
+                    [vector for _, vector in new], dtype=self.dtype
+                )
+                self._vectors.flush()
+                self._keys_file.write(b"".join(key for key, _ in new))
+                self._keys_file.flush()
+                for offset, (key, _) in enumerate(new):
+                    self._index[key] = start + offset
+                self._count += len(new)
+            finally:
+                fcntl.flock(self._keys_file, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        """刷盘并关闭文件"""
+        with self._lock:
+            self._vectors.flush()
+            self._keys_file.close()
+
+    def _refresh(self) -> None:
+        """读入其他进程追加的键（须持有 ``_lock``）"""
+        size = os.fstat(self._keys_file.fileno()).st_size
+        usable = size - size % _KEY_SIZE
+        offset = self._count * _KEY_SIZE
+        if usable <= offset:
+            return
+        with open(self._keys_path, "rb") as f:
+            f.seek(offset)
+            raw = f.read(usable - offset)
+        for row, start in enumerate(range(0, len(raw), _KEY_SIZE), self._count):
+            self._index[raw[start : start + _KEY_SIZE]] = row
+        self._count += len(raw) // _KEY_SIZE
+        self._ensure_capacity(self._count)
+
+    def _map(self, capacity: int) -> np.memmap:
+        mode = "r+" if self._vectors_path.exists() else "w+"
+        size = capacity * self.dimensions * self.dtype.itemsize
+        if mode == "r+" and self._vectors_path.stat().st_size < size:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(size)
+        return np.memmap(
+            self._vectors_path, dtype=self.dtype, mode=mode, shape=(capacity, self.dimensions)
+        )
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < rows:
+            capacity *= 2
+        self._vectors.flush()
+        self._vectors = self._map(capacity)
+        self._capacity = capacity
+
+
+class CachedEmbeddings(Embeddings):
+    """带缓存的 Embedding
+
+    包装任意 LangChain ``Embeddings``，命中的文本直接返回缓存，
+    未命中的文本（调用内去重后）一次性发给底层客户端。
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        *,
+        provider: str,
+        model: str,
+        dimensions: int | None = None,
+        store_dir: str | Path | None = None,
+        memory_size: int = 10000,
+        dtype: Literal["float32", "float16"] = "float32",
+    ) -> None:
+        """初始化带缓存的 Embedding
+
+        Args:
+            embeddings: 底层 Embedding 客户端
+            provider: 提供商名称（参与缓存键）
+            model: 模型名称（参与缓存键）
+            dimensions: 向量维度（参与缓存键）
+            store_dir: 磁盘缓存目录，为空时只使用内存缓存
+            memory_size: 内存 LRU 容量（条）
+            dtype: 磁盘存储精度，float16 占用减半
+        """
+        self.embeddings = embeddings
+        self.provider = provider
+        self.model = model
+        self.dimensions = dimensions
+        self.store_dir = Path(store_dir) if store_dir else None
+        self.memory_size = memory_size
+        self.dtype = dtype
+
+        self._memory: OrderedDict[bytes, list[float]] = OrderedDict()
+        self._store: EmbeddingStore | None = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, found, missing = self._lookup(texts)
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            self._fill(found, missing, vectors)
+        return [found[key] for key in keys]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys, found, missing = self._lookup(texts)
+        if missing:
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            self._fill(found, missing, vectors)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> list[float]:
+        keys, found, missing = self._lookup([text])
+        if missing:
+            self._fill(found, missing, [self.embeddings.embed_query(text)])
+        return found[keys[0]]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        keys, found, missing = self._lookup([text])
+        if missing:
+            self._fill(found, missing, [await self.embeddings.aembed_query(text)])
+        return found[keys[0]]
+
+    def close(self) -> None:
+        """关闭磁盘存储"""
+        if self._store is not None:
+            self._store.close()
+
+    def _lookup(
+        self, texts: Sequence[str]
+    ) -> tuple[list[bytes], dict[bytes, list[float]], dict[bytes, str]]:
+        """查询内存和磁盘缓存
+
+        Returns:
+            (每个输入的键, 命中的键 -> 向量, 未命中的键 -> 文本)
+        """
+        keys = [
+            embedding_cache_key(self.provider, self.model, self.dimensions, text)
+            for text in texts
+        ]
+        unique = dict(zip(keys, texts, strict=True))
+
+        found: dict[bytes, list[float]] = {}
+        with self._lock:
+            for key in unique:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+
+        absent = [key for key in unique if key not in found]
+        store = self._get_store() if absent else None
+        if store is not None:
+            loaded = {key: vector.tolist() for key, vector in store.get_many(absent).items()}
+            if loaded:
+                found.update(loaded)
+                self._remember(loaded)
+
+        missing = {key: text for key, text in unique.items() if key not in found}
+        self.misses += len(missing)
+        self.hits += len(texts) - len(missing)
+        return keys, found, missing
+
+    def _fill(
+        self,
+        found: dict[bytes, list[float]],
+        missing: dict[bytes, str],
+        vectors: list[list[float]],
+    ) -> None:
+        if len(vectors) != len(missing):
+            raise ValueError(
+                f"Embedding 返回数量不匹配: 期望 {len(missing)}，实际 {len(vectors)}"
+            )
+        entries = dict(zip(missing, vectors, strict=True))
+        found.update(entries)
+        self._remember(entries)
+        store = self._get_store(len(vectors[0]))
+        if store is not None:
+            store.put_many(list(entries.items()))
+
+    def _remember(self, entries: dict[bytes, list[float]]) -> None:
+        with self._lock:
+            for key, vector in entries.items():
+                self._memory[key] = vector
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _get_store(self, dimensions: int | None = None) -> EmbeddingStore | None:
+        """打开磁盘存储，维度未知且存储尚不存在时返回 None"""
+        if self.store_dir is None:
+            return None
+        if self._store is None:
+            name = f"{self.provider}-{self.model}-{self.dimensions or 'default'}-{self.dtype}"
+            path = self.store_dir / re.sub(r"[^\w.-]+", "_", name)
+            with self._lock:
+                if self._store is None:
+                    try:
+                        self._store = EmbeddingStore(path, dimensions, self.dtype)
+                    except FileNotFoundError:
+                        return None
+                    logger.info(
+                        "embedding_cache_store_opened",
+                        path=str(self._store.path),
+                        entries=len(self._store),
+                    )
+        return self._store
+
+
+def get_cached_embeddings(
+    provider: Literal["openai", "dashscope"] | None = None,
+    model: str | None = None,
+    dimensions: int | None = None,
+    **kwargs: Any,
+) -> CachedEmbeddings:
+    """获取带缓存的批量 Embedding
+
+    缓存在前，未命中的文本交给批量管道按提供商限制分批发送。
+
+    Args:
+        provider: 提供商名称，默认从配置读取
+        model: 模型名称
+        dimensions: 向量维度
+        **kwargs: 传给 ``CachedEmbeddings`` 的参数
+
+    Returns:
+        CachedEmbeddings 实例
+    """
+    settings = get_settings()
+    provider = provider or settings.embedding_provider
+    pipeline = get_embedding_pipeline(provider, model=model, dimensions=dimensions)
+    client = pipeline.embeddings
+    kwargs.setdefault("store_dir", settings.embedding_cache_dir)
+    kwargs.setdefault("memory_size", settings.embedding_cache_memory_size)
+    kwargs.setdefault("dtype", settings.embedding_cache_dtype)
+    return CachedEmbeddings(
+        pipeline,
+        provider=provider,
+        model=getattr(client, "model", None) or model or "",
+        dimensions=getattr(client, "dimensions", None) or dimensions,
+        **kwargs,
+    )
+
+
+__all__ = [
+    "CachedEmbeddings",
+    "EmbeddingStore",
+    "embedding_cache_key",
+    "get_cached_embeddings",
+]
@@ -0,0 +1,239 @@
+"""批量 Embedding 管道
+
+按提供商的批处理限制（行数、总 token 数）打包输入，并发发送各批次，
+失败的批次单独重试，结果按输入顺序返回。重试只在批次层进行，
+``get_embedding_pipeline`` 创建的底层客户端关闭了自身的重试。
+
+使用示例:
+```python
+embeddings = get_embedding_pipeline("dashscope")
+vectors = await embeddings.aembed_documents(chunks)  # 自动按 10 行一批发送
+```
+"""
+
+import asyncio
+import time
+from collections.abc import Callable, Sequence
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Literal
+
+from langchain_core.embeddings import Embeddings
+
+from app.config.settings import get_settings
+from app.llm.embeddings import get_embeddings
+from app.llm.tokens import count_prompt_tokens
+from app.observability.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class BatchLimits:
+    """单次请求的批处理限制"""
+
+    max_rows: int
+    max_tokens: int
+
+
+# 各提供商的单次请求限制
+PROVIDER_BATCH_LIMITS: dict[str, BatchLimits] = {
+    # text-embedding-v4: 最大 10 行，单行最大 8,192 token
+    "dashscope": BatchLimits(max_rows=10, max_tokens=10 * 8192),
+    # OpenAI: 最多 2048 条输入，单次请求合计最多 300,000 token
+    "openai": BatchLimits(max_rows=2048, max_tokens=300_000),
+}
+
+
+def pack_batches(
+    texts: Sequence[str],
+    limits: BatchLimits,
+    count_tokens: Callable[[str], int] = count_prompt_tokens,
+) -> list[list[int]]:
+    """按行数和 token 数把输入打包成批次
+
+    保持输入顺序，超过单批 token 上限的文本单独成批（由提供商截断或报错）。
+
+    Args:
+        texts: 输入文本
+        limits: 批处理限制
+        count_tokens: token 计数函数
+
+    Returns:
+        每个批次包含的输入下标
+    """
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+    for index, text in enumerate(texts):
+        tokens = count_tokens(text)
+        if current and (
+            len(current) >= limits.max_rows or current_tokens + tokens > limits.max_tokens
+        ):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+class BatchedEmbeddings(Embeddings):
+    """批量 Embedding
+
+    包装任意 LangChain ``Embeddings``，``embed_documents`` 拆批并发调用底层客户端。
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        limits: BatchLimits,
+        *,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        count_tokens: Callable[[str], int] = count_prompt_tokens,
+    ) -> None:
+        """初始化批量 Embedding
+
+        Args:
+            embeddings: 底层 Embedding 客户端
+            limits: 批处理限制
+            max_concurrency: 最大并发批次数
+            max_retries: 单个批次的最大重试次数
+            retry_backoff: 重试退避基数（秒），按 2 的幂增长
+            count_tokens: token 计数函数
+        """
+        # 底层客户端自身也会分块（如 OpenAIEmbeddings.chunk_size），批次不能超过它
+        chunk_size = getattr(embeddings, "chunk_size", None)
+        if isinstance(chunk_size, int) and 0 < chunk_size < limits.max_rows:
+            limits = BatchLimits(max_rows=chunk_size, max_tokens=limits.max_tokens)
+
+        self.embeddings = embeddings
+        self.limits = limits
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._count_tokens = count_tokens
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """批量向量化文档（线程池并发）"""
+        batches = pack_batches(texts, self.limits, self._count_tokens)
+        if len(batches) <= 1:
+            return self._embed_batch_sync(texts, batches[0]) if batches else []
+
+        results: list[list[float]] = [[] for _ in texts]
+        with ThreadPoolExecutor(
+            max_workers=min(self.max_concurrency, len(batches)),
+            thread_name_prefix="embedding-batch",
+        ) as executor:
+            futures = [
+                (batch, executor.submit(self._embed_batch_sync, texts, batch))
+                for batch in batches
+            ]
+            for batch, future in futures:
+                for index, vector in zip(batch, future.result(), strict=True):
+                    results[index] = vector
+        return results
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """批量向量化文档（协程并发）"""
+        batches = pack_batches(texts, self.limits, self._count_tokens)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(batch: list[int]) -> list[list[float]]:
+            async with semaphore:
+                return await self._embed_batch(texts, batch)
+
+        vectors = await asyncio.gather(*(run(batch) for batch in batches))
+
+        results: list[list[float]] = [[] for _ in texts]
+        for batch, batch_vectors in zip(batches, vectors, strict=True):
+            for index, vector in zip(batch, batch_vectors, strict=True):
+                results[index] = vector
+        return results
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embeddings.embed_query(text)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await self.embeddings.aembed_query(text)
+
+    async def _embed_batch(self, texts: Sequence[str], batch: list[int]) -> list[list[float]]:
+        inputs = [texts[index] for index in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._check(inputs, await self.embeddings.aembed_documents(inputs))
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self._retry_delay(attempt, batch, e))
+        raise AssertionError("unreachable")
+
+    def _embed_batch_sync(self, texts: Sequence[str], batch: list[int]) -> list[list[float]]:
+        inputs = [texts[index] for index in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._check(inputs, self.embeddings.embed_documents(inputs))
+            except Exception as e:
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(self._retry_delay(attempt, batch, e))
+        raise AssertionError("unreachable")
+
+    def _retry_delay(self, attempt: int, batch: list[int], error: Exception) -> float:
+        delay = self.retry_backoff * (2**attempt)
+        logger.warning(
+            "embedding_batch_retry",
+            attempt=attempt + 1,
+            rows=len(batch),
+            first_index=batch[0],
+            delay=delay,
+            error=str(error),
+        )
+        return delay
+
+    @staticmethod
+    def _check(inputs: list[str], vectors: list[list[float]]) -> list[list[float]]:
+        if len(vectors) != len(inputs):
+            raise ValueError(f"Embedding 返回数量不匹配: 期望 {len(inputs)}，实际 {len(vectors)}")
+        return vectors
+
+
+def get_embedding_pipeline(
+    provider: Literal["openai", "dashscope"] | None = None,
+    model: str | None = None,
+    dimensions: int | None = None,
+    **kwargs: Any,
+) -> BatchedEmbeddings:
+    """获取批量 Embedding 管道
+
+    Args:
+        provider: 提供商名称，默认从配置读取
+        model: 模型名称
+        dimensions: 向量维度
+        **kwargs: 传给 ``BatchedEmbeddings`` 的参数
+
+    Returns:
+        BatchedEmbeddings 实例
+    """
+    settings = get_settings()
+    provider = provider or settings.embedding_provider
+    kwargs.setdefault("max_concurrency", settings.embedding_max_concurrency)
+    kwargs.setdefault("max_retries", settings.embedding_max_retries)
+    # 重试由批次层负责，客户端再重试会让单个批次最多尝试 (n+1)*(m+1) 次
+    return BatchedEmbeddings(
+        get_embeddings(provider, model=model, dimensions=dimensions, max_retries=0),
+        PROVIDER_BATCH_LIMITS[provider],
+        **kwargs,
+    )
+
+
+__all__ = [
+    "BatchLimits",
+    "BatchedEmbeddings",
+    "PROVIDER_BATCH_LIMITS",
+    "get_embedding_pipeline",
+    "pack_batches",
+]
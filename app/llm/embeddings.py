@@ -97,6 +97,7 @@ def get_embeddings(
     provider: Literal["openai", "dashscope", "voyage", "ollama"] | None = None,
     model: str | None = None,
     dimensions: int | None = None,
+    max_retries: int | None = None,
 ) -> OpenAIEmbeddings:
     """获取 Embeddings 实例
 
@@ -104,6 +105,7 @@ def get_embeddings(
         provider: 提供商名称，默认从配置读取
         model: 模型名称
         dimensions: 向量维度（仅部分提供商支持）
+        max_retries: 客户端自身的重试次数，默认使用客户端的默认值
 
     Returns:
         Embeddings 实例
@@ -111,11 +113,13 @@ def get_embeddings(
     # 从配置获取默认提供商
     if provider is None:
         provider = getattr(settings, "embedding_provider", "openai")
+    client_kwargs = {} if max_retries is None else {"max_retries": max_retries}
 
     if provider == "dashscope":
         return DashScopeEmbeddings(
             model=model or "text-embedding-v4",
             dimensions=dimensions or getattr(settings, "embedding_dimensions", 1024),
+            **client_kwargs,
         )
 
     # OpenAI 兼容的提供商
@@ -128,6 +132,7 @@ def get_embeddings(
             api_key=api_key,
             base_url=base_url,
             dimensions=dimensions,
+            **client_kwargs,
         )
 
     raise ValueError(f"Unsupported embedding provider: {provider}")
@@ -9,6 +9,7 @@ from langchain_core.language_models.chat_models import BaseChatModel
 from langchain_openai import ChatOpenAI
 
 from app.config.settings import get_settings
+from app.llm.usage import get_usage_callback, with_usage_tracking
 from app.observability.logging import get_logger
 
 logger = get_logger(__name__)
@@ -47,7 +48,7 @@ class LLMRegistry:
         """
         cls._models[name] = {
             "name": name,
-            "llm": llm,
+            "llm": with_usage_tracking(llm),
             "description": description,
         }
         logger.info("llm_registered", model_name=name)
@@ -87,12 +88,16 @@ class LLMRegistry:
                         model=name,
                         api_key=api_key,
                         base_url=base_url,
+                        stream_usage=True,
+                        callbacks=[get_usage_callback()],
                         **kwargs,
                     )
                 return ChatOpenAI(
                     model=name,
                     api_key=settings.llm_api_key,
                     base_url=settings.llm_base_url,
+                    stream_usage=True,
+                    callbacks=[get_usage_callback()],
                     **kwargs,
                 )
             # 其他 LLM 类型可以在这里添加
@@ -143,6 +148,7 @@ def _init_default_models() -> None:
                     base_url=settings.llm_base_url,
                     temperature=settings.llm_temperature,
                     max_tokens=settings.llm_max_tokens,
+                    stream_usage=True,
                 )
                 LLMRegistry.register(model_name, llm, description)
             except Exception as e:
@@ -209,6 +215,7 @@ def _init_default_models() -> None:
                     base_url=base_url,
                     temperature=settings.llm_temperature,
                     max_tokens=settings.llm_max_tokens,
+                    stream_usage=True,
                 )
                 LLMRegistry.register(model_name, llm, description)
                 logger.info("deepseek_model_registered", model_name=model_name)
@@ -240,6 +247,7 @@ def _init_default_models() -> None:
                     base_url=base_url,
                     temperature=settings.llm_temperature,
                     max_tokens=settings.llm_max_tokens,
+                    stream_usage=True,
                 )
                 LLMRegistry.register(model_name, llm, description)
                 logger.info("qwen_model_registered", model_name=model_name)
@@ -0,0 +1,279 @@
+"""检索结果重排序
+
+在向量 / 混合检索之后，用重排序模型对候选分块打分，按会话的 ``rerank_top_k`` /
+``rerank_threshold`` 截断。
+
+- 打分器可插拔：``LexicalScorer`` 为确定性的本地打分器（无需模型，便于测试），
+  ``DashScopeRerankScorer`` 调用 gte-rerank 系列模型
+- 分数按 (查询哈希, 分块 ID) 缓存，同一问题重复检索时不再调用模型
+- 候选按检索分数从高到低分批打分，已有 ``rerank_top_k`` 个候选超过阈值时提前结束
+
+使用示例:
+```python
+reranker = get_reranker(session.rerank_model_id)
+hits = await reranker.rerank(query, candidates, settings)
+```
+"""
+
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+import httpx
+
+from app.config.settings import get_settings
+from app.infra.keyword_index import tokenize
+from app.observability.logging import get_logger
+
+logger = get_logger(__name__)
+
+LOCAL_RERANK_MODEL = "local"
+
+
+class RerankScorer(Protocol):
+    """重排序打分器"""
+
+    # 模型标识，参与缓存键，换模型后不会命中旧分数
+    name: str
+
+    async def ascore(self, query: str, documents: Sequence[str]) -> list[float]:
+        """为每个文档打分（0-1，越大越相关），顺序与输入一致"""
+        ...
+
+
+class LexicalScorer:
+    """确定性的本地打分器
+
+    分数为查询词（CJK 单字 + 二元组、英文词）在文档中出现的比例，二元组权重加倍，
+    同样的输入总是得到同样的分数。
+    """
+
+    name = LOCAL_RERANK_MODEL
+
+    async def ascore(self, query: str, documents: Sequence[str]) -> list[float]:
+        return [self.score(query, document) for document in documents]
+
+    @staticmethod
+    def score(query: str, document: str) -> float:
+        """计算单个文档的分数"""
+        terms = set(tokenize(query))
+        if not terms:
+            return 0.0
+        present = set(tokenize(document))
+        weights = {term: 2.0 if len(term) == 2 and not term.isascii() else 1.0 for term in terms}
+        return sum(weight for term, weight in weights.items() if term in present) / sum(weights.values())
+
+
+class DashScopeRerankScorer:
+    """DashScope gte-rerank 打分器
+
+    文档: https://help.aliyun.com/zh/model-studio/text-rerank-api
+    """
+
+    endpoint = "https://dashscope.aliyuncs.com/api/v1/services/rerank/text-rerank/text-rerank"
+
+    def __init__(
+        self,
+        model: str = "gte-rerank-v2",
+        api_key: str | None = None,
+        timeout: float = 30.0,
+    ) -> None:
+        """初始化 DashScope 重排序打分器
+
+        Args:
+            model: 模型名称
+            api_key: DashScope API Key，默认从配置读取
+            timeout: 请求超时（秒）
+        """
+        api_key = api_key or get_settings().dashscope_api_key
+        if not api_key:
+            raise ValueError("DashScope API Key is required for reranking.")
+        self.name = model
+        self._client = httpx.AsyncClient(
+            timeout=timeout, headers={"Authorization": f"Bearer {api_key}"}
+        )
+
+    async def ascore(self, query: str, documents: Sequence[str]) -> list[float]:
+        response = await self._client.post(
+            self.endpoint,
+            json={
+                "model": self.name,
+                "input": {"query": query, "documents": list(documents)},
+                "parameters": {"return_documents": False, "top_n": len(documents)},
+            },
+        )
+        response.raise_for_status()
+        scores = [0.0] * len(documents)
+        for result in response.json()["output"]["results"]:
+            scores[result["index"]] = float(result["relevance_score"])
+        return scores
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+@dataclass
+class RerankCandidate:
+    """待重排序的候选分块"""
+
+    id: str
+    content: str
+    score: float = 0.0
+    tenant_id: int | None = None
+
+
+@dataclass
+class RerankHit:
+    """重排序结果"""
+
+    id: str
+    score: float
+    retrieval_score: float
+    tenant_id: int | None = None
+
+
+class Reranker:
+    """重排序阶段"""
+
+    def __init__(
+        self,
+        scorer: RerankScorer,
+        *,
+        batch_size: int = 16,
+        max_concurrency: int = 2,
+        cache_size: int = 10000,
+    ) -> None:
+        """初始化重排序阶段
+
+        Args:
+            scorer: 打分器
+            batch_size: 单次打分请求的候选数
+            max_concurrency: 每轮并发的打分请求数，每轮结束后检查是否可以提前结束
+            cache_size: 分数缓存条数（LRU）
+        """
+        self.scorer = scorer
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.cache_size = cache_size
+        self._cache: OrderedDict[tuple[str, str], float] = OrderedDict()
+        self._lock = threading.Lock()
+        # 统计
+        self.cache_hits = 0
+        self.scored = 0
+        self.skipped = 0
+
+    async def rerank(
+        self,
+        query: str,
+        candidates: Sequence[RerankCandidate],
+        settings: Any,
+    ) -> list[RerankHit]:
+        """对候选重排序
+
+        Args:
+            query: 查询文本
+            candidates: 检索得到的候选
+            settings: 检索配置（``RetrievalSettings`` 或具有 ``rerank_top_k`` /
+                ``rerank_threshold`` 属性的对象）
+
+        Returns:
+            分数不低于 ``rerank_threshold`` 的前 ``rerank_top_k`` 条结果
+        """
+        top_k = settings.rerank_top_k
+        threshold = settings.rerank_threshold
+        query_key = self._query_key(query)
+        ordered = sorted(candidates, key=lambda candidate: candidate.score, reverse=True)
+
+        scores: dict[str, float] = {}
+        pending: list[RerankCandidate] = []
+        with self._lock:
+            for candidate in ordered:
+                cached = self._cache.get((query_key, candidate.id))
+                if cached is None:
+                    pending.append(candidate)
+                else:
+                    self._cache.move_to_end((query_key, candidate.id))
+                    scores[candidate.id] = cached
+            self.cache_hits += len(scores)
+        cleared = sum(score >= threshold for score in scores.values())
+
+        batches = [pending[i : i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        for wave_start in range(0, len(batches), self.max_concurrency):
+            if cleared >= top_k:
+                self.skipped += sum(len(batch) for batch in batches[wave_start:])
+                break
+            wave = batches[wave_start : wave_start + self.max_concurrency]
+            results = await asyncio.gather(
+                *(self.scorer.ascore(query, [c.content for c in batch]) for batch in wave)
+            )
+            with self._lock:
+                for batch, batch_scores in zip(wave, results, strict=True):
+                    for candidate, score in zip(batch, batch_scores, strict=True):
+                        scores[candidate.id] = score
+                        cleared += score >= threshold
+                        self._cache[(query_key, candidate.id)] = score
+                    self.scored += len(batch)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        hits = [
+            RerankHit(candidate.id, scores[candidate.id], candidate.score, candidate.tenant_id)
+            for candidate in ordered
+            if candidate.id in scores and scores[candidate.id] >= threshold
+        ]
+        hits.sort(key=lambda hit: hit.score, reverse=True)
+        return hits[:top_k]
+
+    def clear_cache(self) -> None:
+        """清空分数缓存"""
+        with self._lock:
+            self._cache.clear()
+
+    def _query_key(self, query: str) -> str:
+        return hashlib.sha256(f"{self.scorer.name}\0{query.strip()}".encode()).hexdigest()
+
+
+_rerankers: dict[str, Reranker] = {}
+
+
+def get_reranker(model_id: str | None = None) -> Reranker:
+    """按模型获取重排序阶段（共享分数缓存）
+
+    Args:
+        model_id: 会话的 ``rerank_model_id``（模型名称），为空时使用配置的默认模型，
+            ``local`` 表示本地打分器
+
+    Returns:
+        重排序阶段实例
+    """
+    settings = get_settings()
+    model_id = model_id or settings.rerank_model
+    reranker = _rerankers.get(model_id)
+    if reranker is None:
+        scorer: RerankScorer
+        if model_id == LOCAL_RERANK_MODEL:
+            scorer = LexicalScorer()
+        else:
+            scorer = DashScopeRerankScorer(model=model_id)
+        reranker = _rerankers[model_id] = Reranker(
+            scorer,
+            batch_size=settings.rerank_batch_size,
+            cache_size=settings.rerank_cache_size,
+        )
+        logger.info("reranker_initialized", model=model_id)
+    return reranker
+
+
+__all__ = [
+    "DashScopeRerankScorer",
+    "LexicalScorer",
+    "RerankCandidate",
+    "RerankHit",
+    "RerankScorer",
+    "Reranker",
+    "get_reranker",
+]
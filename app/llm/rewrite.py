@@ -0,0 +1,255 @@
+"""查询改写
+
+多轮对话中的追问（"那它的价格呢？"）直接检索效果很差，检索前先用 LLM 结合最近
+``max_rounds`` 轮历史改写为独立问题。
+
+- 改写结果按 (历史哈希, 查询) 缓存，同一会话重复提问或重试时不再调用 LLM
+- 改写与原始查询的推测检索并发执行：推测检索先完成且结果足够好时直接使用并取消改写；
+  改写先完成时，改写结果与原查询相同则复用推测检索，否则用改写后的查询重新检索
+
+使用示例:
+```python
+settings = RetrievalSettings.from_session(session)
+result = await rewrite_and_retrieve(
+    get_query_rewriter(),
+    lambda text: hybrid_search(vector_index, keyword_index, text, embed(text), settings),
+    query,
+    history,
+    settings,
+)
+result.hits, result.query
+```
+"""
+
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+
+from app.config.settings import get_settings
+from app.infra.retrieval import HybridHit
+from app.llm.service import get_llm_service
+from app.observability.logging import get_logger
+
+logger = get_logger(__name__)
+
+REWRITE_PROMPT = """你是检索查询改写助手。根据对话历史，把用户的最新问题改写为一个不依赖上下文、\
+可以直接用于知识库检索的独立问题：补全指代和省略的对象，保留原问题的语言和关键词。
+如果最新问题本身已经完整，原样输出。只输出改写后的问题，不要解释。"""
+
+_ROLE_NAMES = {"human": "user", "ai": "assistant"}
+
+
+def _as_turns(history: Sequence[dict[str, Any] | BaseMessage]) -> list[tuple[str, str]]:
+    turns = []
+    for message in history:
+        if isinstance(message, BaseMessage):
+            role, content = _ROLE_NAMES.get(message.type, message.type), message.content
+        else:
+            role, content = message["role"], message["content"]
+        if role in ("user", "assistant") and content:
+            turns.append((role, str(content)))
+    return turns
+
+
+def history_hash(turns: Sequence[tuple[str, str]]) -> str:
+    """对话历史的哈希"""
+    digest = hashlib.sha256()
+    for role, content in turns:
+        digest.update(f"{role}\0{content}\0".encode())
+    return digest.hexdigest()
+
+
+class QueryRewriter:
+    """查询改写器"""
+
+    def __init__(self, model: Any | None = None, *, cache_size: int = 10000) -> None:
+        """初始化查询改写器
+
+        Args:
+            model: LangChain 聊天模型，默认使用 ``rewrite_model`` 配置的模型
+            cache_size: 改写缓存条数（LRU）
+        """
+        if model is None:
+            model = get_llm_service().get_model(model_name=get_settings().rewrite_model)
+        self.model = model
+        self.cache_size = cache_size
+        self._cache: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self._lock = threading.Lock()
+        # 统计
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def cached(
+        self, query: str, history: Sequence[dict[str, Any] | BaseMessage], max_rounds: int = 5
+    ) -> str | None:
+        """查询缓存的改写结果（无历史时返回原查询）"""
+        turns = self._recent(history, max_rounds)
+        if not turns:
+            return query
+        key = (history_hash(turns), query.strip())
+        with self._lock:
+            rewritten = self._cache.get(key)
+            if rewritten is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+        return rewritten
+
+    async def rewrite(
+        self, query: str, history: Sequence[dict[str, Any] | BaseMessage], max_rounds: int = 5
+    ) -> str:
+        """改写为独立问题
+
+        Args:
+            query: 用户最新问题
+            history: 之前的对话消息（``{"role", "content"}`` 字典或 LangChain 消息）
+            max_rounds: 参考的最近对话轮数
+
+        Returns:
+            改写后的问题，无历史或改写结果为空时返回原问题
+        """
+        rewritten = self.cached(query, history, max_rounds)
+        if rewritten is not None:
+            return rewritten
+
+        turns = self._recent(history, max_rounds)
+        transcript = "\n".join(f"{role}: {content}" for role, content in turns)
+        response = await self.model.ainvoke([
+            SystemMessage(content=REWRITE_PROMPT),
+            HumanMessage(content=f"对话历史:\n{transcript}\n\n最新问题: {query}"),
+        ])
+        rewritten = str(response.content).strip() or query
+
+        with self._lock:
+            self.cache_misses += 1
+            self._cache[(history_hash(turns), query.strip())] = rewritten
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rewritten
+
+    @staticmethod
+    def _recent(
+        history: Sequence[dict[str, Any] | BaseMessage], max_rounds: int
+    ) -> list[tuple[str, str]]:
+        # 一轮为一问一答
+        return _as_turns(history)[-2 * max_rounds :] if max_rounds > 0 else []
+
+
+@dataclass
+class RewriteResult[T]:
+    """改写 + 检索结果"""
+
+    query: str
+    hits: list[T]
+    # 是否使用了改写后的查询 / 是否采用了原始查询的推测检索
+    rewritten: bool = False
+    speculative: bool = False
+
+
+def _best_score(hits: Sequence[Any]) -> float:
+    scores = [
+        max(hit.vector_score or 0.0, hit.keyword_score or 0.0)
+        if isinstance(hit, HybridHit)
+        else hit.score
+        for hit in hits
+    ]
+    return max(scores, default=0.0)
+
+
+async def rewrite_and_retrieve[T](
+    rewriter: QueryRewriter,
+    retrieve: Callable[[str], Awaitable[list[T]]],
+    query: str,
+    history: Sequence[dict[str, Any] | BaseMessage],
+    settings: Any,
+    *,
+    is_adequate: Callable[[list[T]], bool] | None = None,
+) -> RewriteResult[T]:
+    """查询改写与推测检索
+
+    Args:
+        rewriter: 查询改写器
+        retrieve: 检索函数，参数为查询文本
+        query: 用户最新问题
+        history: 之前的对话消息
+        settings: 检索配置（``RetrievalSettings`` 或具有 ``enable_rewrite`` /
+            ``max_rounds`` 属性的对象）
+        is_adequate: 判断推测检索结果是否足够好，默认要求最高的原始相似度
+            （混合检索取两路中较高者）不低于 ``rewrite_adequate_score``
+
+    Returns:
+        实际使用的查询与检索结果
+    """
+    if not settings.enable_rewrite:
+        return RewriteResult(query, await retrieve(query))
+    rewritten = rewriter.cached(query, history, settings.max_rounds)
+    if rewritten is not None:
+        return RewriteResult(rewritten, await retrieve(rewritten), rewritten=rewritten != query)
+
+    if is_adequate is None:
+        adequate_score = get_settings().rewrite_adequate_score
+
+        def is_adequate(hits: list[T]) -> bool:
+            return _best_score(hits) >= adequate_score
+
+    rewrite_task = asyncio.ensure_future(rewriter.rewrite(query, history, settings.max_rounds))
+    speculative_task = asyncio.ensure_future(retrieve(query))
+    try:
+        done, _ = await asyncio.wait(
+            {rewrite_task, speculative_task}, return_when=asyncio.FIRST_COMPLETED
+        )
+        if speculative_task in done and not rewrite_task.done():
+            error = speculative_task.exception()
+            if error is None:
+                hits = speculative_task.result()
+                if is_adequate(hits):
+                    return RewriteResult(query, hits, speculative=True)
+            else:
+                # 推测检索失败不影响改写，继续用改写后的查询检索
+                logger.warning("speculative_retrieve_failed", error=str(error))
+
+        try:
+            rewritten = await rewrite_task
+        except Exception as e:
+            logger.warning("query_rewrite_failed", error=str(e))
+            rewritten = query
+        if rewritten.strip() == query.strip():
+            try:
+                return RewriteResult(query, await speculative_task, speculative=True)
+            except Exception as e:
+                logger.warning("speculative_retrieve_failed", error=str(e))
+                return RewriteResult(query, await retrieve(query))
+        speculative_task.cancel()
+        return RewriteResult(rewritten, await retrieve(rewritten), rewritten=True)
+    finally:
+        for task in (rewrite_task, speculative_task):
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # 取回异常，避免未处理的任务异常告警
+                task.exception()
+
+
+_query_rewriter: QueryRewriter | None = None
+
+
+def get_query_rewriter() -> QueryRewriter:
+    """获取全局查询改写器"""
+    global _query_rewriter
+    if _query_rewriter is None:
+        _query_rewriter = QueryRewriter(cache_size=get_settings().rewrite_cache_size)
+    return _query_rewriter
+
+
+__all__ = [
+    "QueryRewriter",
+    "RewriteResult",
+    "get_query_rewriter",
+    "history_hash",
+    "rewrite_and_retrieve",
+]
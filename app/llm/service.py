@@ -9,6 +9,7 @@ from typing import Any
 from langchain_openai import ChatOpenAI
 
 from app.config.settings import get_settings
+from app.llm.usage import get_usage_callback
 from app.observability.logging import get_logger
 
 logger = get_logger(__name__)
@@ -28,26 +29,42 @@ class LLMService:
         self._models: dict[str, Any] = {}
         self._settings = get_settings()
 
-    def get_model(self, provider: LLMProvider | None = None, model_name: str | None = None) -> Any:
-        """获取模型"""
+    def get_model(
+        self,
+        provider: LLMProvider | None = None,
+        model_name: str | None = None,
+        max_tokens: int | None = None,
+    ) -> Any:
+        """获取模型
+
+        Args:
+            provider: 提供商，默认从配置读取
+            model_name: 模型名称，默认从配置读取
+            max_tokens: 最大输出 token 数（如预算预留的输出上限），为空时不限制
+        """
         provider = provider or LLMProvider(self._settings.llm_provider)
         model_name = model_name or self._settings.llm_model
 
-        key = f"{provider}:{model_name}"
+        key = f"{provider}:{model_name}:{max_tokens or ''}"
         if key in self._models:
             return self._models[key]
 
-        model = self._create_model(provider, model_name)
+        model = self._create_model(provider, model_name, max_tokens)
         self._models[key] = model
         return model
 
-    def _create_model(self, provider: LLMProvider, model_name: str) -> Any:
+    def _create_model(
+        self, provider: LLMProvider, model_name: str, max_tokens: int | None = None
+    ) -> Any:
         """创建模型实例"""
         if provider == LLMProvider.OPENAI:
             return ChatOpenAI(
                 model=model_name,
                 api_key=self._settings.openai_api_key,
                 temperature=0.7,
+                max_tokens=max_tokens,
+                stream_usage=True,
+                callbacks=[get_usage_callback()],
             )
         elif provider == LLMProvider.DASHSCOPE:
             return ChatOpenAI(
@@ -55,6 +72,9 @@ class LLMService:
                 api_key=self._settings.dashscope_api_key,
                 base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
                 temperature=0.7,
+                max_tokens=max_tokens,
+                stream_usage=True,
+                callbacks=[get_usage_callback()],
             )
         else:
             raise ValueError(f"不支持的 LLM 提供商: {provider}")
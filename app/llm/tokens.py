@@ -0,0 +1,49 @@
+"""Token 数估算
+
+不依赖具体模型的分词器，按字符数粗略估算，供预算预检和 Embedding 批次打包共用。
+
+- CJK 字符约 1 token/字，其他文本约 4 字符/token
+- 每条消息额外计入格式开销（role、分隔符等）
+"""
+
+import re
+from collections.abc import Iterable
+from typing import Any
+
+# 中日韩统一表意文字、假名、韩文音节
+_CJK_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]")
+# 每条消息的格式开销（role、分隔符等）
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def count_prompt_tokens(prompt: Any) -> int:
+    """粗略估算提示词 token 数
+
+    Args:
+        prompt: 字符串、消息列表（BaseMessage 或 {"role", "content"} 字典）
+
+    Returns:
+        估算的 token 数
+    """
+    if prompt is None:
+        return 0
+    if isinstance(prompt, str):
+        cjk = len(_CJK_PATTERN.findall(prompt))
+        return cjk + (len(prompt) - cjk + 3) // 4
+    if isinstance(prompt, dict):
+        return _MESSAGE_OVERHEAD_TOKENS + count_prompt_tokens(prompt.get("content"))
+    content = getattr(prompt, "content", None)
+    if content is not None:
+        if isinstance(content, list):
+            content = " ".join(
+                part.get("text", "") if isinstance(part, dict) else str(part) for part in content
+            )
+        return _MESSAGE_OVERHEAD_TOKENS + count_prompt_tokens(content)
+    if isinstance(prompt, Iterable):
+        return sum(count_prompt_tokens(item) for item in prompt)
+    return count_prompt_tokens(str(prompt))
+
+
+__all__ = [
+    "count_prompt_tokens",
+]
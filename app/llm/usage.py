@@ -0,0 +1,347 @@
+"""LLM 用量自动采集
+
+通过 LangChain 回调从模型响应中提取 token 用量和耗时，异步写入 CostTracker。
+
+回调本身只做字典读写和一次非阻塞入队（``run_inline``），
+聚合由后台线程完成，不会给 token 流增加延迟。
+
+使用示例:
+```python
+from app.llm.usage import with_usage_tracking
+
+llm = with_usage_tracking(ChatOpenAI(model="qwen-plus", stream_usage=True))
+await llm.ainvoke("你好", config={"metadata": {"tenant_id": 1}})
+```
+"""
+
+import queue
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from typing import Any
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from app.llm.cost_tracker import CostTracker, get_cost_tracker
+from app.observability.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+@dataclass
+class UsageEvent:
+    """一次模型调用的用量"""
+
+    model: str
+    input_tokens: int
+    output_tokens: int
+    cached_tokens: int = 0
+    latency_ms: float = 0.0
+    tenant_id: int | None = None
+    run_id: str | None = None
+    metadata: dict[str, Any] | None = None
+
+
+class UsageRecorder:
+    """用量记录器
+
+    使用有界队列和后台线程把 UsageEvent 写入 CostTracker。
+    队列满时丢弃事件并计数，绝不阻塞调用方。
+    """
+
+    def __init__(
+        self,
+        tracker: CostTracker | None = None,
+        max_queue_size: int = 10000,
+    ) -> None:
+        """初始化用量记录器
+
+        Args:
+            tracker: 成本追踪器，默认使用全局追踪器
+            max_queue_size: 队列容量
+        """
+        self._tracker = tracker
+        self._queue: queue.Queue[UsageEvent | Callable[[], None] | None] = queue.Queue(
+            maxsize=max_queue_size
+        )
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._handlers: list[Callable[[UsageEvent, float], None]] = []
+        self.dropped = 0
+
+    @property
+    def tracker(self) -> CostTracker:
+        return self._tracker or get_cost_tracker()
+
+    def add_handler(self, handler: Callable[[UsageEvent, float], None]) -> None:
+        """注册事件处理器，事件写入 CostTracker 后在后台线程回调 ``handler(event, cost)``"""
+        self._handlers.append(handler)
+
+    def submit(self, event: UsageEvent) -> None:
+        """提交用量事件（非阻塞）"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("llm_usage_dropped", model=event.model, dropped=self.dropped)
+
+    def defer(self, callback: Callable[[], None]) -> bool:
+        """在此前提交的事件处理完后于后台线程回调（非阻塞）
+
+        Returns:
+            是否入队，队列满时返回 False
+        """
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(callback)
+        except queue.Full:
+            return False
+        return True
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """等待队列中的事件全部写入
+
+        Args:
+            timeout: 超时时间（秒），为空时一直等待
+
+        Returns:
+            是否在超时前完成
+        """
+        if self._worker is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def close(self, timeout: float | None = 5.0) -> None:
+        """写完剩余事件并停止后台线程"""
+        with self._lock:
+            worker = self._worker
+            self._worker = None
+        if worker is None:
+            return
+        self._queue.put(None)
+        worker.join(timeout)
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._run, name="llm-usage-recorder", daemon=True
+                )
+                self._worker.start()
+
+    def _run(self) -> None:
+        while True:
+            event = self._queue.get()
+            try:
+                if event is None:
+                    return
+                if isinstance(event, UsageEvent):
+                    self._record(event)
+                else:
+                    event()
+            except Exception as e:
+                logger.error("llm_usage_record_failed", error=str(e))
+            finally:
+                self._queue.task_done()
+
+    def _record(self, event: UsageEvent) -> None:
+        cost = self.tracker.track(
+            event.model,
+            event.input_tokens,
+            event.output_tokens,
+            cached_tokens=event.cached_tokens,
+            tenant_id=event.tenant_id,
+            latency_ms=event.latency_ms,
+        )
+        for handler in self._handlers:
+            handler(event, cost)
+        logger.debug(
+            "llm_usage_recorded",
+            model=event.model,
+            input_tokens=event.input_tokens,
+            output_tokens=event.output_tokens,
+            cached_tokens=event.cached_tokens,
+            latency_ms=round(event.latency_ms, 1),
+            cost=cost,
+        )
+
+
+class UsageTrackingCallback(BaseCallbackHandler):
+    """用量采集回调
+
+    在 ``on_chat_model_start`` / ``on_llm_start`` 记录开始时间和模型，
+    在 ``on_llm_end`` 提取 ``usage_metadata``（或 ``llm_output.token_usage``）并提交。
+    租户从 ``metadata["tenant_id"]`` 读取。
+    """
+
+    # 回调只做轻量操作，直接在事件循环中执行，避免线程池调度开销
+    run_inline = True
+
+    def __init__(self, recorder: UsageRecorder | None = None) -> None:
+        self._recorder = recorder
+        self._runs: dict[UUID, tuple[float, str | None, dict[str, Any]]] = {}
+
+    @property
+    def recorder(self) -> UsageRecorder:
+        return self._recorder or get_usage_recorder()
+
+    def on_chat_model_start(
+        self,
+        serialized: dict[str, Any],
+        messages: list[list[Any]],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start(run_id, metadata, kwargs.get("invocation_params"))
+
+    def on_llm_start(
+        self,
+        serialized: dict[str, Any],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start(run_id, metadata, kwargs.get("invocation_params"))
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        started_at, model, metadata = self._runs.pop(run_id, (None, None, {}))
+        latency_ms = (time.perf_counter() - started_at) * 1000 if started_at else 0.0
+
+        llm_output = response.llm_output or {}
+        model = llm_output.get("model_name") or _response_model(response) or model or "unknown"
+        input_tokens, output_tokens, cached_tokens = _extract_usage(response)
+
+        self.recorder.submit(
+            UsageEvent(
+                model=model,
+                input_tokens=input_tokens,
+                output_tokens=output_tokens,
+                cached_tokens=cached_tokens,
+                latency_ms=latency_ms,
+                tenant_id=metadata.get("tenant_id"),
+                run_id=str(run_id),
+                metadata=metadata,
+            )
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._runs.pop(run_id, None)
+
+    def _start(
+        self,
+        run_id: UUID,
+        metadata: dict[str, Any] | None,
+        invocation_params: dict[str, Any] | None,
+    ) -> None:
+        metadata = metadata or {}
+        params = invocation_params or {}
+        model = (
+            metadata.get("ls_model_name") or params.get("model") or params.get("model_name")
+        )
+        self._runs[run_id] = (time.perf_counter(), model, metadata)
+
+
+def _response_model(response: LLMResult) -> str | None:
+    """从响应消息的 response_metadata 中读取实际模型名"""
+    for generations in response.generations:
+        for generation in generations:
+            if isinstance(generation, ChatGeneration):
+                model = generation.message.response_metadata.get("model_name")
+                if model:
+                    return model
+    return None
+
+
+def _extract_usage(response: LLMResult) -> tuple[int, int, int]:
+    """从 LLMResult 中提取 (输入, 输出, 缓存命中) token 数"""
+    input_tokens = output_tokens = cached_tokens = 0
+    found = False
+
+    for generations in response.generations:
+        for generation in generations:
+            if not isinstance(generation, ChatGeneration):
+                continue
+            usage = getattr(generation.message, "usage_metadata", None)
+            if not usage:
+                continue
+            found = True
+            input_tokens += usage.get("input_tokens", 0)
+            output_tokens += usage.get("output_tokens", 0)
+            cached_tokens += (usage.get("input_token_details") or {}).get("cache_read", 0) or 0
+
+    if not found:
+        # 非 Chat 模型或未返回 usage_metadata 的提供商
+        token_usage = (response.llm_output or {}).get("token_usage") or {}
+        input_tokens = token_usage.get("prompt_tokens", 0)
+        output_tokens = token_usage.get("completion_tokens", 0)
+        details = token_usage.get("prompt_tokens_details") or {}
+        cached_tokens = details.get("cached_tokens", 0) or 0
+
+    return input_tokens, output_tokens, cached_tokens
+
+
+# 全局用量记录器与回调（单例，保证同一回调不会被 LangChain 重复注册）
+_usage_recorder: UsageRecorder | None = None
+_usage_callback: UsageTrackingCallback | None = None
+
+
+def get_usage_recorder() -> UsageRecorder:
+    """获取全局用量记录器"""
+    global _usage_recorder
+    if _usage_recorder is None:
+        _usage_recorder = UsageRecorder()
+    return _usage_recorder
+
+
+def get_usage_callback() -> UsageTrackingCallback:
+    """获取全局用量采集回调"""
+    global _usage_callback
+    if _usage_callback is None:
+        _usage_callback = UsageTrackingCallback()
+    return _usage_callback
+
+
+def with_usage_tracking(llm: Any) -> Any:
+    """为模型挂载用量采集回调（幂等）
+
+    Args:
+        llm: LangChain 模型实例
+
+    Returns:
+        同一模型实例
+    """
+    callback = get_usage_callback()
+    callbacks = getattr(llm, "callbacks", None)
+    if callbacks is None:
+        llm.callbacks = [callback]
+    elif isinstance(callbacks, list):
+        if callback not in callbacks:
+            callbacks.append(callback)
+    elif callback not in callbacks.handlers:
+        callbacks.add_handler(callback, inherit=True)
+    return llm
+
+
+__all__ = [
+    "UsageEvent",
+    "UsageRecorder",
+    "UsageTrackingCallback",
+    "get_usage_recorder",
+    "get_usage_callback",
+    "with_usage_tracking",
+]
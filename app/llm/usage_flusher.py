@@ -0,0 +1,260 @@
+"""LLM 用量写回
+
+把 CostTracker 中的用量按 租户 / 模型 / 分钟 聚合后定期累加写入 ``llm_usage`` 表，
+多个 worker 各自写增量，数据库中的行即为合并后的总量。
+
+- 监听器只在内存中累加，不做 IO；待写聚合数量有上限，超出时丢弃并计数
+- 待写数量达到批大小时提前唤醒写回任务
+- 每批一条多行 upsert，写入失败的批次合并回待写区，下次重试
+
+使用示例:
+```python
+flusher = get_usage_flusher()
+flusher.start()
+...
+await flusher.stop()
+
+totals = await get_usage_totals(tenant_id=1, group_by=("model",))
+```
+"""
+
+import asyncio
+import threading
+from collections.abc import Callable, Sequence
+from contextlib import AbstractAsyncContextManager
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config.settings import get_settings
+from app.llm.cost_tracker import CostRecord, CostTracker, get_cost_tracker
+from app.models.llm_usage import UNATTRIBUTED_TENANT_ID
+from app.observability.logging import get_logger
+from app.repositories.llm_usage import ADDITIVE_COLUMNS, LLMUsageRepository, UsageTotal
+
+logger = get_logger(__name__)
+
+SessionFactory = Callable[[], AbstractAsyncContextManager[AsyncSession]]
+
+_BucketKey = tuple[int, str, int]
+
+
+def _default_session_factory() -> AbstractAsyncContextManager[AsyncSession]:
+    from app.infra.database import session_scope
+
+    return session_scope()
+
+
+class UsageFlusher:
+    """用量写回器"""
+
+    def __init__(
+        self,
+        tracker: CostTracker | None = None,
+        *,
+        interval: float = 10.0,
+        batch_size: int = 500,
+        max_pending: int = 10000,
+        bucket_seconds: int = 60,
+        session_factory: SessionFactory | None = None,
+    ) -> None:
+        """初始化用量写回器
+
+        Args:
+            tracker: 成本追踪器，默认使用全局追踪器
+            interval: 写回周期（秒）
+            batch_size: 每条 upsert 的最大行数
+            max_pending: 待写聚合行上限
+            bucket_seconds: 时间桶宽度（秒）
+            session_factory: 数据库会话工厂，默认 ``session_scope``
+        """
+        self._tracker = tracker
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.bucket_seconds = bucket_seconds
+        self._session_factory = session_factory or _default_session_factory
+
+        self._pending: dict[_BucketKey, list[float]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task[None] | None = None
+        self.dropped = 0
+
+    @property
+    def tracker(self) -> CostTracker:
+        return self._tracker or get_cost_tracker()
+
+    @property
+    def pending(self) -> int:
+        """待写聚合行数"""
+        return len(self._pending)
+
+    def start(self) -> None:
+        """注册监听器并启动周期写回任务（需在事件循环中调用）"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self.tracker.add_listener(self.add_record)
+        self._task = asyncio.create_task(self._run(), name="llm-usage-flusher")
+        logger.info("llm_usage_flusher_started", interval=self.interval)
+
+    async def stop(self) -> None:
+        """停止写回任务并写出剩余数据"""
+        self.tracker.remove_listener(self.add_record)
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        logger.info("llm_usage_flusher_stopped", dropped=self.dropped)
+
+    def add_record(self, record: CostRecord) -> None:
+        """累加一条用量记录（线程安全，不做 IO）"""
+        bucket = int(record.timestamp // self.bucket_seconds) * self.bucket_seconds
+        tenant_id = UNATTRIBUTED_TENANT_ID if record.tenant_id is None else record.tenant_id
+        values = (
+            1,
+            record.input_tokens,
+            record.output_tokens,
+            record.cached_tokens,
+            record.cost,
+            record.latency_ms,
+        )
+        if not self._merge({(tenant_id, record.model, bucket): values}):
+            return
+        if len(self._pending) >= self.batch_size:
+            self._wake()
+
+    async def flush(self) -> int:
+        """立即写出全部待写数据
+
+        Returns:
+            写入的聚合行数
+        """
+        async with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            items = list(pending.items())
+            written = 0
+            for start in range(0, len(items), self.batch_size):
+                batch = items[start : start + self.batch_size]
+                try:
+                    async with self._session_factory() as session:
+                        await LLMUsageRepository(session).upsert_buckets(
+                            [self._to_row(key, values) for key, values in batch]
+                        )
+                        await session.commit()
+                except Exception as e:
+                    # 当前批及之后的数据放回待写区，下次重试
+                    self._merge(dict(items[start:]))
+                    logger.error(
+                        "llm_usage_flush_failed", error=str(e), retained=len(items) - start
+                    )
+                    break
+                written += len(batch)
+
+            if written:
+                logger.debug("llm_usage_flushed", rows=written)
+            return written
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def _merge(self, entries: dict[_BucketKey, Sequence[float]]) -> bool:
+        """合并到待写区，超出上限的新键被丢弃"""
+        dropped = 0
+        with self._lock:
+            for key, values in entries.items():
+                current = self._pending.get(key)
+                if current is None:
+                    if len(self._pending) >= self.max_pending:
+                        dropped += 1
+                        continue
+                    self._pending[key] = list(values)
+                else:
+                    for i, value in enumerate(values):
+                        current[i] += value
+            self.dropped += dropped
+        if dropped:
+            logger.warning("llm_usage_flush_dropped", dropped=self.dropped)
+        return dropped == 0
+
+    def _wake(self) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            pass
+
+    @staticmethod
+    def _to_row(key: _BucketKey, values: Sequence[float]) -> dict[str, Any]:
+        tenant_id, model, bucket = key
+        row: dict[str, Any] = {
+            "tenant_id": tenant_id,
+            "model": model,
+            "bucket_start": datetime.fromtimestamp(bucket, UTC),
+            "updated_at": datetime.now(UTC),
+        }
+        for name, value in zip(ADDITIVE_COLUMNS, values, strict=True):
+            row[name] = value
+        return row
+
+
+async def get_usage_totals(
+    *,
+    tenant_id: int | None = None,
+    model: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    group_by: Sequence[str] = (),
+) -> list[UsageTotal]:
+    """查询所有 worker 合并后的用量合计
+
+    参数同 ``LLMUsageRepository.get_totals``。
+    """
+    async with _default_session_factory() as session:
+        return await LLMUsageRepository(session).get_totals(
+            tenant_id=tenant_id, model=model, since=since, until=until, group_by=group_by
+        )
+
+
+# 全局写回器
+_usage_flusher: UsageFlusher | None = None
+
+
+def get_usage_flusher() -> UsageFlusher:
+    """获取全局用量写回器"""
+    global _usage_flusher
+    if _usage_flusher is None:
+        settings = get_settings()
+        _usage_flusher = UsageFlusher(
+            interval=settings.usage_flush_interval,
+            batch_size=settings.usage_flush_batch_size,
+            max_pending=settings.usage_flush_max_pending,
+        )
+    return _usage_flusher
+
+
+__all__ = [
+    "UsageFlusher",
+    "get_usage_flusher",
+    "get_usage_totals",
+]
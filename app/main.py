@@ -16,8 +16,39 @@ load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
+    from app.config.settings import get_settings
+    from app.infra.database import close_db
+    from app.infra.memory_store import get_memory_store
+    from app.infra.message_writer import get_message_writer
+    from app.infra.row_cache import get_row_cache
+    from app.ingestion.pipeline import shutdown_parse_executor
+    from app.llm.usage import get_usage_recorder
+    from app.llm.usage_flusher import get_usage_flusher
+
+    settings = get_settings()
+    if settings.usage_flush_enabled:
+        get_usage_flusher().start()
+    if settings.message_writer_enabled:
+        get_message_writer().start()
+    # 订阅跨 worker 的缓存失效广播（未配置 Redis 时为空操作）
+    await get_row_cache().start()
+    # 长期记忆过期清理
+    await get_memory_store().start()
+
     yield
 
+    await get_memory_store().stop()
+    await get_row_cache().stop()
+    shutdown_parse_executor()
+    if settings.message_writer_enabled:
+        await get_message_writer().stop()
+    # 写完尚未入账的 LLM 用量，再写回数据库
+    get_usage_recorder().close()
+    if settings.usage_flush_enabled:
+        await get_usage_flusher().stop()
+    # 写回全部完成后再关闭连接池
+    await close_db()
+
 
 def create_app() -> FastAPI:
     """创建 FastAPI 应用"""
@@ -1,39 +1,19 @@
-"""数据模型定义（SQLModel）"""
+"""数据模型定义（SQLModel）
 
-from datetime import UTC, datetime
+表模型定义在各独立模型文件中，这里只做重新导出，避免同名表在元数据中重复定义。
+"""
 
-from sqlmodel import Field, SQLModel
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
 
+from app.models.message import Message
+from app.models.session import Session
 
-class SessionBase(SQLModel):
-    """会话基础模型"""
-    title: str | None = Field(default=None, max_length=255)
 
-
-class Session(SessionBase, table=True):
-    """会话表模型"""
-    __tablename__ = "sessions"
-
-    id: str = Field(default=None, primary_key=True, max_length=36)
-    user_id: str | None = Field(default=None, max_length=36)
-    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
-    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
-
-
-class MessageBase(SQLModel):
-    """消息基础模型"""
-    role: str = Field(max_length=50)
-    content: str
-
-
-class Message(MessageBase, table=True):
-    """消息表模型"""
-    __tablename__ = "messages"
-
-    id: str = Field(default=None, primary_key=True, max_length=36)
-    session_id: str = Field(max_length=36, foreign_key="sessions.id")
-    user_id: str | None = Field(default=None, max_length=36)
-    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+@compiles(JSONB, "sqlite")
+def _compile_jsonb_sqlite(type_, compiler, **kw) -> str:
+    """SQLite（本地开发 / 基准测试）中 JSONB 列按 JSON 建表"""
+    return "JSON"
 
 
 __all__ = [
@@ -0,0 +1,129 @@
+"""知识模型
+
+对齐 WeKnora99 的 knowledges / chunks / knowledge_tags 表结构
+"""
+
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy import BigInteger
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlmodel import Column, Field, SQLModel
+
+# 解析状态
+PARSE_STATUS_UNPROCESSED = "unprocessed"
+PARSE_STATUS_PROCESSING = "processing"
+PARSE_STATUS_COMPLETED = "completed"
+PARSE_STATUS_FAILED = "failed"
+
+# 分块类型：重复分块不单独 Embedding，``metadata.duplicate_of`` 指向规范分块
+CHUNK_TYPE_TEXT = "text"
+CHUNK_TYPE_DUPLICATE = "duplicate"
+
+
+class Knowledge(SQLModel, table=True):
+    """知识（文档）表模型
+
+    对应 WeKnora99 的 knowledges 表
+    """
+
+    __tablename__ = "knowledges"
+
+    id: str = Field(default=None, primary_key=True, max_length=36)
+    tenant_id: int = Field(index=True)
+    knowledge_base_id: str = Field(max_length=36, index=True)
+    type: str = Field(max_length=50)
+    title: str = Field(max_length=255)
+    description: str | None = None
+    source: str = Field(max_length=128)
+    parse_status: str = Field(default=PARSE_STATUS_UNPROCESSED, max_length=50)
+    enable_status: str = Field(default="enabled", max_length=50)
+    embedding_model_id: str | None = Field(default=None, max_length=64)
+
+    # 文件信息
+    file_name: str | None = Field(default=None, max_length=255)
+    file_type: str | None = Field(default=None, max_length=50)
+    file_size: int | None = Field(default=None, sa_type=BigInteger)
+    file_path: str | None = None
+    file_hash: str | None = Field(default=None, max_length=64)
+    storage_size: int = Field(default=0, sa_type=BigInteger)
+
+    meta: Any | None = Field(default=None, sa_column=Column("metadata", JSONB))
+
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    processed_at: datetime | None = None
+    error_message: str | None = None
+    deleted_at: datetime | None = None
+
+    tag_id: str | None = Field(default=None, max_length=36)
+    summary_status: str | None = Field(default="none", max_length=32)
+
+
+class Chunk(SQLModel, table=True):
+    """知识分块表模型
+
+    对应 WeKnora99 的 chunks 表，``start_at`` / ``end_at`` 为分块在文档全文中的字符偏移
+    """
+
+    __tablename__ = "chunks"
+
+    id: str = Field(default=None, primary_key=True, max_length=36)
+    tenant_id: int
+    knowledge_base_id: str = Field(max_length=36)
+    knowledge_id: str = Field(max_length=36)
+    content: str
+    chunk_index: int
+    is_enabled: bool = Field(default=True)
+    start_at: int
+    end_at: int
+    pre_chunk_id: str | None = Field(default=None, max_length=36)
+    next_chunk_id: str | None = Field(default=None, max_length=36)
+    chunk_type: str = Field(default=CHUNK_TYPE_TEXT, max_length=20)
+    parent_chunk_id: str | None = Field(default=None, max_length=36)
+    image_info: str | None = None
+    relation_chunks: Any | None = Field(default=None, sa_column=Column(JSONB))
+    indirect_relation_chunks: Any | None = Field(default=None, sa_column=Column(JSONB))
+
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    deleted_at: datetime | None = None
+
+    meta: Any | None = Field(default=None, sa_column=Column("metadata", JSONB))
+    tag_id: str | None = Field(default=None, max_length=36)
+    status: int = Field(default=0)
+    content_hash: str | None = Field(default=None, max_length=64, index=True)
+    flags: int = Field(default=1)
+
+
+class KnowledgeTag(SQLModel, table=True):
+    """知识标签表模型
+
+    对应 WeKnora99 的 knowledge_tags 表
+    """
+
+    __tablename__ = "knowledge_tags"
+
+    id: str = Field(default=None, primary_key=True, max_length=36)
+    tenant_id: int
+    knowledge_base_id: str = Field(max_length=36, index=True)
+    name: str = Field(max_length=128)
+    color: str | None = Field(default=None, max_length=32)
+    sort_order: int = Field(default=0)
+
+    created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+    deleted_at: datetime | None = None
+
+
+__all__ = [
+    "CHUNK_TYPE_DUPLICATE",
+    "CHUNK_TYPE_TEXT",
+    "Chunk",
+    "Knowledge",
+    "KnowledgeTag",
+    "PARSE_STATUS_COMPLETED",
+    "PARSE_STATUS_FAILED",
+    "PARSE_STATUS_PROCESSING",
+    "PARSE_STATUS_UNPROCESSED",
+]
@@ -0,0 +1,38 @@
+"""LLM 用量聚合模型
+
+按 租户 / 模型 / 分钟 聚合的 token 用量与成本，
+由各进程的用量写回任务以累加 upsert 的方式写入，多进程数据天然合并。
+"""
+
+from datetime import UTC, datetime
+
+from sqlalchemy import BigInteger, Column, DateTime
+from sqlmodel import Field, SQLModel
+
+# 未归属租户的用量记在 0 号租户下（主键列不能为 NULL）
+UNATTRIBUTED_TENANT_ID = 0
+
+
+class LLMUsage(SQLModel, table=True):
+    """LLM 用量聚合表模型"""
+
+    __tablename__ = "llm_usage"
+
+    tenant_id: int = Field(default=UNATTRIBUTED_TENANT_ID, primary_key=True)
+    model: str = Field(primary_key=True, max_length=128)
+    bucket_start: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), primary_key=True)
+    )
+    request_count: int = Field(default=0, sa_type=BigInteger)
+    input_tokens: int = Field(default=0, sa_type=BigInteger)
+    output_tokens: int = Field(default=0, sa_type=BigInteger)
+    cached_tokens: int = Field(default=0, sa_type=BigInteger)
+    cost: float = Field(default=0.0)
+    latency_ms: float = Field(default=0.0)
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
+
+
+__all__ = [
+    "LLMUsage",
+    "UNATTRIBUTED_TENANT_ID",
+]
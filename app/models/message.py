@@ -27,7 +27,7 @@ class Message(MessageBase, table=True):
 
     id: str = Field(default=None, primary_key=True, max_length=36)
     request_id: str = Field(max_length=36)
-    session_id: str = Field(max_length=36, foreign_key="sessions.id")
+    session_id: str = Field(max_length=36, foreign_key="sessions.id", index=True)
 
     # 知识库引用
     knowledge_references: Any | None = Field(default=None, sa_column=Column(JSONB))
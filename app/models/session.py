@@ -47,6 +47,10 @@ class Session(SessionBase, table=True):
     rerank_top_k: int = Field(default=10)
     rerank_threshold: float = Field(default=0.65)
 
+    # Matryoshka 两阶段向量检索：粗排前缀维度 / 重排维度，为空时使用完整维度
+    embedding_search_dimensions: int | None = Field(default=None)
+    embedding_rerank_dimensions: int | None = Field(default=None)
+
     # 摘要配置
     summary_model_id: str | None = Field(default=None, max_length=64)
     summary_parameters: Any | None = Field(default=None, sa_column=Column(JSONB))
@@ -1,12 +1,17 @@
-"""日志模块（简化版）"""
+"""日志模块（简化版）
+
+基于 structlog，支持 ``logger.info("event_name", key=value)`` 形式的结构化日志。
+"""
 
 import logging
 from typing import Any
 
+import structlog
+
 
-def get_logger(name: str) -> logging.Logger:
+def get_logger(name: str) -> Any:
     """获取日志器"""
-    return logging.getLogger(name)
+    return structlog.get_logger(name)
 
 
 def setup_logging(level: str = "INFO") -> None:
@@ -15,6 +20,14 @@ def setup_logging(level: str = "INFO") -> None:
         level=getattr(logging, level),
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     )
+    structlog.configure(
+        processors=[
+            structlog.stdlib.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso"),
+            structlog.dev.ConsoleRenderer(),
+        ],
+        wrapper_class=structlog.make_filtering_bound_logger(getattr(logging, level)),
+    )
 
 
 __all__ = [
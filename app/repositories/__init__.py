@@ -3,46 +3,22 @@
 提供数据库操作的抽象层。
 """
 
-from sqlalchemy import desc, select, func
+from collections.abc import Sequence
+from typing import Any
+
+from sqlalchemy import delete, desc, insert, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models import Session, Message
+from app.repositories.base import (
+    BaseRepository,
+    InvalidCursorError,
+    PaginatedResult,
+    PaginationParams,
+)
 
 
-class BaseRepository:
-    """基础仓储类"""
-
-    def __init__(self, model, session: AsyncSession) -> None:
-        self.model = model
-        self.session = session
-
-    async def get(self, id: str):
-        statement = select(self.model).where(self.model.id == id)
-        result = await self.session.execute(statement)
-        return result.scalar_one_or_none()
-
-    async def create(self, obj):
-        self.session.add(obj)
-        await self.session.flush()
-        await self.session.refresh(obj)
-        return obj
-
-    async def delete(self, id: str) -> bool:
-        obj = await self.get(id)
-        if obj:
-            await self.session.delete(obj)
-            return True
-        return False
-
-    async def count(self, **filters) -> int:
-        statement = select(func.count()).select_from(self.model)
-        for field, value in filters.items():
-            statement = statement.where(getattr(self.model, field) == value)
-        result = await self.session.execute(statement)
-        return result.scalar() or 0
-
-
-class SessionRepository(BaseRepository):
+class SessionRepository(BaseRepository[Session]):
     """会话仓储"""
 
     def __init__(self, session: AsyncSession) -> None:
@@ -56,8 +32,19 @@ class SessionRepository(BaseRepository):
         result = await self.session.execute(statement)
         return list(result.scalars().all())
 
+    async def page_by_user(
+        self, user_id: str | None, params: PaginationParams
+    ) -> PaginatedResult[Session]:
+        """按创建时间倒序分页列出会话（支持游标）"""
+        statement = select(Session).where(Session.deleted_at.is_(None))
+        if user_id:
+            statement = statement.where(Session.user_id == user_id)
+        return await self.paginate(
+            statement, [Session.created_at.desc(), Session.id.desc()], params
+        )
 
-class MessageRepository(BaseRepository):
+
+class MessageRepository(BaseRepository[Message]):
     """消息仓储"""
 
     def __init__(self, session: AsyncSession) -> None:
@@ -70,9 +57,43 @@ class MessageRepository(BaseRepository):
         result = await self.session.execute(statement)
         return list(result.scalars().all())
 
+    async def page_by_session(
+        self, session_id: str, params: PaginationParams
+    ) -> PaginatedResult[Message]:
+        """从最新的消息开始倒序分页（支持游标），下一页为更早的消息"""
+        statement = select(Message).where(
+            Message.session_id == session_id, Message.deleted_at.is_(None)
+        )
+        return await self.paginate(
+            statement, [Message.created_at.desc(), Message.id.desc()], params
+        )
+
+    async def delete_by_session(self, session_id: str) -> int:
+        """删除会话的全部消息，返回删除行数"""
+        result = await self.session.execute(
+            delete(Message).where(Message.session_id == session_id)
+        )
+        return result.rowcount
+
+    async def bulk_insert(self, rows: Sequence[dict[str, Any]]) -> int:
+        """批量插入消息（多行 INSERT，不回读实例）
+
+        Args:
+            rows: 消息字段字典，按插入顺序排列
+
+        Returns:
+            插入的行数
+        """
+        if rows:
+            await self.session.execute(insert(Message), list(rows))
+        return len(rows)
+
 
 __all__ = [
     "BaseRepository",
+    "InvalidCursorError",
+    "PaginatedResult",
+    "PaginationParams",
     "SessionRepository",
     "MessageRepository",
 ]
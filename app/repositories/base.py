@@ -0,0 +1,327 @@
+"""仓储基类与分页
+
+提供通用 CRUD、页码分页与游标（keyset）分页。
+
+总数统计方式由 ``PaginationParams.count`` 选择:
+
+- ``inline``（默认）：总数作为标量子查询随页数据一起返回，一次往返。
+  不用 ``count(*) over()``：窗口函数要先物化全部匹配行才能 LIMIT，
+  20 万行时比单独计数慢数倍
+- ``exact``：单独执行一次 ``count(*)``
+- ``estimate``：PostgreSQL 取查询计划的估算行数，数量级大时避免全量计数；
+  估算值较小或其他数据库时退回精确计数
+- ``none``：不计数，只返回 ``has_more``
+
+游标分页按排序键（如 ``(created_at, id)``）定位上一页最后一行，
+``WHERE (created_at, id) > (:created_at, :id)`` 直接走索引，翻到第 N 页的耗时
+与第 1 页相同；OFFSET 分页需要先扫描并丢弃前面所有行。
+
+使用示例:
+```python
+page = await repository.paginate(
+    statement, [Message.created_at.desc(), Message.id.desc()], PaginationParams(size=20)
+)
+next_page = await repository.paginate(
+    statement, [...], PaginationParams(size=20, cursor=page.next_cursor)
+)
+```
+"""
+
+import base64
+import json
+from collections.abc import Sequence
+from datetime import datetime
+from typing import Any, Literal
+
+from pydantic import BaseModel, Field
+from sqlalchemy import Select, and_, false, func, or_, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import UnaryExpression
+
+CountMode = Literal["inline", "exact", "estimate", "none"]
+
+# 估算行数低于该值时改为精确计数
+_ESTIMATE_EXACT_BELOW = 10_000
+
+
+class InvalidCursorError(ValueError):
+    """游标无法解析或与当前排序不匹配"""
+
+
+class PaginationParams(BaseModel):
+    """分页参数
+
+    传入 ``cursor`` 时按游标分页（忽略 ``page``），否则按页码分页。
+    """
+
+    page: int = Field(default=1, ge=1)
+    size: int = Field(default=20, ge=1, le=500)
+    cursor: str | None = None
+    # 总数统计方式
+    count: CountMode = "inline"
+
+    @property
+    def offset(self) -> int:
+        return (self.page - 1) * self.size
+
+    @property
+    def limit(self) -> int:
+        return self.size
+
+
+class PaginatedResult[T](BaseModel):
+    """分页结果"""
+
+    items: list[T]
+    # 总数，``count="none"`` 时为空
+    total: int | None
+    page: int
+    size: int
+    # 下一页游标，没有下一页时为空
+    next_cursor: str | None = None
+    has_more: bool = False
+    # total 是否为查询计划估算值
+    estimated: bool = False
+
+    @property
+    def pages(self) -> int | None:
+        if self.total is None:
+            return None
+        return (self.total + self.size - 1) // self.size if self.size else 0
+
+    @classmethod
+    def create(
+        cls,
+        items: Sequence[T],
+        total: int | None,
+        params: PaginationParams,
+        next_cursor: str | None = None,
+        *,
+        has_more: bool = False,
+        estimated: bool = False,
+    ) -> "PaginatedResult[T]":
+        return cls(
+            items=list(items),
+            total=total,
+            page=params.page,
+            size=params.size,
+            next_cursor=next_cursor,
+            has_more=has_more,
+            estimated=estimated,
+        )
+
+
+def encode_cursor(values: Sequence[Any], keys: Sequence[str] = ()) -> str:
+    """编码游标（不透明的 URL 安全字符串）
+
+    Args:
+        values: 排序键取值
+        keys: 排序键名称，解码时校验，防止把一个列表的游标用在另一个列表上
+    """
+    encoded = [
+        {"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values
+    ]
+    payload = {"k": list(keys), "v": encoded}
+    raw = json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(token: str, keys: Sequence[str] = ()) -> list[Any]:
+    """解码游标
+
+    Raises:
+        InvalidCursorError: 游标无法解析或排序键不匹配
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = [
+            datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value
+            for value in payload["v"]
+        ]
+    except (ValueError, TypeError, KeyError) as e:
+        raise InvalidCursorError("Invalid pagination cursor.") from e
+    if payload.get("k") != list(keys) or (keys and len(values) != len(keys)):
+        raise InvalidCursorError("Pagination cursor does not match this listing.")
+    return values
+
+
+def _order_columns(order_by: Sequence[Any]) -> list[tuple[Any, bool]]:
+    """把 ``column.asc()`` / ``column.desc()`` 拆成 (列, 是否倒序)"""
+    columns = []
+    for clause in order_by:
+        if isinstance(clause, UnaryExpression) and clause.modifier in (
+            operators.asc_op,
+            operators.desc_op,
+        ):
+            columns.append((clause.element, clause.modifier is operators.desc_op))
+        else:
+            columns.append((clause, False))
+    return columns
+
+
+def keyset_filter(columns: Sequence[tuple[Any, bool]], values: Sequence[Any]) -> Any:
+    """排在游标之后的行的过滤条件
+
+    方向一致时用行值比较 ``(a, b) > (:a, :b)``，可以直接走联合索引；
+    方向混合时展开为 ``a > :a OR (a = :a AND b < :b) ...``。
+    """
+    directions = {descending for _, descending in columns}
+    if len(directions) == 1:
+        row = tuple_(*(column for column, _ in columns))
+        bound = tuple_(*values)
+        return row < bound if directions.pop() else row > bound
+
+    clauses = []
+    for i, (column, descending) in enumerate(columns):
+        equal = [columns[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, column < values[i] if descending else column > values[i]))
+    return or_(false(), *clauses)
+
+
+class BaseRepository[T]:
+    """基础仓储类"""
+
+    def __init__(self, model: type[T], session: AsyncSession) -> None:
+        self.model = model
+        self.session = session
+
+    async def get(self, id: str) -> T | None:
+        statement = select(self.model).where(self.model.id == id)
+        result = await self.session.execute(statement)
+        return result.scalar_one_or_none()
+
+    async def get_by_tenant(self, id: str, tenant_id: int) -> T | None:
+        statement = select(self.model).where(
+            self.model.id == id,
+            self.model.tenant_id == tenant_id,
+            self.model.deleted_at.is_(None),
+        )
+        result = await self.session.execute(statement)
+        return result.scalar_one_or_none()
+
+    async def create(self, obj: T) -> T:
+        self.session.add(obj)
+        await self.session.flush()
+        await self.session.refresh(obj)
+        return obj
+
+    async def delete(self, id: str) -> bool:
+        obj = await self.get(id)
+        if obj:
+            await self.session.delete(obj)
+            return True
+        return False
+
+    async def count(self, **filters: Any) -> int:
+        statement = select(func.count()).select_from(self.model)
+        for field, value in filters.items():
+            statement = statement.where(getattr(self.model, field) == value)
+        result = await self.session.execute(statement)
+        return result.scalar() or 0
+
+    async def paginate(
+        self,
+        statement: Select,
+        order_by: Sequence[Any],
+        params: PaginationParams,
+    ) -> PaginatedResult[T]:
+        """分页查询
+
+        Args:
+            statement: 已带过滤条件、未排序的查询
+            order_by: 排序键，最后一列须唯一（如 ``id``），保证游标位置确定
+            params: 分页参数，有 ``cursor`` 时按游标分页，``count`` 决定总数统计方式
+
+        Returns:
+            分页结果，``next_cursor`` 指向本页最后一行
+
+        Raises:
+            InvalidCursorError: 游标无法解析或与排序键不匹配
+        """
+        columns = _order_columns(order_by)
+        keys = [column.key for column, _ in columns]
+        filtered = statement.order_by(None)
+
+        page_stmt = statement.order_by(*order_by)
+        if params.cursor:
+            values = decode_cursor(params.cursor, keys)
+            page_stmt = page_stmt.where(keyset_filter(columns, values))
+        else:
+            page_stmt = page_stmt.offset(params.offset)
+
+        total: int | None = None
+        estimated = False
+        inline = params.count == "inline"
+        if inline:
+            # 不相关子查询只执行一次，且不受游标过滤影响
+            counter = self._count_statement(filtered).scalar_subquery()
+            page_stmt = page_stmt.add_columns(counter.label("_total"))
+        elif params.count == "exact":
+            total = await self._count(filtered)
+        elif params.count == "estimate":
+            total, estimated = await self._estimate(filtered)
+
+        # 多取一行判断是否还有下一页
+        result = await self.session.execute(page_stmt.limit(params.size + 1))
+        if inline:
+            rows = result.all()
+            items = [row[0] for row in rows]
+            # 越过末页时没有行可带回总数，补一次计数
+            total = rows[0][1] if rows else await self._count(filtered)
+        else:
+            items = list(result.scalars().all())
+
+        has_more = len(items) > params.size
+        next_cursor = None
+        if has_more:
+            del items[params.size :]
+            last = items[-1]
+            next_cursor = encode_cursor([getattr(last, key) for key in keys], keys)
+        return PaginatedResult.create(
+            items, total, params, next_cursor, has_more=has_more, estimated=estimated
+        )
+
+    @staticmethod
+    def _count_statement(statement: Select) -> Select:
+        return select(func.count()).select_from(statement.subquery())
+
+    async def _count(self, statement: Select) -> int:
+        result = await self.session.execute(self._count_statement(statement))
+        return result.scalar() or 0
+
+    async def _estimate(self, statement: Select) -> tuple[int, bool]:
+        """PostgreSQL 查询计划估算行数，返回 (总数, 是否估算)"""
+        bind = self.session.get_bind()
+        if bind.dialect.name != "postgresql":
+            return await self._count(statement), False
+
+        compiled = statement.compile(dialect=bind.dialect)
+        parameters = (
+            tuple(compiled.params[name] for name in compiled.positiontup)
+            if compiled.positional
+            else compiled.params
+        )
+        connection = await self.session.connection()
+        result = await connection.exec_driver_sql(
+            f"EXPLAIN (FORMAT JSON) {compiled}", parameters
+        )
+        plan = result.scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        rows = int(plan[0]["Plan"]["Plan Rows"])
+        if rows < _ESTIMATE_EXACT_BELOW:
+            return await self._count(statement), False
+        return rows, True
+
+__all__ = [
+    "BaseRepository",
+    "CountMode",
+    "InvalidCursorError",
+    "PaginatedResult",
+    "PaginationParams",
+    "decode_cursor",
+    "encode_cursor",
+    "keyset_filter",
+]
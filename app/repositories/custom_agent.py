@@ -0,0 +1,101 @@
+"""自定义 Agent Repository
+
+Agent 配置几乎每个请求都要读，通过热点行缓存读穿；更新和软删除提交后失效缓存。
+"""
+
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.infra.row_cache import get_row_cache
+from app.models.custom_agent import CustomAgent
+from app.observability.logging import get_logger
+from app.repositories.base import BaseRepository
+
+logger = get_logger(__name__)
+
+
+def _scope(agent_id: str) -> str:
+    return f"custom_agent:{agent_id}"
+
+
+class CustomAgentRepository(BaseRepository[CustomAgent]):
+    """自定义 Agent 仓储"""
+
+    def __init__(self, session: AsyncSession) -> None:
+        super().__init__(CustomAgent, session)
+
+    async def get_config(self, agent_id: str, tenant_id: int) -> dict[str, Any] | None:
+        """获取 Agent 配置（读穿缓存）
+
+        Args:
+            agent_id: Agent ID
+            tenant_id: 租户 ID
+
+        Returns:
+            配置副本，Agent 不存在、已删除或不属于该租户时为 None
+        """
+
+        async def load() -> dict[str, Any] | None:
+            result = await self.session.execute(
+                select(CustomAgent.config).where(
+                    CustomAgent.id == agent_id,
+                    CustomAgent.tenant_id == tenant_id,
+                    CustomAgent.deleted_at.is_(None),
+                )
+            )
+            row = result.one_or_none()
+            return None if row is None else dict(row.config or {})
+
+        return await get_row_cache().get_or_load(_scope(agent_id), f"config:{tenant_id}", load)
+
+    async def update_config(
+        self, agent_id: str, tenant_id: int, config: dict[str, Any]
+    ) -> CustomAgent | None:
+        """更新 Agent 配置并失效缓存
+
+        Args:
+            agent_id: Agent ID
+            tenant_id: 租户 ID
+            config: 新配置（整体替换）
+
+        Returns:
+            更新后的 Agent，不存在时为 None
+        """
+        agent = await self.get_by_tenant(agent_id, tenant_id)
+        if agent is None:
+            return None
+
+        agent.config = config
+        agent.updated_at = datetime.now(UTC)
+        await self.session.commit()
+        await get_row_cache().invalidate(_scope(agent_id))
+
+        logger.info("custom_agent_config_updated", agent_id=agent_id, tenant_id=tenant_id)
+        return agent
+
+    async def soft_delete(self, agent_id: str, tenant_id: int) -> bool:
+        """软删除 Agent 并失效缓存
+
+        Args:
+            agent_id: Agent ID
+            tenant_id: 租户 ID
+
+        Returns:
+            是否删除成功
+        """
+        agent = await self.get_by_tenant(agent_id, tenant_id)
+        if agent is None:
+            return False
+
+        agent.deleted_at = datetime.now(UTC)
+        await self.session.commit()
+        await get_row_cache().invalidate(_scope(agent_id))
+
+        logger.info("custom_agent_soft_deleted", agent_id=agent_id, tenant_id=tenant_id)
+        return True
+
+
+__all__ = ["CustomAgentRepository"]
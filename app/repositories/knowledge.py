@@ -0,0 +1,191 @@
+"""知识 Repository
+
+提供知识解析状态更新、分块批量写入与删除、重复分块提升和内容去重查询
+"""
+
+from collections.abc import AsyncIterator, Iterable, Sequence
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.knowledge import CHUNK_TYPE_DUPLICATE, CHUNK_TYPE_TEXT, Chunk, Knowledge
+from app.repositories import BaseRepository
+
+# IN 列表分批上限，避免超出数据库参数个数限制
+_IN_BATCH_SIZE = 500
+
+
+class KnowledgeRepository(BaseRepository):
+    """知识仓储"""
+
+    def __init__(self, session: AsyncSession) -> None:
+        super().__init__(Knowledge, session)
+
+    async def update_status(
+        self,
+        knowledge_id: str,
+        parse_status: str,
+        *,
+        error_message: str | None = None,
+        processed: bool = False,
+    ) -> None:
+        """更新解析状态
+
+        Args:
+            knowledge_id: 知识 ID
+            parse_status: 解析状态
+            error_message: 失败原因
+            processed: 是否写入完成时间
+        """
+        now = datetime.now(UTC)
+        values: dict[str, Any] = {
+            "parse_status": parse_status,
+            "error_message": error_message,
+            "updated_at": now,
+        }
+        if processed:
+            values["processed_at"] = now
+        await self.session.execute(
+            update(Knowledge).where(Knowledge.id == knowledge_id).values(**values)
+        )
+
+
+class ChunkRepository(BaseRepository):
+    """知识分块仓储"""
+
+    def __init__(self, session: AsyncSession) -> None:
+        super().__init__(Chunk, session)
+
+    async def bulk_insert(self, rows: Sequence[dict[str, Any]]) -> int:
+        """批量插入分块（executemany，不回读实例）
+
+        Args:
+            rows: 分块字段字典
+
+        Returns:
+            插入的行数
+        """
+        if rows:
+            await self.session.execute(insert(Chunk), list(rows))
+        return len(rows)
+
+    async def delete_by_knowledge(self, knowledge_id: str) -> list[str]:
+        """删除知识的全部分块（物理删除）
+
+        Args:
+            knowledge_id: 知识 ID
+
+        Returns:
+            删除的分块 ID
+        """
+        result = await self.session.execute(
+            delete(Chunk).where(Chunk.knowledge_id == knowledge_id).returning(Chunk.id)
+        )
+        return list(result.scalars())
+
+    async def promote_duplicates(self, tenant_id: int, canonical_ids: Sequence[str]) -> list[Chunk]:
+        """规范分块被删除后，为其重复分块重新选出规范分块
+
+        每个已删除规范分块的重复分块中，最早写入的一个提升为规范分块，其余改为指向它。
+
+        Args:
+            tenant_id: 租户 ID
+            canonical_ids: 已删除的规范分块 ID
+
+        Returns:
+            提升为规范分块的分块（需由调用方 Embedding 并加入检索索引）
+        """
+        now = datetime.now(UTC)
+        promoted: list[Chunk] = []
+        for start in range(0, len(canonical_ids), _IN_BATCH_SIZE):
+            stmt = (
+                select(Chunk)
+                .where(
+                    Chunk.tenant_id == tenant_id,
+                    Chunk.deleted_at.is_(None),
+                    Chunk.chunk_type == CHUNK_TYPE_DUPLICATE,
+                    Chunk.meta["duplicate_of"].as_string().in_(
+                        canonical_ids[start : start + _IN_BATCH_SIZE]
+                    ),
+                )
+                .order_by(Chunk.created_at, Chunk.knowledge_id, Chunk.chunk_index)
+            )
+            survivors: dict[str, Chunk] = {}
+            for chunk in (await self.session.execute(stmt)).scalars():
+                meta = dict(chunk.meta)
+                survivor = survivors.get(meta["duplicate_of"])
+                if survivor is None:
+                    survivors[meta.pop("duplicate_of")] = chunk
+                    meta.pop("similarity", None)
+                    chunk.chunk_type = CHUNK_TYPE_TEXT
+                else:
+                    meta["duplicate_of"] = survivor.id
+                chunk.meta = meta
+                chunk.updated_at = now
+            promoted.extend(survivors.values())
+        await self.session.flush()
+        return promoted
+
+    async def existing_hashes(
+        self, knowledge_base_id: str | None, tenant_id: int, hashes: Iterable[str]
+    ) -> dict[str, str]:
+        """查询已存在的内容哈希对应的规范分块
+
+        Args:
+            knowledge_base_id: 知识库 ID，为空时在整个租户内查询
+            tenant_id: 租户 ID
+            hashes: 待检查的内容哈希
+
+        Returns:
+            内容哈希到规范分块 ID 的映射
+        """
+        hashes = list(dict.fromkeys(hashes))
+        found: dict[str, str] = {}
+        for start in range(0, len(hashes), _IN_BATCH_SIZE):
+            stmt = select(Chunk.content_hash, Chunk.id).where(
+                *self._canonical_filters(knowledge_base_id, tenant_id),
+                Chunk.content_hash.in_(hashes[start : start + _IN_BATCH_SIZE]),
+            )
+            result = await self.session.execute(stmt)
+            for content_hash, chunk_id in result:
+                found.setdefault(content_hash, chunk_id)
+        return found
+
+    async def iter_canonical(
+        self, knowledge_base_id: str | None, tenant_id: int, batch_size: int = 1000
+    ) -> AsyncIterator[list[tuple[str, str]]]:
+        """流式读取规范分块（非重复分块）
+
+        Args:
+            knowledge_base_id: 知识库 ID，为空时读取整个租户
+            tenant_id: 租户 ID
+            batch_size: 每批行数
+
+        Yields:
+            (分块 ID, 内容) 列表
+        """
+        stmt = select(Chunk.id, Chunk.content).where(
+            *self._canonical_filters(knowledge_base_id, tenant_id)
+        )
+        result = await self.session.stream(stmt.execution_options(yield_per=batch_size))
+        async for partition in result.partitions(batch_size):
+            yield [(chunk_id, content) for chunk_id, content in partition]
+
+    @staticmethod
+    def _canonical_filters(knowledge_base_id: str | None, tenant_id: int) -> list[Any]:
+        filters = [
+            Chunk.tenant_id == tenant_id,
+            Chunk.deleted_at.is_(None),
+            Chunk.chunk_type != CHUNK_TYPE_DUPLICATE,
+        ]
+        if knowledge_base_id is not None:
+            filters.append(Chunk.knowledge_base_id == knowledge_base_id)
+        return filters
+
+
+__all__ = [
+    "ChunkRepository",
+    "KnowledgeRepository",
+]
@@ -0,0 +1,140 @@
+"""LLM 用量 Repository
+
+提供用量聚合行的累加写入和跨进程合并查询
+"""
+
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.llm_usage import UNATTRIBUTED_TENANT_ID, LLMUsage
+from app.repositories import BaseRepository
+
+# 累加列（冲突时 x = x + excluded.x）
+ADDITIVE_COLUMNS = (
+    "request_count",
+    "input_tokens",
+    "output_tokens",
+    "cached_tokens",
+    "cost",
+    "latency_ms",
+)
+
+_GROUP_COLUMNS = ("tenant_id", "model", "bucket_start")
+
+
+@dataclass
+class UsageTotal:
+    """用量合计"""
+
+    request_count: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cached_tokens: int = 0
+    cost: float = 0.0
+    latency_ms: float = 0.0
+    tenant_id: int | None = None
+    model: str | None = None
+    bucket_start: datetime | None = None
+
+
+def _insert_for(dialect_name: str) -> Any:
+    """按方言选择支持 ON CONFLICT 的 insert"""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise ValueError(f"不支持的数据库方言: {dialect_name}")
+    return insert
+
+
+class LLMUsageRepository(BaseRepository):
+    """LLM 用量仓储"""
+
+    def __init__(self, session: AsyncSession) -> None:
+        super().__init__(LLMUsage, session)
+
+    async def upsert_buckets(self, rows: Sequence[dict[str, Any]]) -> int:
+        """累加写入用量聚合行
+
+        单条多行 INSERT ... ON CONFLICT DO UPDATE，
+        多个进程写同一 (租户, 模型, 分钟) 时结果自动相加。
+
+        Args:
+            rows: 聚合行，键为 LLMUsage 列名
+
+        Returns:
+            写入行数
+        """
+        if not rows:
+            return 0
+
+        insert = _insert_for(self.session.bind.dialect.name)
+        table = LLMUsage.__table__
+        statement = insert(table).values(list(rows))
+        excluded = statement.excluded
+        set_ = {name: table.c[name] + excluded[name] for name in ADDITIVE_COLUMNS}
+        set_["updated_at"] = excluded.updated_at
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c[name] for name in _GROUP_COLUMNS],
+            set_=set_,
+        )
+        await self.session.execute(statement)
+        return len(rows)
+
+    async def get_totals(
+        self,
+        *,
+        tenant_id: int | None = None,
+        model: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        group_by: Sequence[str] = (),
+    ) -> list[UsageTotal]:
+        """查询合并后的用量合计
+
+        Args:
+            tenant_id: 租户过滤，``UNATTRIBUTED_TENANT_ID`` 表示未归属用量
+            model: 模型过滤
+            since: 起始分钟（含）
+            until: 结束分钟（不含）
+            group_by: 分组列，可选 tenant_id / model / bucket_start，为空时返回总计
+
+        Returns:
+            用量合计列表
+        """
+        unknown = set(group_by) - set(_GROUP_COLUMNS)
+        if unknown:
+            raise ValueError(f"不支持的分组列: {', '.join(sorted(unknown))}")
+
+        table = LLMUsage.__table__
+        group_columns = [table.c[name] for name in group_by]
+        statement = select(
+            *group_columns,
+            *(func.coalesce(func.sum(table.c[name]), 0).label(name) for name in ADDITIVE_COLUMNS),
+        )
+        if tenant_id is not None:
+            statement = statement.where(table.c.tenant_id == tenant_id)
+        if model is not None:
+            statement = statement.where(table.c.model == model)
+        if since is not None:
+            statement = statement.where(table.c.bucket_start >= since)
+        if until is not None:
+            statement = statement.where(table.c.bucket_start < until)
+        if group_columns:
+            statement = statement.group_by(*group_columns).order_by(*group_columns)
+
+        result = await self.session.execute(statement)
+        return [UsageTotal(**row) for row in result.mappings().all()]
+
+
+__all__ = [
+    "LLMUsageRepository",
+    "UsageTotal",
+    "UNATTRIBUTED_TENANT_ID",
+]
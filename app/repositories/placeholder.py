@@ -1,6 +1,7 @@
 """占位符仓储模块
 
-提供占位符的异步数据访问层。
+提供占位符的异步数据访问层。``list_by_agent`` 通过热点行缓存读穿，
+创建、更新和软删除提交后失效缓存。
 """
 
 from typing import Any
@@ -8,12 +9,21 @@ from typing import Any
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.infra.row_cache import get_row_cache
 from app.models.placeholder import Placeholder
 from app.observability.logging import get_logger
-from app.repositories.base import BaseRepository, PaginatedResult, PaginationParams
+from app.repositories.base import (
+    BaseRepository,
+    InvalidCursorError,
+    PaginatedResult,
+    PaginationParams,
+)
 
 logger = get_logger(__name__)
 
+# 全局占位符（agent_id 为空）出现在每个 Agent 的列表中，任何修改都作废整个作用域
+CACHE_SCOPE = "placeholders"
+
 
 class PlaceholderRepository(BaseRepository[Placeholder]):
     """占位符仓储
@@ -47,6 +57,7 @@ class PlaceholderRepository(BaseRepository[Placeholder]):
 
         await self.session.commit()
         await self.session.refresh(placeholder)
+        await get_row_cache().invalidate(CACHE_SCOPE)
 
         logger.info(
             "placeholder_created",
@@ -72,10 +83,13 @@ class PlaceholderRepository(BaseRepository[Placeholder]):
             agent_id: 过滤 Agent ID
             category: 过滤分类
             is_enabled: 过滤是否启用
-            params: 分页参数
+            params: 分页参数，带 ``cursor`` 时按游标分页
 
         Returns:
             分页结果
+
+        Raises:
+            InvalidCursorError: 游标无效
         """
         try:
             statement = select(Placeholder).where(
@@ -96,31 +110,18 @@ class PlaceholderRepository(BaseRepository[Placeholder]):
             if is_enabled is not None:
                 statement = statement.where(Placeholder.is_enabled == is_enabled)
 
-            # 按显示顺序和创建时间排序
-            statement = statement.order_by(
+            # 按显示顺序和创建时间排序，id 保证游标位置唯一
+            order_by = [
                 Placeholder.display_order.asc(),
                 Placeholder.created_at.desc(),
+                Placeholder.id.desc(),
+            ]
+            return await self.paginate(
+                statement, order_by, params or PaginationParams(page=1, size=100)
             )
 
-            # 获取总数
-            from sqlalchemy import func
-
-            count_stmt = select(func.count()).select_from(statement.subquery())
-            total_result = await self.session.execute(count_stmt)
-            total = total_result.scalar() or 0
-
-            # 分页
-            if params:
-                statement = statement.offset(params.offset).limit(params.limit)
-            else:
-                params = PaginationParams(page=1, size=100)
-                statement = statement.offset(params.offset).limit(params.limit)
-
-            items_result = await self.session.execute(statement)
-            items = list(items_result.scalars().all())
-
-            return PaginatedResult.create(items, total, params)
-
+        except InvalidCursorError:
+            raise
         except Exception as e:
             logger.error(
                 "placeholder_repository_list_failed",
@@ -132,20 +133,27 @@ class PlaceholderRepository(BaseRepository[Placeholder]):
     async def list_by_agent(
         self,
         agent_id: str,
+        tenant_id: int,
         *,
         is_enabled: bool | None = None,
     ) -> list[Placeholder]:
-        """按 Agent 列出占位符
+        """按 Agent 列出租户内的占位符（Agent 专属 + 租户全局，读穿缓存）
 
         Args:
             agent_id: Agent ID
+            tenant_id: 租户 ID，全局占位符只取本租户的
             is_enabled: 过滤是否启用
 
         Returns:
-            占位符列表
+            占位符列表（命中缓存时为游离副本，修改需通过 ``update_placeholder``）
+
+        Raises:
+            SQLAlchemyError: 查询失败（不返回空列表，避免调用方把失败当作没有占位符而缓存）
         """
-        try:
+
+        async def load() -> list[Placeholder]:
             statement = select(Placeholder).where(
+                Placeholder.tenant_id == tenant_id,
                 (Placeholder.agent_id == agent_id) | (Placeholder.agent_id.is_(None)),
             )
 
@@ -163,13 +171,19 @@ class PlaceholderRepository(BaseRepository[Placeholder]):
             result = await self.session.execute(statement)
             return list(result.scalars().all())
 
+        try:
+            return await get_row_cache().get_or_load(
+                CACHE_SCOPE, f"tenant:{tenant_id}:agent:{agent_id}:{is_enabled}", load
+            )
+
         except Exception as e:
             logger.error(
                 "placeholder_repository_list_by_agent_failed",
                 agent_id=agent_id,
+                tenant_id=tenant_id,
                 error=str(e),
             )
-            return []
+            raise
 
     async def get_by_name(
         self,
@@ -231,6 +245,7 @@ class PlaceholderRepository(BaseRepository[Placeholder]):
 
             placeholder.deleted_at = datetime.now(UTC)
             await self.session.commit()
+            await get_row_cache().invalidate(CACHE_SCOPE)
 
             logger.info("placeholder_soft_deleted", placeholder_id=placeholder_id)
             return True
@@ -270,6 +285,7 @@ class PlaceholderRepository(BaseRepository[Placeholder]):
 
             await self.session.commit()
             await self.session.refresh(placeholder)
+            await get_row_cache().invalidate(CACHE_SCOPE)
 
             logger.info("placeholder_updated", placeholder_id=placeholder.id)
             return placeholder
@@ -0,0 +1,125 @@
+"""租户 Repository
+
+租户配置几乎每个请求都要读，通过热点行缓存读穿；更新和软删除提交后失效缓存。
+"""
+
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.infra.row_cache import get_row_cache
+from app.models.tenant import Tenant
+from app.observability.logging import get_logger
+from app.repositories.base import BaseRepository
+
+logger = get_logger(__name__)
+
+# 可通过 update_config 修改的配置字段
+CONFIG_FIELDS = (
+    "retriever_engines",
+    "agent_config",
+    "context_config",
+    "conversation_config",
+    "web_search_config",
+    "kv_config",
+)
+
+
+def _scope(tenant_id: int) -> str:
+    return f"tenant:{tenant_id}"
+
+
+@dataclass
+class TenantConfig:
+    """租户配置快照（缓存副本，修改不会写回数据库）"""
+
+    id: int
+    status: str
+    retriever_engines: Any | None = None
+    agent_config: Any | None = None
+    context_config: Any | None = None
+    conversation_config: Any | None = None
+    web_search_config: Any | None = None
+    kv_config: Any | None = None
+
+
+class TenantRepository(BaseRepository[Tenant]):
+    """租户仓储"""
+
+    def __init__(self, session: AsyncSession) -> None:
+        super().__init__(Tenant, session)
+
+    async def get_config(self, tenant_id: int) -> TenantConfig | None:
+        """获取租户配置（读穿缓存）
+
+        Args:
+            tenant_id: 租户 ID
+
+        Returns:
+            配置快照，租户不存在或已删除时为 None
+        """
+
+        async def load() -> TenantConfig | None:
+            result = await self.session.execute(
+                select(Tenant).where(Tenant.id == tenant_id, Tenant.deleted_at.is_(None))
+            )
+            tenant = result.scalar_one_or_none()
+            if tenant is None:
+                return None
+            return TenantConfig(
+                id=tenant.id,
+                status=tenant.status,
+                **{field: getattr(tenant, field) for field in CONFIG_FIELDS},
+            )
+
+        return await get_row_cache().get_or_load(_scope(tenant_id), "config", load)
+
+    async def update_config(self, tenant_id: int, data: dict[str, Any]) -> Tenant | None:
+        """更新租户配置并失效缓存
+
+        Args:
+            tenant_id: 租户 ID
+            data: 配置字段，只接受 ``CONFIG_FIELDS`` 中的字段
+
+        Returns:
+            更新后的租户，不存在时为 None
+        """
+        tenant = await self.get(tenant_id)
+        if tenant is None or tenant.deleted_at is not None:
+            return None
+
+        for field, value in data.items():
+            if field in CONFIG_FIELDS:
+                setattr(tenant, field, value)
+        tenant.updated_at = datetime.now(UTC)
+        await self.session.commit()
+        await get_row_cache().invalidate(_scope(tenant_id))
+
+        logger.info("tenant_config_updated", tenant_id=tenant_id, fields=sorted(data))
+        return tenant
+
+    async def soft_delete(self, tenant_id: int) -> bool:
+        """软删除租户并失效缓存
+
+        Args:
+            tenant_id: 租户 ID
+
+        Returns:
+            是否删除成功
+        """
+        tenant = await self.get(tenant_id)
+        if tenant is None or tenant.deleted_at is not None:
+            return False
+
+        tenant.deleted_at = datetime.now(UTC)
+        await self.session.commit()
+        await get_row_cache().invalidate(_scope(tenant_id))
+
+        logger.info("tenant_soft_deleted", tenant_id=tenant_id)
+        return True
+
+
+__all__ = ["CONFIG_FIELDS", "TenantConfig", "TenantRepository"]
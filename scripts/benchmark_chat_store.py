@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""会话 / 消息存储基准测试
+
+在 100 万条消息规模下，对比消息 API 原先的全局列表（按会话过滤全表扫描、
+删除时重建列表）与 ``InMemoryChatStore`` 的索引实现；加 ``--database`` 时
+同时测试 ``DatabaseChatStore``（SQLite）。
+
+用法:
+    uv run python scripts/benchmark_chat_store.py
+    uv run python scripts/benchmark_chat_store.py --messages 200000 --per-session 50 --database
+"""
+
+import argparse
+import asyncio
+import gc
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from uuid import uuid4
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+from app.infra.chat_store import DatabaseChatStore, InMemoryChatStore
+from app.models import Message, Session
+from app.repositories import MessageRepository
+
+
+class ListStore:
+    """消息 API 原先的实现：全局列表"""
+
+    def __init__(self) -> None:
+        self.messages: list[dict] = []
+
+    async def add_message(self, session_id: str, role: str, content: str) -> dict:
+        message = {
+            "id": str(uuid4()),
+            "session_id": session_id,
+            "role": role,
+            "content": content,
+            "created_at": datetime.now().isoformat(),
+        }
+        self.messages.append(message)
+        return message
+
+    async def list_messages(self, session_id: str, limit: int = 100) -> list[dict]:
+        return [m for m in self.messages if m["session_id"] == session_id][-limit:]
+
+    async def delete_message(self, message_id: str) -> bool:
+        if not any(m["id"] == message_id for m in self.messages):
+            return False
+        self.messages = [m for m in self.messages if m["id"] != message_id]
+        return True
+
+
+async def timed(operation, arguments) -> float:
+    """逐个执行，返回中位延迟（毫秒）"""
+    latencies = []
+    for argument in arguments:
+        started = time.perf_counter()
+        await operation(argument)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies)
+
+
+async def run_store(name: str, store, args: argparse.Namespace, message_ids=None) -> None:
+    sessions = [f"session-{i}" for i in range(args.messages // args.per_session)]
+    started = time.perf_counter()
+    if message_ids is None:
+        message_ids = []
+        for index in range(args.messages):
+            record = await store.add_message(sessions[index % len(sessions)], "user", f"消息 {index}")
+            message_ids.append(record["id"] if isinstance(record, dict) else record.id)
+        load = f"写入 {args.messages / (time.perf_counter() - started):,.0f} 条/s"
+    else:
+        load = "批量导入"
+
+    rng = random.Random(0)  # noqa: S311
+    list_ms = await timed(
+        lambda session_id: store.list_messages(session_id, limit=args.limit),
+        rng.sample(sessions, args.operations),
+    )
+    delete_ms = await timed(store.delete_message, rng.sample(message_ids, args.operations))
+    print(f"{name:<10} {load:<22} 列表 {list_ms:>9.3f} ms   删除 {delete_ms:>9.3f} ms")
+
+
+async def run_database(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                SQLModel.metadata.create_all, tables=[Session.__table__, Message.__table__]
+            )
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+
+        sessions = args.messages // args.per_session
+        message_ids = [str(uuid4()) for _ in range(args.messages)]
+        now = datetime.now(UTC)
+        async with factory() as session:
+            repository = MessageRepository(session)
+            for start in range(0, args.messages, 10000):
+                await repository.bulk_insert([
+                    {
+                        "id": message_ids[index],
+                        "request_id": message_ids[index],
+                        "session_id": f"session-{index % sessions}",
+                        "role": "user",
+                        "content": f"消息 {index}",
+                        "is_completed": True,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for index in range(start, min(start + 10000, args.messages))
+                ])
+            await session.commit()
+        await run_store("数据库", DatabaseChatStore(factory), args, message_ids)
+        await engine.dispose()
+
+
+async def main(args: argparse.Namespace) -> None:
+    print(
+        f"{args.messages:,} 条消息，每个会话 {args.per_session} 条，"
+        f"列表 limit={args.limit}，各操作 {args.operations} 次取中位数"
+    )
+    await run_store("全局列表", ListStore(), args)
+    gc.collect()
+    await run_store("索引", InMemoryChatStore(), args)
+    gc.collect()
+    if args.database:
+        await run_database(args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="会话 / 消息存储基准测试")
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--per-session", type=int, default=100, help="每个会话的消息数")
+    parser.add_argument("--limit", type=int, default=20, help="列表接口的 limit")
+    parser.add_argument("--operations", type=int, default=20, help="每种操作的执行次数")
+    parser.add_argument("--database", action="store_true", help="同时测试 SQLite 数据库存储")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""连接池饱和压测（SQLite / aiosqlite）
+
+通过 ``app.infra.database`` 的共享引擎，逐级提高并发：每个请求取一个会话、
+执行一次查询并占用连接一段时间（模拟请求内的其他 IO），统计吞吐、延迟分位数
+以及 ``get_pool_stats()`` 的连接池指标。并发超过 ``pool_size + max_overflow``
+后请求开始排队，等待时间上升，超过 ``pool_timeout`` 的请求失败。
+
+用法:
+    uv run python scripts/benchmark_db_pool.py
+    uv run python scripts/benchmark_db_pool.py --pool-size 5 --max-overflow 5 --hold 0.05 --pool-timeout 0.5
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+async def run_level(concurrency: int, args: argparse.Namespace) -> None:
+    from sqlalchemy import text
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+    from app.infra.database import close_db, get_pool_stats, session_scope
+
+    latencies: list[float] = []
+    failures = 0
+    deadline = time.perf_counter() + args.duration
+
+    async def worker() -> None:
+        nonlocal failures
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with session_scope() as session:
+                    await session.execute(text("SELECT 1"))
+                    await asyncio.sleep(args.hold)
+            except PoolTimeoutError:
+                failures += 1
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stats = get_pool_stats()
+    await close_db()
+
+    latencies.sort()
+    p50 = statistics.median(latencies) if latencies else 0.0
+    p99 = latencies[int(len(latencies) * 0.99) - 1] if latencies else 0.0
+    print(
+        f"{concurrency:>6} {len(latencies) / elapsed:>9.0f}/s {p50:>8.1f}ms {p99:>8.1f}ms"
+        f" {failures:>6} {stats['peak_checked_out']:>6} {stats['peak_overflow']:>6}"
+        f" {stats['avg_wait_ms']:>9.1f}ms {stats['max_wait_ms']:>9.1f}ms"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    capacity = args.pool_size + args.max_overflow
+    levels = args.concurrency or sorted({
+        max(1, args.pool_size // 2), args.pool_size, capacity, capacity * 2, capacity * 4
+    })
+    print(
+        f"pool_size={args.pool_size} max_overflow={args.max_overflow} "
+        f"pool_timeout={args.pool_timeout}s，每个请求占用连接 {args.hold * 1000:.0f}ms，"
+        f"每级 {args.duration}s"
+    )
+    print(
+        f"{'并发':>4} {'吞吐':>10} {'p50':>10} {'p99':>10} {'超时':>4} "
+        f"{'峰值占用':>4} {'峰值溢出':>4} {'平均等待':>7} {'最大等待':>7}"
+    )
+    for concurrency in levels:
+        await run_level(concurrency, args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="连接池饱和压测（SQLite / aiosqlite）")
+    parser.add_argument("--pool-size", type=int, default=5)
+    parser.add_argument("--max-overflow", type=int, default=5)
+    parser.add_argument("--pool-timeout", type=float, default=1.0)
+    parser.add_argument("--hold", type=float, default=0.02, help="每个请求占用连接的秒数")
+    parser.add_argument("--duration", type=float, default=3.0, help="每级并发的压测秒数")
+    parser.add_argument("--concurrency", type=int, nargs="*", help="并发级别，默认按池容量推算")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # 引擎在首次导入 app.infra.database 时读取配置
+        os.environ["KIKI_DATABASE_URL"] = f"sqlite+aiosqlite:///{directory}/bench.db"
+        os.environ["KIKI_DATABASE_POOL_SIZE"] = str(args.pool_size)
+        os.environ["KIKI_DATABASE_MAX_OVERFLOW"] = str(args.max_overflow)
+        os.environ["KIKI_DATABASE_POOL_TIMEOUT"] = str(args.pool_timeout)
+        asyncio.run(main(args))
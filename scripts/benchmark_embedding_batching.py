@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""批量 Embedding 基准测试
+
+启动本地假 Embedding 服务（OpenAI 兼容 /v1/embeddings），对比逐批串行调用
+与 BatchedEmbeddings 并发打包的吞吐，并验证失败批次重试后结果仍按输入顺序返回。
+
+用法:
+    uv run python scripts/benchmark_embedding_batching.py
+    uv run python scripts/benchmark_embedding_batching.py --texts 2000 --latency 0.05 --failure-rate 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from langchain_openai import OpenAIEmbeddings
+
+from app.llm.embedding_pipeline import PROVIDER_BATCH_LIMITS, BatchedEmbeddings
+
+
+class FakeEmbeddingServer(ThreadingHTTPServer):
+    """假 Embedding 服务
+
+    向量第一维为文本的编号，便于校验返回顺序。
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency: float, failure_rate: float, max_rows: int, dimensions: int):
+        super().__init__(("127.0.0.1", 0), FakeEmbeddingHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.max_rows = max_rows
+        self.dimensions = dimensions
+        self.requests = 0
+        self.failures = 0
+        # 固定种子，注入的失败可复现
+        self.rng = random.Random(0)  # noqa: S311
+        self.lock = threading.Lock()
+
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    server: FakeEmbeddingServer
+
+    def do_POST(self) -> None:
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        inputs = body["input"]
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            fail = server.rng.random() < server.failure_rate
+            if fail:
+                server.failures += 1
+
+        time.sleep(server.latency)
+        if len(inputs) > server.max_rows:
+            self._reply(400, {"error": {"message": f"batch size {len(inputs)} > {server.max_rows}"}})
+            return
+        if fail:
+            self._reply(500, {"error": {"message": "injected failure"}})
+            return
+
+        data = [
+            {
+                "object": "embedding",
+                "index": i,
+                "embedding": [float(text.split(":", 1)[0])] + [0.0] * (server.dimensions - 1),
+            }
+            for i, text in enumerate(inputs)
+        ]
+        self._reply(200, {"object": "list", "data": data, "model": body["model"], "usage": {}})
+
+    def _reply(self, status: int, payload: dict) -> None:
+        raw = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def make_texts(count: int) -> list[str]:
+    rng = random.Random(42)  # noqa: S311
+    words = ["向量", "检索", "知识库", "embedding", "batch", "文档", "chunk", "租户"]
+    return [f"{i}: " + " ".join(rng.choices(words, k=rng.randint(5, 200))) for i in range(count)]
+
+
+async def run_serial(client: OpenAIEmbeddings, texts: list[str], rows: int) -> list[list[float]]:
+    """手动按行数分块、逐块串行调用"""
+    vectors: list[list[float]] = []
+    for start in range(0, len(texts), rows):
+        vectors.extend(await client.aembed_documents(texts[start : start + rows]))
+    return vectors
+
+
+async def main(args: argparse.Namespace) -> None:
+    limits = PROVIDER_BATCH_LIMITS[args.provider]
+    server = FakeEmbeddingServer(args.latency, 0.0, limits.max_rows, args.dimensions)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+    client = OpenAIEmbeddings(
+        model="fake-embedding",
+        api_key="sk-fake",
+        base_url=base_url,
+        check_embedding_ctx_length=False,
+        chunk_size=limits.max_rows,
+        max_retries=0,
+    )
+    texts = make_texts(args.texts)
+    print(f"provider={args.provider} texts={len(texts)} rows/batch={limits.max_rows} "
+          f"latency={args.latency * 1000:.0f}ms")
+
+    start = time.perf_counter()
+    await run_serial(client, texts, limits.max_rows)
+    serial = time.perf_counter() - start
+    print(f"串行分块:     {serial:.2f}s  {len(texts) / serial:8.0f} texts/s  请求数 {server.requests}")
+
+    for concurrency in args.concurrency:
+        server.requests = 0
+        pipeline = BatchedEmbeddings(client, limits, max_concurrency=concurrency, retry_backoff=0.01)
+        start = time.perf_counter()
+        await pipeline.aembed_documents(texts)
+        elapsed = time.perf_counter() - start
+        print(f"并发={concurrency:<3}      {elapsed:.2f}s  {len(texts) / elapsed:8.0f} texts/s  "
+              f"请求数 {server.requests}  加速 {serial / elapsed:.1f}x")
+
+    # 注入失败，验证只重试失败批次且顺序正确
+    server.requests = server.failures = 0
+    server.failure_rate = args.failure_rate
+    pipeline = BatchedEmbeddings(client, limits, max_concurrency=max(args.concurrency), max_retries=8,
+                                 retry_backoff=0.01)
+    vectors = await pipeline.aembed_documents(texts)
+    ordered = all(int(vector[0]) == i for i, vector in enumerate(vectors))
+    batches = -(-len(texts) // limits.max_rows)
+    print(f"失败率 {args.failure_rate:.0%}: 批次 {batches}，请求 {server.requests}，"
+          f"注入失败 {server.failures}，顺序正确 {ordered}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="批量 Embedding 基准测试")
+    parser.add_argument("--provider", choices=sorted(PROVIDER_BATCH_LIMITS), default="dashscope")
+    parser.add_argument("--texts", type=int, default=1000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--latency", type=float, default=0.03, help="单次请求延迟（秒）")
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""混合检索基准测试
+
+合成中文语料，测量 BM25 关键词索引的构建耗时、倒排表内存、查询延迟，
+并对比关键词 + 向量检索串行执行与并发执行（``hybrid_search``）的端到端延迟。
+可用 --embed-latency 模拟查询 Embedding 的网络耗时，并发时关键词检索与之重叠。
+
+用法:
+    uv run python scripts/benchmark_hybrid_retrieval.py
+    uv run python scripts/benchmark_hybrid_retrieval.py --size 200000 --embed-latency 50
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from app.infra.keyword_index import KeywordIndex
+from app.infra.retrieval import RetrievalSettings, hybrid_search, keyword_search, vector_search
+from app.infra.vector_index import VectorIndex
+
+# 常用汉字，按频率近似 Zipf 分布抽样
+_CHARS = (
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+    "十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处理世车"
+)
+
+
+def make_corpus(size: int, words: int, seed: int = 0) -> list[str]:
+    rng = np.random.default_rng(seed)
+    chars = np.array(list(_CHARS))
+    weights = 1 / np.arange(1, len(chars) + 1)
+    weights /= weights.sum()
+    return ["".join(rng.choice(chars, words, p=weights)) for _ in range(size)]
+
+
+def main(args: argparse.Namespace) -> None:
+    rng = np.random.default_rng(1)
+    texts = make_corpus(args.size, args.words)
+    ids = [f"chunk-{i}" for i in range(args.size)]
+    tenants = rng.integers(0, args.tenants, args.size).tolist()
+    # 查询取自语料片段，保证有关键词命中
+    queries = [texts[i][j : j + args.query_chars] for i, j in zip(
+        rng.integers(0, args.size, args.queries), rng.integers(0, args.words - args.query_chars, args.queries),
+        strict=True,
+    )]
+    vectors = rng.standard_normal((args.size, args.dimensions)).astype(np.float32)
+    query_vectors = rng.standard_normal((args.queries, args.dimensions)).astype(np.float32)
+    print(f"size={args.size} words/doc={args.words} dims={args.dimensions} queries={args.queries}\n")
+
+    keyword_index = KeywordIndex()
+    start = time.perf_counter()
+    for offset in range(0, args.size, 1000):
+        keyword_index.add(ids[offset : offset + 1000], texts[offset : offset + 1000],
+                          tenant_id=tenants[offset : offset + 1000])
+    build = time.perf_counter() - start
+    memory = keyword_index.memory_usage()
+    print(f"关键词索引构建 {build:.2f}s ({args.size / build:,.0f} 文档/s)，"
+          f"倒排表 {memory['postings'] / 2**20:.1f}MB，文档元数据 {memory['documents'] / 2**20:.1f}MB")
+
+    vector_index = VectorIndex(args.dimensions)
+    vector_index.add(ids, vectors, tenant_id=tenants)
+    settings = RetrievalSettings(embedding_top_k=args.k, vector_threshold=0.0, keyword_threshold=0.0)
+
+    def timed(fn) -> float:
+        start = time.perf_counter()
+        for i, query in enumerate(queries):
+            fn(i, query)
+        return (time.perf_counter() - start) * 1000 / len(queries)
+
+    keyword_ms = timed(lambda i, q: keyword_search(keyword_index, q, settings, tenant_id=tenants[i]))
+    vector_ms = timed(lambda i, q: vector_search(vector_index, query_vectors[i], settings, tenant_id=tenants[i]))
+    print(f"关键词检索 {keyword_ms:.3f} ms/次，向量检索 {vector_ms:.3f} ms/次\n")
+
+    async def embed(i: int) -> np.ndarray:
+        await asyncio.sleep(args.embed_latency / 1000)
+        return query_vectors[i]
+
+    async def sequential(i: int, query: str) -> None:
+        vector = await embed(i)
+        vector_search(vector_index, vector, settings, tenant_id=tenants[i])
+        keyword_search(keyword_index, query, settings, tenant_id=tenants[i])
+
+    async def concurrent(i: int, query: str) -> None:
+        await hybrid_search(vector_index, keyword_index, query, embed(i), settings, tenant_id=tenants[i])
+
+    async def run(fn) -> float:
+        start = time.perf_counter()
+        for i, query in enumerate(queries):
+            await fn(i, query)
+        return (time.perf_counter() - start) * 1000 / len(queries)
+
+    sequential_ms = asyncio.run(run(sequential))
+    concurrent_ms = asyncio.run(run(concurrent))
+    print(f"{'串行（Embedding -> 向量 -> 关键词）':<32} {sequential_ms:8.3f} ms/次")
+    print(f"{'并发 hybrid_search':<32} {concurrent_ms:8.3f} ms/次 ({sequential_ms / concurrent_ms:.2f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="混合检索基准测试")
+    parser.add_argument("--size", type=int, default=50_000)
+    parser.add_argument("--words", type=int, default=300, help="每个分块的字数")
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--query-chars", type=int, default=8)
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--embed-latency", type=float, default=20.0, help="模拟查询 Embedding 耗时（毫秒）")
+    main(parser.parse_args())
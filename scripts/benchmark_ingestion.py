@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""文档入库管道基准测试
+
+生成多页 PDF 和多工作表 XLSX，使用本地 SQLite 和假 Embedding
+（固定延迟模拟网络耗时）跑完整的解析 → 切分 → 去重 → Embedding → 写入流程，
+对比不同解析进程数下的耗时，并报告主进程峰值内存。
+
+用法:
+    uv run python scripts/benchmark_ingestion.py
+    uv run python scripts/benchmark_ingestion.py --pages 500 --rows 50000 --workers 1 2 4
+"""
+
+import argparse
+import asyncio
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import multiprocessing
+
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.ingestion.parsers import warm_up
+from app.ingestion.pipeline import IngestionPipeline
+from app.models.knowledge import Chunk, Knowledge
+
+
+class FakeEmbeddings(Embeddings):
+    """固定延迟的假 Embedding"""
+
+    def __init__(self, latency: float, dimensions: int = 8) -> None:
+        self.latency = latency
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [[float(len(text))] * self.dimensions for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        await asyncio.sleep(self.latency)
+        return self.embed_documents(texts)
+
+
+def make_pdf(path: Path, pages: int) -> None:
+    import pymupdf
+
+    document = pymupdf.open()
+    for number in range(pages):
+        page = document.new_page()
+        text = "\n".join(
+            f"Section {number}.{line}: knowledge base ingestion benchmark paragraph {line}." for line in range(40)
+        )
+        page.insert_textbox(page.rect + (36, 36, -36, -36), text, fontsize=9)
+        if number % 10 == 0:
+            # 重复页脚，测试去重
+            page.insert_text((36, 820), "Confidential - do not distribute", fontsize=8)
+    document.save(path)
+
+
+def make_xlsx(path: Path, rows: int, sheets: int) -> None:
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    for sheet_number in range(sheets):
+        sheet = workbook.create_sheet(f"Sheet{sheet_number}")
+        for row in range(rows // sheets):
+            sheet.append([row, f"item-{sheet_number}-{row}", row * 1.5, "备注"])
+    workbook.save(path)
+
+
+async def run(args: argparse.Namespace, files: list[Path], workers: int, database: Path) -> None:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Chunk.__table__.create)
+        await conn.run_sync(Knowledge.__table__.create)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    knowledges = []
+    async with session_factory() as session:
+        for number, file in enumerate(files):
+            knowledge = Knowledge(
+                id=f"k{number}", tenant_id=1, knowledge_base_id="kb", type="file",
+                title=file.name, source="local", file_path=str(file), file_type=file.suffix[1:],
+            )
+            session.add(knowledge)
+            knowledges.append(knowledge)
+        await session.commit()
+
+    executor = ProcessPoolExecutor(
+        workers, mp_context=multiprocessing.get_context("spawn"), initializer=warm_up
+    )
+    # 启动并预热全部子进程，不计入耗时
+    list(executor.map(time.sleep, [0.2] * workers))
+    pipeline = IngestionPipeline(
+        FakeEmbeddings(args.embed_latency / 1000),
+        session_factory=session_factory,
+        executor=executor,
+        pages_per_unit=args.pages_per_unit,
+        embed_batch_size=args.batch_size,
+    )
+    start = time.perf_counter()
+    final = {}
+    async for progress in pipeline.ingest_many(knowledges, concurrency=len(knowledges)):
+        final[progress.knowledge_id] = progress
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+
+    async with session_factory() as session:
+        stored = await session.scalar(select(func.count()).select_from(Chunk))
+    await engine.dispose()
+    summary = ", ".join(
+        f"{p.knowledge_id}: {p.status} {p.chunks_stored} 块 / 重复 {p.chunks_duplicate}" for p in final.values()
+    )
+    print(f"workers={workers:<3} {elapsed:7.2f}s  入库 {stored} 块  ({summary})")
+
+
+def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        files = [tmp_path / "bench.pdf", tmp_path / "bench.xlsx"]
+        make_pdf(files[0], args.pages)
+        make_xlsx(files[1], args.rows, args.sheets)
+        print(f"pdf {args.pages} 页 ({files[0].stat().st_size / 2**20:.1f}MB)，"
+              f"xlsx {args.rows} 行 / {args.sheets} 表 ({files[1].stat().st_size / 2**20:.1f}MB)\n")
+        for workers in args.workers:
+            asyncio.run(run(args, files, workers, tmp_path / f"bench-{workers}.db"))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"\n主进程峰值内存 {peak:.0f}MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="文档入库管道基准测试")
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--sheets", type=int, default=4)
+    parser.add_argument("--pages-per-unit", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--embed-latency", type=float, default=5.0, help="模拟每批 Embedding 耗时（毫秒）")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    main(parser.parse_args())
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""Matryoshka 两阶段检索基准测试
+
+完整维度存储向量，粗排只用前 N 维，再对候选用完整维度重排。
+对比不同粗排维度、是否预先生成前缀矩阵以及重排倍数下的延迟和 recall@k。
+
+合成向量的各维方差随维度递减，模拟 Matryoshka 训练的 Embedding
+（text-embedding-v4 支持 64-2048 维截断）把信息集中在前缀维度上。
+
+用法:
+    uv run python scripts/benchmark_matryoshka_search.py
+    uv run python scripts/benchmark_matryoshka_search.py --dimensions 2048 --stages 128 256 512
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from app.infra.vector_index import VectorIndex
+
+
+def make_corpus(size: int, dimensions: int, clusters: int, noise: float, seed: int = 0) -> np.ndarray:
+    """生成前缀维度信息量更高的聚簇向量"""
+    rng = np.random.default_rng(seed)
+    decay = (1.0 / np.sqrt(1.0 + np.arange(dimensions) / 32.0)).astype(np.float32)
+    centers = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    vectors = centers[labels] + noise * rng.standard_normal((size, dimensions)).astype(np.float32)
+    return vectors * decay
+
+
+def measure(index: VectorIndex, queries: np.ndarray, k: int, **kwargs) -> tuple[list[list[str]], float]:
+    start = time.perf_counter()
+    results = [[hit.id for hit in index.search(query, k, **kwargs)] for query in queries]
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall(results: list[list[str]], truth: list[list[str]]) -> float:
+    return float(np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth, strict=True)]))
+
+
+def main(args: argparse.Namespace) -> None:
+    corpus = make_corpus(args.size + args.queries, args.dimensions, args.clusters, args.noise)
+    vectors, queries = corpus[: args.size], corpus[args.size :]
+    ids = [f"chunk-{i}" for i in range(args.size)]
+    print(f"size={args.size} dims={args.dimensions} queries={args.queries} k={args.k}\n")
+    print(f"{'模式':<28} {'粗排内存':>10} {'延迟':>12} {'recall':>8}")
+
+    full = VectorIndex(args.dimensions)
+    full.add(ids, vectors)
+    truth, latency = measure(full, queries, args.k)
+    print(f"{f'完整 {args.dimensions} 维':<28} {full.memory_usage()['total'] / 2**20:8.1f}MB "
+          f"{latency:8.3f} ms {1:8.3f}")
+
+    for stage in args.stages:
+        # 不预先生成前缀：查询时从完整向量截取
+        results, latency = measure(full, queries, args.k, search_dimensions=stage)
+        print(f"{f'{stage} 维粗排（现算前缀）':<28} {'-':>10} {latency:8.3f} ms "
+              f"{recall(results, truth):8.3f}")
+
+        for factor in args.rerank_factors:
+            index = VectorIndex(args.dimensions, search_dimensions=stage, rerank_factor=factor)
+            index.add(ids, vectors)
+            results, latency = measure(index, queries, args.k)
+            print(f"{f'{stage} 维粗排 重排x{factor}':<28} "
+                  f"{index.memory_usage()['codes'] / 2**20:8.1f}MB {latency:8.3f} ms "
+                  f"{recall(results, truth):8.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Matryoshka 两阶段检索基准测试")
+    parser.add_argument("--size", type=int, default=50_000)
+    parser.add_argument("--dimensions", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=1.0, help="簇内噪声，越大越难检索")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--stages", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--rerank-factors", type=int, nargs="+", default=[4, 10])
+    main(parser.parse_args())
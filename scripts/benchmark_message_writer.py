@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""消息写入基准测试（SQLite）
+
+对比逐条写入（``BaseRepository.create``：add + flush + refresh + commit）与
+``MessageWriter`` 异步攒批写入的吞吐，并校验每个会话的消息顺序。
+
+用法:
+    uv run python scripts/benchmark_message_writer.py
+    uv run python scripts/benchmark_message_writer.py --sessions 50 --messages 100 --batch-size 500
+"""
+
+import argparse
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+from uuid import uuid4
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+from app.infra.message_writer import MessageWriter
+from app.models import Message, Session
+from app.repositories import MessageRepository
+
+
+async def produce(args: argparse.Namespace, write) -> float:
+    """每个会话一个协程，按顺序写入消息"""
+
+    async def conversation(session_id: str) -> None:
+        for index in range(args.messages):
+            await write(session_id, "user" if index % 2 == 0 else "assistant", f"{index}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(conversation(f"session-{i}") for i in range(args.sessions)))
+    return time.perf_counter() - started
+
+
+async def check_order(factory, args: argparse.Namespace) -> bool:
+    async with factory() as session:
+        result = await session.execute(
+            select(Message.session_id, Message.content).order_by(Message.created_at)
+        )
+        contents: dict[str, list[int]] = {}
+        for session_id, content in result:
+            contents.setdefault(session_id, []).append(int(content))
+    expected = list(range(args.messages))
+    return len(contents) == args.sessions and all(v == expected for v in contents.values())
+
+
+async def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                SQLModel.metadata.create_all, tables=[Session.__table__, Message.__table__]
+            )
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        total = args.sessions * args.messages
+        print(f"{args.sessions} 个会话 × {args.messages} 条消息 = {total} 条")
+
+        # 逐条写入：SQLite 单写者，用锁串行化
+        lock = asyncio.Lock()
+
+        async def write_one(session_id: str, role: str, content: str) -> None:
+            async with lock, factory() as session:
+                message = Message(
+                    id=str(uuid4()), request_id=str(uuid4()), session_id=session_id,
+                    role=role, content=content, is_completed=True,
+                )
+                await MessageRepository(session).create(message)
+                await session.commit()
+
+        elapsed = await produce(args, write_one)
+        print(f"逐条写入   {total / elapsed:>10.0f} 条/s  顺序正确={await check_order(factory, args)}")
+
+        async with factory() as session:
+            await session.execute(delete(Message))
+            await session.commit()
+
+        writer = MessageWriter(
+            interval=args.interval, batch_size=args.batch_size, session_factory=factory
+        )
+        started = time.perf_counter()
+        writer.start()
+        enqueue_elapsed = await produce(args, writer.enqueue)
+        await writer.stop()
+        elapsed = time.perf_counter() - started
+        print(
+            f"异步写入   {total / elapsed:>10.0f} 条/s  顺序正确={await check_order(factory, args)}"
+            f"  （入队 {total / enqueue_elapsed:.0f} 条/s，写入 {writer.written} 条）"
+        )
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="消息写入基准测试（SQLite）")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--messages", type=int, default=100, help="每个会话的消息数")
+    parser.add_argument("--interval", type=float, default=0.05, help="写入周期（秒）")
+    parser.add_argument("--batch-size", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
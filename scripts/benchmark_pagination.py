@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""分页基准测试（SQLite）
+
+在单个会话的大量消息上对比 OFFSET 分页与游标分页取第 N 页的耗时：
+OFFSET 需要扫描并丢弃前面所有行，耗时随页数线性增长；游标分页按
+(created_at, id) 索引直接定位，耗时与页数无关。另外对比各种总数统计方式
+（``PaginationParams.count``）取一页的耗时。
+
+用法:
+    uv run python scripts/benchmark_pagination.py
+    uv run python scripts/benchmark_pagination.py --messages 500000 --size 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from uuid import uuid4
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+from app.infra.migrations import SOFT_DELETE_INDEXES, Migration, apply_migrations
+from app.models import Message, Session
+from app.repositories import MessageRepository, PaginationParams
+from app.repositories.base import encode_cursor
+
+# 只建消息表的索引
+MESSAGE_INDEXES = Migration(
+    id="benchmark_message_indexes",
+    description="消息分页索引",
+    indexes=tuple(index for index in SOFT_DELETE_INDEXES.indexes if index.table == "messages"),
+)
+
+
+async def load(factory, args: argparse.Namespace) -> None:
+    started = datetime.now(UTC)
+    async with factory() as session:
+        repository = MessageRepository(session)
+        for start in range(0, args.messages, 10000):
+            rows = []
+            for index in range(start, min(start + 10000, args.messages)):
+                message_id = str(uuid4())
+                created_at = started + timedelta(milliseconds=index)
+                rows.append({
+                    "id": message_id,
+                    "request_id": message_id,
+                    "session_id": "session-0",
+                    "role": "user",
+                    "content": f"消息 {index}",
+                    "is_completed": True,
+                    "created_at": created_at,
+                    "updated_at": created_at,
+                })
+            await repository.bulk_insert(rows)
+        await session.commit()
+
+
+async def measure(factory, params: PaginationParams, repeat: int) -> float:
+    latencies = []
+    for _ in range(repeat):
+        async with factory() as session:
+            started = time.perf_counter()
+            await MessageRepository(session).page_by_session("session-0", params)
+            latencies.append((time.perf_counter() - started) * 1000)
+    return statistics.median(latencies)
+
+
+async def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                SQLModel.metadata.create_all, tables=[Session.__table__, Message.__table__]
+            )
+            # 分页排序键的联合索引由迁移创建
+            await conn.run_sync(apply_migrations, (MESSAGE_INDEXES,))
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        await load(factory, args)
+
+        # 第 N 页的游标即第 N-1 页最后一行的排序键
+        pages = [page for page in args.pages if page * args.size <= args.messages]
+        cursors: dict[int, str | None] = {}
+        async with factory() as session:
+            for page in pages:
+                if page == 1:
+                    cursors[page] = None
+                    continue
+                result = await session.execute(
+                    select(Message.created_at, Message.id)
+                    .where(Message.session_id == "session-0")
+                    .order_by(Message.created_at.desc(), Message.id.desc())
+                    .offset((page - 1) * args.size - 1)
+                    .limit(1)
+                )
+                cursors[page] = encode_cursor(list(result.one()), ["created_at", "id"])
+
+        print(f"{args.messages:,} 条消息，每页 {args.size} 条，中位耗时（count={args.count}）:")
+        print(f"{'页码':>8} {'OFFSET':>12} {'游标':>12}")
+        for page in pages:
+            offset_ms = await measure(
+                factory, PaginationParams(page=page, size=args.size, count=args.count), args.repeat
+            )
+            cursor_ms = await measure(
+                factory,
+                PaginationParams(size=args.size, cursor=cursors[page], count=args.count),
+                args.repeat,
+            )
+            print(f"{page:>8} {offset_ms:>10.2f}ms {cursor_ms:>10.2f}ms")
+
+        print("\n总数统计方式（第 1 页）:")
+        for mode in ("exact", "inline", "estimate", "none"):
+            params = PaginationParams(size=args.size, count=mode)
+            print(f"{mode:>8} {await measure(factory, params, args.repeat):>10.2f}ms")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="分页基准测试（SQLite）")
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--size", type=int, default=20)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 100, 1000, 5000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--count", choices=["inline", "exact", "estimate", "none"], default="none",
+        help="翻页对比时的总数统计方式",
+    )
+    asyncio.run(main(parser.parse_args()))
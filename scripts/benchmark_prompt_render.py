@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""提示词渲染基准测试
+
+对比每次渲染都重新编译 jinja2 模板和校验正则的朴素实现，与
+``PromptTemplateEngine`` 按 (agent_id, 占位符版本) 缓存编译结果后的渲染吞吐。
+
+用法:
+    uv run python scripts/benchmark_prompt_render.py
+    uv run python scripts/benchmark_prompt_render.py --agents 200 --renders 50000
+"""
+
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+
+from app.agent.prompt_template import PromptTemplateEngine
+from app.models.placeholder import Placeholder
+
+_TYPES = [
+    ("string", r"^.{1,100}$", "Kiki"),
+    ("number", r"^\d+$", "3"),
+    ("boolean", None, "true"),
+    ("array", None, "退货,换货,开票"),
+]
+
+
+def build_agent(agent_index: int, placeholders: int) -> tuple[str, list[Placeholder]]:
+    items = []
+    lines = [f"你是 Agent {agent_index} 的助手。"]
+    for index in range(placeholders):
+        variable_type, rule, default = _TYPES[index % len(_TYPES)]
+        name = f"var_{index}"
+        items.append(Placeholder(
+            id=f"ph-{agent_index}-{index}", tenant_id=1, agent_id=f"agent-{agent_index}",
+            name=name, variable_type=variable_type, validation_rule=rule, default_value=default,
+        ))
+        if variable_type == "array":
+            lines.append(f"{name}: {{% for item in {name} %}}{{{{ item }}}}；{{% endfor %}}")
+        elif variable_type == "boolean":
+            lines.append(f"{{% if {name} %}}{name} 已启用{{% endif %}}")
+        else:
+            lines.append(f"{name}: {{{{ {name} }}}}")
+    return "\n".join(lines), items
+
+
+def naive_render(source: str, placeholders: list[Placeholder], values: dict) -> str:
+    """每次渲染都编译模板和正则"""
+    environment = ImmutableSandboxedEnvironment(autoescape=False)
+    context = dict(values)
+    for placeholder in placeholders:
+        value = values.get(placeholder.name, placeholder.default_value)
+        if placeholder.validation_rule and not re.compile(placeholder.validation_rule).search(str(value)):
+            raise ValueError(placeholder.name)
+        if placeholder.variable_type == "number":
+            value = int(value)
+        elif placeholder.variable_type == "boolean":
+            value = str(value).lower() in ("true", "1", "yes", "on")
+        elif placeholder.variable_type == "array" and isinstance(value, str):
+            value = [item.strip() for item in value.split(",")]
+        context[placeholder.name] = value
+    return environment.from_string(source).render(context)
+
+
+def measure(label: str, renders: int, render) -> float:
+    started = time.perf_counter()
+    for index in range(renders):
+        render(index)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10} {renders / elapsed:>10,.0f} 次/秒  平均 {elapsed / renders * 1e6:>8.1f} µs")
+    return renders / elapsed
+
+
+def main(args: argparse.Namespace) -> None:
+    agents = [build_agent(index, args.placeholders) for index in range(args.agents)]
+    rng = random.Random(0)  # noqa: S311 - 基准数据，非安全用途
+    picks = [rng.randrange(args.agents) for _ in range(args.renders)]
+    values = [{"var_0": f"用户 {index}", "var_1": index % 100} for index in range(args.renders)]
+    print(f"{args.agents} 个 Agent，每个 {args.placeholders} 个占位符，渲染 {args.renders} 次")
+
+    naive_renders = min(args.renders, args.naive_renders)
+
+    def naive(index: int) -> None:
+        source, placeholders = agents[picks[index]]
+        naive_render(source, placeholders, values[index])
+
+    engine = PromptTemplateEngine(cache_size=args.agents)
+
+    def compiled(index: int) -> None:
+        source, placeholders = agents[picks[index]]
+        engine.compile(f"agent-{picks[index]}", 0, source, placeholders).render(values[index])
+
+    baseline = measure("每次编译", naive_renders, naive)
+    optimized = measure("编译缓存", args.renders, compiled)
+    print(f"提升 {optimized / baseline:.1f} 倍，编译 {engine.compilations} 次")
+
+    # 校验两种实现结果一致
+    for index in range(min(args.renders, 200)):
+        source, placeholders = agents[picks[index]]
+        expected = naive_render(source, placeholders, values[index])
+        actual = engine.compile(f"agent-{picks[index]}", 0, source, placeholders).render(values[index])
+        assert expected == actual, f"渲染结果不一致: agent-{picks[index]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="提示词渲染基准测试")
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--placeholders", type=int, default=12)
+    parser.add_argument("--renders", type=int, default=20000)
+    parser.add_argument("--naive-renders", type=int, default=1000)
+    main(parser.parse_args())
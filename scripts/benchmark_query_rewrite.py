@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""查询改写基准测试
+
+用带固定延迟的模拟 LLM 与模拟检索，对比:
+- 串行：先改写再检索
+- 推测：改写与原始查询检索并发，原始查询检索足够好时直接采用
+- 推测 + 缓存：同一批对话再次提问，直接命中 (历史哈希, 查询) 改写缓存
+
+用法:
+    uv run python scripts/benchmark_query_rewrite.py
+    uv run python scripts/benchmark_query_rewrite.py --llm-latency 0.6 --followup-ratio 0.7
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from langchain_core.messages import AIMessage
+
+from app.infra.vector_index import VectorHit
+from app.llm.rewrite import QueryRewriter, rewrite_and_retrieve
+
+
+class FakeLLM:
+    """模拟改写模型：追问补全为 "<主题> <问题>"，独立问题原样返回"""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        prompt = messages[-1].content
+        query = prompt.rsplit("最新问题: ", 1)[1]
+        if query.startswith("那"):
+            topic = prompt.split("user: ", 1)[1].split("\n", 1)[0]
+            query = f"{topic} {query[1:]}"
+        return AIMessage(content=query)
+
+
+@dataclass
+class Settings:
+    enable_rewrite: bool = True
+    max_rounds: int = 5
+
+
+def make_conversations(args: argparse.Namespace) -> list[tuple[str, list[dict]]]:
+    rng = np.random.default_rng(0)
+    conversations = []
+    for i in range(args.conversations):
+        history = [
+            {"role": "user", "content": f"产品{i}的保修政策"},
+            {"role": "assistant", "content": f"产品{i}保修两年。"},
+        ]
+        query = "那退货呢" if rng.random() < args.followup_ratio else f"产品{i}怎么退货"
+        conversations.append((query, history))
+    return conversations
+
+
+async def main(args: argparse.Namespace) -> None:
+    async def retrieve(query: str) -> list[VectorHit]:
+        await asyncio.sleep(args.retrieval_latency)
+        # 追问缺少主题，检索相似度低
+        return [VectorHit("chunk", 0.5 if query.startswith("那") else 0.9)]
+
+    conversations = make_conversations(args)
+    llm = FakeLLM(args.llm_latency)
+    settings = Settings()
+
+    async def sequential(rewriter: QueryRewriter, query: str, history: list[dict]):
+        return await retrieve(await rewriter.rewrite(query, history))
+
+    async def speculative(rewriter: QueryRewriter, query: str, history: list[dict]):
+        return await rewrite_and_retrieve(rewriter, retrieve, query, history, settings)
+
+    async def measure(name: str, rewriter: QueryRewriter, run) -> None:
+        llm.calls = 0
+        latencies = []
+        for query, history in conversations:
+            started = time.perf_counter()
+            await run(rewriter, query, history)
+            latencies.append(time.perf_counter() - started)
+        print(
+            f"{name:<10} 平均 {statistics.mean(latencies) * 1000:7.1f} ms  "
+            f"最大 {max(latencies) * 1000:7.1f} ms  LLM 调用 {llm.calls}"
+        )
+
+    print(
+        f"{args.conversations} 个对话，追问占比 {args.followup_ratio:.0%}，"
+        f"LLM {args.llm_latency * 1000:.0f} ms，检索 {args.retrieval_latency * 1000:.0f} ms"
+    )
+    await measure("串行", QueryRewriter(llm), sequential)
+    rewriter = QueryRewriter(llm)
+    await measure("推测", rewriter, speculative)
+    await measure("推测+缓存", rewriter, speculative)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="查询改写基准测试")
+    parser.add_argument("--conversations", type=int, default=50)
+    parser.add_argument("--followup-ratio", type=float, default=0.5, help="需要改写的追问占比")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="改写调用的模拟延迟（秒）")
+    parser.add_argument("--retrieval-latency", type=float, default=0.08, help="检索的模拟延迟（秒）")
+    asyncio.run(main(parser.parse_args()))
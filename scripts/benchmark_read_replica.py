@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""读写分离基准测试（两个 SQLite 文件分别充当主库与只读副本）
+
+副本在压测开始时由主库文件复制而来，之后不再同步（模拟复制延迟）。
+每个模拟请求在独立的任务上下文中运行：大部分请求只列出会话消息，
+少量请求先写入一条消息再列出消息。统计各库承担的语句数，
+并校验写入方在同一请求内总能读到自己的写（读自己的写）。
+
+用法:
+    uv run python scripts/benchmark_read_replica.py
+    uv run python scripts/benchmark_read_replica.py --requests 5000 --write-ratio 0.2
+"""
+
+import argparse
+import asyncio
+import contextvars
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from uuid import uuid4
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+
+from app.infra.chat_store import DatabaseChatStore
+from app.infra.database import create_session_factory
+from app.models import Message, Session
+from app.repositories import MessageRepository
+
+
+async def seed(path: Path, args: argparse.Namespace) -> list[str]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            SQLModel.metadata.create_all, tables=[Session.__table__, Message.__table__]
+        )
+    sessions = [f"session-{i}" for i in range(args.sessions)]
+    now = datetime.now(UTC)
+    factory = create_session_factory(engine)
+    async with factory() as session:
+        rows = []
+        for index in range(args.sessions * 20):
+            message_id = str(uuid4())
+            rows.append({
+                "id": message_id,
+                "request_id": message_id,
+                "session_id": sessions[index % args.sessions],
+                "role": "user",
+                "content": f"消息 {index}",
+                "is_completed": True,
+                "created_at": now,
+                "updated_at": now,
+            })
+        await MessageRepository(session).bulk_insert(rows)
+        await session.commit()
+    await engine.dispose()
+    return sessions
+
+
+async def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        primary_path = Path(directory) / "primary.db"
+        replica_path = Path(directory) / "replica.db"
+        sessions = await seed(primary_path, args)
+        shutil.copyfile(primary_path, replica_path)
+
+        primary = create_async_engine(f"sqlite+aiosqlite:///{primary_path}")
+        replica = create_async_engine(f"sqlite+aiosqlite:///{replica_path}")
+        statements = {"主库": 0, "副本": 0}
+        for name, engine in (("主库", primary), ("副本", replica)):
+
+            def count(*_, name: str = name) -> None:
+                statements[name] += 1
+
+            event.listen(engine.sync_engine, "before_cursor_execute", count)
+
+        store = DatabaseChatStore(create_session_factory(primary, replica))
+        stale = 0
+        rng = random.Random(0)  # noqa: S311
+
+        async def request(session_id: str, write: bool) -> None:
+            nonlocal stale
+            if not write:
+                await store.list_messages(session_id, limit=20)
+                return
+            record = await store.add_message(session_id, "user", "新消息")
+            page = await store.list_messages(session_id, limit=20)
+            if record.id not in {message.id for message in page.items}:
+                stale += 1
+
+        started = time.perf_counter()
+        writes = 0
+        for _ in range(args.requests):
+            write = rng.random() < args.write_ratio
+            writes += write
+            # 每个请求一个全新的上下文，写入后的主库粘滞只在本请求内有效
+            await asyncio.create_task(
+                request(rng.choice(sessions), write), context=contextvars.Context()
+            )
+        elapsed = time.perf_counter() - started
+
+        total = sum(statements.values())
+        print(
+            f"{args.requests} 个请求（其中 {writes} 个写入），"
+            f"{args.requests / elapsed:,.0f} 请求/s"
+        )
+        for name, value in statements.items():
+            print(f"{name}  {value:>7} 条语句  {value / total:>6.1%}")
+        print(f"写后读不到自己的写: {stale} 次")
+        await primary.dispose()
+        await replica.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="读写分离基准测试（SQLite）")
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="写入请求的比例")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""重排序阶段基准测试
+
+用带固定延迟的本地打分器模拟重排序模型，对比:
+- 全量打分：所有候选逐批打分后截断
+- 提前结束：已有 rerank_top_k 个候选超过阈值时停止
+- 分数缓存：同一问题再次检索时直接命中 (查询哈希, 分块 ID) 缓存
+
+用法:
+    uv run python scripts/benchmark_rerank.py
+    uv run python scripts/benchmark_rerank.py --candidates 200 --latency 0.08 --top-k 5
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from collections.abc import Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from app.llm.rerank import LexicalScorer, RerankCandidate, Reranker
+
+_CHARS = list(
+    "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经"
+)
+
+
+class SlowScorer(LexicalScorer):
+    """每次调用固定延迟的本地打分器"""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.calls = 0
+
+    async def ascore(self, query: str, documents: Sequence[str]) -> list[float]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return await super().ascore(query, documents)
+
+
+@dataclass
+class Settings:
+    rerank_top_k: int
+    rerank_threshold: float
+
+
+def make_queries(args: argparse.Namespace) -> list[tuple[str, list[RerankCandidate]]]:
+    """生成查询与候选：前排候选大多包含查询词，检索分数随排名递减"""
+    rng = np.random.default_rng(0)
+    queries = []
+    for q in range(args.queries):
+        query = "".join(rng.choice(_CHARS, 8))
+        candidates = []
+        for rank in range(args.candidates):
+            text = "".join(rng.choice(_CHARS, 200))
+            if rng.random() < max(0.9 - rank / args.candidates, 0.05):
+                text = query + text
+            candidates.append(RerankCandidate(f"{q}-{rank}", text, score=1.0 - rank / args.candidates))
+        queries.append((query, candidates))
+    return queries
+
+
+async def run(name: str, reranker: Reranker, queries, settings: Settings, scorer: SlowScorer) -> None:
+    scorer.calls = 0
+    started = time.perf_counter()
+    results = [await reranker.rerank(query, candidates, settings) for query, candidates in queries]
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:<12} {elapsed / len(queries) * 1000:>9.1f} ms/query  calls={scorer.calls:<5} "
+        f"hits/query={sum(map(len, results)) / len(queries):.1f}"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    queries = make_queries(args)
+    settings = Settings(args.top_k, args.threshold)
+    print(f"{args.queries} 个查询 × {args.candidates} 个候选, batch={args.batch_size}, 延迟 {args.latency * 1000:.0f} ms/调用")
+
+    scorer = SlowScorer(args.latency)
+    full = Reranker(scorer, batch_size=args.batch_size, max_concurrency=args.concurrency, cache_size=0)
+    # 全量打分：阈值满足个数设为不可达，截断在打分之后
+    full_settings = Settings(args.candidates + 1, args.threshold)
+    scorer.calls = 0
+    started = time.perf_counter()
+    for query, candidates in queries:
+        hits = await full.rerank(query, candidates, full_settings)
+        del hits[args.top_k :]
+    elapsed = time.perf_counter() - started
+    print(f"{'全量打分':<12} {elapsed / len(queries) * 1000:>9.1f} ms/query  calls={scorer.calls}")
+
+    reranker = Reranker(scorer, batch_size=args.batch_size, max_concurrency=args.concurrency)
+    await run("提前结束", reranker, queries, settings, scorer)
+    await run("提前结束+缓存", reranker, queries, settings, scorer)
+    print(f"缓存命中 {reranker.cache_hits}，实际打分 {reranker.scored}，跳过 {reranker.skipped}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="重排序阶段基准测试")
+    parser.add_argument("--queries", type=int, default=20)
+    parser.add_argument("--candidates", type=int, default=100, help="每个查询的候选数")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--threshold", type=float, default=0.65)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=2, help="每轮并发的打分请求数")
+    parser.add_argument("--latency", type=float, default=0.05, help="每次打分调用的模拟延迟（秒）")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""热点行缓存基准测试（SQLite）
+
+模拟每个请求读取租户配置、自定义 Agent 配置和占位符列表，对比直接查库与
+``RowCache`` 读穿缓存的延迟；期间按比例更新配置，校验更新后立即读到新值。
+
+用法:
+    uv run python scripts/benchmark_row_cache.py
+    uv run python scripts/benchmark_row_cache.py --requests 5000 --update-ratio 0.05
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+import app.infra.row_cache as row_cache
+from app.infra.row_cache import RowCache
+from app.models.custom_agent import CustomAgent
+from app.models.placeholder import Placeholder
+from app.models.tenant import Tenant
+from app.repositories.custom_agent import CustomAgentRepository
+from app.repositories.placeholder import PlaceholderRepository
+from app.repositories.tenant import TenantRepository
+
+
+async def seed(factory, args: argparse.Namespace) -> None:
+    async with factory() as session:
+        for tenant_id in range(1, args.tenants + 1):
+            session.add(Tenant(
+                id=tenant_id, name=f"租户 {tenant_id}", api_key=f"key-{tenant_id}", business="bench",
+                agent_config={"model": "gpt-4o", "temperature": 0.7, "version": 0},
+                context_config={"max_tokens": 8000}, web_search_config={"enabled": False},
+            ))
+            session.add(CustomAgent(
+                id=f"agent-{tenant_id}", tenant_id=tenant_id, name="助手",
+                config={"system_prompt": "你是 {{company_name}} 的助手", "version": 0},
+            ))
+            for index in range(args.placeholders):
+                session.add(Placeholder(
+                    id=f"ph-{tenant_id}-{index}", tenant_id=tenant_id, agent_id=f"agent-{tenant_id}",
+                    name=f"var_{index}", default_value=f"值 {index}", display_order=index,
+                ))
+        await session.commit()
+
+
+async def run(factory, args: argparse.Namespace, label: str, versions: dict[int, int]) -> None:
+    rng = random.Random(0)  # noqa: S311
+    latencies = []
+    stale = 0
+    for _ in range(args.requests):
+        tenant_id = rng.randint(1, args.tenants)
+        async with factory() as session:
+            if rng.random() < args.update_ratio:
+                versions[tenant_id] += 1
+                await TenantRepository(session).update_config(
+                    tenant_id, {"agent_config": {"model": "gpt-4o", "version": versions[tenant_id]}}
+                )
+            started = time.perf_counter()
+            config = await TenantRepository(session).get_config(tenant_id)
+            await CustomAgentRepository(session).get_config(f"agent-{tenant_id}", tenant_id)
+            await PlaceholderRepository(session).list_by_agent(f"agent-{tenant_id}", tenant_id, is_enabled=True)
+            latencies.append((time.perf_counter() - started) * 1000)
+        stale += config.agent_config["version"] != versions[tenant_id]
+    cache = row_cache.get_row_cache()
+    print(
+        f"{label:<8} 平均 {statistics.mean(latencies):>7.3f} ms  p50 {statistics.median(latencies):>7.3f} ms"
+        f"  命中 {cache.hits:>6}  未命中 {cache.misses:>6}  读到旧配置 {stale} 次"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/bench.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                SQLModel.metadata.create_all,
+                tables=[Tenant.__table__, CustomAgent.__table__, Placeholder.__table__],
+            )
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        await seed(factory, args)
+        print(
+            f"{args.tenants} 个租户，每个 Agent {args.placeholders} 个占位符，"
+            f"{args.requests} 个请求，{args.update_ratio:.0%} 的请求先更新租户配置"
+        )
+
+        # 各租户配置的当前版本，用于校验读到的是否为最新配置
+        versions = dict.fromkeys(range(1, args.tenants + 1), 0)
+        # 条目数为 0 相当于不缓存
+        row_cache._row_cache = RowCache(max_size=0)
+        await run(factory, args, "直接查库", versions)
+        row_cache._row_cache = RowCache(max_size=args.cache_size, ttl=args.ttl)
+        await run(factory, args, "读穿缓存", versions)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="热点行缓存基准测试（SQLite）")
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--placeholders", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--update-ratio", type=float, default=0.01)
+    parser.add_argument("--cache-size", type=int, default=10000)
+    parser.add_argument("--ttl", type=float, default=60.0)
+    asyncio.run(main(parser.parse_args()))
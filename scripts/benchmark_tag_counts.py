@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""标签计数基准测试（SQLite）
+
+渲染一页标签列表时，对比逐个标签调用 ``get_knowledge_count`` /
+``get_chunk_count``（2N 次查询）与 ``TagRepository.get_counts`` 一次分组查询，
+并校验两者结果一致。
+
+用法:
+    uv run python scripts/benchmark_tag_counts.py
+    uv run python scripts/benchmark_tag_counts.py --tags 500 --knowledge 50000 --page-size 100
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import UTC, datetime
+from pathlib import Path
+from uuid import uuid4
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+from app.infra.migrations import apply_migrations
+from app.models.knowledge import Chunk, Knowledge, KnowledgeTag
+from app.repositories.base import PaginationParams
+from app.repositories.tag import TagCounts, TagRepository
+
+TENANT_ID = 1
+KB_ID = "kb-0"
+
+
+async def load(factory, args: argparse.Namespace) -> None:
+    rng = random.Random(0)  # noqa: S311
+    now = datetime.now(UTC)
+    tag_ids = [str(uuid4()) for _ in range(args.tags)]
+    async with factory() as session:
+        await session.execute(insert(KnowledgeTag), [
+            {
+                "id": tag_id, "tenant_id": TENANT_ID, "knowledge_base_id": KB_ID,
+                "name": f"标签 {i}", "sort_order": i, "created_at": now, "updated_at": now,
+            }
+            for i, tag_id in enumerate(tag_ids)
+        ])
+        knowledge = []
+        for i in range(args.knowledge):
+            knowledge.append({
+                "id": str(uuid4()), "tenant_id": TENANT_ID, "knowledge_base_id": KB_ID,
+                "type": "file", "title": f"文档 {i}", "source": "upload",
+                "tag_id": rng.choice(tag_ids), "created_at": now, "updated_at": now,
+                # 少量已删除
+                "deleted_at": now if i % 20 == 0 else None,
+            })
+        await session.execute(insert(Knowledge), knowledge)
+        for start in range(0, len(knowledge), 1000):
+            await session.execute(insert(Chunk), [
+                {
+                    "id": str(uuid4()), "tenant_id": TENANT_ID, "knowledge_base_id": KB_ID,
+                    "knowledge_id": row["id"], "content": "", "chunk_index": index,
+                    "start_at": 0, "end_at": 0, "tag_id": row["tag_id"],
+                    "created_at": now, "updated_at": now,
+                }
+                for row in knowledge[start : start + 1000]
+                for index in range(args.chunks_per_knowledge)
+            ])
+        await session.commit()
+
+
+async def per_tag(repository: TagRepository, tag_ids: list[str]) -> dict[str, TagCounts]:
+    return {
+        tag_id: TagCounts(
+            await repository.get_knowledge_count(tag_id, TENANT_ID),
+            await repository.get_chunk_count(tag_id, TENANT_ID),
+        )
+        for tag_id in tag_ids
+    }
+
+
+async def bulk(repository: TagRepository, tag_ids: list[str]) -> dict[str, TagCounts]:
+    return await repository.get_counts(tag_ids, TENANT_ID)
+
+
+async def main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{directory}/bench.db")
+        queries = 0
+
+        def count_query(*_) -> None:
+            nonlocal queries
+            queries += 1
+
+        event.listen(engine.sync_engine, "before_cursor_execute", count_query)
+        async with engine.begin() as conn:
+            await conn.run_sync(
+                SQLModel.metadata.create_all,
+                tables=[KnowledgeTag.__table__, Knowledge.__table__, Chunk.__table__],
+            )
+            # ix_knowledges_tag_tenant / ix_chunks_tag_tenant
+            await conn.run_sync(apply_migrations)
+        factory = async_sessionmaker(engine, expire_on_commit=False)
+        await load(factory, args)
+        print(
+            f"{args.tags} 个标签，{args.knowledge:,} 篇知识，"
+            f"{args.knowledge * args.chunks_per_knowledge:,} 个分块，每页 {args.page_size} 个标签"
+        )
+
+        results = {}
+        for name, counter in (("逐个标签", per_tag), ("分组查询", bulk)):
+            latencies = []
+            for _ in range(args.repeat):
+                async with factory() as session:
+                    repository = TagRepository(session)
+                    page = await repository.list_by_kb(
+                        KB_ID, TENANT_ID, PaginationParams(size=args.page_size)
+                    )
+                    queries = 0
+                    started = time.perf_counter()
+                    results[name] = await counter(repository, [tag.id for tag in page.items])
+                    latencies.append((time.perf_counter() - started) * 1000)
+            print(f"{name}  {statistics.median(latencies):>9.2f} ms  {queries:>4} 次查询")
+        print(f"结果一致={results['逐个标签'] == results['分组查询']}")
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="标签计数基准测试（SQLite）")
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--knowledge", type=int, default=20_000)
+    parser.add_argument("--chunks-per-knowledge", type=int, default=10)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    asyncio.run(main(parser.parse_args()))
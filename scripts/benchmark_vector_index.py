@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""向量索引基准测试
+
+在聚类分布的随机向量上对比逐条点积、批量精确搜索和不同 nprobe 的 IVF 搜索，
+输出单次查询延迟和相对精确搜索的 recall@k。
+
+用法:
+    uv run python scripts/benchmark_vector_index.py
+    uv run python scripts/benchmark_vector_index.py --size 200000 --dimensions 1024 --nprobe 4 16 64
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from app.infra.vector_index import VectorIndex
+
+
+def make_corpus(size: int, dimensions: int, clusters: int, noise: float, seed: int = 0) -> np.ndarray:
+    """生成高斯混合分布的向量（近似真实 Embedding 的聚簇结构）"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    return centers[labels] + noise * rng.standard_normal((size, dimensions)).astype(np.float32)
+
+
+def recall(results: list[list[str]], truth: list[list[str]]) -> float:
+    return float(np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth, strict=True)]))
+
+
+def timed(label: str, fn, queries: int) -> list:
+    start = time.perf_counter()
+    result = fn()
+    elapsed = (time.perf_counter() - start) * 1000 / queries
+    print(f"{label:<28} {elapsed:8.3f} ms/query", end="")
+    return result
+
+
+def main(args: argparse.Namespace) -> None:
+    corpus = make_corpus(args.size + args.queries, args.dimensions, args.clusters, args.noise)
+    vectors, queries = corpus[: args.size], corpus[args.size :]
+    ids = [f"chunk-{i}" for i in range(args.size)]
+
+    index = VectorIndex(args.dimensions)
+    start = time.perf_counter()
+    index.add(ids, vectors, tenant_id=[i % args.tenants + 1 for i in range(args.size)])
+    print(f"size={args.size} dims={args.dimensions} queries={args.queries} k={args.k}")
+    print(f"写入: {time.perf_counter() - start:.2f}s\n")
+
+    # 基线：逐条计算点积后全排序
+    stored = index.get_vectors(ids[: min(args.size, 20000)])
+    normalized = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    timed(
+        f"逐条点积（前 {len(stored)} 条）",
+        lambda: [
+            sorted(range(len(stored)), key=lambda i, q=q: -float(np.dot(stored[i], q)))[: args.k]
+            for q in normalized[:5]
+        ],
+        5,
+    )
+    print()
+
+    truth = timed(
+        "精确（逐条查询）",
+        lambda: [[h.id for h in index.search(q, args.k, exact=True)] for q in queries],
+        args.queries,
+    )
+    print()
+    timed(
+        "精确（批量查询）",
+        lambda: index.search_batch(queries, args.k, exact=True),
+        args.queries,
+    )
+    print()
+    timed(
+        "精确 + 租户过滤",
+        lambda: index.search_batch(queries, args.k, tenant_id=1, exact=True),
+        args.queries,
+    )
+    print()
+
+    start = time.perf_counter()
+    index.train(args.nlist)
+    print(f"\nIVF 训练: {time.perf_counter() - start:.2f}s")
+    for nprobe in args.nprobe:
+        result = timed(
+            f"IVF nprobe={nprobe}",
+            lambda nprobe=nprobe: [
+                [h.id for h in hits] for hits in index.search_batch(queries, args.k, nprobe=nprobe)
+            ],
+            args.queries,
+        )
+        print(f"   recall@{args.k}={recall(result, truth):.3f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        index.save(tmp)
+        saved = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded = VectorIndex.load(tmp)
+        opened = time.perf_counter() - start
+        result = [[h.id for h in hits] for hits in loaded.search_batch(queries, args.k, exact=True)]
+        print(f"\n保存 {saved:.2f}s，mmap 加载 {opened * 1000:.1f}ms，"
+              f"加载后 recall@{args.k}={recall(result, truth):.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="向量索引基准测试")
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=1.0, help="簇内噪声，越大越难检索")
+    parser.add_argument("--tenants", type=int, default=4)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""向量量化基准测试
+
+对比全精度、int8 和二值量化（不同重排倍数）的常驻内存、查询延迟和 recall@k。
+量化索引的全精度向量写入临时文件并内存映射，只在重排时按需读取。
+
+用法:
+    uv run python scripts/benchmark_vector_quantization.py
+    uv run python scripts/benchmark_vector_quantization.py --size 200000 --rerank-factors 4 16 32
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到 Python 路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+
+from app.infra.vector_index import VectorIndex
+
+
+def make_corpus(size: int, dimensions: int, clusters: int, noise: float, seed: int = 0) -> np.ndarray:
+    """生成高斯混合分布的向量（近似真实 Embedding 的聚簇结构）"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    return centers[labels] + noise * rng.standard_normal((size, dimensions)).astype(np.float32)
+
+
+def measure(index: VectorIndex, queries: np.ndarray, k: int) -> tuple[list[list[str]], float]:
+    start = time.perf_counter()
+    results = [[hit.id for hit in index.search(query, k)] for query in queries]
+    return results, (time.perf_counter() - start) * 1000 / len(queries)
+
+
+def recall(results: list[list[str]], truth: list[list[str]]) -> float:
+    return float(np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth, strict=True)]))
+
+
+def main(args: argparse.Namespace) -> None:
+    corpus = make_corpus(args.size + args.queries, args.dimensions, args.clusters, args.noise)
+    vectors, queries = corpus[: args.size], corpus[args.size :]
+    ids = [f"chunk-{i}" for i in range(args.size)]
+    print(f"size={args.size} dims={args.dimensions} queries={args.queries} k={args.k}\n")
+    print(f"{'模式':<20} {'常驻内存':>10} {'压缩比':>7} {'延迟':>12} {'recall':>8}")
+
+    full = VectorIndex(args.dimensions)
+    full.add(ids, vectors)
+    truth, latency = measure(full, queries, args.k)
+    baseline = full.memory_usage()["total"]
+    print(f"{'float32':<20} {baseline / 2**20:8.1f}MB {1:6.1f}x {latency:8.3f} ms {1:8.3f}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for quantization in ("int8", "binary"):
+            for factor in args.rerank_factors:
+                index = VectorIndex(
+                    args.dimensions,
+                    quantization=quantization,
+                    rerank_factor=factor,
+                    vectors_path=Path(tmp) / f"{quantization}-{factor}.f32",
+                )
+                index.add(ids, vectors)
+                results, latency = measure(index, queries, args.k)
+                memory = index.memory_usage()["total"]
+                print(
+                    f"{quantization + f' 重排x{factor}':<20} {memory / 2**20:8.1f}MB "
+                    f"{baseline / memory:6.1f}x {latency:8.3f} ms {recall(results, truth):8.3f}"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="向量量化基准测试")
+    parser.add_argument("--size", type=int, default=50_000)
+    parser.add_argument("--dimensions", type=int, default=1024, help="text-embedding-v4 默认 1024 维")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=1.0, help="簇内噪声，越大越难检索")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factors", type=int, nargs="+", default=[2, 4, 10])
+    main(parser.parse_args())
@@ -47,6 +47,8 @@ fi
 if [ "$RUN_MIGRATIONS" = "true" ]; then
     echo "Running database migrations..."
     python -m alembic upgrade head || echo "Migration failed or not configured"
+    echo "Applying index migrations..."
+    python -m app.infra.migrations || echo "Index migration failed"
 fi
 
 # Create necessary directories
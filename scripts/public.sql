@@ -412,6 +412,28 @@ CREATE TABLE "public"."knowledges" (
 ;
 ALTER TABLE "public"."knowledges" OWNER TO "postgres";
 
+-- ----------------------------
+-- Table structure for llm_usage
+-- ----------------------------
+DROP TABLE IF EXISTS "public"."llm_usage";
+CREATE TABLE "public"."llm_usage" (
+  "tenant_id" int4 NOT NULL DEFAULT 0,
+  "model" varchar(128) COLLATE "pg_catalog"."default" NOT NULL,
+  "bucket_start" timestamptz(6) NOT NULL,
+  "request_count" int8 NOT NULL DEFAULT 0,
+  "input_tokens" int8 NOT NULL DEFAULT 0,
+  "output_tokens" int8 NOT NULL DEFAULT 0,
+  "cached_tokens" int8 NOT NULL DEFAULT 0,
+  "cost" float8 NOT NULL DEFAULT 0,
+  "latency_ms" float8 NOT NULL DEFAULT 0,
+  "updated_at" timestamptz(6) NOT NULL DEFAULT CURRENT_TIMESTAMP
+)
+;
+ALTER TABLE "public"."llm_usage" OWNER TO "postgres";
+COMMENT ON COLUMN "public"."llm_usage"."tenant_id" IS 'Tenant ID, 0 for unattributed usage';
+COMMENT ON COLUMN "public"."llm_usage"."bucket_start" IS 'Start of the one-minute aggregation bucket';
+COMMENT ON TABLE "public"."llm_usage" IS 'LLM token usage and cost aggregated per tenant / model / minute, accumulated by each worker via upsert';
+
 -- ----------------------------
 -- Table structure for mcp_services
 -- ----------------------------
@@ -537,6 +559,8 @@ CREATE TABLE "public"."sessions" (
   "embedding_top_k" int4 NOT NULL DEFAULT 10,
   "rerank_top_k" int4 NOT NULL DEFAULT 10,
   "rerank_threshold" float8 NOT NULL DEFAULT 0.65,
+  "embedding_search_dimensions" int4,
+  "embedding_rerank_dimensions" int4,
   "summary_model_id" varchar(64) COLLATE "pg_catalog"."default",
   "summary_parameters" jsonb NOT NULL DEFAULT '{}'::jsonb,
   "agent_config" jsonb,
@@ -550,6 +574,8 @@ CREATE TABLE "public"."sessions" (
 ALTER TABLE "public"."sessions" OWNER TO "postgres";
 COMMENT ON COLUMN "public"."sessions"."agent_config" IS 'Session-level agent configuration in JSON format';
 COMMENT ON COLUMN "public"."sessions"."context_config" IS 'LLM context management configuration (separate from message storage)';
+COMMENT ON COLUMN "public"."sessions"."embedding_search_dimensions" IS 'Prefix dimensions for the first-stage (Matryoshka) vector search, NULL for full dimensions';
+COMMENT ON COLUMN "public"."sessions"."embedding_rerank_dimensions" IS 'Dimensions used to rerank the first-stage shortlist, NULL for full dimensions';
 
 -- ----------------------------
 -- Table structure for spatial_ref_sys
@@ -11478,6 +11504,11 @@ CREATE INDEX "idx_knowledges_tenant_id" ON "public"."knowledges" USING btree (
 -- ----------------------------
 ALTER TABLE "public"."knowledges" ADD CONSTRAINT "knowledges_pkey" PRIMARY KEY ("id");
 
+-- ----------------------------
+-- Primary Key structure for table llm_usage
+-- ----------------------------
+ALTER TABLE "public"."llm_usage" ADD CONSTRAINT "llm_usage_pkey" PRIMARY KEY ("tenant_id", "model", "bucket_start");
+
 -- ----------------------------
 -- Indexes structure for table mcp_services
 -- ----------------------------
@@ -11651,3 +11682,12 @@ ALTER TABLE "public"."auth_tokens" ADD CONSTRAINT "fk_auth_tokens_user" FOREIGN
 -- Foreign Keys structure for table users
 -- ----------------------------
 ALTER TABLE "public"."users" ADD CONSTRAINT "fk_users_tenant" FOREIGN KEY ("tenant_id") REFERENCES "public"."tenants" ("id") ON DELETE SET NULL ON UPDATE NO ACTION;
+
+-- ----------------------------
+-- Upgrade existing databases: columns added to sessions after the initial schema
+-- (idempotent; run this section alone against a database created from an older dump)
+-- ----------------------------
+ALTER TABLE "public"."sessions" ADD COLUMN IF NOT EXISTS "embedding_search_dimensions" int4;
+ALTER TABLE "public"."sessions" ADD COLUMN IF NOT EXISTS "embedding_rerank_dimensions" int4;
+COMMENT ON COLUMN "public"."sessions"."embedding_search_dimensions" IS 'Prefix dimensions for the first-stage (Matryoshka) vector search, NULL for full dimensions';
+COMMENT ON COLUMN "public"."sessions"."embedding_rerank_dimensions" IS 'Dimensions used to rerank the first-stage shortlist, NULL for full dimensions';
@@ -35,17 +35,17 @@ if [[ "$confirm" != "yes" ]]; then
 fi
 
 echo ""
-echo "📋 步骤 1/5: 删除旧数据库..."
+echo "📋 步骤 1/6: 删除旧数据库..."
 dropdb --host="$PG_HOST" --port="$PG_PORT" --username="$PG_USER" --if-exists "$DB_NAME" 2>/dev/null || echo "  (数据库不存在，跳过)"
 
-echo "✅ 步骤 2/5: 创建新数据库..."
+echo "✅ 步骤 2/6: 创建新数据库..."
 createdb --host="$PG_HOST" --port="$PG_PORT" --username="$PG_USER" "$DB_NAME"
 
-echo "✅ 步骤 3/5: 安装扩展..."
+echo "✅ 步骤 3/6: 安装扩展..."
 psql --host="$PG_HOST" --port="$PG_PORT" --username="$PG_USER" -d "$DB_NAME" -c "CREATE EXTENSION IF NOT EXISTS \"uuid-ossp\";"
 psql --host="$PG_HOST" --port="$PG_PORT" --username="$PG_USER" -d "$DB_NAME" -c "CREATE EXTENSION IF NOT EXISTS vector;" 2>/dev/null || echo "  (vector 扩展需要 pgvector，请手动安装)"
 
-echo "✅ 步骤 4/5: 导入表结构..."
+echo "✅ 步骤 4/6: 导入表结构..."
 if [[ -f "$SQL_FILE" ]]; then
     psql --host="$PG_HOST" --port="$PG_PORT" --username="$PG_USER" -d "$DB_NAME" -f "$SQL_FILE" > /dev/null
     echo "  已导入 $SQL_FILE"
@@ -54,7 +54,10 @@ else
     exit 1
 fi
 
-echo "✅ 步骤 5/5: 验证表结构..."
+echo "✅ 步骤 5/6: 执行索引迁移..."
+(cd "$SCRIPT_DIR/.." && KIKI_DATABASE_URL="postgresql://$PG_USER@$PG_HOST:$PG_PORT/$DB_NAME" python -m app.infra.migrations)
+
+echo "✅ 步骤 6/6: 验证表结构..."
 TABLES=$(psql --host="$PG_HOST" --port="$PG_PORT" --username="$PG_USER" -d "$DB_NAME" -t -c "SELECT COUNT(*) FROM information_schema.tables WHERE table_schema = 'public' AND table_type = 'BASE TABLE' AND table_name NOT LIKE 'pg_%';")
 echo "  已创建 $TABLES 张表"
 
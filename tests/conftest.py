@@ -13,7 +13,7 @@ from langchain_core.tools import tool
 
 # 设置测试环境变量
 os.environ.setdefault("KIKI_ENV", "testing")
-os.environ.setdefault("KIKI_LLM_PROVIDER", "mock")
+os.environ.setdefault("KIKI_LLM_PROVIDER", "openai")
 os.environ.setdefault("LANGCHAIN_TRACING_V2", "false")
 os.environ.setdefault("KIKI_DATABASE_URL", "sqlite+aiosqlite:///:memory:")
 os.environ.setdefault("KIKI_REDIS_URL", "redis://localhost:16379/15")
@@ -61,6 +61,25 @@ def test_admin_user() -> dict:
     }
 
 
+@pytest.fixture
+async def memory_store():
+    """长期记忆存储 - SQLite 内存库后端，每个测试独立"""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    from sqlalchemy.pool import StaticPool
+    from sqlmodel import SQLModel
+
+    from app.infra.memory_store import DatabaseStore
+    from app.models.memory import Memory
+
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all, tables=[Memory.__table__])
+    store = DatabaseStore(session_factory=async_sessionmaker(engine, expire_on_commit=False))
+    yield store
+    await store.stop()
+    await engine.dispose()
+
+
 @pytest.fixture
 def mock_llm_service():
     """Mock LLM 服务 - 避免真实 API 调用"""
@@ -0,0 +1,212 @@
+"""预算预留与结算测试"""
+
+import json
+from typing import Any
+from uuid import uuid4
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from app.llm.budget import BudgetCallback, BudgetExceededError, BudgetManager
+from app.llm.cost_tracker import CostTracker, ModelPricing, PricingTable
+from app.llm.tokens import count_prompt_tokens
+from app.llm.usage import UsageEvent, UsageRecorder, UsageTrackingCallback
+
+# 每 token 1 美元，便于核对
+PRICING = PricingTable({"model-a": ModelPricing(1_000_000, 1_000_000)})
+
+
+@pytest.fixture
+def recorder():
+    recorder = UsageRecorder(CostTracker(pricing=PRICING))
+    yield recorder
+    recorder.close()
+
+
+@pytest.fixture
+def budget(recorder) -> BudgetManager:
+    manager = BudgetManager(
+        pricing=PRICING, default_tenant_budget=1000.0, candidate_models=list, recorder=recorder
+    )
+    recorder.add_handler(manager.on_usage)
+    return manager
+
+
+def _event(reservation, input_tokens: int, output_tokens: int) -> UsageEvent:
+    return UsageEvent(
+        model="model-a",
+        input_tokens=input_tokens,
+        output_tokens=output_tokens,
+        tenant_id=reservation.tenant_id,
+        metadata=reservation.metadata,
+    )
+
+
+def test_reservation_caps_output_tokens(budget):
+    reservation = budget.reserve("model-a", prompt_tokens=100, max_tokens=200, tenant_id=1)
+
+    assert reservation.max_tokens == 200
+    assert reservation.amount == 300
+    assert budget.get_status(tenant_id=1).reserved == 300
+
+
+def test_usage_settles_against_reservation_atomically(budget):
+    reservation = budget.reserve("model-a", prompt_tokens=100, max_tokens=200, tenant_id=1)
+
+    budget.on_usage(_event(reservation, 100, 50), 150.0)
+    status = budget.get_status(tenant_id=1)
+    assert (status.spent, status.reserved) == (150.0, 150.0)
+
+    budget.release(reservation)
+    status = budget.get_status(tenant_id=1)
+    assert (status.spent, status.reserved) == (150.0, 0.0)
+
+
+def test_finish_holds_reservation_until_usage_recorded(budget, recorder):
+    reservation = budget.reserve("model-a", prompt_tokens=100, max_tokens=200, tenant_id=1)
+    recorder.submit(_event(reservation, 100, 150))
+    budget.finish(reservation)
+
+    assert recorder.flush(timeout=5)
+    status = budget.get_status(tenant_id=1)
+    assert (status.spent, status.reserved) == (250.0, 0.0)
+    assert reservation.released
+
+
+def test_finish_releases_when_usage_never_arrives(budget, recorder):
+    reservation = budget.reserve("model-a", prompt_tokens=100, max_tokens=200, tenant_id=1)
+    budget.finish(reservation)
+
+    assert recorder.flush(timeout=5)
+    status = budget.get_status(tenant_id=1)
+    assert (status.spent, status.reserved) == (0.0, 0.0)
+
+
+def test_concurrent_reservations_cannot_overspend(budget):
+    first = budget.reserve("model-a", prompt_tokens=100, max_tokens=400, tenant_id=1)
+    budget.on_usage(_event(first, 100, 400), 500.0)
+    second = budget.reserve("model-a", prompt_tokens=100, max_tokens=300, tenant_id=1)
+
+    # 已花费 500 + 预留 400，第三个 500 的请求放不下
+    with pytest.raises(BudgetExceededError):
+        budget.reserve("model-a", prompt_tokens=100, max_tokens=400, tenant_id=1)
+
+    budget.settle(second, 100.0)
+    budget.release(first)
+    status = budget.get_status(tenant_id=1)
+    assert (status.spent, status.reserved) == (600.0, 0.0)
+
+
+class FakeChatModel(GenericFakeChatModel):
+    """调用参数中带模型名和 max_tokens 的假聊天模型"""
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"model": "model-a", "max_tokens": 10}
+
+
+def _reply(input_tokens: int, output_tokens: int) -> AIMessage:
+    return AIMessage(
+        content="ok",
+        usage_metadata={
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        },
+    )
+
+
+def test_callback_reserves_full_prompt_and_tools(budget):
+    callback = BudgetCallback(budget, tenant_id=1)
+    history = [
+        SystemMessage(content="系统提示词" * 20),
+        HumanMessage(content="上一轮问题"),
+        HumanMessage(content="问题"),
+    ]
+    tools = [{"type": "function", "function": {"name": "search", "description": "检索知识库" * 10}}]
+    run_id = uuid4()
+
+    callback.on_chat_model_start(
+        {},
+        [history],
+        run_id=run_id,
+        invocation_params={"model": "model-a", "max_tokens": 50, "tools": tools},
+    )
+    status = budget.get_status(tenant_id=1)
+    expected = (
+        count_prompt_tokens(history)
+        + count_prompt_tokens(json.dumps(tools, ensure_ascii=False))
+        + 50
+    )
+    assert status.reserved == expected
+
+    # 按 run_id 结算并释放
+    budget.on_usage(
+        UsageEvent(
+            model="model-a", input_tokens=10, output_tokens=5, tenant_id=1, run_id=str(run_id)
+        ),
+        15.0,
+    )
+    status = budget.get_status(tenant_id=1)
+    assert (status.spent, status.reserved) == (15.0, 0.0)
+
+
+def test_callback_rejects_call_when_budget_exhausted(budget, recorder):
+    callback = BudgetCallback(budget, tenant_id=1)
+    params = {"model": "model-a", "max_tokens": 600}
+    callback.on_chat_model_start(
+        {}, [[HumanMessage(content="问题")]], run_id=uuid4(), invocation_params=params
+    )
+
+    with pytest.raises(BudgetExceededError):
+        callback.on_chat_model_start(
+            {}, [[HumanMessage(content="问题")]], run_id=uuid4(), invocation_params=params
+        )
+
+    # 用量事件未送达的预留在请求结束后释放
+    callback.close()
+    assert recorder.flush(timeout=5)
+    assert budget.get_status(tenant_id=1).reserved == 0.0
+
+
+def test_callback_releases_on_error(budget):
+    callback = BudgetCallback(budget, tenant_id=1)
+    run_id = uuid4()
+    callback.on_chat_model_start(
+        {},
+        [[HumanMessage(content="问题")]],
+        run_id=run_id,
+        invocation_params={"model": "model-a", "max_tokens": 50},
+    )
+    callback.on_llm_error(RuntimeError("timeout"), run_id=run_id)
+
+    assert budget.get_status(tenant_id=1).reserved == 0.0
+
+
+async def test_each_model_call_reserves_and_settles(budget, recorder):
+    model = FakeChatModel(messages=iter([_reply(100, 10), _reply(300, 10)]))
+    callback = BudgetCallback(budget, tenant_id=1)
+    config = {
+        "callbacks": [callback, UsageTrackingCallback(recorder)],
+        "metadata": {"tenant_id": 1},
+    }
+
+    await model.ainvoke("第一次调用", config=config)
+    await model.ainvoke("第二次调用", config=config)
+    callback.close()
+
+    assert recorder.flush(timeout=5)
+    status = budget.get_status(tenant_id=1)
+    assert (status.spent, status.reserved) == (420.0, 0.0)
+
+
+async def test_exhausted_budget_aborts_model_call(budget):
+    budget.commit(995.0, tenant_id=1)
+    model = FakeChatModel(messages=iter([_reply(100, 10)]))
+    callback = BudgetCallback(budget, tenant_id=1)
+
+    with pytest.raises(BudgetExceededError):
+        await model.ainvoke("问题", config={"callbacks": [callback]})
+    callback.close()
+    assert budget.get_status(tenant_id=1).reserved == 0.0
@@ -0,0 +1,53 @@
+"""会话与消息存储测试"""
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1 import messages, sessions
+from app.infra.chat_store import InMemoryChatStore, get_chat_store
+
+
+@pytest.fixture
+def store() -> InMemoryChatStore:
+    return InMemoryChatStore()
+
+
+@pytest.fixture
+def api(store) -> TestClient:
+    app = FastAPI()
+    app.include_router(sessions.router)
+    app.include_router(messages.router)
+    app.dependency_overrides[get_chat_store] = lambda: store
+    return TestClient(app)
+
+
+async def test_page_rejects_non_positive_limit(store):
+    session = await store.create_session("测试")
+    await store.add_message(session.id, "user", "你好")
+
+    with pytest.raises(ValueError):
+        await store.list_sessions(limit=0)
+    with pytest.raises(ValueError):
+        await store.list_messages(session.id, limit=0)
+
+
+@pytest.mark.parametrize("limit", [0, -1, 501])
+def test_routes_validate_limit(api, limit):
+    assert api.get("/sessions", params={"limit": limit}).status_code == 422
+    assert api.get("/messages/session/s-1", params={"limit": limit}).status_code == 422
+
+
+async def test_pages_follow_cursor(store, api):
+    session = await store.create_session("测试")
+    for index in range(5):
+        await store.add_message(session.id, "user", f"消息 {index}")
+
+    first = api.get(f"/messages/session/{session.id}", params={"limit": 3})
+    assert [m["content"] for m in first.json()] == ["消息 2", "消息 3", "消息 4"]
+    second = api.get(
+        f"/messages/session/{session.id}",
+        params={"limit": 3, "cursor": first.headers["X-Next-Cursor"]},
+    )
+    assert [m["content"] for m in second.json()] == ["消息 0", "消息 1"]
+    assert "X-Next-Cursor" not in second.headers
@@ -0,0 +1,80 @@
+"""成本追踪测试"""
+
+import pytest
+
+from app.llm.cost_tracker import DEFAULT_PRICING, CostTracker, ModelPricing, PricingTable
+
+
+@pytest.fixture
+def pricing() -> PricingTable:
+    return PricingTable(
+        {
+            "gpt-4o": ModelPricing(2.50, 10.00, 1.25),
+            "gpt-4o-mini": ModelPricing(0.15, 0.60),
+            "qwen": ModelPricing(1.00, 2.00),
+        }
+    )
+
+
+def test_pricing_prefers_exact_then_longest_prefix(pricing):
+    assert pricing.get("gpt-4o") == ModelPricing(2.50, 10.00, 1.25)
+    # gpt-4o 与 gpt-4o-mini 都是前缀，取最长的
+    assert pricing.get("gpt-4o-mini-2024-07-18") == ModelPricing(0.15, 0.60)
+    assert pricing.get("gpt-4o-2024-08-06") == ModelPricing(2.50, 10.00, 1.25)
+    assert pricing.get("qwen-max") == ModelPricing(1.00, 2.00)
+    assert pricing.get("claude-sonnet-4") is DEFAULT_PRICING
+    assert not pricing.is_registered("claude-sonnet-4")
+
+
+def test_register_invalidates_resolved_prefixes(pricing):
+    assert pricing.get("qwen-max-latest") == ModelPricing(1.00, 2.00)
+
+    pricing.register("qwen-max", 1.60, 6.40)
+
+    assert pricing.get("qwen-max-latest") == ModelPricing(1.60, 6.40)
+    assert pricing.get("qwen-turbo") == ModelPricing(1.00, 2.00)
+
+
+def test_cached_tokens_are_billed_at_cached_price(pricing):
+    # 1000 输入（其中 400 命中缓存）+ 100 输出
+    cost = pricing.get("gpt-4o").cost(1000, 100, cached_tokens=400)
+    assert cost == pytest.approx((600 * 2.50 + 400 * 1.25 + 100 * 10.00) / 1_000_000)
+    # 未配置缓存单价时按输入单价计费，缓存数不超过输入数
+    assert pricing.get("qwen").cost(1000, 0, cached_tokens=5000) == pytest.approx(0.001)
+
+
+def test_bucket_totals(pricing):
+    tracker = CostTracker(pricing=pricing, bucket_seconds=60)
+    tracker.record("gpt-4o", 100, 10, 0.5, tenant_id=1, latency_ms=100, timestamp=120.0)
+    tracker.record("qwen-max", 200, 20, 0.25, tenant_id=2, latency_ms=50, timestamp=179.9)
+    tracker.record("gpt-4o", 300, 30, 1.0, cached_tokens=100, tenant_id=1, timestamp=180.0)
+
+    series = tracker.get_time_series()
+    assert [bucket for bucket, _ in series] == [120, 180]
+    first, second = (summary for _, summary in series)
+    assert first.request_count == 2
+    assert (first.total_input_tokens, first.total_output_tokens) == (300, 30)
+    assert first.total_cost == pytest.approx(0.75)
+    assert first.total_latency_ms == pytest.approx(150)
+    assert (second.request_count, second.total_cached_tokens) == (1, 100)
+    # 各维度聚合与时间桶合计一致
+    total = tracker.get_summary()
+    assert total.total_cost == pytest.approx(first.total_cost + second.total_cost)
+    assert tracker.get_summary(tenant_id=1).request_count == 2
+    assert tracker.get_summary(model="gpt-4o").total_input_tokens == 400
+    assert [bucket for bucket, _ in tracker.get_time_series(since=180)] == [180]
+
+
+def test_evicts_oldest_bucket_by_time(pricing):
+    tracker = CostTracker(pricing=pricing, bucket_seconds=60, max_buckets=3)
+    for timestamp in (600, 660, 720):
+        tracker.record("gpt-4o", 1, 1, 0.1, timestamp=timestamp)
+    # 迟到的记录创建了更早的时间桶，淘汰的应是它而不是 600
+    tracker.record("gpt-4o", 1, 1, 0.1, timestamp=60)
+    assert [bucket for bucket, _ in tracker.get_time_series()] == [600, 660, 720]
+
+    # 新的时间桶淘汰最早的 600，而不是最早插入的桶
+    tracker.record("gpt-4o", 1, 1, 0.1, timestamp=300)
+    tracker.record("gpt-4o", 1, 1, 0.1, timestamp=780)
+    assert [bucket for bucket, _ in tracker.get_time_series()] == [660, 720, 780]
+    assert tracker.get_summary().request_count == 6
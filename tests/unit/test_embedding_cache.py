@@ -0,0 +1,43 @@
+"""Embedding 缓存测试"""
+
+import numpy as np
+
+from app.llm.embedding_cache import EmbeddingStore, embedding_cache_key
+
+
+def _key(text: str) -> bytes:
+    return embedding_cache_key("openai", "text-embedding-3-small", 4, text)
+
+
+def test_store_reopens_from_disk(tmp_path):
+    store = EmbeddingStore(tmp_path, dimensions=4, initial_capacity=2)
+    items = [(_key(f"文本 {i}"), [float(i)] * 4) for i in range(5)]
+    store.put_many(items)
+    store.close()
+
+    reopened = EmbeddingStore(tmp_path)
+    assert len(reopened) == 5
+    for key, vector in items:
+        np.testing.assert_array_equal(reopened.get(key), vector)
+
+
+def test_stores_sharing_a_directory_keep_keys_aligned(tmp_path):
+    """两个进程（这里是两个独立打开的存储）交替写入同一目录"""
+    first = EmbeddingStore(tmp_path, dimensions=4, initial_capacity=2)
+    second = EmbeddingStore(tmp_path, dimensions=4, initial_capacity=2)
+    a, b, c = _key("A"), _key("B"), _key("C")
+
+    first.put_many([(a, [1.0] * 4)])
+    second.put_many([(b, [2.0] * 4)])
+    first.put_many([(c, [3.0] * 4), (b, [9.0] * 4)])
+
+    np.testing.assert_array_equal(second.get(a), [1.0] * 4)
+    np.testing.assert_array_equal(first.get(b), [2.0] * 4)
+    first.close()
+    second.close()
+
+    reopened = EmbeddingStore(tmp_path)
+    assert len(reopened) == 3
+    np.testing.assert_array_equal(reopened.get(a), [1.0] * 4)
+    np.testing.assert_array_equal(reopened.get(b), [2.0] * 4)
+    np.testing.assert_array_equal(reopened.get(c), [3.0] * 4)
@@ -0,0 +1,97 @@
+"""批量 Embedding 管道测试"""
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+import app.llm.embedding_pipeline as embedding_pipeline
+from app.llm.embedding_pipeline import (
+    PROVIDER_BATCH_LIMITS,
+    BatchedEmbeddings,
+    BatchLimits,
+    get_embedding_pipeline,
+    pack_batches,
+)
+
+
+class RecordingEmbeddings(Embeddings):
+    """记录每次调用的输入，前 ``failures`` 次调用失败"""
+
+    def __init__(self, failures: int = 0) -> None:
+        self.calls: list[list[str]] = []
+        self.failures = failures
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(list(texts))
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("rate limited")
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return [float(len(text))]
+
+
+def test_pack_batches_respects_row_limit():
+    batches = pack_batches(["a"] * 7, BatchLimits(max_rows=3, max_tokens=1000), len)
+    assert batches == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_pack_batches_respects_token_limit():
+    texts = ["x" * 4, "x" * 5, "x", "x" * 9, "x" * 3]
+    batches = pack_batches(texts, BatchLimits(max_rows=10, max_tokens=10), len)
+    # 4+5 ≤ 10，再加 1 恰好 10；9 单独一批（9+3 > 10）
+    assert batches == [[0, 1, 2], [3], [4]]
+
+
+def test_pack_batches_keeps_oversized_text_alone():
+    texts = ["short", "x" * 50, "tail"]
+    assert pack_batches(texts, BatchLimits(max_rows=10, max_tokens=20), len) == [[0], [1], [2]]
+    assert pack_batches([], BatchLimits(max_rows=10, max_tokens=20), len) == []
+
+
+def test_pack_batches_default_counter_handles_cjk():
+    # 中文约 1 token/字：三段 4 字文本，上限 10 token 时每批最多两段
+    batches = pack_batches(["知识库检"] * 3, BatchLimits(max_rows=10, max_tokens=10))
+    assert batches == [[0, 1], [2]]
+
+
+async def test_batches_are_sent_concurrently_and_reassembled_in_order():
+    client = RecordingEmbeddings()
+    embeddings = BatchedEmbeddings(client, BatchLimits(max_rows=2, max_tokens=1000))
+    texts = [str(i) * (i + 1) for i in range(5)]
+
+    assert await embeddings.aembed_documents(texts) == [[float(i + 1)] for i in range(5)]
+    assert embeddings.embed_documents(texts) == [[float(i + 1)] for i in range(5)]
+    assert sorted(len(call) for call in client.calls) == [1, 1, 2, 2, 2, 2]
+
+
+async def test_failed_batch_is_retried_alone():
+    client = RecordingEmbeddings(failures=1)
+    embeddings = BatchedEmbeddings(
+        client, BatchLimits(max_rows=2, max_tokens=1000), max_concurrency=1, retry_backoff=0
+    )
+
+    assert await embeddings.aembed_documents(["a", "bb", "ccc"]) == [[1.0], [2.0], [3.0]]
+    # 只重发失败的第一批
+    assert client.calls == [["a", "bb"], ["a", "bb"], ["ccc"]]
+
+    client.failures = 3
+    embeddings.max_retries = 2
+    with pytest.raises(ConnectionError):
+        embeddings.embed_documents(["a"])
+
+
+def test_pipeline_disables_client_retries(monkeypatch):
+    calls = []
+
+    def fake_get_embeddings(provider, **kwargs):
+        calls.append((provider, kwargs))
+        return RecordingEmbeddings()
+
+    monkeypatch.setattr(embedding_pipeline, "get_embeddings", fake_get_embeddings)
+
+    pipeline = get_embedding_pipeline("dashscope", max_retries=5)
+
+    assert calls == [("dashscope", {"model": None, "dimensions": None, "max_retries": 0})]
+    assert pipeline.max_retries == 5
+    assert pipeline.limits == PROVIDER_BATCH_LIMITS["dashscope"]
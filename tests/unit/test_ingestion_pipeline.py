@@ -0,0 +1,151 @@
+"""文档入库管道测试"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel
+
+from app.infra.keyword_index import KeywordIndex
+from app.infra.vector_index import VectorIndex
+from app.ingestion.parsers import ChunkingConfig
+from app.ingestion.pipeline import IngestionPipeline
+from app.models.knowledge import CHUNK_TYPE_DUPLICATE, Chunk, Knowledge
+
+
+class FlakyEmbeddings(Embeddings):
+    """第 ``fail_on`` 次批量 Embedding 时失败"""
+
+    def __init__(self, fail_on: int | None = None) -> None:
+        self.fail_on = fail_on
+        self.calls = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("embedding provider unavailable")
+        return [[float(len(text)), 1.0, 0.5, 0.25] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+@pytest.fixture
+async def factory():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            SQLModel.metadata.create_all, tables=[Knowledge.__table__, Chunk.__table__]
+        )
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def _add_knowledge(factory, tmp_path, id: str) -> Knowledge:
+    path = tmp_path / f"{id}.txt"
+    path.write_text("\n\n".join(f"第 {i} 段：知识库入库测试内容 {i * 7919}。" for i in range(12)))
+    knowledge = Knowledge(
+        id=id, tenant_id=1, knowledge_base_id="kb", type="file", title=path.name,
+        source="local", file_path=str(path), file_type="txt",
+    )
+    async with factory() as session:
+        session.add(knowledge)
+        await session.commit()
+    return knowledge
+
+
+@pytest.fixture
+async def knowledge(factory, tmp_path) -> Knowledge:
+    return await _add_knowledge(factory, tmp_path, "k1")
+
+
+def _pipeline(factory, embeddings: Embeddings, executor) -> IngestionPipeline:
+    return IngestionPipeline(
+        embeddings,
+        chunking=ChunkingConfig(chunk_size=40, chunk_overlap=0),
+        session_factory=factory,
+        executor=executor,
+        embed_batch_size=3,
+        vector_index=VectorIndex(4),
+        keyword_index=KeywordIndex(),
+    )
+
+
+async def _chunks(factory) -> list[Chunk]:
+    async with factory() as session:
+        return list((await session.execute(select(Chunk))).scalars())
+
+
+async def test_failed_ingest_removes_committed_batches(factory, knowledge):
+    with ThreadPoolExecutor(1) as executor:
+        pipeline = _pipeline(factory, FlakyEmbeddings(fail_on=3), executor)
+        statuses = [progress.status async for progress in pipeline.ingest(knowledge)]
+        assert statuses[-1] == "failed"
+        assert await _chunks(factory) == []
+        assert len(pipeline.vector_index) == 0
+        assert len(pipeline.keyword_index) == 0
+
+        # 重新入库不会把分块判定为孤儿行的重复
+        pipeline._embeddings = FlakyEmbeddings()
+        final = [progress async for progress in pipeline.ingest(knowledge)][-1]
+
+    assert final.status == "completed"
+    chunks = await _chunks(factory)
+    assert chunks
+    assert all(chunk.chunk_type != CHUNK_TYPE_DUPLICATE for chunk in chunks)
+    assert len(pipeline.vector_index) == len(chunks)
+
+
+async def test_reingest_replaces_existing_chunks(factory, knowledge):
+    with ThreadPoolExecutor(1) as executor:
+        pipeline = _pipeline(factory, FlakyEmbeddings(), executor)
+        [progress async for progress in pipeline.ingest(knowledge)]
+        first = await _chunks(factory)
+        [progress async for progress in pipeline.ingest(knowledge)]
+
+    second = await _chunks(factory)
+    assert len(second) == len(first)
+    assert not {chunk.id for chunk in first} & {chunk.id for chunk in second}
+    assert all(chunk.chunk_type != CHUNK_TYPE_DUPLICATE for chunk in second)
+    assert len(pipeline.keyword_index) == len(second)
+
+
+async def test_purging_canonical_chunks_promotes_duplicates(factory, knowledge, tmp_path):
+    # 三份内容相同的文档：k2、k3 的分块都是 k1 分块的重复
+    copies = [await _add_knowledge(factory, tmp_path, id) for id in ("k2", "k3")]
+    with ThreadPoolExecutor(1) as executor:
+        pipeline = _pipeline(factory, FlakyEmbeddings(), executor)
+        for item in (knowledge, *copies):
+            [progress async for progress in pipeline.ingest(item)]
+        canonical = {c.id for c in await _chunks(factory) if c.knowledge_id == "k1"}
+
+        assert await pipeline._purge(knowledge) == len(canonical)
+
+    chunks = await _chunks(factory)
+    promoted = [c for c in chunks if c.knowledge_id == "k2"]
+    assert all(c.chunk_type != CHUNK_TYPE_DUPLICATE and "duplicate_of" not in c.meta for c in promoted)
+    # k3 的重复分块改为指向 k2 中提升的分块
+    promoted_ids = {c.id for c in promoted}
+    assert {c.meta["duplicate_of"] for c in chunks if c.knowledge_id == "k3"} == promoted_ids
+    assert len(pipeline.vector_index) == len(pipeline.keyword_index) == len(promoted)
+    assert all(chunk_id in pipeline.vector_index for chunk_id in promoted_ids)
+    assert not any(chunk_id in pipeline.vector_index for chunk_id in canonical)
+
+
+async def test_failed_status_update_does_not_escape(factory, knowledge, monkeypatch):
+    with ThreadPoolExecutor(1) as executor:
+        pipeline = _pipeline(factory, FlakyEmbeddings(fail_on=1), executor)
+        update_status = pipeline._update_status
+
+        async def update_status_or_fail(knowledge_id, status, **kwargs):
+            if status == "failed":
+                raise ConnectionError("database unavailable")
+            await update_status(knowledge_id, status, **kwargs)
+
+        monkeypatch.setattr(pipeline, "_update_status", update_status_or_fail)
+        final = [progress async for progress in pipeline.ingest(knowledge)][-1]
+
+    assert (final.status, final.error) == ("failed", "embedding provider unavailable")
@@ -0,0 +1,86 @@
+"""关键词索引测试"""
+
+import threading
+
+from app.infra.keyword_index import KeywordIndex, tokenize
+
+
+def test_tokenize_cjk_bigrams():
+    assert tokenize("知识库 API-v2") == ["知", "识", "库", "知识", "识库", "api-v2"]
+
+
+def test_search_filters_tenant_and_threshold():
+    index = KeywordIndex()
+    index.add(["a", "b"], ["如何配置知识库", "如何配置知识库"], tenant_id=[1, 2])
+    index.add(["c"], ["天气预报"], tenant_id=1)
+
+    hits = index.search("配置知识库", tenant_id=1)
+    assert [hit.id for hit in hits] == ["a"]
+    assert index.search("配置知识库", tenant_id=1, threshold=1.01) == []
+
+
+def test_concurrent_add_and_search():
+    index = KeywordIndex()
+    index.add([f"seed-{i}" for i in range(100)], ["如何配置知识库"] * 100)
+    errors: list[BaseException] = []
+    stop = threading.Event()
+
+    def search() -> None:
+        while not stop.is_set():
+            index.search("配置知识库", k=5)
+
+    def add(worker: int) -> None:
+        try:
+            for i in range(100):
+                index.add([f"doc-{worker}-{i}"], ["知识库配置说明"])
+        except BaseException as e:
+            errors.append(e)
+
+    searchers = [threading.Thread(target=search) for _ in range(2)]
+    writers = [threading.Thread(target=add, args=(worker,)) for worker in range(3)]
+    for thread in searchers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    for thread in searchers:
+        thread.join()
+
+    assert errors == []
+    assert len(index) == 400
+
+
+def test_concurrent_delete_and_search():
+    index = KeywordIndex()
+    # 每篇固定文档有唯一的词，查询它们时结果必须始终指向同一篇
+    targets = [f"target-{i}" for i in range(20)]
+    index.add(
+        targets, [f"固定文档 unique{i}" for i in range(20)], tenant_id=[i % 3 for i in range(20)]
+    )
+    index.add([f"noise-{i}" for i in range(1000)], ["知识库配置说明"] * 1000, tenant_id=1)
+    errors: list[str] = []
+    stop = threading.Event()
+
+    def search() -> None:
+        while not stop.is_set():
+            for i, target in enumerate(targets):
+                hits = index.search(f"unique{i}", k=1)
+                if [(hit.id, hit.tenant_id) for hit in hits] != [(target, i % 3)]:
+                    errors.append(f"unique{i} -> {hits}")
+
+    searchers = [threading.Thread(target=search) for _ in range(2)]
+    for thread in searchers:
+        thread.start()
+    try:
+        # 删除足够多的文档以多次触发压缩，同时追加新文档触发扩容
+        for start in range(0, 1000, 50):
+            index.delete([f"noise-{i}" for i in range(start, start + 50)])
+            index.add([f"new-{start + i}" for i in range(30)], ["知识库配置说明"] * 30)
+    finally:
+        stop.set()
+        for thread in searchers:
+            thread.join()
+
+    assert errors == []
+    assert len(index) == 20 + 600
+    assert index.search("unique7", k=1)[0].id == "target-7"
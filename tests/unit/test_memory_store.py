@@ -0,0 +1,115 @@
+"""长期记忆存储测试（SQLite 后端，见 conftest 的 ``memory_store``）"""
+
+from datetime import UTC, datetime, timedelta
+
+import pytest
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.engine import Engine
+
+from app.models.memory import Memory
+
+
+@pytest.fixture
+def statements():
+    """记录发出的 SQL 语句"""
+    captured: list[str] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append(statement.lstrip().split()[0].upper())
+
+    event.listen(Engine, "before_cursor_execute", capture)
+    yield captured
+    event.remove(Engine, "before_cursor_execute", capture)
+
+
+async def _insert_expired(store, count: int) -> None:
+    now = datetime.now(UTC)
+    async with store._session_factory() as session:
+        await session.execute(insert(Memory), [
+            {
+                "namespace": "users.expired", "key": f"k{i}", "value": {"i": i},
+                "created_at": now, "updated_at": now, "expires_at": now - timedelta(minutes=1),
+            }
+            for i in range(count)
+        ])
+        await session.commit()
+
+
+async def test_mput_and_mget_are_batched(memory_store, statements):
+    await memory_store.amput([
+        (("users", "u1"), "preferences", {"language": "zh"}),
+        (("users", "u2"), "preferences", {"language": "en"}),
+        (("users", "u3"), "preferences", {"language": "zh"}),
+    ])
+    assert statements.count("INSERT") == 1
+
+    statements.clear()
+    items = await memory_store.amget([
+        (("users", "u1"), "preferences"),
+        (("users", "u2"), "preferences"),
+        (("users", "missing"), "preferences"),
+    ])
+    assert [item and item.value for item in items] == [{"language": "zh"}, {"language": "en"}, None]
+    assert statements.count("SELECT") == 1
+
+
+async def test_put_invalidates_cache(memory_store):
+    namespace = ("users", "u1")
+    await memory_store.aput(namespace, "profile", {"name": "A"})
+    assert (await memory_store.aget(namespace, "profile")).value == {"name": "A"}
+
+    cached = await memory_store.aget(namespace, "profile")
+    assert memory_store.hits == 1
+    # 修改读到的值不影响缓存
+    cached.value["name"] = "changed"
+    assert (await memory_store.aget(namespace, "profile")).value == {"name": "A"}
+
+    await memory_store.aput(namespace, "profile", {"name": "B"})
+    assert (await memory_store.aget(namespace, "profile")).value == {"name": "B"}
+
+    await memory_store.adelete(namespace, "profile")
+    assert await memory_store.aget(namespace, "profile") is None
+
+
+async def test_search_prefix_with_filter_and_offset(memory_store):
+    await memory_store.amput([
+        (("users", "u1"), "a", {"language": "zh", "rank": 1}),
+        (("users", "u1", "sub"), "b", {"language": "zh", "rank": 2}),
+        (("users", "u2"), "c", {"language": "en", "rank": 3}),
+        (("usersx",), "d", {"language": "zh", "rank": 4}),
+    ])
+
+    hits = await memory_store.asearch(("users",))
+    assert sorted(hit.key for hit in hits) == ["a", "b", "c"]
+
+    hits = await memory_store.asearch(("users",), filter={"language": "zh"})
+    assert sorted(hit.key for hit in hits) == ["a", "b"]
+
+    first = await memory_store.asearch(("users",), filter={"language": "zh"}, limit=1)
+    second = await memory_store.asearch(("users",), filter={"language": "zh"}, limit=1, offset=1)
+    assert len(first) == len(second) == 1
+    assert {first[0].key, second[0].key} == {"a", "b"}
+
+    hits = await memory_store.asearch(("users",), filter={"rank": {"$gte": 2}})
+    assert sorted(hit.key for hit in hits) == ["b", "c"]
+
+
+async def test_expired_items_are_skipped(memory_store):
+    await _insert_expired(memory_store, 1)
+    await memory_store.aput(("users", "live"), "k0", {"i": 0}, ttl=60)
+
+    assert await memory_store.aget(("users", "expired"), "k0") is None
+    assert await memory_store.asearch(("users", "expired")) == []
+    assert (await memory_store.aget(("users", "live"), "k0")).value == {"i": 0}
+
+
+async def test_sweep_expired_deletes_in_batches(memory_store):
+    memory_store.sweep_batch_size = 2
+    await _insert_expired(memory_store, 5)
+    await memory_store.aput(("users", "live"), "k0", {"i": 0}, ttl=60)
+
+    assert await memory_store.sweep_expired() == 5
+    async with memory_store._session_factory() as session:
+        remaining = await session.execute(select(func.count()).select_from(Memory))
+        assert remaining.scalar_one() == 1
+    assert await memory_store.sweep_expired() == 0
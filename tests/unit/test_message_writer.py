@@ -0,0 +1,70 @@
+"""消息写入器测试"""
+
+from datetime import UTC, datetime
+
+import pytest
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel
+
+from app.infra.message_writer import MessageWriter
+from app.models.message import Message
+from app.models.session import Session
+
+
+@pytest.fixture
+async def factory():
+    """会话与消息表 - SQLite 内存库，开启外键约束"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def enable_foreign_keys(connection, _):
+        connection.execute("PRAGMA foreign_keys = ON")
+
+    now = datetime.now(UTC)
+    async with engine.begin() as conn:
+        await conn.run_sync(
+            SQLModel.metadata.create_all, tables=[Session.__table__, Message.__table__]
+        )
+        await conn.execute(insert(Session), [
+            {"id": "session-1", "tenant_id": 1, "title": "测试", "created_at": now, "updated_at": now}
+        ])
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def _count(factory) -> int:
+    async with factory() as session:
+        return (await session.execute(select(func.count()).select_from(Message))).scalar_one()
+
+
+async def test_bad_row_is_dead_lettered_after_retries(factory):
+    writer = MessageWriter(batch_size=50, max_retries=2, session_factory=factory)
+    for index in range(20):
+        await writer.enqueue("session-1", "user", f"消息 {index}")
+    # 会话不存在，外键约束失败
+    await writer.enqueue("missing", "user", "孤儿消息")
+
+    assert await writer._write_batch() is None
+    assert writer.pending == 21
+
+    assert await writer._write_batch() == 20
+    assert writer.pending == 0
+    assert writer.dead_lettered == 1
+    assert await _count(factory) == 20
+
+    # 后续消息不受影响
+    await writer.enqueue("session-1", "assistant", "回复")
+    assert await writer.flush() == 1
+    assert await _count(factory) == 21
+
+
+async def test_enqueue_drops_when_queue_full(factory):
+    writer = MessageWriter(max_queue=2, session_factory=factory)
+    for index in range(5):
+        await writer.enqueue("session-1", "user", f"消息 {index}")
+
+    assert writer.pending == 2
+    assert writer.dropped == 3
+    assert await writer.flush() == 2
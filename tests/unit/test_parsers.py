@@ -0,0 +1,103 @@
+"""文档解析测试"""
+
+import pytest
+
+import app.ingestion.parsers as parsers
+from app.ingestion.parsers import ChunkingConfig, iter_sections, parse_unit, plan_units
+
+
+@pytest.fixture
+def small_units(monkeypatch):
+    """缩小文本单元，便于用小文件覆盖多单元"""
+    monkeypatch.setattr(parsers, "_TEXT_UNIT_BYTES", 1000)
+    monkeypatch.setattr(parsers, "_READ_BYTES", 7)
+
+
+def _text(unit) -> str:
+    return "".join(text for _, text in iter_sections(unit))
+
+
+def test_text_is_split_into_line_aligned_byte_ranges(tmp_path, small_units):
+    path = tmp_path / "doc.md"
+    content = "".join(f"第 {i} 行：多字节字符不能被切开 ✓\n" for i in range(300))
+    path.write_text(content, encoding="utf-8")
+
+    units = plan_units(path, "md")
+
+    assert len(units) > 5
+    assert units[0].start == 0 and units[-1].stop == path.stat().st_size
+    assert all(a.stop == b.start for a, b in zip(units, units[1:], strict=False))
+    texts = [_text(unit) for unit in units]
+    assert all(text.endswith("\n") for text in texts)
+    assert "".join(texts) == content
+
+
+def test_text_without_trailing_newline(tmp_path, small_units):
+    path = tmp_path / "doc.csv"
+    content = "\n".join(f"{i},value-{i}" for i in range(500))
+    path.write_text(content, encoding="utf-8")
+
+    assert "".join(_text(unit) for unit in plan_units(path, "csv")) == content
+    # 空文件只有一个空单元
+    (tmp_path / "empty.txt").write_bytes(b"")
+    assert [_text(unit) for unit in plan_units(tmp_path / "empty.txt", "txt")] == [""]
+
+
+def test_parse_unit_chunks_each_range(tmp_path, small_units):
+    path = tmp_path / "doc.txt"
+    path.write_text("\n\n".join(f"段落 {i} 的内容" for i in range(200)), encoding="utf-8")
+
+    units = plan_units(path, "txt")
+    chunks = [
+        text
+        for unit in units
+        for section in parse_unit(unit, ChunkingConfig(chunk_size=40, chunk_overlap=0))
+        for _, text in section.chunks
+    ]
+    assert len(units) > 1
+    assert "段落 0 的内容" in chunks[0]
+    assert "段落 199 的内容" in chunks[-1]
+
+
+def test_html_skips_scripts_and_streams_sections(tmp_path, monkeypatch):
+    monkeypatch.setattr(parsers, "_READ_BYTES", 16)
+    body = "".join(f"<p>段落 {i} &amp; 更多</p>\n<script>var x = {i};</script>" for i in range(120))
+    path = tmp_path / "page.html"
+    path.write_text(f"<html><head><style>p {{}}</style></head><body>{body}</body></html>")
+
+    sections = list(iter_sections(plan_units(path, "html")[0]))
+
+    assert [label for label, _ in sections] == ["lines 1-", "lines 51-", "lines 101-"]
+    lines = "\n".join(text for _, text in sections).splitlines()
+    assert lines == [f"段落 {i} & 更多" for i in range(120)]
+
+
+def test_docx_keeps_block_order(tmp_path):
+    docx = pytest.importorskip("docx")
+    document = docx.Document()
+    document.add_paragraph("第一段")
+    table = document.add_table(rows=2, cols=2)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f"r{r}c{c}"
+    document.add_paragraph("最后一段")
+    path = tmp_path / "doc.docx"
+    document.save(path)
+
+    assert _text(plan_units(path, "docx")[0]) == "第一段\nr0c0\tr0c1\nr1c0\tr1c1\n最后一段"
+
+
+def test_pptx_is_split_into_slide_ranges(tmp_path):
+    pptx = pytest.importorskip("pptx")
+    presentation = pptx.Presentation()
+    for number in range(5):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[5])
+        slide.shapes.title.text = f"幻灯片 {number + 1}"
+    path = tmp_path / "deck.pptx"
+    presentation.save(path)
+
+    units = plan_units(path, "pptx", pages_per_unit=2)
+
+    assert [(unit.start, unit.stop) for unit in units] == [(0, 2), (2, 4), (4, None)]
+    sections = [section for unit in units for section in iter_sections(unit)]
+    assert sections == [(f"slide {i}", f"幻灯片 {i}") for i in range(1, 6)]
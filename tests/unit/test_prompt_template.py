@@ -0,0 +1,108 @@
+"""提示词模板测试"""
+
+import pytest
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlmodel import SQLModel
+
+from app.agent.prompt_template import PlaceholderValidationError, PromptTemplateEngine
+from app.models.placeholder import Placeholder
+from app.repositories.placeholder import PlaceholderRepository
+
+SOURCE = "你是 {{ company_name }} 的助手，最多 {{ max_items }} 条"
+
+
+def _placeholders() -> list[Placeholder]:
+    return [
+        Placeholder(
+            id="ph-1", tenant_id=1, agent_id=None, name="company_name",
+            variable_type="string", is_required=True,
+        ),
+        Placeholder(
+            id="ph-2", tenant_id=1, agent_id="agent-1", name="max_items",
+            variable_type="number", validation_rule=r"^\d+$", default_value="3",
+        ),
+    ]
+
+
+class FlakyRepository:
+    """第一次加载失败的占位符仓储"""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def list_by_agent(self, agent_id: str, tenant_id: int, *, is_enabled: bool | None = None):
+        self.calls += 1
+        if self.calls == 1:
+            raise OperationalError("SELECT", {}, Exception("database is down"))
+        return _placeholders()
+
+
+def test_compile_validates_and_coerces():
+    compiled = PromptTemplateEngine().compile("agent-1", 1, 0, SOURCE, _placeholders())
+
+    assert compiled.render({"company_name": "Kiki"}) == "你是 Kiki 的助手，最多 3 条"
+    with pytest.raises(PlaceholderValidationError):
+        compiled.render({})
+    with pytest.raises(PlaceholderValidationError):
+        compiled.render({"company_name": "Kiki", "max_items": "many"})
+
+
+async def test_failed_placeholder_load_is_not_cached():
+    engine = PromptTemplateEngine()
+    repository = FlakyRepository()
+
+    with pytest.raises(OperationalError):
+        await engine.render_for_agent(repository, "agent-1", 1, SOURCE, {"company_name": "Kiki"})
+    assert engine.compilations == 0
+
+    # 下一次重新加载，必填校验仍然生效
+    with pytest.raises(PlaceholderValidationError):
+        await engine.render_for_agent(repository, "agent-1", 1, SOURCE, {})
+    assert repository.calls == 2
+    assert await engine.render_for_agent(
+        repository, "agent-1", 1, SOURCE, {"company_name": "Kiki"}
+    ) == "你是 Kiki 的助手，最多 3 条"
+    assert repository.calls == 2
+
+
+async def test_list_by_agent_raises_on_database_error(monkeypatch):
+    import app.infra.row_cache as row_cache
+    from app.infra.row_cache import RowCache
+
+    monkeypatch.setattr(row_cache, "_row_cache", RowCache(max_size=0))
+    # 未建表，查询失败
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with AsyncSession(engine) as session:
+        with pytest.raises(OperationalError):
+            await PlaceholderRepository(session).list_by_agent("agent-1", 1, is_enabled=True)
+    await engine.dispose()
+
+
+async def test_render_uses_only_the_tenants_placeholders(monkeypatch):
+    import app.infra.row_cache as row_cache
+    from app.infra.row_cache import RowCache
+
+    monkeypatch.setattr(row_cache, "_row_cache", RowCache())
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all, tables=[Placeholder.__table__])
+    source = "{{ company_name }} / {{ api_token }}"
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add_all([
+            Placeholder(id="t1-company", tenant_id=1, name="company_name", default_value="TenantOneCorp"),
+            Placeholder(id="t2-company", tenant_id=2, name="company_name", default_value="TenantTwoCorp"),
+            Placeholder(id="t2-token", tenant_id=2, name="api_token", default_value="tenant-2-internal-token"),
+        ])
+        await session.commit()
+
+        templates = PromptTemplateEngine()
+        repository = PlaceholderRepository(session)
+        # 同一 agent_id 在两个租户下各自编译、各自缓存
+        assert await templates.render_for_agent(repository, "agent-1", 1, source) == "TenantOneCorp / "
+        assert await templates.render_for_agent(
+            repository, "agent-1", 2, source
+        ) == "TenantTwoCorp / tenant-2-internal-token"
+        assert await templates.render_for_agent(repository, "agent-1", 1, source) == "TenantOneCorp / "
+        assert templates.compilations == 2
+    await engine.dispose()
@@ -0,0 +1,266 @@
+"""查询计划测试
+
+执行 ``PlaceholderRepository`` / ``TagRepository`` / ``MessageRepository`` 等的热点查询，
+截获实际发出的 SQL，在 SQLite 上用 EXPLAIN QUERY PLAN 断言命中 ``app.infra.migrations``
+中对应的索引。
+"""
+
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime, timedelta
+from typing import Any
+
+import pytest
+from sqlalchemy import create_engine, event, insert, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlmodel import SQLModel
+
+import app.infra.migrations as migrations
+import app.infra.row_cache as row_cache
+from app.infra.migrations import (
+    MEMORY_EXPIRY_INDEX,
+    MIGRATIONS,
+    SOFT_DELETE_INDEXES,
+    apply_migrations,
+)
+from app.infra.row_cache import RowCache
+from app.models.knowledge import Chunk, Knowledge, KnowledgeTag
+from app.models.memory import Memory
+from app.models.message import Message
+from app.models.placeholder import Placeholder
+from app.models.session import Session
+from app.repositories import MessageRepository
+from app.repositories.base import PaginationParams
+from app.repositories.placeholder import PlaceholderRepository
+from app.repositories.tag import TagRepository
+
+TENANT_ID = 1
+KB_ID = "kb-0"
+AGENT_ID = "agent-1"
+SESSION_ID = "session-0"
+ROWS = 1000
+
+TABLES = [
+    Placeholder.__table__, KnowledgeTag.__table__, Knowledge.__table__,
+    Chunk.__table__, Session.__table__, Message.__table__, Memory.__table__,
+]
+
+# (名称, 查询, 须命中的索引)
+Check = tuple[str, Callable[[AsyncSession], Awaitable[Any]], tuple[str, ...]]
+
+CHECKS: list[Check] = [
+    (
+        "placeholders.list_by_tenant",
+        lambda s: PlaceholderRepository(s).list_by_tenant(TENANT_ID),
+        ("ix_placeholders_tenant_order",),
+    ),
+    (
+        "placeholders.list_by_agent",
+        lambda s: PlaceholderRepository(s).list_by_agent(AGENT_ID, TENANT_ID, is_enabled=True),
+        ("ix_placeholders_tenant_order",),
+    ),
+    (
+        "placeholders.get_by_name",
+        lambda s: PlaceholderRepository(s).get_by_name("var_1", tenant_id=TENANT_ID),
+        ("ix_placeholders_tenant_name",),
+    ),
+    (
+        "tags.list_by_kb",
+        lambda s: TagRepository(s).list_by_kb(KB_ID, TENANT_ID, PaginationParams(size=20)),
+        ("ix_knowledge_tags_kb_order",),
+    ),
+    (
+        "tags.get_knowledge_count",
+        lambda s: TagRepository(s).get_knowledge_count("tag-1", TENANT_ID),
+        ("ix_knowledges_tag_tenant",),
+    ),
+    (
+        "tags.get_chunk_count",
+        lambda s: TagRepository(s).get_chunk_count("tag-1", TENANT_ID),
+        ("ix_chunks_tag_tenant",),
+    ),
+    (
+        "tags.get_counts",
+        lambda s: TagRepository(s).get_counts([f"tag-{i}" for i in range(20)], TENANT_ID),
+        ("ix_knowledges_tag_tenant", "ix_chunks_tag_tenant"),
+    ),
+    (
+        "messages.list_by_session",
+        lambda s: MessageRepository(s).list_by_session(SESSION_ID),
+        ("ix_messages_session_created",),
+    ),
+    (
+        "messages.page_by_session",
+        lambda s: MessageRepository(s).page_by_session(SESSION_ID, PaginationParams(size=20)),
+        ("ix_messages_session_created",),
+    ),
+    (
+        # 与 DatabaseStore.sweep_expired 每批选取过期行的查询一致
+        "memories.sweep_expired",
+        lambda s: s.execute(
+            select(Memory.namespace, Memory.key)
+            .where(Memory.expires_at <= datetime.now(UTC))
+            .limit(500)
+        ),
+        ("ix_memories_expires_at",),
+    ),
+]
+
+
+def _seed(connection, rows: int) -> None:
+    now = datetime.now(UTC)
+    connection.execute(insert(Session), [
+        {"id": f"session-{i}", "tenant_id": TENANT_ID, "title": "检查", "created_at": now, "updated_at": now}
+        for i in range(50)
+    ])
+    connection.execute(insert(Placeholder), [
+        {
+            "id": f"ph-{i}", "tenant_id": 1 + i % 10, "agent_id": f"agent-{i % 50}" if i % 5 else None,
+            "name": f"var_{i}", "variable_type": "string", "display_order": i % 7,
+            "is_required": False, "is_enabled": True, "created_at": now, "updated_at": now,
+            "deleted_at": now if i % 20 == 0 else None,
+        }
+        for i in range(rows)
+    ])
+    connection.execute(insert(KnowledgeTag), [
+        {
+            "id": f"tag-{i}", "tenant_id": 1 + i % 10, "knowledge_base_id": f"kb-{i % 20}",
+            "name": f"标签 {i}", "sort_order": i, "created_at": now, "updated_at": now,
+            "deleted_at": now if i % 20 == 0 else None,
+        }
+        for i in range(rows)
+    ])
+    common = [
+        {
+            "tenant_id": 1 + i % 10, "knowledge_base_id": f"kb-{i % 20}", "tag_id": f"tag-{i % rows}",
+            "created_at": now, "updated_at": now, "deleted_at": now if i % 20 == 0 else None,
+        }
+        for i in range(rows * 5)
+    ]
+    connection.execute(insert(Knowledge), [
+        {**row, "id": f"knowledge-{i}", "type": "file", "title": f"文档 {i}", "source": "upload"}
+        for i, row in enumerate(common)
+    ])
+    connection.execute(insert(Chunk), [
+        {
+            **row, "id": f"chunk-{i}", "knowledge_id": f"knowledge-{i}", "content": "内容",
+            "chunk_index": 0, "start_at": 0, "end_at": 2,
+        }
+        for i, row in enumerate(common)
+    ])
+    connection.execute(insert(Message), [
+        {
+            "id": f"msg-{i}", "request_id": f"req-{i}", "session_id": f"session-{i % 50}",
+            "role": "user", "content": "你好", "created_at": now + timedelta(seconds=i),
+            "updated_at": now,
+        }
+        for i in range(rows * 5)
+    ])
+    connection.execute(insert(Memory), [
+        {
+            "namespace": f"users.u{i % 100}", "key": f"memory-{i}", "value": {"i": i},
+            "created_at": now, "updated_at": now,
+            "expires_at": now + timedelta(minutes=i - rows) if i % 10 == 0 else None,
+        }
+        for i in range(rows * 5)
+    ])
+
+
+@pytest.fixture(scope="module")
+def database_path(tmp_path_factory) -> str:
+    """已建表、执行迁移并写入测试数据的 SQLite 库 - module 级别"""
+    path = tmp_path_factory.mktemp("plans") / "plans.db"
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        SQLModel.metadata.create_all(connection, tables=TABLES)
+        apply_migrations(connection)
+        _seed(connection, ROWS)
+        connection.exec_driver_sql("ANALYZE")
+    engine.dispose()
+    return str(path)
+
+
+@pytest.fixture
+async def engine(database_path, monkeypatch):
+    """查询计划检查用的异步引擎，占位符读穿缓存关闭以保证查询真正发出"""
+    monkeypatch.setattr(row_cache, "_row_cache", RowCache(max_size=0))
+    engine = create_async_engine(f"sqlite+aiosqlite:///{database_path}")
+    yield engine
+    await engine.dispose()
+
+
+async def _search_plan(engine, query: Callable[[AsyncSession], Awaitable[Any]]) -> list[str]:
+    """执行查询并返回其 SELECT 语句查询计划中的 SEARCH 行"""
+    captured: list[tuple[str, Any]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    async with async_sessionmaker(engine)() as session:
+        event.listen(engine.sync_engine, "before_cursor_execute", capture)
+        try:
+            await query(session)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", capture)
+
+        assert captured, "查询未发出 SELECT"
+        connection = await session.connection()
+        lines: list[str] = []
+        for statement, parameters in captured:
+            result = await connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            lines.extend(str(row[-1]) for row in result)
+    # SCAN ... USING INDEX 是整个索引扫描，须为 SEARCH（按索引查找）
+    return [line for line in lines if line.startswith("SEARCH")]
+
+
+@pytest.mark.parametrize(("query", "expected"), [check[1:] for check in CHECKS], ids=[check[0] for check in CHECKS])
+async def test_query_uses_index(engine, query, expected):
+    plan = await _search_plan(engine, query)
+    for index in expected:
+        assert any(f"USING INDEX {index}" in line for line in plan), f"{index} 未命中: {plan}"
+
+
+def test_every_index_is_checked():
+    checked = {index for _, _, expected in CHECKS for index in expected}
+    declared = {spec.name for migration in MIGRATIONS for spec in migration.indexes}
+    assert declared == checked
+
+
+def test_migrations_skip_golang_migrate_ledger():
+    """public.sql 建的 schema_migrations(version, dirty) 不影响索引迁移"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE schema_migrations (version INT8 PRIMARY KEY, dirty BOOL NOT NULL)"))
+        SQLModel.metadata.create_all(connection, tables=TABLES)
+
+    assert apply_migrations(engine) == [migration.id for migration in MIGRATIONS]
+    assert apply_migrations(engine) == []
+    engine.dispose()
+
+
+def test_migration_waits_for_missing_tables():
+    """public.sql 中没有的表（如 memories）建好之前，对应迁移不记为已执行"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        SQLModel.metadata.create_all(connection, tables=TABLES[:-1])
+
+    assert apply_migrations(engine) == [SOFT_DELETE_INDEXES.id]
+    with engine.begin() as connection:
+        SQLModel.metadata.create_all(connection, tables=[Memory.__table__])
+    assert apply_migrations(engine) == [MEMORY_EXPIRY_INDEX.id]
+    engine.dispose()
+
+
+def test_invalid_index_is_rebuilt(monkeypatch):
+    """中途失败的并发建索引留下的无效索引先删除再重建，而不是被 IF NOT EXISTS 跳过"""
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        SQLModel.metadata.create_all(connection, tables=[Memory.__table__])
+        connection.execute(text("CREATE INDEX ix_memories_expires_at ON memories (namespace)"))
+    monkeypatch.setattr(migrations, "_is_invalid", lambda connection, name: name == "ix_memories_expires_at")
+
+    assert apply_migrations(engine, (MEMORY_EXPIRY_INDEX,)) == [MEMORY_EXPIRY_INDEX.id]
+    with engine.connect() as connection:
+        columns = [row[2] for row in connection.exec_driver_sql("PRAGMA index_info(ix_memories_expires_at)")]
+    assert columns == ["expires_at"]
+    engine.dispose()
@@ -0,0 +1,88 @@
+"""重排序测试"""
+
+from collections.abc import Sequence
+from types import SimpleNamespace
+
+import pytest
+
+from app.llm.rerank import LexicalScorer, RerankCandidate, Reranker
+
+
+class CountingScorer(LexicalScorer):
+    """记录每次打分请求的本地打分器"""
+
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    async def ascore(self, query: str, documents: Sequence[str]) -> list[float]:
+        self.calls.append(list(documents))
+        return await super().ascore(query, documents)
+
+
+def _settings(top_k: int, threshold: float) -> SimpleNamespace:
+    return SimpleNamespace(rerank_top_k=top_k, rerank_threshold=threshold)
+
+
+@pytest.fixture
+def scorer() -> CountingScorer:
+    return CountingScorer()
+
+
+def _candidates() -> list[RerankCandidate]:
+    # 检索分数从高到低：c0 最先打分
+    contents = ["如何配置知识库", "知识库配置说明", "配置知识", "天气预报", "今天吃什么", "库存管理"]
+    return [
+        RerankCandidate(f"c{i}", content, score=1.0 - i / 10)
+        for i, content in enumerate(contents)
+    ]
+
+
+def test_lexical_scorer_is_deterministic():
+    first = LexicalScorer.score("配置知识库", "如何配置知识库")
+    assert first == LexicalScorer.score("配置知识库", "如何配置知识库")
+    assert first == 1.0
+    assert LexicalScorer.score("配置知识库", "天气预报") == 0.0
+
+
+async def test_cache_hits_per_query_and_chunk(scorer):
+    reranker = Reranker(scorer, batch_size=2, max_concurrency=1)
+    candidates = _candidates()
+
+    first = await reranker.rerank("配置知识库", candidates, _settings(10, 0.0))
+    assert reranker.scored == len(candidates)
+    assert reranker.cache_hits == 0
+
+    calls = len(scorer.calls)
+    second = await reranker.rerank("配置知识库", candidates, _settings(10, 0.0))
+    assert second == first
+    assert len(scorer.calls) == calls
+    assert reranker.cache_hits == len(candidates)
+
+    # 不同查询不命中，同一查询的新分块只给新分块打分
+    await reranker.rerank("天气", candidates[:1], _settings(10, 0.0))
+    assert scorer.calls[-1] == ["如何配置知识库"]
+    await reranker.rerank("配置知识库", [*candidates, RerankCandidate("c9", "知识库")], _settings(10, 0.0))
+    assert scorer.calls[-1] == ["知识库"]
+
+
+async def test_early_exit_once_top_k_clear_threshold(scorer):
+    reranker = Reranker(scorer, batch_size=2, max_concurrency=1)
+
+    hits = await reranker.rerank("配置知识库", _candidates(), _settings(2, 0.5))
+
+    # 第一批 (c0, c1) 都超过阈值，其余两批不再打分
+    assert scorer.calls == [["如何配置知识库", "知识库配置说明"]]
+    assert reranker.skipped == 4
+    assert [hit.id for hit in hits] == ["c0", "c1"]
+
+
+async def test_threshold_filters_hits(scorer):
+    reranker = Reranker(scorer, batch_size=4)
+
+    hits = await reranker.rerank("配置知识库", _candidates(), _settings(10, 0.5))
+
+    assert reranker.skipped == 0
+    assert all(hit.score >= 0.5 for hit in hits)
+    assert {hit.id for hit in hits} == {"c0", "c1", "c2"}
+    assert [hit.score for hit in hits] == sorted((hit.score for hit in hits), reverse=True)
+    assert hits[0].retrieval_score == 1.0
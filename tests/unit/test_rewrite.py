@@ -0,0 +1,70 @@
+"""查询改写与推测检索测试"""
+
+import asyncio
+from types import SimpleNamespace
+
+from app.llm.rewrite import QueryRewriter, rewrite_and_retrieve
+
+HISTORY = [{"role": "user", "content": "介绍一下 Kiki"}, {"role": "assistant", "content": "Kiki 是助手"}]
+SETTINGS = SimpleNamespace(enable_rewrite=True, max_rounds=5)
+
+
+class SlowModel:
+    """等待 ``release`` 后返回固定改写结果的模型"""
+
+    def __init__(self, answer: str) -> None:
+        self.answer = answer
+        self.release = asyncio.Event()
+
+    async def ainvoke(self, messages):
+        await self.release.wait()
+        return SimpleNamespace(content=self.answer)
+
+
+def _retriever(model: SlowModel, *, fail: set[str]):
+    calls: list[str] = []
+
+    async def retrieve(text: str) -> list[str]:
+        calls.append(text)
+        if text in fail:
+            # 推测检索先失败，随后改写才完成
+            asyncio.get_running_loop().call_later(0.01, model.release.set)
+            raise RuntimeError("index unavailable")
+        return [f"hit:{text}"]
+
+    return retrieve, calls
+
+
+async def test_speculative_failure_falls_through_to_rewritten_query():
+    model = SlowModel("Kiki 的价格是多少")
+    retrieve, calls = _retriever(model, fail={"它的价格呢"})
+
+    result = await rewrite_and_retrieve(
+        QueryRewriter(model), retrieve, "它的价格呢", HISTORY, SETTINGS
+    )
+
+    assert result.query == "Kiki 的价格是多少"
+    assert result.hits == ["hit:Kiki 的价格是多少"]
+    assert result.rewritten and not result.speculative
+    assert calls == ["它的价格呢", "Kiki 的价格是多少"]
+
+
+async def test_speculative_failure_retries_unchanged_query():
+    model = SlowModel("它的价格呢")
+    attempts = 0
+
+    async def retrieve(text: str) -> list[str]:
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            asyncio.get_running_loop().call_later(0.01, model.release.set)
+            raise RuntimeError("index unavailable")
+        return [f"hit:{text}"]
+
+    result = await rewrite_and_retrieve(
+        QueryRewriter(model), retrieve, "它的价格呢", HISTORY, SETTINGS
+    )
+
+    assert result.hits == ["hit:它的价格呢"]
+    assert not result.rewritten and not result.speculative
+    assert attempts == 2
@@ -0,0 +1,56 @@
+"""热点行缓存测试"""
+
+import asyncio
+
+import pytest
+
+from app.infra.row_cache import RowCache
+
+
+async def test_hit_returns_copy():
+    cache = RowCache()
+
+    async def load():
+        return {"model": "gpt-4o"}
+
+    first = await cache.get_or_load("tenant:1", "config", load)
+    first["model"] = "changed"
+    assert await cache.get_or_load("tenant:1", "config", load) == {"model": "gpt-4o"}
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.parametrize("clear", [False, True])
+async def test_inflight_load_is_not_written_back(clear):
+    cache = RowCache()
+    await cache.invalidate("tenant:1")
+    started, release = asyncio.Event(), asyncio.Event()
+
+    async def slow_load():
+        started.set()
+        await release.wait()
+        return "stale"
+
+    task = asyncio.create_task(cache.get_or_load("tenant:1", "config", slow_load))
+    await started.wait()
+    if clear:
+        cache.clear()
+    # 清空后再失效一次，版本号不能回到加载开始时的值
+    await cache.invalidate("tenant:1")
+    release.set()
+    assert await task == "stale"
+    assert len(cache) == 0
+
+    async def load():
+        return "fresh"
+
+    assert await cache.get_or_load("tenant:1", "config", load) == "fresh"
+
+
+async def test_clear_bumps_versions():
+    cache = RowCache()
+    cache.invalidate_local("tenant:1")
+    before = {scope: cache.version(scope) for scope in ("tenant:1", "tenant:2")}
+
+    cache.clear()
+
+    assert all(cache.version(scope) > version for scope, version in before.items())
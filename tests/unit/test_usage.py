@@ -0,0 +1,180 @@
+"""用量采集测试"""
+
+import threading
+from uuid import uuid4
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, Generation, LLMResult
+
+from app.llm.cost_tracker import CostTracker, ModelPricing, PricingTable
+from app.llm.usage import UsageEvent, UsageRecorder, UsageTrackingCallback
+
+# 每 token 1 美元，便于核对
+PRICING = PricingTable({"model-a": ModelPricing(1_000_000, 1_000_000)})
+
+
+@pytest.fixture
+def recorder():
+    recorder = UsageRecorder(CostTracker(pricing=PRICING))
+    yield recorder
+    recorder.close()
+
+
+@pytest.fixture
+def events(recorder) -> list[UsageEvent]:
+    events: list[UsageEvent] = []
+    recorder.add_handler(lambda event, cost: events.append(event))
+    return events
+
+
+def _chat_result(*messages: AIMessage, llm_output: dict | None = None) -> LLMResult:
+    return LLMResult(
+        generations=[[ChatGeneration(message=message) for message in messages]],
+        llm_output=llm_output,
+    )
+
+
+def _run(callback, response: LLMResult, *, metadata=None, invocation_params=None) -> None:
+    run_id = uuid4()
+    callback.on_chat_model_start(
+        {}, [[]], run_id=run_id, metadata=metadata, invocation_params=invocation_params
+    )
+    callback.on_llm_end(response, run_id=run_id)
+
+
+def test_usage_metadata_with_cache_reads(recorder, events):
+    callback = UsageTrackingCallback(recorder)
+    # OpenAI / Anthropic 的 LangChain 集成都把缓存命中写在 input_token_details.cache_read
+    message = AIMessage(
+        content="ok",
+        response_metadata={"model_name": "model-a-2024"},
+        usage_metadata={
+            "input_tokens": 120,
+            "output_tokens": 30,
+            "total_tokens": 150,
+            "input_token_details": {"cache_read": 100, "cache_creation": 20},
+        },
+    )
+    _run(callback, _chat_result(message), metadata={"tenant_id": 7})
+
+    assert recorder.flush(timeout=5)
+    [event] = events
+    assert (event.model, event.tenant_id) == ("model-a-2024", 7)
+    assert (event.input_tokens, event.output_tokens, event.cached_tokens) == (120, 30, 100)
+    assert recorder.tracker.get_summary(tenant_id=7).total_cost == pytest.approx(150.0)
+
+
+def test_usage_metadata_is_summed_across_generations(recorder, events):
+    callback = UsageTrackingCallback(recorder)
+    messages = [
+        AIMessage(
+            content=str(i),
+            usage_metadata={"input_tokens": 10, "output_tokens": 5, "total_tokens": 15},
+        )
+        for i in range(3)
+    ]
+    _run(callback, _chat_result(*messages), metadata={"ls_model_name": "model-a"})
+
+    assert recorder.flush(timeout=5)
+    [event] = events
+    assert (event.model, event.input_tokens, event.output_tokens, event.cached_tokens) == (
+        "model-a",
+        30,
+        15,
+        0,
+    )
+
+
+def test_token_usage_fallback_for_completion_models(recorder, events):
+    callback = UsageTrackingCallback(recorder)
+    # 非 Chat 模型 / 未返回 usage_metadata 的提供商：读取 llm_output.token_usage
+    response = LLMResult(
+        generations=[[Generation(text="ok")]],
+        llm_output={
+            "model_name": "model-a-instruct",
+            "token_usage": {
+                "prompt_tokens": 80,
+                "completion_tokens": 20,
+                "prompt_tokens_details": {"cached_tokens": 64},
+            },
+        },
+    )
+    run_id = uuid4()
+    callback.on_llm_start({}, ["prompt"], run_id=run_id, invocation_params={"model": "ignored"})
+    callback.on_llm_end(response, run_id=run_id)
+
+    assert recorder.flush(timeout=5)
+    [event] = events
+    assert (event.model, event.run_id) == ("model-a-instruct", str(run_id))
+    assert (event.input_tokens, event.output_tokens, event.cached_tokens) == (80, 20, 64)
+
+
+def test_model_falls_back_to_invocation_params(recorder, events):
+    callback = UsageTrackingCallback(recorder)
+    message = AIMessage(content="ok")
+    _run(callback, _chat_result(message), invocation_params={"model_name": "model-a"})
+    # 没有对应的开始事件
+    callback.on_llm_end(_chat_result(message), run_id=uuid4())
+
+    assert recorder.flush(timeout=5)
+    assert [(event.model, event.input_tokens) for event in events] == [
+        ("model-a", 0),
+        ("unknown", 0),
+    ]
+
+
+def test_errored_runs_are_not_recorded(recorder, events):
+    callback = UsageTrackingCallback(recorder)
+    run_id = uuid4()
+    callback.on_chat_model_start({}, [[]], run_id=run_id, metadata={"tenant_id": 1})
+    callback.on_llm_error(RuntimeError("timeout"), run_id=run_id)
+
+    assert recorder.flush(timeout=5)
+    assert events == []
+    assert callback._runs == {}
+
+
+def test_recorder_drains_in_submission_order(recorder):
+    order: list[str] = []
+    recorder.add_handler(lambda event, cost: order.append(f"{event.model}:{cost:.0f}"))
+    for tokens in (1, 2, 3):
+        recorder.submit(UsageEvent(model="model-a", input_tokens=tokens, output_tokens=0))
+        assert recorder.defer(lambda tokens=tokens: order.append(f"after {tokens}"))
+
+    assert recorder.flush(timeout=5)
+    assert order == ["model-a:1", "after 1", "model-a:2", "after 2", "model-a:3", "after 3"]
+    assert recorder.tracker.get_summary().request_count == 3
+
+
+def test_recorder_drops_when_queue_is_full():
+    recorder = UsageRecorder(CostTracker(pricing=PRICING), max_queue_size=1)
+    started, release = threading.Event(), threading.Event()
+    # 占住后台线程，让队列只能容纳一个事件
+    recorder.defer(lambda: (started.set(), release.wait(5)))
+    assert started.wait(5)
+    recorder.submit(UsageEvent(model="model-a", input_tokens=1, output_tokens=0))
+    recorder.submit(UsageEvent(model="model-a", input_tokens=2, output_tokens=0))
+    assert not recorder.defer(lambda: None)
+
+    release.set()
+    recorder.close()
+    assert recorder.dropped == 1
+    assert recorder.tracker.get_summary().total_input_tokens == 1
+
+
+def test_close_writes_pending_events_and_stops_worker(recorder):
+    handled = threading.Event()
+    recorder.add_handler(lambda event, cost: handled.wait(0.05))
+    for _ in range(5):
+        recorder.submit(UsageEvent(model="model-a", input_tokens=1, output_tokens=1))
+    worker = recorder._worker
+
+    recorder.close()
+
+    assert not worker.is_alive()
+    assert recorder.tracker.get_summary().request_count == 5
+    # 关闭后再次提交会重新启动后台线程
+    recorder.submit(UsageEvent(model="model-a", input_tokens=1, output_tokens=1))
+    assert recorder.flush(timeout=5)
+    assert recorder.tracker.get_summary().request_count == 6
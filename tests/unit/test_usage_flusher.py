@@ -0,0 +1,125 @@
+"""用量写回测试"""
+
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel
+
+from app.llm.cost_tracker import CostRecord, CostTracker
+from app.llm.usage_flusher import UsageFlusher
+from app.models.llm_usage import UNATTRIBUTED_TENANT_ID, LLMUsage
+from app.repositories.llm_usage import LLMUsageRepository
+
+# 同一分钟桶内的时间戳
+NOW = 1_700_000_040.0
+
+
+@pytest.fixture
+async def factory():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all, tables=[LLMUsage.__table__])
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+def _flusher(factory, **kwargs) -> UsageFlusher:
+    return UsageFlusher(CostTracker(), session_factory=factory, **kwargs)
+
+
+def _record(
+    tenant_id: int | None = 1, model: str = "model-a", timestamp: float = NOW
+) -> CostRecord:
+    return CostRecord(
+        model=model,
+        input_tokens=100,
+        output_tokens=20,
+        cost=0.5,
+        cached_tokens=10,
+        tenant_id=tenant_id,
+        latency_ms=200.0,
+        timestamp=timestamp,
+    )
+
+
+async def _totals(factory, **kwargs):
+    async with factory() as session:
+        return await LLMUsageRepository(session).get_totals(**kwargs)
+
+
+async def test_workers_accumulate_into_same_bucket(factory):
+    # 两个 worker 各自写同一 (租户, 模型, 分钟) 的增量
+    workers = [_flusher(factory), _flusher(factory)]
+    for worker in workers:
+        worker.add_record(_record())
+        worker.add_record(_record())
+    workers[0].add_record(_record(tenant_id=None))
+    workers[1].add_record(_record(timestamp=NOW + 60))
+
+    assert [await worker.flush() for worker in workers] == [2, 2]
+    assert await workers[0].flush() == 0
+
+    totals = await _totals(factory, group_by=("tenant_id", "bucket_start"))
+    assert [(t.tenant_id, t.request_count) for t in totals] == [
+        (UNATTRIBUTED_TENANT_ID, 1),
+        (1, 4),
+        (1, 1),
+    ]
+    total = (await _totals(factory, tenant_id=1))[0]
+    assert (total.input_tokens, total.output_tokens, total.cached_tokens) == (500, 100, 50)
+    assert total.cost == pytest.approx(2.5)
+    assert total.latency_ms == pytest.approx(1000.0)
+
+
+async def test_failed_batches_are_retried(factory):
+    attempts = 0
+
+    @asynccontextmanager
+    async def flaky():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 2:
+            raise ConnectionError("database unavailable")
+        async with factory() as session:
+            yield session
+
+    flusher = _flusher(flaky, batch_size=1)
+    for model in ("model-a", "model-b", "model-c"):
+        flusher.add_record(_record(model=model))
+
+    # 第二批失败：第一批已写入，其余放回待写区
+    assert await flusher.flush() == 1
+    assert flusher.pending == 2
+    flusher.add_record(_record(model="model-b"))
+    assert await flusher.flush() == 2
+    assert flusher.pending == 0
+
+    totals = await _totals(factory, group_by=("model",))
+    assert [(t.model, t.request_count) for t in totals] == [
+        ("model-a", 1),
+        ("model-b", 2),
+        ("model-c", 1),
+    ]
+
+
+async def test_pending_buckets_are_capped(factory):
+    flusher = _flusher(factory, max_pending=2)
+    for model in ("model-a", "model-b", "model-c"):
+        flusher.add_record(_record(model=model))
+    # 已有的键继续累加
+    flusher.add_record(_record(model="model-a"))
+
+    assert (flusher.pending, flusher.dropped) == (2, 1)
+    assert await flusher.flush() == 2
+
+
+async def test_stop_flushes_tracked_usage(factory):
+    flusher = _flusher(factory, interval=3600)
+    flusher.start()
+    flusher.tracker.track("model-a", 100, 20, tenant_id=1)
+    await flusher.stop()
+
+    total = (await _totals(factory, tenant_id=1))[0]
+    assert (total.request_count, total.input_tokens, total.output_tokens) == (1, 100, 20)
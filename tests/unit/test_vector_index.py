@@ -0,0 +1,180 @@
+"""向量索引测试"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from app.infra.vector_index import VectorIndex
+
+DIMENSIONS = 32
+
+
+def _vectors(count: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((count, DIMENSIONS)).astype(np.float32)
+
+
+def _clustered(
+    count: int, queries: int, dimensions: int = 64, *, decay: bool = False
+) -> tuple[np.ndarray, np.ndarray]:
+    """聚类分布的文档向量和落在文档附近的查询向量，比独立高斯分布更接近真实 Embedding
+
+    ``decay`` 时各维方差按维度递减，模拟 Matryoshka 模型把主要信息放在前缀维度。
+    """
+    rng = np.random.default_rng(7)
+    centers = rng.standard_normal((50, dimensions))
+    vectors = centers[rng.integers(0, len(centers), count)]
+    vectors += 0.5 * rng.standard_normal((count, dimensions))
+    probes = vectors[rng.integers(0, count, queries)]
+    probes += 0.5 * rng.standard_normal((queries, dimensions))
+    if decay:
+        scale = 1 / np.sqrt(1 + np.arange(dimensions))
+        vectors, probes = vectors * scale, probes * scale
+    return vectors.astype(np.float32), probes.astype(np.float32)
+
+
+def _recall(index: VectorIndex, queries: np.ndarray, k: int = 10, **kwargs) -> float:
+    """相对全精度精确搜索的 recall@k"""
+    found = index.search_batch(queries, k, **kwargs)
+    expected = index.search_batch(queries, k, exact=True)
+    return float(
+        np.mean(
+            [
+                len({hit.id for hit in hits} & {hit.id for hit in exact}) / k
+                for hits, exact in zip(found, expected, strict=True)
+            ]
+        )
+    )
+
+
+@pytest.mark.parametrize("spill", [False, True])
+def test_compaction_during_search_keeps_ids_aligned(tmp_path, spill):
+    vectors = _vectors(200)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = VectorIndex(
+        DIMENSIONS,
+        quantization="int8",
+        vectors_path=tmp_path / "vectors.f32" if spill else None,
+        block_size=64,
+    )
+    index.add(ids, vectors)
+
+    # 在查询取完快照、开始计算之前删除前半部分，触发自动压缩
+    candidates_flat = index._candidates_flat
+
+    def delete_then_score(snapshot, queries, k):
+        index.delete(ids[:100])
+        return candidates_flat(snapshot, queries, k)
+
+    index._candidates_flat = delete_then_score
+    target = 150
+    hits = index.search(vectors[target], k=3)
+    del index._candidates_flat
+
+    assert index._size == 100
+    assert hits[0].id == ids[target]
+    assert hits[0].score == pytest.approx(1.0, abs=1e-5)
+    # 压缩后的索引同样正确
+    assert index.search(vectors[target], k=1)[0].id == ids[target]
+    assert ids[0] not in index
+
+
+def test_concurrent_delete_and_search():
+    vectors = _vectors(2000, seed=1)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = VectorIndex(DIMENSIONS, block_size=128, compact_ratio=0.05)
+    index.add(ids, vectors)
+    # 后半部分不删除，查询它们时结果必须始终指向同一条向量
+    targets = range(1000, 2000, 50)
+    errors: list[str] = []
+    done = threading.Event()
+
+    def search() -> None:
+        while not done.is_set():
+            for target in targets:
+                hit = index.search(vectors[target], k=1)[0]
+                if hit.id != ids[target] or abs(hit.score - 1.0) > 1e-4:
+                    errors.append(f"{ids[target]} -> {hit.id} ({hit.score:.3f})")
+
+    readers = [threading.Thread(target=search) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    try:
+        for start in range(0, 1000, 20):
+            index.delete(ids[start : start + 20])
+            index.add(ids[start : start + 10], vectors[start : start + 10])
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+
+    assert errors == []
+
+
+@pytest.mark.parametrize(
+    ("quantization", "rerank_factor", "min_recall"),
+    [("int8", 4, 0.98), ("binary", 10, 0.95)],
+)
+def test_quantized_search_recall_with_rerank(quantization, rerank_factor, min_recall):
+    vectors, queries = _clustered(3000, 50)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = VectorIndex(64, quantization=quantization, rerank_factor=rerank_factor)
+    index.add(ids, vectors)
+
+    assert _recall(index, queries) >= min_recall
+    # 重排后的分数是全精度分数，与精确搜索一致
+    hits = index.search(queries[0], k=5)
+    exact = {hit.id: hit.score for hit in index.search(queries[0], k=50, exact=True)}
+    assert [hit.score for hit in hits] == pytest.approx([exact[hit.id] for hit in hits], abs=1e-5)
+
+
+def test_binary_recall_depends_on_rerank_shortlist():
+    vectors, queries = _clustered(3000, 50)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    recalls = []
+    for rerank_factor in (1, 4, 10):
+        index = VectorIndex(64, quantization="binary", rerank_factor=rerank_factor)
+        index.add(ids, vectors)
+        recalls.append(_recall(index, queries))
+
+    # 汉明距离区分度有限，只取 k 个候选时召回明显偏低
+    assert recalls[0] < 0.6
+    assert recalls[0] < recalls[1] < recalls[2]
+
+
+def test_matryoshka_stages():
+    vectors, queries = _clustered(3000, 50, decay=True)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = VectorIndex(64, search_dimensions=16, rerank_factor=4)
+    index.add(ids, vectors)
+
+    # 粗排只看前 16 维，重排后召回接近精确搜索，分数为完整维度的余弦
+    assert _recall(index, queries) >= 0.95
+    assert _recall(index, queries, search_dimensions=64) == 1.0
+    hits = index.search(queries[0], k=5)
+    exact = {hit.id: hit.score for hit in index.search(queries[0], k=50, exact=True)}
+    assert [hit.score for hit in hits] == pytest.approx([exact[hit.id] for hit in hits], abs=1e-5)
+
+    # 重排维度小于完整维度时，分数为前缀维度重新归一化后的余弦
+    prefix = vectors[:, :32] / np.linalg.norm(vectors[:, :32], axis=1, keepdims=True)
+    query = queries[0, :32] / np.linalg.norm(queries[0, :32])
+    hits = index.search(queries[0], k=5, rerank_dimensions=32)
+    rows = [ids.index(hit.id) for hit in hits]
+    assert [hit.score for hit in hits] == pytest.approx(prefix[rows] @ query, abs=1e-5)
+    assert rows == list(np.argsort(prefix @ query)[::-1][:5])
+
+    # 查询时指定与索引配置不同的粗排维度，按前缀现算
+    assert _recall(index, queries, search_dimensions=32) >= _recall(index, queries)
+
+
+def test_matryoshka_stage_with_quantization():
+    vectors, queries = _clustered(3000, 50, decay=True)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    index = VectorIndex(64, search_dimensions=16, quantization="int8", rerank_factor=8)
+    index.add(ids, vectors)
+
+    # 粗排编码只保存前缀维度
+    assert index._codes.shape[1] == 16
+    assert _recall(index, queries) >= 0.95
+    with pytest.raises(ValueError):
+        VectorIndex(64, search_dimensions=128)